@@ -0,0 +1,65 @@
+"""
+Calendario laboral en memoria - Sistema GIGA
+
+Evita consultar la tabla feriado en cada marcación: los feriados activos se
+cargan por año y se guardan en la caché de aplicación (espacio 'feriados').
+Las altas, modificaciones y bajas de feriados invalidan el espacio
+(ver common/signals.py).
+"""
+
+from datetime import date, timedelta
+import logging
+
+from common.cache import cache_app
+
+logger = logging.getLogger(__name__)
+
+
+class CalendarioLaboral:
+    """Feriados activos por año servidos desde la caché de aplicación"""
+
+    ESPACIO = 'feriados'
+    TTL_SEGUNDOS = 3600
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl if ttl is not None else self.TTL_SEGUNDOS
+
+    def _cargar_anio(self, anio):
+        """Carga todos los feriados activos que tocan el año indicado"""
+        from guardias.models import Feriado
+
+        inicio = date(anio, 1, 1)
+        fin = date(anio, 12, 31)
+        feriados = {}
+        for nombre, desde, hasta in Feriado.feriados_en_rango(inicio, fin).values_list(
+            'nombre', 'fecha_inicio', 'fecha_fin'
+        ):
+            dia = max(desde, inicio)
+            while dia <= min(hasta, fin):
+                feriados.setdefault(dia, []).append(nombre)
+                dia += timedelta(days=1)
+        return feriados
+
+    def feriados_del_anio(self, anio):
+        """Retorna {fecha: [nombres]} de los feriados del año"""
+        return cache_app.obtener(self.ESPACIO, (anio,), lambda: self._cargar_anio(anio), self.ttl)
+
+    def feriados_en_fecha(self, fecha):
+        """Nombres de los feriados de una fecha (lista vacía si no hay)"""
+        return self.feriados_del_anio(fecha.year).get(fecha, [])
+
+    def es_feriado(self, fecha):
+        return bool(self.feriados_en_fecha(fecha))
+
+    def es_dia_laborable(self, fecha):
+        """False si es sábado, domingo o feriado"""
+        if fecha.weekday() in [5, 6]:
+            return False
+        return not self.es_feriado(fecha)
+
+    def invalidar(self):
+        """Descarta los feriados cargados (se recargan en la próxima consulta)"""
+        cache_app.invalidar(self.ESPACIO)
+
+
+calendario = CalendarioLaboral()
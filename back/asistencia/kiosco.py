@@ -0,0 +1,391 @@
+"""
+Ingesta de marcaciones por lote - Sistema GIGA
+
+Los kioscos y terminales sin conexión acumulan marcaciones y las envían juntas.
+Todo el lote se valida con pocas consultas y se aplica en una sola transacción
+con upserts por conjunto sobre asistencia. Cada marcación trae un id generado
+por el cliente: reenviar el mismo lote no duplica nada y devuelve el resultado
+ya registrado.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from auditoria.buffer import encolar_auditoria
+from personas.models import Agente
+from .calendario import calendario
+from .models import Asistencia, IntentoMarcacionFraudulenta, MarcacionKiosco
+from .resumen import programar_recalculo
+
+logger = logging.getLogger(__name__)
+
+MAX_MARCACIONES_LOTE = 500
+TIPOS_MARCACION = ('entrada', 'salida')
+
+
+def _parsear_timestamp(valor):
+    """Convierte un timestamp ISO 8601 a datetime local sin zona horaria"""
+    if not isinstance(valor, str):
+        raise ValueError('timestamp inválido')
+    momento = datetime.fromisoformat(valor.strip())
+    if momento.tzinfo is not None:
+        momento = momento.astimezone(ZoneInfo(settings.TIME_ZONE)).replace(tzinfo=None)
+    return momento.replace(microsecond=0)
+
+
+def _rechazo(id_cliente, motivo):
+    return {'id_cliente': id_cliente, 'estado': 'rechazada', 'motivo': motivo, 'id_asistencia': None}
+
+
+def _validar_formato(marcaciones):
+    """
+    Valida la estructura de cada marcación.
+    Retorna (resultados parciales, marcaciones válidas como dicts normalizados).
+    """
+    resultados = [None] * len(marcaciones)
+    validas = []
+    vistos = set()
+
+    for indice, marcacion in enumerate(marcaciones):
+        if not isinstance(marcacion, dict):
+            resultados[indice] = _rechazo(None, 'formato_invalido')
+            continue
+
+        id_cliente = str(marcacion.get('id_cliente') or '').strip()
+        dni = str(marcacion.get('dni') or '').strip()
+        tipo = marcacion.get('tipo')
+
+        if not id_cliente or len(id_cliente) > 64:
+            resultados[indice] = _rechazo(id_cliente or None, 'id_cliente_invalido')
+            continue
+        if id_cliente in vistos:
+            resultados[indice] = {
+                'id_cliente': id_cliente, 'estado': 'duplicada',
+                'motivo': 'repetida_en_lote', 'id_asistencia': None
+            }
+            continue
+        vistos.add(id_cliente)
+
+        if not dni:
+            resultados[indice] = _rechazo(id_cliente, 'dni_requerido')
+            continue
+        if tipo not in TIPOS_MARCACION:
+            resultados[indice] = _rechazo(id_cliente, 'tipo_invalido')
+            continue
+        try:
+            momento = _parsear_timestamp(marcacion.get('timestamp'))
+        except ValueError:
+            resultados[indice] = _rechazo(id_cliente, 'timestamp_invalido')
+            continue
+
+        validas.append({
+            'indice': indice,
+            'id_cliente': id_cliente,
+            'dni': dni,
+            'tipo': tipo,
+            'momento': momento,
+        })
+
+    return resultados, validas
+
+
+def _filtrar_tolerancia(validas, resultados):
+    """
+    Rechaza las marcaciones cuyo timestamp se aleja de la hora del servidor más
+    que KIOSCO_TOLERANCIA_SEGUNDOS (para usuarios sin rol de supervisión).
+    Retorna las que quedan dentro de la ventana.
+    """
+    tolerancia = timedelta(seconds=getattr(settings, 'KIOSCO_TOLERANCIA_SEGUNDOS', 300))
+    ahora = datetime.now(ZoneInfo(settings.TIME_ZONE)).replace(tzinfo=None)
+    aceptadas = []
+    for marca in validas:
+        if abs(marca['momento'] - ahora) > tolerancia:
+            resultados[marca['indice']] = _rechazo(marca['id_cliente'], 'fuera_de_tolerancia')
+        else:
+            aceptadas.append(marca)
+    return aceptadas
+
+
+def _reservar_ids(validas, agente_sesion, terminal):
+    """
+    Registra los ids de cliente del lote. Los que ya existían se devuelven
+    aparte: son reenvíos (o un lote igual procesándose en paralelo).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO marcacion_kiosco (id_cliente, dni, tipo, marcado_en, id_agente_sesion, terminal)
+            SELECT u.id_cliente, u.dni, u.tipo, u.marcado_en, %s, %s
+            FROM unnest(%s::varchar[], %s::varchar[], %s::varchar[], %s::timestamp[])
+                AS u(id_cliente, dni, tipo, marcado_en)
+            ON CONFLICT (id_cliente) DO NOTHING
+            RETURNING id_cliente
+            """,
+            [
+                agente_sesion.id_agente, terminal,
+                [m['id_cliente'] for m in validas],
+                [m['dni'] for m in validas],
+                [m['tipo'] for m in validas],
+                [m['momento'] for m in validas],
+            ]
+        )
+        return {fila[0] for fila in cursor.fetchall()}
+
+
+def _aplicar_transiciones(grupos, existentes):
+    """
+    Simula en memoria, en orden cronológico, las marcaciones de cada (agente, fecha).
+    Retorna los valores finales de las jornadas modificadas.
+    """
+    finales = {}
+
+    for clave, marcas in grupos.items():
+        previa = existentes.get(clave, {})
+        entrada = previa.get('hora_entrada')
+        salida = previa.get('hora_salida')
+        modificada = False
+
+        for marca in sorted(marcas, key=lambda m: (m['momento'], m['indice'])):
+            hora = marca['momento'].time()
+
+            if marca['tipo'] == 'entrada':
+                if entrada is None:
+                    entrada = hora
+                    modificada = True
+                    marca['resultado'] = ('aplicada', None)
+                else:
+                    marca['resultado'] = ('sin_cambios', 'entrada_ya_registrada')
+            else:
+                if entrada is None:
+                    marca['resultado'] = ('rechazada', 'sin_entrada_previa')
+                elif hora <= entrada:
+                    marca['resultado'] = ('rechazada', 'salida_anterior_a_entrada')
+                elif salida is not None:
+                    marca['resultado'] = ('sin_cambios', 'salida_ya_registrada')
+                else:
+                    salida = hora
+                    modificada = True
+                    marca['resultado'] = ('aplicada', None)
+
+        if modificada:
+            finales[clave] = (entrada, salida)
+
+    return finales
+
+
+def _upsert_asistencias(finales, areas):
+    """Escribe todas las jornadas modificadas en una sola sentencia"""
+    claves = list(finales.keys())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO asistencia (
+                id_agente, fecha, id_area, hora_entrada, hora_salida, horas_efectivas,
+                creado_en, actualizado_en
+            )
+            SELECT v.id_agente, v.fecha, v.id_area, v.hora_entrada, v.hora_salida,
+                   CASE WHEN v.hora_entrada IS NOT NULL AND v.hora_salida IS NOT NULL
+                        THEN ROUND((EXTRACT(EPOCH FROM (v.hora_salida - v.hora_entrada)) / 3600.0)::numeric, 2)
+                   END,
+                   NOW(), NOW()
+            FROM unnest(%s::bigint[], %s::date[], %s::bigint[], %s::time[], %s::time[])
+                AS v(id_agente, fecha, id_area, hora_entrada, hora_salida)
+            -- La auditoría la encola procesar_lote: el trigger no duplica filas
+            CROSS JOIN (SELECT set_config('giga.auditoria_aplicacion', 'on', true)) AS auditoria_aplicacion
+            ON CONFLICT (id_agente, fecha) DO UPDATE SET
+                hora_entrada = COALESCE(asistencia.hora_entrada, EXCLUDED.hora_entrada),
+                hora_salida = COALESCE(asistencia.hora_salida, EXCLUDED.hora_salida),
+                horas_efectivas = CASE
+                    WHEN COALESCE(asistencia.hora_salida, EXCLUDED.hora_salida) IS NULL THEN asistencia.horas_efectivas
+                    ELSE GREATEST(ROUND((EXTRACT(EPOCH FROM (
+                        COALESCE(asistencia.hora_salida, EXCLUDED.hora_salida)
+                        - COALESCE(asistencia.hora_entrada, EXCLUDED.hora_entrada)
+                    )) / 3600.0)::numeric, 2), 0)
+                END,
+                actualizado_en = NOW()
+            RETURNING id_agente, fecha, id_asistencia
+            """,
+            [
+                [c[0] for c in claves],
+                [c[1] for c in claves],
+                [areas.get(c[0]) for c in claves],
+                [finales[c][0] for c in claves],
+                [finales[c][1] for c in claves],
+            ]
+        )
+        return {(fila[0], fila[1]): fila[2] for fila in cursor.fetchall()}
+
+
+def _guardar_resultados(procesadas):
+    """Persiste el resultado de cada marcación procesada en una sola sentencia"""
+    if not procesadas:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE marcacion_kiosco m
+            SET estado = v.estado, motivo = v.motivo,
+                id_agente = v.id_agente, id_asistencia = v.id_asistencia
+            FROM unnest(%s::varchar[], %s::varchar[], %s::varchar[], %s::bigint[], %s::bigint[])
+                AS v(id_cliente, estado, motivo, id_agente, id_asistencia)
+            WHERE m.id_cliente = v.id_cliente
+            """,
+            [
+                [r['id_cliente'] for r in procesadas],
+                [r['estado'] for r in procesadas],
+                [r['motivo'] for r in procesadas],
+                [r.get('id_agente') for r in procesadas],
+                [r['id_asistencia'] for r in procesadas],
+            ]
+        )
+
+
+def procesar_lote(marcaciones, agente_sesion, es_admin, ip_address=None, terminal=None):
+    """
+    Procesa un lote ordenado de marcaciones (id_cliente, dni, timestamp, tipo).
+
+    Reglas (las mismas que la marcación individual):
+    - Un usuario sin rol de supervisión solo puede marcar con su propio DNI; el
+      resto se registra como intento fraudulento. Además sus timestamps deben
+      estar a menos de KIOSCO_TOLERANCIA_SEGUNDOS de la hora del servidor.
+      Esas marcaciones se rechazan antes de registrar el lote.
+    - Solo agentes activos y días laborables.
+    - La primera entrada del día se conserva; la salida requiere entrada previa.
+
+    Retorna una lista de resultados en el mismo orden del lote.
+    """
+    resultados, validas = _validar_formato(marcaciones)
+    if not es_admin:
+        validas = _filtrar_tolerancia(validas, resultados)
+    if not validas:
+        return resultados
+
+    with transaction.atomic():
+        propias = _reservar_ids(validas, agente_sesion, terminal)
+
+        # Reenvíos: devolver el resultado ya registrado
+        repetidas = [m for m in validas if m['id_cliente'] not in propias]
+        if repetidas:
+            previas = {
+                fila['id_cliente']: fila
+                for fila in MarcacionKiosco.objects.filter(
+                    id_cliente__in=[m['id_cliente'] for m in repetidas]
+                ).values('id_cliente', 'estado', 'motivo', 'id_asistencia')
+            }
+            for marca in repetidas:
+                previa = previas.get(marca['id_cliente'], {})
+                resultados[marca['indice']] = {
+                    'id_cliente': marca['id_cliente'],
+                    'estado': 'duplicada',
+                    'motivo': previa.get('estado'),
+                    'id_asistencia': previa.get('id_asistencia'),
+                }
+
+        nuevas = [m for m in validas if m['id_cliente'] in propias]
+        if not nuevas:
+            return resultados
+
+        # Agentes por DNI en una sola consulta
+        agentes = {
+            fila['dni']: fila
+            for fila in Agente.objects.filter(dni__in={m['dni'] for m in nuevas}).values(
+                'id_agente', 'dni', 'activo', 'id_area_id'
+            )
+        }
+
+        intentos = []
+        grupos = defaultdict(list)
+        for marca in nuevas:
+            agente = agentes.get(marca['dni'])
+
+            if not es_admin and marca['dni'] != agente_sesion.dni:
+                intentos.append(IntentoMarcacionFraudulenta(
+                    fecha=marca['momento'].date(),
+                    hora=marca['momento'].time(),
+                    dni_ingresado=marca['dni'],
+                    id_agente_sesion=agente_sesion,
+                    id_agente_dni_id=agente['id_agente'] if agente else None,
+                    tipo_intento='entrada_salida',
+                    ip_address=ip_address
+                ))
+                marca['resultado'] = ('rechazada', 'dni_no_corresponde')
+                continue
+
+            if not agente or not agente['activo']:
+                marca['resultado'] = ('rechazada', 'agente_no_encontrado')
+                continue
+
+            marca['id_agente'] = agente['id_agente']
+            fecha = marca['momento'].date()
+            if not calendario.es_dia_laborable(fecha):
+                marca['resultado'] = ('rechazada', 'dia_no_laborable')
+                continue
+
+            grupos[(agente['id_agente'], fecha)].append(marca)
+
+        if intentos:
+            IntentoMarcacionFraudulenta.objects.bulk_create(intentos)
+            logger.warning(
+                f'Lote de kiosco con {len(intentos)} intentos fraudulentos '
+                f'(agente sesión {agente_sesion.id_agente})'
+            )
+
+        ids_asistencia = {}
+        areas = {a['id_agente']: a['id_area_id'] for a in agentes.values()}
+        if grupos:
+            # Estado actual de las jornadas involucradas, bloqueadas hasta el commit
+            existentes = {}
+            filtro_agentes = {c[0] for c in grupos}
+            filtro_fechas = {c[1] for c in grupos}
+            for fila in Asistencia.objects.select_for_update().filter(
+                id_agente_id__in=filtro_agentes, fecha__in=filtro_fechas
+            ).values('id_asistencia', 'id_agente_id', 'fecha', 'hora_entrada', 'hora_salida'):
+                clave = (fila['id_agente_id'], fila['fecha'])
+                if clave in grupos:
+                    existentes[clave] = fila
+                    ids_asistencia[clave] = fila['id_asistencia']
+
+            finales = _aplicar_transiciones(grupos, existentes)
+            if finales:
+                ids_asistencia.update(_upsert_asistencias(finales, areas))
+
+                # Un recálculo por (fecha, área), no por agente: cada uno agrega el área completa
+                for fecha, id_area in {(fecha, areas.get(id_agente)) for id_agente, fecha in finales}:
+                    programar_recalculo(fecha, id_area)
+
+        procesadas = []
+        for marca in nuevas:
+            estado, motivo = marca['resultado']
+            clave = (marca.get('id_agente'), marca['momento'].date())
+            id_asistencia = ids_asistencia.get(clave) if estado != 'rechazada' else None
+
+            resultado = {
+                'id_cliente': marca['id_cliente'],
+                'estado': estado,
+                'motivo': motivo,
+                'id_asistencia': id_asistencia,
+            }
+            resultados[marca['indice']] = resultado
+            procesadas.append(dict(resultado, id_agente=marca.get('id_agente')))
+
+            if estado == 'aplicada':
+                encolar_auditoria(
+                    'asistencia', f"MARCAR_{marca['tipo'].upper()}_KIOSCO", id_asistencia,
+                    agente_sesion.id_agente,
+                    valor_nuevo={
+                        f"hora_{marca['tipo']}": str(marca['momento'].time()),
+                        'agente_dni': marca['dni'],
+                        'fecha': str(marca['momento'].date()),
+                        'id_cliente': marca['id_cliente'],
+                        'terminal': terminal,
+                    }
+                )
+
+        _guardar_resultados(procesadas)
+
+    return resultados
@@ -0,0 +1,199 @@
+"""
+Benchmark de concurrencia para la marcación de asistencia.
+Simula el pico de entradas al inicio de la jornada con varios hilos
+(cada uno con su propia conexión) y compara el camino rápido (upsert)
+con el camino ORM anterior (get_or_create + save + auditoría inmediata).
+
+Marca solo a los agentes sintéticos de generar_dataset y en una fecha futura,
+para no tocar marcaciones reales. La auditoría generada no se borra: queda
+asociada a los agentes sintéticos y se elimina con generar_dataset --limpiar.
+
+Uso:
+    python manage.py generar_dataset
+    python manage.py benchmark_marcacion --agentes 300 --hilos 20 --modo ambos
+
+Las asistencias y contadores generados se eliminan al terminar salvo que se
+indique --conservar.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from asistencia.models import Asistencia
+from asistencia.marcacion import marcar_rapido
+from asistencia.resumen import registrar_entrada, registrar_salida
+from auditoria.buffer import encolar_auditoria
+from auditoria.management.commands.generar_dataset import DOMINIO, areas_sinteticas_sql
+from auditoria.models import Auditoria
+from personas.models import Agente
+
+
+def _percentil(valores, p):
+    """Percentil p (0-100) de una lista de latencias"""
+    if not valores:
+        return 0.0
+    if len(valores) == 1:
+        return valores[0]
+    return statistics.quantiles(valores, n=100, method='inclusive')[p - 1]
+
+
+def _marcar_orm(id_agente, id_area, fecha, hora):
+    """Réplica del camino anterior: lectura, escritura y auditoría por separado"""
+    with transaction.atomic():
+        asistencia, created = Asistencia.objects.get_or_create(
+            id_agente_id=id_agente,
+            fecha=fecha,
+            defaults={'id_area_id': id_area}
+        )
+        if created:
+            Auditoria.objects.create(
+                pk_afectada=asistencia.id_asistencia, nombre_tabla='asistencia',
+                creado_en=timezone.now(), accion='CREAR_ASISTENCIA', id_agente_id=id_agente
+            )
+        if asistencia.hora_entrada is None:
+            asistencia.hora_entrada = hora
+            accion = 'MARCAR_ENTRADA'
+        else:
+            asistencia.hora_salida = hora
+            accion = 'MARCAR_SALIDA'
+        asistencia.save()
+        Auditoria.objects.create(
+            pk_afectada=asistencia.id_asistencia, nombre_tabla='asistencia',
+            creado_en=timezone.now(), accion=accion, id_agente_id=id_agente,
+            valor_nuevo={'hora': str(hora)}
+        )
+
+
+def _marcar_rapida(id_agente, id_area, fecha, hora):
+    """Mismo flujo que la vista: upsert, contadores y auditoría encolada"""
+    with transaction.atomic():
+        resultado = marcar_rapido(id_agente, id_area, fecha, hora)
+        if resultado.creada:
+            encolar_auditoria('asistencia', 'CREAR_ASISTENCIA', resultado.id_asistencia, id_agente)
+        if resultado.tipo == 'entrada':
+            registrar_entrada(fecha, id_area, id_agente)
+        elif resultado.tipo == 'salida':
+            registrar_salida(fecha, id_area)
+        encolar_auditoria(
+            'asistencia', f'MARCAR_{resultado.tipo.upper()}', resultado.id_asistencia, id_agente,
+            valor_nuevo={'hora': str(hora)}
+        )
+
+
+MODOS = {
+    'rapido': _marcar_rapida,
+    'orm': _marcar_orm,
+}
+
+
+class Command(BaseCommand):
+    help = 'Simula el pico matutino de marcaciones concurrentes y mide latencias'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--agentes', type=int, default=300, help='Cantidad de agentes que marcan')
+        parser.add_argument('--hilos', type=int, default=20, help='Marcaciones simultáneas')
+        parser.add_argument(
+            '--modo', choices=['rapido', 'orm', 'ambos'], default='ambos',
+            help='Camino a medir'
+        )
+        parser.add_argument(
+            '--fecha', type=str, default='2099-01-05',
+            help='Fecha (YYYY-MM-DD) usada para las marcaciones de prueba'
+        )
+        parser.add_argument(
+            '--con-salida', action='store_true',
+            help='Después de las entradas, simular también las salidas'
+        )
+        parser.add_argument(
+            '--conservar', action='store_true',
+            help='No eliminar las asistencias y contadores generados'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            fecha = datetime.strptime(options['fecha'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError('Formato de fecha inválido. Use YYYY-MM-DD')
+
+        if fecha <= date.today():
+            raise CommandError('Use una fecha futura para no mezclar datos reales con el benchmark')
+
+        agentes = list(
+            Agente.objects.filter(activo=True, email__endswith=f'@{DOMINIO}')
+            .order_by('id_agente')
+            .values_list('id_agente', 'id_area_id')[:options['agentes']]
+        )
+        if not agentes:
+            raise CommandError(
+                'No hay agentes sintéticos para simular marcaciones. '
+                'Genérelos con: python manage.py generar_dataset'
+            )
+
+        modos = ['rapido', 'orm'] if options['modo'] == 'ambos' else [options['modo']]
+
+        self.stdout.write(self.style.HTTP_INFO('\n⏱️  BENCHMARK DE MARCACIÓN\n'))
+        self.stdout.write('=' * 80)
+        self.stdout.write(
+            f'Agentes: {len(agentes)}  Hilos: {options["hilos"]}  Fecha: {fecha}'
+        )
+
+        for modo in modos:
+            self._limpiar(fecha, agentes)
+            rondas = [('entrada', datetime(2000, 1, 1, 8, 0).time())]
+            if options['con_salida']:
+                rondas.append(('salida', datetime(2000, 1, 1, 16, 0).time()))
+
+            for nombre_ronda, hora in rondas:
+                self._ejecutar_ronda(modo, nombre_ronda, MODOS[modo], agentes, fecha, hora, options['hilos'])
+
+        if not options['conservar']:
+            self._limpiar(fecha, agentes)
+            self.stdout.write(self.style.SUCCESS('\n🧹 Registros de prueba eliminados'))
+
+    def _ejecutar_ronda(self, modo, nombre_ronda, funcion, agentes, fecha, hora, hilos):
+        def tarea(agente):
+            id_agente, id_area = agente
+            inicio = time.perf_counter()
+            try:
+                funcion(id_agente, id_area, fecha, hora)
+                return time.perf_counter() - inicio, None
+            except Exception as e:
+                return time.perf_counter() - inicio, str(e)
+            finally:
+                connection.close()
+
+        inicio_total = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as executor:
+            resultados = list(executor.map(tarea, agentes))
+        duracion = time.perf_counter() - inicio_total
+
+        latencias = sorted(r[0] * 1000 for r in resultados if r[1] is None)
+        errores = [r[1] for r in resultados if r[1] is not None]
+
+        self.stdout.write(self.style.HTTP_INFO(f'\n▶ {modo} / {nombre_ronda}'))
+        self.stdout.write('-' * 80)
+        self.stdout.write(f'Marcaciones:    {len(resultados)} en {duracion:.2f}s '
+                          f'({len(resultados) / duracion:.1f}/s)')
+        if latencias:
+            self.stdout.write(
+                f'Latencia (ms):  p50={_percentil(latencias, 50):.1f}  '
+                f'p95={_percentil(latencias, 95):.1f}  p99={_percentil(latencias, 99):.1f}  '
+                f'max={latencias[-1]:.1f}'
+            )
+        if errores:
+            self.stdout.write(self.style.ERROR(f'Errores: {len(errores)} (ej: {errores[0]})'))
+
+    def _limpiar(self, fecha, agentes):
+        """Elimina las asistencias y contadores de los agentes sintéticos en la fecha de prueba"""
+        with transaction.atomic():
+            Asistencia.objects.filter(fecha=fecha, id_agente_id__in=[a[0] for a in agentes]).delete()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM resumen_asistencia_diaria WHERE fecha = %s AND id_area IN ({areas_sinteticas_sql()})",
+                    [fecha]
+                )
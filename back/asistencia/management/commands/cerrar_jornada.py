@@ -0,0 +1,63 @@
+"""
+Comando para ejecutar el cierre de jornada de asistencias.
+Uso: python manage.py cerrar_jornada [--fecha YYYY-MM-DD] [--dry-run]
+
+Normalmente lo ejecuta el scheduler todas las noches (00:30) sobre el día anterior.
+"""
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from personas.tasks import close_attendance_day
+
+
+class Command(BaseCommand):
+    help = 'Cierra la jornada: salidas automáticas, horas efectivas y parte diario'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fecha',
+            type=str,
+            help='Fecha a cerrar (YYYY-MM-DD). Por defecto, ayer'
+        )
+        parser.add_argument(
+            '--hora-cierre',
+            type=str,
+            default='23:00',
+            help='Hora de salida asignada a jornadas abiertas (HH:MM)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Calcular sin guardar cambios'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            fecha = (
+                datetime.strptime(options['fecha'], '%Y-%m-%d').date()
+                if options['fecha'] else date.today() - timedelta(days=1)
+            )
+            datetime.strptime(options['hora_cierre'], '%H:%M')
+        except ValueError:
+            raise CommandError('Formato inválido. Use --fecha YYYY-MM-DD y --hora-cierre HH:MM')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('🔍 Modo dry-run: no se guardarán cambios'))
+
+        result = close_attendance_day(
+            fecha=fecha, dry_run=options['dry_run'], hora_cierre=options['hora_cierre']
+        )
+
+        if result['error']:
+            raise CommandError(f"Error en cierre de jornada: {result['error']}")
+
+        self.stdout.write(self.style.HTTP_INFO(f'\n🌙 CIERRE DE JORNADA {fecha}\n'))
+        self.stdout.write('=' * 60)
+        self.stdout.write(f"Salidas automáticas:  {result['salidas_cerradas']}")
+        self.stdout.write(f"Horas calculadas:     {result['horas_calculadas']}")
+        self.stdout.write(f"Presentes:            {result['presentes']}")
+        self.stdout.write(f"Ausentes:             {result['ausentes']}")
+        self.stdout.write(f"En licencia:          {result['en_licencia']}")
+        self.stdout.write(f"Partes generados:     {result['partes_generados']}")
+        self.stdout.write(self.style.SUCCESS(f"\n✅ Completado en {result['duracion_ms']} ms"))
@@ -0,0 +1,107 @@
+"""
+Marcación rápida de asistencia - Sistema GIGA
+
+Camino optimizado para el pico de marcaciones al inicio de la jornada.
+La transición entrada → salida se resuelve en una única sentencia atómica
+INSERT ... ON CONFLICT (id_agente, fecha) DO UPDATE ... RETURNING, sin leer
+previamente la fila ni tomar bloqueos adicionales desde la aplicación.
+
+La auditoría de la marcación la encola la aplicación (auditoria/buffer.py).
+La misma sentencia activa giga.auditoria_aplicacion para la transacción, y
+con eso trigger_audit_asistencia no escribe una segunda fila
+(bd/init-scripts/19-auditoria-asistencia-aplicacion.sql).
+"""
+
+from decimal import Decimal
+import logging
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+SQL_MARCAR = """
+    INSERT INTO asistencia (
+        id_agente, fecha, id_area, hora_entrada, observaciones, creado_en, actualizado_en
+    )
+    SELECT %(agente)s::bigint, %(fecha)s::date, %(area)s::bigint, %(hora)s::time, %(observacion)s::text,
+           NOW(), NOW()
+    FROM (SELECT set_config('giga.auditoria_aplicacion', 'on', true)) AS auditoria_aplicacion
+    ON CONFLICT (id_agente, fecha) DO UPDATE SET
+        hora_entrada = COALESCE(asistencia.hora_entrada, EXCLUDED.hora_entrada),
+        hora_salida = CASE
+            WHEN asistencia.hora_entrada IS NULL THEN asistencia.hora_salida
+            ELSE EXCLUDED.hora_entrada
+        END,
+        horas_efectivas = CASE
+            WHEN asistencia.hora_entrada IS NULL THEN asistencia.horas_efectivas
+            ELSE GREATEST(
+                ROUND((EXTRACT(EPOCH FROM (EXCLUDED.hora_entrada - asistencia.hora_entrada)) / 3600.0)::numeric, 2),
+                0
+            )
+        END,
+        observaciones = CASE
+            WHEN EXCLUDED.observaciones IS NULL THEN asistencia.observaciones
+            WHEN asistencia.hora_entrada IS NULL OR asistencia.observaciones IS NULL
+                 OR asistencia.observaciones = '' THEN EXCLUDED.observaciones
+            ELSE asistencia.observaciones || ' | ' || EXCLUDED.observaciones
+        END,
+        actualizado_en = NOW()
+    WHERE asistencia.hora_salida IS NULL
+    RETURNING id_asistencia, hora_entrada, hora_salida, horas_efectivas, (xmax = 0) AS creada
+"""
+
+
+class ResultadoMarcacion:
+    """Resultado de una marcación rápida"""
+
+    __slots__ = ('tipo', 'id_asistencia', 'hora_entrada', 'hora_salida', 'horas_efectivas', 'creada')
+
+    def __init__(self, tipo, id_asistencia=None, hora_entrada=None, hora_salida=None,
+                 horas_efectivas=None, creada=False):
+        self.tipo = tipo  # 'entrada', 'salida' o 'ya_completo'
+        self.id_asistencia = id_asistencia
+        self.hora_entrada = hora_entrada
+        self.hora_salida = hora_salida
+        self.horas_efectivas = horas_efectivas
+        self.creada = creada
+
+
+def marcar_rapido(id_agente, id_area, fecha, hora, observacion=None):
+    """
+    Registra la entrada o la salida del agente en una sola sentencia.
+
+    - Sin registro del día (o sin entrada): se registra la entrada.
+    - Con entrada y sin salida: se registra la salida y se calculan horas efectivas.
+    - Con entrada y salida: no se modifica nada ('ya_completo').
+
+    Debe ejecutarse dentro de la transacción del llamador.
+    """
+    params = {
+        'agente': id_agente,
+        'fecha': fecha,
+        'area': id_area,
+        'hora': hora,
+        'observacion': observacion or None,
+    }
+
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_MARCAR, params)
+        fila = cursor.fetchone()
+
+        if fila is None:
+            # El ON CONFLICT no actualizó: la jornada ya estaba completa
+            cursor.execute(
+                "SELECT id_asistencia, hora_entrada, hora_salida, horas_efectivas "
+                "FROM asistencia WHERE id_agente = %s AND fecha = %s",
+                [id_agente, fecha]
+            )
+            existente = cursor.fetchone()
+            return ResultadoMarcacion('ya_completo', *existente)
+
+    id_asistencia, hora_entrada, hora_salida, horas_efectivas, creada = fila
+    tipo = 'salida' if hora_salida is not None else 'entrada'
+    if horas_efectivas is not None:
+        horas_efectivas = Decimal(horas_efectivas)
+
+    return ResultadoMarcacion(tipo, id_asistencia, hora_entrada, hora_salida, horas_efectivas, creada)
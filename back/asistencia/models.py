@@ -20,10 +20,18 @@ class ParteDiario(models.Model):
     creado_en = models.DateTimeField(blank=True, null=True)
     actualizado_en = models.DateTimeField(blank=True, null=True)
     id_agente = models.ForeignKey('personas.Agente', models.DO_NOTHING, db_column='id_agente')
+    
+    # Campos materializados por el cierre nocturno de jornada
+    id_area = models.ForeignKey('personas.Area', models.DO_NOTHING, db_column='id_area', blank=True, null=True)
+    estado = models.CharField(max_length=20, blank=True, null=True)  # 'presente', 'ausente', 'licencia'
+    id_asistencia = models.ForeignKey('Asistencia', models.DO_NOTHING, db_column='id_asistencia', blank=True, null=True, related_name='partes_diarios')
+    id_licencia = models.ForeignKey('Licencia', models.DO_NOTHING, db_column='id_licencia', blank=True, null=True, related_name='partes_diarios')
+    horas_efectivas = models.DecimalField(max_digits=4, decimal_places=2, blank=True, null=True)
 
     class Meta:
         managed = False
         db_table = 'parte_diario'
+        unique_together = (('id_agente', 'fecha_parte'),)
         
     def __str__(self):
         return f"Parte {self.fecha_parte} - {self.id_agente}"
@@ -126,3 +134,50 @@ class IntentoMarcacionFraudulenta(models.Model):
         
     def __str__(self):
         return f"Intento fraudulento {self.fecha} - Agente {self.id_agente_sesion} usó DNI {self.dni_ingresado}"
+
+
+class MarcacionKiosco(models.Model):
+    """Marcación recibida por lote desde un kiosco (idempotente por id de cliente)"""
+    id_cliente = models.CharField(max_length=64, primary_key=True)
+    dni = models.CharField(max_length=20)
+    tipo = models.CharField(max_length=10)  # 'entrada', 'salida'
+    marcado_en = models.DateTimeField()
+    estado = models.CharField(max_length=20, default='procesando')  # 'aplicada', 'sin_cambios', 'rechazada'
+    motivo = models.CharField(max_length=100, blank=True, null=True)
+    id_agente = models.ForeignKey('personas.Agente', models.DO_NOTHING, db_column='id_agente', blank=True, null=True, related_name='marcaciones_kiosco')
+    id_asistencia = models.ForeignKey(Asistencia, models.DO_NOTHING, db_column='id_asistencia', blank=True, null=True)
+    id_agente_sesion = models.ForeignKey('personas.Agente', models.DO_NOTHING, db_column='id_agente_sesion', blank=True, null=True, related_name='marcaciones_kiosco_enviadas')
+    terminal = models.CharField(max_length=100, blank=True, null=True)
+    recibido_en = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        managed = False
+        db_table = 'marcacion_kiosco'
+
+    def __str__(self):
+        return f"Marcación {self.id_cliente} - {self.dni} ({self.estado})"
+
+
+class CierreJornada(models.Model):
+    """Métricas de cada ejecución del cierre nocturno de asistencias"""
+    id_cierre = models.BigAutoField(primary_key=True)
+    fecha = models.DateField()
+    iniciado_en = models.DateTimeField()
+    finalizado_en = models.DateTimeField(blank=True, null=True)
+    duracion_ms = models.IntegerField(blank=True, null=True)
+    salidas_cerradas = models.IntegerField(default=0)
+    horas_calculadas = models.IntegerField(default=0)
+    presentes = models.IntegerField(default=0)
+    ausentes = models.IntegerField(default=0)
+    en_licencia = models.IntegerField(default=0)
+    partes_generados = models.IntegerField(default=0)
+    estado = models.CharField(max_length=20, default='ok')  # 'ok', 'error'
+    error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        managed = False
+        db_table = 'cierre_jornada'
+        ordering = ['-fecha', '-iniciado_en']
+
+    def __str__(self):
+        return f"Cierre {self.fecha} ({self.estado})"
@@ -0,0 +1,219 @@
+"""
+Resumen diario de asistencias - Sistema GIGA
+
+Cálculo del resumen en una sola consulta (función SQL calcular_resumen_asistencia)
+y mantenimiento incremental de la tabla resumen_asistencia_diaria, que guarda
+contadores por (fecha, área) para que el tablero de supervisores no tenga que
+recalcular todo en cada refresco.
+
+Los contadores se ajustan después del commit de cada operación. Una fecha se
+inicializa siempre completa (todas las áreas) a partir de los datos reales:
+si la primera operación del día es una marcación, crear solo la fila de su
+área haría que el tablero tomara la fecha como inicializada y contara de
+menos en las demás áreas.
+"""
+
+from datetime import date
+import logging
+
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_RESUMEN = (
+    'total_agentes', 'presentes', 'sin_salida', 'salidas_automaticas',
+    'en_licencia', 'presentes_con_licencia'
+)
+
+
+def _sumar_filas(filas, fecha):
+    """Consolida filas por área en el formato de respuesta del resumen"""
+    totales = dict.fromkeys(CAMPOS_RESUMEN, 0)
+    for fila in filas:
+        for campo, valor in zip(CAMPOS_RESUMEN, fila):
+            totales[campo] += valor or 0
+
+    # Ausentes = Total - (Presentes ∪ Licencias)
+    ausentes = (
+        totales['total_agentes'] - totales['presentes']
+        - totales['en_licencia'] + totales['presentes_con_licencia']
+    )
+
+    return {
+        'fecha': str(fecha),
+        'total_agentes': totales['total_agentes'],
+        'presentes': totales['presentes'],
+        'ausentes': max(0, ausentes),
+        'sin_salida': totales['sin_salida'],
+        'salidas_automaticas': totales['salidas_automaticas'],
+        'en_licencia': totales['en_licencia'],
+    }
+
+
+def calcular_resumen(fecha, areas_ids=None):
+    """
+    Calcula el resumen de la fecha con una única consulta sobre los datos reales.
+    Si se indican áreas, solo se consideran los agentes de esas áreas.
+    """
+    # El filtro por área va dentro de la función: solo se agregan esos agentes
+    sql = f"SELECT {', '.join(CAMPOS_RESUMEN)} FROM calcular_resumen_asistencia(%s, %s::bigint[])"
+    params = [fecha, list(areas_ids) if areas_ids is not None else None]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return _sumar_filas(cursor.fetchall(), fecha)
+
+
+def obtener_resumen(fecha, areas_ids=None):
+    """
+    Obtiene el resumen del día usando los contadores incrementales.
+    Para fechas distintas de hoy se calcula directamente sobre los datos.
+    """
+    if fecha != date.today():
+        return calcular_resumen(fecha, areas_ids)
+
+    sql = f"SELECT {', '.join(CAMPOS_RESUMEN)} FROM resumen_asistencia_diaria WHERE fecha = %s"
+    params = [fecha]
+    if areas_ids is not None:
+        sql += " AND id_area = ANY(%s)"
+        params.append(list(areas_ids))
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        filas = cursor.fetchall()
+
+    if not filas:
+        # Primera consulta del día: inicializar contadores desde los datos
+        recalcular_contadores(fecha)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            filas = cursor.fetchall()
+
+    return _sumar_filas(filas, fecha)
+
+
+def recalcular_contadores(fecha, id_area=None):
+    """
+    Sincroniza los contadores de una fecha (y opcionalmente un área) con los
+    datos reales. Si la fecha todavía no tiene contadores se recalculan todas
+    las áreas aunque se indique una.
+    """
+    with connection.cursor() as cursor:
+        if id_area is not None:
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM resumen_asistencia_diaria WHERE fecha = %s)", [fecha])
+            if not cursor.fetchone()[0]:
+                id_area = None
+        cursor.execute("SELECT recalcular_resumen_asistencia(%s, %s)", [fecha, id_area])
+        resultado = cursor.fetchone()
+        return resultado[0] if resultado else 0
+
+
+def _ajustar_contadores(sql, params, fecha, id_area):
+    """
+    Aplica un ajuste incremental. Si la fila no existe (fecha sin inicializar o
+    área nueva) se recalcula la fecha completa desde los datos reales, que ya
+    incluyen esta operación.
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            actualizadas = cursor.rowcount
+        if not actualizadas:
+            recalcular_contadores(fecha)
+    except Exception as e:
+        logger.error(f'Error actualizando resumen de asistencia ({fecha}, área {id_area}): {e}')
+
+
+def registrar_entrada(fecha, id_area, id_agente):
+    """Suma una entrada a los contadores del día (se aplica al confirmar la transacción)"""
+    if not id_area:
+        return
+
+    sql = """
+        UPDATE resumen_asistencia_diaria
+        SET presentes = presentes + 1,
+            sin_salida = sin_salida + 1,
+            presentes_con_licencia = presentes_con_licencia + CASE WHEN EXISTS (
+                SELECT 1 FROM licencia l
+                WHERE l.id_agente = %s AND l.estado = 'aprobada'
+                  AND %s BETWEEN l.fecha_desde AND l.fecha_hasta
+            ) THEN 1 ELSE 0 END,
+            actualizado_en = CURRENT_TIMESTAMP
+        WHERE fecha = %s AND id_area = %s
+    """
+    transaction.on_commit(
+        lambda: _ajustar_contadores(sql, [id_agente, fecha, fecha, id_area], fecha, id_area)
+    )
+
+
+def registrar_salida(fecha, id_area):
+    """Descuenta un agente sin salida de los contadores del día"""
+    if not id_area:
+        return
+
+    sql = """
+        UPDATE resumen_asistencia_diaria
+        SET sin_salida = GREATEST(sin_salida - 1, 0),
+            actualizado_en = CURRENT_TIMESTAMP
+        WHERE fecha = %s AND id_area = %s
+    """
+    transaction.on_commit(
+        lambda: _ajustar_contadores(sql, [fecha, id_area], fecha, id_area)
+    )
+
+
+def registrar_licencia_aprobada(licencia):
+    """
+    Suma la licencia aprobada a los contadores ya existentes dentro de su rango.
+    Los días sin contadores se inicializan desde los datos cuando se consultan.
+    Si el agente ya tenía otra licencia aprobada ese día no se cuenta dos veces.
+    """
+    agente = licencia.id_agente
+    if not agente.id_area_id or not agente.activo:
+        return
+
+    sql = """
+        UPDATE resumen_asistencia_diaria r
+        SET en_licencia = r.en_licencia + 1,
+            presentes_con_licencia = r.presentes_con_licencia + CASE WHEN EXISTS (
+                SELECT 1 FROM asistencia a
+                WHERE a.id_agente = %(agente)s AND a.fecha = r.fecha
+                  AND a.hora_entrada IS NOT NULL
+            ) THEN 1 ELSE 0 END,
+            actualizado_en = CURRENT_TIMESTAMP
+        WHERE r.id_area = %(area)s
+          AND r.fecha BETWEEN %(desde)s AND %(hasta)s
+          AND NOT EXISTS (
+              SELECT 1 FROM licencia l
+              WHERE l.id_agente = %(agente)s AND l.estado = 'aprobada'
+                AND l.id_licencia <> %(licencia)s
+                AND r.fecha BETWEEN l.fecha_desde AND l.fecha_hasta
+          )
+    """
+    params = {
+        'agente': agente.id_agente,
+        'area': agente.id_area_id,
+        'desde': licencia.fecha_desde,
+        'hasta': licencia.fecha_hasta,
+        'licencia': licencia.id_licencia,
+    }
+
+    def _aplicar():
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+        except Exception as e:
+            logger.error(f'Error actualizando resumen por licencia {licencia.id_licencia}: {e}')
+
+    transaction.on_commit(_aplicar)
+
+
+def programar_recalculo(fecha, id_area=None):
+    """Recalcula los contadores de la fecha al confirmar la transacción (correcciones manuales)"""
+    def _aplicar():
+        try:
+            recalcular_contadores(fecha, id_area)
+        except Exception as e:
+            logger.error(f'Error recalculando resumen de asistencia ({fecha}): {e}')
+
+    transaction.on_commit(_aplicar)
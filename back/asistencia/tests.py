@@ -1,3 +1,152 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta
+import unittest
 
-# Create your tests here.
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from common.testing import PresupuestoEndpointMixin
+from personas.models import Area, Rol
+from personas.tests import crear_agente
+
+from .models import Asistencia, TipoLicencia
+from .resumen import obtener_resumen, programar_recalculo, registrar_entrada
+
+SCRIPT_RESUMEN = settings.BASE_DIR.parent / 'bd' / 'init-scripts' / '10-resumen-asistencia.sql'
+
+
+class PresupuestoConsultasAsistenciaTests(PresupuestoEndpointMixin, TestCase):
+    """Los endpoints de asistencia respetan SQL_QUERY_BUDGETS"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.area = Area.objects.create(nombre='Área de prueba')
+        cls.admin = crear_agente(cls.area, Rol.objects.create(nombre='Administrador'), '30111222')
+        rol_agente = Rol.objects.create(nombre='Agente')
+        cls.agentes = [crear_agente(cls.area, rol_agente, f'3022233{i}') for i in range(5)]
+        for agente in cls.agentes:
+            Asistencia.objects.create(
+                fecha=date.today(), hora_entrada=time(8), id_agente=agente, id_area=cls.area,
+            )
+        TipoLicencia.objects.create(codigo='LAO', descripcion='Licencia anual ordinaria')
+
+    def setUp(self):
+        self.assertDentroDelPresupuesto(
+            'login', 'post',
+            data={'cuil': self.admin.dni, 'password': 'clave-segura-1'},
+            content_type='application/json',
+        )
+
+    def test_marcar_asistencia(self):
+        self.assertDentroDelPresupuesto(
+            'marcar_asistencia', 'post',
+            data={
+                'dni': self.agentes[0].dni,
+                'tipo_marcacion': 'entrada',
+                # Fecha pasada en día hábil: no depende del día en que corre el test
+                'fecha_especifica': '2026-03-04',
+                'hora_especifica': '08:05',
+            },
+            content_type='application/json',
+        )
+
+    def test_obtener_estado_asistencia(self):
+        self.assertDentroDelPresupuesto('obtener_estado_asistencia')
+
+    def test_listar_asistencias(self):
+        response = self.assertDentroDelPresupuesto(
+            'listar_asistencias',
+            data={'fecha_desde': date.today().isoformat(), 'fecha_hasta': date.today().isoformat()},
+        )
+        self.assertEqual(len(response.data['data']), len(self.agentes))
+
+    def test_listar_tipos_licencia(self):
+        self.assertDentroDelPresupuesto('listar_tipos_licencia')
+
+
+@unittest.skipUnless(
+    connection.vendor == 'postgresql' and SCRIPT_RESUMEN.exists(),
+    'Requiere PostgreSQL y bd/init-scripts (funciones PL/pgSQL del resumen)',
+)
+class ContadoresResumenTests(TestCase):
+    """La primera operación del día inicializa los contadores de todas las áreas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cursor:
+            cursor.execute(SCRIPT_RESUMEN.read_text())
+        rol = Rol.objects.create(nombre='Agente')
+        cls.area_a = Area.objects.create(nombre='Área A')
+        cls.area_b = Area.objects.create(nombre='Área B')
+        cls.agentes_a = [crear_agente(cls.area_a, rol, f'3033300{i}') for i in range(2)]
+        cls.agentes_b = [crear_agente(cls.area_b, rol, f'3044400{i}') for i in range(3)]
+
+    def marcar_entrada(self, agente):
+        with self.captureOnCommitCallbacks(execute=True):
+            Asistencia.objects.create(
+                fecha=date.today(), hora_entrada=time(8), id_agente=agente, id_area=agente.id_area,
+            )
+            registrar_entrada(date.today(), agente.id_area_id, agente.id_agente)
+
+    def test_marcacion_antes_de_la_primera_consulta(self):
+        self.marcar_entrada(self.agentes_a[0])
+
+        resumen = obtener_resumen(date.today())
+        self.assertEqual(resumen['total_agentes'], 5)
+        self.assertEqual(resumen['presentes'], 1)
+        self.assertEqual(resumen['ausentes'], 4)
+
+        resumen_b = obtener_resumen(date.today(), [self.area_b.id_area])
+        self.assertEqual((resumen_b['total_agentes'], resumen_b['ausentes']), (3, 3))
+
+    def test_recalculo_de_un_area_antes_de_la_primera_consulta(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            programar_recalculo(date.today(), self.area_a.id_area)
+
+        self.assertEqual(obtener_resumen(date.today())['total_agentes'], 5)
+
+    def test_marcaciones_siguientes_son_incrementales(self):
+        self.marcar_entrada(self.agentes_a[0])
+        self.marcar_entrada(self.agentes_b[0])
+
+        resumen = obtener_resumen(date.today())
+        self.assertEqual((resumen['presentes'], resumen['sin_salida'], resumen['ausentes']), (2, 2, 3))
+
+
+@override_settings(KIOSCO_TOLERANCIA_SEGUNDOS=300)
+class MarcacionLoteToleranciaTests(TestCase):
+    """Sin rol de supervisión no se aceptan timestamps lejos de la hora del servidor"""
+
+    @classmethod
+    def setUpTestData(cls):
+        area = Area.objects.create(nombre='Área de prueba')
+        cls.agente = crear_agente(area, Rol.objects.create(nombre='Agente'), '30555666')
+
+    def setUp(self):
+        self.client.post(
+            reverse('login'), {'cuil': self.agente.dni, 'password': 'clave-segura-1'},
+            content_type='application/json',
+        )
+
+    def enviar(self, *desplazamientos):
+        ahora = datetime.now()
+        marcaciones = [
+            {
+                'id_cliente': f'prueba-{indice}', 'dni': self.agente.dni, 'tipo': 'entrada',
+                'timestamp': (ahora + desplazamiento).isoformat(timespec='seconds'),
+            }
+            for indice, desplazamiento in enumerate(desplazamientos)
+        ]
+        return self.client.post(
+            reverse('marcar_asistencia_lote'), {'marcaciones': marcaciones}, content_type='application/json',
+        )
+
+    def test_rechaza_marcaciones_pasadas_y_futuras(self):
+        response = self.enviar(timedelta(hours=-2), timedelta(hours=3))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(r['estado'], r['motivo']) for r in response.data['data']],
+            [('rechazada', 'fuera_de_tolerancia')] * 2,
+        )
+        self.assertFalse(Asistencia.objects.filter(id_agente=self.agente).exists())
@@ -7,6 +7,7 @@ from . import views
 urlpatterns = [
     # Endpoints para usuarios
     path('marcar/', views.marcar_asistencia, name='marcar_asistencia'),
+    path('marcar/lote/', views.marcar_asistencia_lote, name='marcar_asistencia_lote'),
     path('estado/', views.obtener_estado_asistencia, name='obtener_estado_asistencia'),
     
     # Endpoints para administradores
@@ -28,6 +29,6 @@ urlpatterns = [
     path('admin/tipos-licencia/actualizar/<int:tipo_licencia_id>/', views.actualizar_tipo_licencia, name='actualizar_tipo_licencia'),
     path('admin/tipos-licencia/eliminar/<int:tipo_licencia_id>/', views.eliminar_tipo_licencia, name='eliminar_tipo_licencia'),
     
-    # Endpoint para cron job
+    # Cierre de jornada manual (el cierre nocturno corre desde el scheduler)
     path('cron/marcar-salidas/', views.ejecutar_marcacion_automatica, name='ejecutar_marcacion_automatica'),
 ]
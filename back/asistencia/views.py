@@ -9,7 +9,11 @@ from rest_framework.response import Response
 from django.db.models import Q, Count, Case, When, IntegerField
 from django.db import transaction
 from django.utils import timezone
-from datetime import datetime, date, time, timedelta
+from django.db import connection
+from django.core.serializers.json import DjangoJSONEncoder
+from datetime import datetime, date, timedelta
+import base64
+import json
 import logging
 
 from .models import Asistencia, IntentoMarcacionFraudulenta, Licencia, TipoLicencia
@@ -18,8 +22,14 @@ from .serializers import (
     LicenciaSerializer, TipoLicenciaSerializer, ResumenAsistenciaSerializer
 )
 from personas.models import Agente, Area
-from guardias.models import Feriado
-from auditoria.models import Auditoria
+from auditoria.buffer import encolar_auditoria
+from .calendario import calendario
+from .kiosco import procesar_lote, MAX_MARCACIONES_LOTE
+from .marcacion import marcar_rapido
+from .resumen import (
+    obtener_resumen, registrar_entrada, registrar_salida,
+    registrar_licencia_aprobada, programar_recalculo
+)
 
 # RBAC Permissions
 from common.permissions import (
@@ -27,6 +37,8 @@ from common.permissions import (
     CanApprove, obtener_agente_sesion, obtener_rol_agente,
     obtener_areas_jerarquia
 )
+from common.cache import cache_app
+from common.condicional import respuesta_condicional
 
 logger = logging.getLogger(__name__)
 
@@ -35,102 +47,30 @@ def crear_auditoria_asistencia(agente_realizador_id, accion, asistencia_id, valo
     """
     Crear registro de auditoría específico para asistencias.
     """
-    try:
-        from django.utils import timezone
-        from django.core.serializers.json import DjangoJSONEncoder
-        import json
-        
-        # Convertir datos a JSON serializable
-        valor_previo_json = None
-        valor_nuevo_json = None
-        
-        if valor_previo:
-            valor_previo_json = json.loads(json.dumps(valor_previo, cls=DjangoJSONEncoder))
-        
-        if valor_nuevo:
-            valor_nuevo_json = json.loads(json.dumps(valor_nuevo, cls=DjangoJSONEncoder))
-        
-        Auditoria.objects.create(
-            pk_afectada=asistencia_id,
-            nombre_tabla='asistencia',
-            creado_en=timezone.now(),
-            valor_previo=valor_previo_json,
-            valor_nuevo=valor_nuevo_json,
-            accion=accion,
-            id_agente_id=agente_realizador_id
-        )
-    except Exception as e:
-        logger.error(f"Error creando auditoría de asistencia: {e}")
-        # No fallar la operación principal por error de auditoría
-        pass
+    encolar_auditoria(
+        'asistencia', accion, asistencia_id, agente_realizador_id,
+        valor_previo=valor_previo or None, valor_nuevo=valor_nuevo or None
+    )
 
 
 def crear_auditoria_licencia(agente_realizador_id, accion, licencia_id, valor_previo=None, valor_nuevo=None):
     """
     Crear registro de auditoría específico para licencias.
     """
-    try:
-        from django.utils import timezone
-        from django.core.serializers.json import DjangoJSONEncoder
-        import json
-        
-        # Convertir datos a JSON serializable
-        valor_previo_json = None
-        valor_nuevo_json = None
-        
-        if valor_previo:
-            valor_previo_json = json.loads(json.dumps(valor_previo, cls=DjangoJSONEncoder))
-        
-        if valor_nuevo:
-            valor_nuevo_json = json.loads(json.dumps(valor_nuevo, cls=DjangoJSONEncoder))
-        
-        Auditoria.objects.create(
-            pk_afectada=licencia_id,
-            nombre_tabla='licencia',
-            creado_en=timezone.now(),
-            valor_previo=valor_previo_json,
-            valor_nuevo=valor_nuevo_json,
-            accion=accion,
-            id_agente_id=agente_realizador_id
-        )
-    except Exception as e:
-        logger.error(f"Error creando auditoría de licencia: {e}")
-        # No fallar la operación principal por error de auditoría
-        pass
+    encolar_auditoria(
+        'licencia', accion, licencia_id, agente_realizador_id,
+        valor_previo=valor_previo or None, valor_nuevo=valor_nuevo or None
+    )
 
 
 def crear_auditoria_tipo_licencia(agente_realizador_id, accion, tipo_licencia_id, valor_previo=None, valor_nuevo=None):
     """
     Crear registro de auditoría específico para tipos de licencia.
     """
-    try:
-        from django.utils import timezone
-        from django.core.serializers.json import DjangoJSONEncoder
-        import json
-        
-        # Convertir datos a JSON serializable
-        valor_previo_json = None
-        valor_nuevo_json = None
-        
-        if valor_previo:
-            valor_previo_json = json.loads(json.dumps(valor_previo, cls=DjangoJSONEncoder))
-        
-        if valor_nuevo:
-            valor_nuevo_json = json.loads(json.dumps(valor_nuevo, cls=DjangoJSONEncoder))
-        
-        Auditoria.objects.create(
-            pk_afectada=tipo_licencia_id,
-            nombre_tabla='tipo_licencia',
-            creado_en=timezone.now(),
-            valor_previo=valor_previo_json,
-            valor_nuevo=valor_nuevo_json,
-            accion=accion,
-            id_agente_id=agente_realizador_id
-        )
-    except Exception as e:
-        logger.error(f"Error creando auditoría de tipo de licencia: {e}")
-        # No fallar la operación principal por error de auditoría
-        pass
+    encolar_auditoria(
+        'tipo_licencia', accion, tipo_licencia_id, agente_realizador_id,
+        valor_previo=valor_previo or None, valor_nuevo=valor_nuevo or None
+    )
 
 
 def es_dia_laborable(fecha):
@@ -138,15 +78,8 @@ def es_dia_laborable(fecha):
     Verifica si una fecha es un día laborable.
     Retorna False si es sábado, domingo o feriado.
     """
-    # Verificar si es fin de semana (sábado=5, domingo=6)
-    if fecha.weekday() in [5, 6]:  # 0=Lunes, 6=Domingo
-        return False
-    
-    # Verificar si es feriado
-    if Feriado.es_feriado(fecha):
-        return False
-        
-    return True
+    # Fin de semana o feriado según el calendario laboral en memoria
+    return calendario.es_dia_laborable(fecha)
 
 
 def get_motivo_no_laborable(fecha):
@@ -157,11 +90,10 @@ def get_motivo_no_laborable(fecha):
         return "sábado"
     elif fecha.weekday() == 6:  # Domingo
         return "domingo"
-    elif Feriado.es_feriado(fecha):
-        feriados = Feriado.feriados_en_fecha(fecha)
-        if feriados.exists():
-            nombres = [f.nombre for f in feriados]
-            return f"feriado ({', '.join(nombres)})"
+    
+    nombres = calendario.feriados_en_fecha(fecha)
+    if nombres:
+        return f"feriado ({', '.join(nombres)})"
     
     return None
 
@@ -176,6 +108,100 @@ def get_client_ip(request):
     return ip
 
 
+def _marcar_asistencia_rapida(agente_sesion, agente_a_marcar, es_admin, fecha, hora, observacion):
+    """
+    Marcación automática entrada/salida por el camino rápido.
+    Una sola sentencia (upsert) resuelve la transición; la auditoría de la
+    aplicación se encola y se inserta en lote al confirmar la transacción.
+    """
+    agente_nombre = f"{agente_a_marcar.nombre} {agente_a_marcar.apellido}"
+    
+    with transaction.atomic():
+        resultado = marcar_rapido(
+            agente_a_marcar.id_agente, agente_a_marcar.id_area_id, fecha, hora, observacion
+        )
+        
+        if resultado.tipo == 'ya_completo':
+            return Response({
+                'success': False,
+                'message': 'Ya has registrado entrada y salida para hoy',
+                'tipo': 'ya_completo',
+                'data': {
+                    'fecha': fecha,
+                    'hora_entrada': resultado.hora_entrada,
+                    'hora_salida': resultado.hora_salida
+                }
+            })
+        
+        if resultado.creada:
+            encolar_auditoria(
+                'asistencia', 'CREAR_ASISTENCIA', resultado.id_asistencia, agente_sesion.id_agente,
+                valor_nuevo={
+                    'agente_dni': agente_a_marcar.dni,
+                    'agente_nombre': agente_nombre,
+                    'fecha': str(fecha),
+                    'id_area': agente_a_marcar.id_area_id,
+                    'creado_por_admin': es_admin,
+                    'motivo': 'Creación automática de registro de asistencia'
+                }
+            )
+        
+        if resultado.tipo == 'entrada':
+            registrar_entrada(fecha, agente_a_marcar.id_area_id, agente_a_marcar.id_agente)
+            encolar_auditoria(
+                'asistencia', 'MARCAR_ENTRADA', resultado.id_asistencia, agente_sesion.id_agente,
+                valor_nuevo={
+                    'hora_entrada': str(hora),
+                    'observaciones': observacion,
+                    'agente_nombre': agente_nombre,
+                    'agente_dni': agente_a_marcar.dni,
+                    'fecha': str(fecha),
+                    'marcacion_normal': True,
+                    'es_admin': es_admin
+                }
+            )
+            
+            return Response({
+                'success': True,
+                'message': f'Entrada registrada a las {hora.strftime("%H:%M")}',
+                'tipo': 'entrada',
+                'data': {
+                    'fecha': fecha,
+                    'hora_entrada': hora,
+                    'agente': agente_nombre
+                }
+            })
+        
+        registrar_salida(fecha, agente_a_marcar.id_area_id)
+        encolar_auditoria(
+            'asistencia', 'MARCAR_SALIDA', resultado.id_asistencia, agente_sesion.id_agente,
+            valor_previo={'hora_salida': None},
+            valor_nuevo={
+                'hora_salida': str(hora),
+                'horas_efectivas': resultado.horas_efectivas,
+                'observaciones': observacion,
+                'agente_nombre': agente_nombre,
+                'agente_dni': agente_a_marcar.dni,
+                'fecha': str(fecha),
+                'marcacion_normal': True,
+                'es_admin': es_admin
+            }
+        )
+        
+        return Response({
+            'success': True,
+            'message': f'Salida registrada a las {hora.strftime("%H:%M")}',
+            'tipo': 'salida',
+            'data': {
+                'fecha': fecha,
+                'hora_entrada': resultado.hora_entrada,
+                'hora_salida': hora,
+                'horas_efectivas': resultado.horas_efectivas,
+                'agente': agente_nombre
+            }
+        })
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticatedGIGA])  
 def marcar_asistencia(request):
@@ -211,14 +237,14 @@ def marcar_asistencia(request):
         agente_sesion = Agente.objects.get(id_agente=agente_sesion_id, activo=True)
         
         # Verificar si el usuario es administrador
-        rol_sesion = agente_sesion.agenterol_set.first()
-        es_admin = rol_sesion and rol_sesion.id_rol.nombre in ['Administrador', 'Director', 'Jefatura']
+        rol_sesion = agente_sesion.agenterol_set.values_list('id_rol__nombre', flat=True).first()
+        es_admin = rol_sesion in ['Administrador', 'Director', 'Jefatura']
         
         # Obtener el agente al que se le va a marcar asistencia
         if es_admin:
             # El admin puede marcar para cualquier agente
             try:
-                agente_a_marcar = Agente.objects.get(dni=dni_ingresado, activo=True)
+                agente_a_marcar = Agente.objects.select_related('id_area').get(dni=dni_ingresado, activo=True)
             except Agente.DoesNotExist:
                 return Response({
                     'success': False,
@@ -293,6 +319,13 @@ def marcar_asistencia(request):
         else:
             hora_para_marcar = datetime.now().time()
         
+        # Camino rápido: transición automática entrada/salida en una sola sentencia
+        if not es_admin or tipo_marcacion not in ['entrada', 'salida']:
+            return _marcar_asistencia_rapida(
+                agente_sesion, agente_a_marcar, es_admin,
+                fecha_para_marcar, hora_para_marcar, observacion
+            )
+        
         with transaction.atomic():
             # Buscar o crear asistencia del día
             asistencia, created = Asistencia.objects.get_or_create(
@@ -323,136 +356,45 @@ def marcar_asistencia(request):
                     valor_nuevo
                 )
             
-            # Si es admin y especificó tipo_marcacion, respetarlo
-            if es_admin and tipo_marcacion:
-                if tipo_marcacion == 'entrada':
-                    # Auditoría: Capturar estado previo
-                    valor_previo = {
-                        'hora_entrada': str(asistencia.hora_entrada) if asistencia.hora_entrada else None,
-                        'observaciones': asistencia.observaciones,
-                        'es_correccion': asistencia.es_correccion
-                    }
-                    
-                    asistencia.hora_entrada = hora_para_marcar
-                    if observacion:
-                        asistencia.observaciones = observacion
-                    asistencia.es_correccion = True
-                    asistencia.corregido_por = agente_sesion
-                    asistencia.save()
-                    
-                    # Auditoría: Registrar marcación de entrada por admin
-                    valor_nuevo = {
-                        'hora_entrada': str(hora_para_marcar),
-                        'observaciones': observacion,
-                        'es_correccion': True,
-                        'corregido_por': f"{agente_sesion.nombre} {agente_sesion.apellido}",
-                        'agente_afectado': f"{agente_a_marcar.nombre} {agente_a_marcar.apellido}",
-                        'agente_dni': agente_a_marcar.dni,
-                        'fecha': str(fecha_para_marcar),
-                        'marcacion_admin': True
-                    }
-                    crear_auditoria_asistencia(
-                        agente_sesion_id, 
-                        'MARCAR_ENTRADA_ADMIN', 
-                        asistencia.id_asistencia, 
-                        valor_previo, 
-                        valor_nuevo
-                    )
-                    
-                    return Response({
-                        'success': True,
-                        'message': f'Entrada registrada a las {hora_para_marcar.strftime("%H:%M")} por administrador',
-                        'tipo': 'entrada',
-                        'data': {
-                            'fecha': fecha_para_marcar,
-                            'hora_entrada': hora_para_marcar,
-                            'agente': f"{agente_a_marcar.nombre} {agente_a_marcar.apellido}"
-                        }
-                    })
-                elif tipo_marcacion == 'salida':
-                    if not asistencia.hora_entrada:
-                        return Response({
-                            'success': False,
-                            'message': 'No se puede marcar salida sin entrada previa'
-                        }, status=status.HTTP_400_BAD_REQUEST)
-                    
-                    # Auditoría: Capturar estado previo
-                    valor_previo = {
-                        'hora_salida': str(asistencia.hora_salida) if asistencia.hora_salida else None,
-                        'observaciones': asistencia.observaciones,
-                        'es_correccion': asistencia.es_correccion
-                    }
-                    
-                    asistencia.hora_salida = hora_para_marcar
-                    if observacion:
-                        if asistencia.observaciones:
-                            asistencia.observaciones += f" | {observacion}"
-                        else:
-                            asistencia.observaciones = observacion
-                    asistencia.es_correccion = True
-                    asistencia.corregido_por = agente_sesion
-                    asistencia.save()
-                    
-                    # Auditoría: Registrar marcación de salida por admin
-                    valor_nuevo = {
-                        'hora_salida': str(hora_para_marcar),
-                        'observaciones': asistencia.observaciones,
-                        'es_correccion': True,
-                        'corregido_por': f"{agente_sesion.nombre} {agente_sesion.apellido}",
-                        'agente_afectado': f"{agente_a_marcar.nombre} {agente_a_marcar.apellido}",
-                        'agente_dni': agente_a_marcar.dni,
-                        'fecha': str(fecha_para_marcar),
-                        'marcacion_admin': True
-                    }
-                    crear_auditoria_asistencia(
-                        agente_sesion_id, 
-                        'MARCAR_SALIDA_ADMIN', 
-                        asistencia.id_asistencia, 
-                        valor_previo, 
-                        valor_nuevo
-                    )
-                    
-                    return Response({
-                        'success': True,
-                        'message': f'Salida registrada a las {hora_para_marcar.strftime("%H:%M")} por administrador',
-                        'tipo': 'salida',
-                        'data': {
-                            'fecha': fecha_para_marcar,
-                            'hora_entrada': asistencia.hora_entrada,
-                            'hora_salida': hora_para_marcar,
-                            'agente': f"{agente_a_marcar.nombre} {agente_a_marcar.apellido}"
-                        }
-                    })
-            
-            # Lógica normal: determinar automáticamente si es entrada o salida
-            if asistencia.hora_entrada is None:
-                # Marcar entrada
+            # Admin con tipo_marcacion explícito: se respeta
+            if tipo_marcacion == 'entrada':
+                # Auditoría: Capturar estado previo
+                valor_previo = {
+                    'hora_entrada': str(asistencia.hora_entrada) if asistencia.hora_entrada else None,
+                    'observaciones': asistencia.observaciones,
+                    'es_correccion': asistencia.es_correccion
+                }
+                
                 asistencia.hora_entrada = hora_para_marcar
                 if observacion:
                     asistencia.observaciones = observacion
+                asistencia.es_correccion = True
+                asistencia.corregido_por = agente_sesion
                 asistencia.save()
+                programar_recalculo(fecha_para_marcar, agente_a_marcar.id_area_id)
                 
-                # Auditoría: Registrar marcación normal de entrada
+                # Auditoría: Registrar marcación de entrada por admin
                 valor_nuevo = {
                     'hora_entrada': str(hora_para_marcar),
                     'observaciones': observacion,
-                    'agente_nombre': f"{agente_a_marcar.nombre} {agente_a_marcar.apellido}",
+                    'es_correccion': True,
+                    'corregido_por': f"{agente_sesion.nombre} {agente_sesion.apellido}",
+                    'agente_afectado': f"{agente_a_marcar.nombre} {agente_a_marcar.apellido}",
                     'agente_dni': agente_a_marcar.dni,
                     'fecha': str(fecha_para_marcar),
-                    'marcacion_normal': True,
-                    'es_admin': es_admin
+                    'marcacion_admin': True
                 }
                 crear_auditoria_asistencia(
                     agente_sesion_id, 
-                    'MARCAR_ENTRADA', 
+                    'MARCAR_ENTRADA_ADMIN', 
                     asistencia.id_asistencia, 
-                    None, 
+                    valor_previo, 
                     valor_nuevo
                 )
                 
                 return Response({
                     'success': True,
-                    'message': f'Entrada registrada a las {hora_para_marcar.strftime("%H:%M")}',
+                    'message': f'Entrada registrada a las {hora_para_marcar.strftime("%H:%M")} por administrador',
                     'tipo': 'entrada',
                     'data': {
                         'fecha': fecha_para_marcar,
@@ -460,13 +402,18 @@ def marcar_asistencia(request):
                         'agente': f"{agente_a_marcar.nombre} {agente_a_marcar.apellido}"
                     }
                 })
-            
-            elif asistencia.hora_salida is None:
-                # Marcar salida
-                valor_previo_salida = {
+            elif tipo_marcacion == 'salida':
+                if not asistencia.hora_entrada:
+                    return Response({
+                        'success': False,
+                        'message': 'No se puede marcar salida sin entrada previa'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                
+                # Auditoría: Capturar estado previo
+                valor_previo = {
                     'hora_salida': str(asistencia.hora_salida) if asistencia.hora_salida else None,
-                    'horas_efectivas': asistencia.horas_efectivas,
-                    'observaciones': asistencia.observaciones
+                    'observaciones': asistencia.observaciones,
+                    'es_correccion': asistencia.es_correccion
                 }
                 
                 asistencia.hora_salida = hora_para_marcar
@@ -475,65 +422,42 @@ def marcar_asistencia(request):
                         asistencia.observaciones += f" | {observacion}"
                     else:
                         asistencia.observaciones = observacion
-                
-                # Calcular horas efectivas solo si ambas están presentes
-                if asistencia.hora_entrada:
-                    entrada_dt = timezone.make_aware(timezone.datetime.combine(fecha_para_marcar, asistencia.hora_entrada))
-                    salida_dt = timezone.make_aware(timezone.datetime.combine(fecha_para_marcar, hora_para_marcar))
-                    if salida_dt > entrada_dt:
-                        diferencia = salida_dt - entrada_dt
-                        horas_efectivas = diferencia.total_seconds() / 3600  # Convertir a horas
-                        asistencia.horas_efectivas = round(horas_efectivas, 2)
-                    else:
-                        asistencia.horas_efectivas = 0
-                
+                asistencia.es_correccion = True
+                asistencia.corregido_por = agente_sesion
                 asistencia.save()
+                programar_recalculo(fecha_para_marcar, agente_a_marcar.id_area_id)
                 
-                # Auditoría: Registrar marcación normal de salida
-                valor_nuevo_salida = {
+                # Auditoría: Registrar marcación de salida por admin
+                valor_nuevo = {
                     'hora_salida': str(hora_para_marcar),
-                    'horas_efectivas': asistencia.horas_efectivas,
                     'observaciones': asistencia.observaciones,
-                    'agente_nombre': f"{agente_a_marcar.nombre} {agente_a_marcar.apellido}",
+                    'es_correccion': True,
+                    'corregido_por': f"{agente_sesion.nombre} {agente_sesion.apellido}",
+                    'agente_afectado': f"{agente_a_marcar.nombre} {agente_a_marcar.apellido}",
                     'agente_dni': agente_a_marcar.dni,
                     'fecha': str(fecha_para_marcar),
-                    'marcacion_normal': True,
-                    'es_admin': es_admin
+                    'marcacion_admin': True
                 }
                 crear_auditoria_asistencia(
                     agente_sesion_id, 
-                    'MARCAR_SALIDA', 
+                    'MARCAR_SALIDA_ADMIN', 
                     asistencia.id_asistencia, 
-                    valor_previo_salida, 
-                    valor_nuevo_salida
+                    valor_previo, 
+                    valor_nuevo
                 )
                 
                 return Response({
                     'success': True,
-                    'message': f'Salida registrada a las {hora_para_marcar.strftime("%H:%M")}',
+                    'message': f'Salida registrada a las {hora_para_marcar.strftime("%H:%M")} por administrador',
                     'tipo': 'salida',
                     'data': {
                         'fecha': fecha_para_marcar,
                         'hora_entrada': asistencia.hora_entrada,
                         'hora_salida': hora_para_marcar,
-                        'horas_efectivas': asistencia.horas_efectivas,
                         'agente': f"{agente_a_marcar.nombre} {agente_a_marcar.apellido}"
                     }
                 })
-            
-            else:
-                # Ya tiene entrada y salida
-                return Response({
-                    'success': False,
-                    'message': 'Ya has registrado entrada y salida para hoy',
-                    'tipo': 'ya_completo',
-                    'data': {
-                        'fecha': fecha_para_marcar,
-                        'hora_entrada': asistencia.hora_entrada,
-                        'hora_salida': asistencia.hora_salida
-                    }
-                })
-    
+
     except Agente.DoesNotExist:
         return Response({
             'success': False,
@@ -548,6 +472,80 @@ def marcar_asistencia(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticatedGIGA])
+def marcar_asistencia_lote(request):
+    """
+    Recibir un lote de marcaciones desde un kiosco o terminal sin conexión.
+    
+    Body: {
+        'terminal': 'Kiosco Estación Central',       # opcional
+        'marcaciones': [
+            {'id_cliente': 'uuid', 'dni': '...', 'timestamp': 'ISO 8601', 'tipo': 'entrada'|'salida'},
+            ...
+        ]
+    }
+    
+    SEGURIDAD:
+    - Requiere sesión GIGA válida (IsAuthenticatedGIGA)
+    - Sin rol de supervisión solo se acepta el DNI propio; el resto se
+      registra como intento fraudulento
+    - Sin rol de supervisión el timestamp debe estar dentro de
+      KIOSCO_TOLERANCIA_SEGUNDOS de la hora del servidor
+    - Idempotente: reenviar marcaciones con el mismo id_cliente no las duplica
+    """
+    try:
+        agente_sesion = obtener_agente_sesion(request)
+        if not agente_sesion:
+            return Response({
+                'success': False,
+                'message': 'No hay sesión activa'
+            }, status=status.HTTP_401_UNAUTHORIZED)
+        
+        marcaciones = request.data.get('marcaciones')
+        if not isinstance(marcaciones, list) or not marcaciones:
+            return Response({
+                'success': False,
+                'message': 'Debe enviar una lista de marcaciones'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if len(marcaciones) > MAX_MARCACIONES_LOTE:
+            return Response({
+                'success': False,
+                'message': f'El lote supera el máximo de {MAX_MARCACIONES_LOTE} marcaciones'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        rol_sesion = agente_sesion.agenterol_set.values_list('id_rol__nombre', flat=True).first()
+        es_admin = rol_sesion in ['Administrador', 'Director', 'Jefatura']
+        
+        terminal = request.data.get('terminal')
+        resultados = procesar_lote(
+            marcaciones,
+            agente_sesion,
+            es_admin,
+            ip_address=get_client_ip(request),
+            terminal=str(terminal)[:100] if terminal else None
+        )
+        
+        totales = {}
+        for resultado in resultados:
+            totales[resultado['estado']] = totales.get(resultado['estado'], 0) + 1
+        
+        return Response({
+            'success': True,
+            'message': f'Lote procesado: {len(resultados)} marcaciones',
+            'totales': totales,
+            'data': resultados
+        })
+    
+    except Exception as e:
+        logger.error(f'Error en marcar_asistencia_lote: {str(e)}')
+        return Response({
+            'success': False,
+            'message': f'Error al procesar el lote: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticatedGIGA])
 def obtener_estado_asistencia(request):
@@ -622,6 +620,7 @@ def obtener_estado_asistencia(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticatedGIGA])
+@respuesta_condicional('tipos_licencia')
 def listar_tipos_licencia(request):
     """
     Listar todos los tipos de licencia disponibles.
@@ -634,12 +633,15 @@ def listar_tipos_licencia(request):
         # El modelo TipoLicencia tiene campos 'codigo' y 'descripcion'.
         # Antes se ordenaba por 'nombre' (inexistente) lo que provocaba
         # "Cannot resolve keyword 'nombre' into field" en las consultas.
-        tipos_licencia = TipoLicencia.objects.all().order_by('codigo')
-        serializer = TipoLicenciaSerializer(tipos_licencia, many=True)
+        tipos_licencia = cache_app.obtener(
+            'tipos_licencia', ('listado',),
+            lambda: list(TipoLicenciaSerializer(TipoLicencia.objects.all().order_by('codigo'), many=True).data),
+            ttl=3600
+        )
 
         return Response({
             'success': True,
-            'data': serializer.data
+            'data': tipos_licencia
         })
 
     except Exception as e:
@@ -817,6 +819,208 @@ def eliminar_tipo_licencia(request, tipo_licencia_id):
         return Response({'success': False, 'message': f'Error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _codificar_cursor(valores):
+    """Codifica la posición de la última fila devuelta para la paginación por clave"""
+    crudo = json.dumps(valores, cls=DjangoJSONEncoder).encode()
+    return base64.urlsafe_b64encode(crudo).decode()
+
+
+def _decodificar_cursor(cursor):
+    """
+    Decodifica un cursor generado por _codificar_cursor: [fecha ISO, apellido, id].
+    Retorna None si es inválido o no tiene esa forma.
+    """
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(valores, list) or len(valores) != 3:
+        return None
+    fecha, apellido, id_fila = valores
+    if not isinstance(fecha, str) or not isinstance(apellido, str) or isinstance(id_fila, bool) or not isinstance(id_fila, int):
+        return None
+    try:
+        date.fromisoformat(fecha)
+    except ValueError:
+        return None
+    return valores
+
+
+def _obtener_limite(request, por_defecto=500, maximo=2000):
+    """Tamaño de página solicitado, acotado al máximo permitido"""
+    try:
+        limite = int(request.GET.get('limit', por_defecto))
+    except (TypeError, ValueError):
+        limite = por_defecto
+    return max(1, min(limite, maximo))
+
+
+def _listar_ausentes_rango(fecha_desde, fecha_hasta, area_ids, limite, cursor):
+    """
+    Ausentes por día en el rango: agentes activos sin entrada registrada en cada
+    día laborable (lunes a viernes que no sea feriado).
+    Se resuelve en una consulta con anti-join (NOT EXISTS) contra la serie de días.
+    Orden: fecha DESC, apellido, id_agente (paginación por clave).
+    """
+    condiciones = []
+    params = {
+        'desde': fecha_desde,
+        'hasta': fecha_hasta,
+        'limite': limite + 1,
+    }
+
+    if area_ids is not None:
+        condiciones.append("ag.id_area = ANY(%(areas)s)")
+        params['areas'] = list(area_ids)
+
+    if cursor:
+        condiciones.append("""(
+            d.dia < %(c_fecha)s
+            OR (d.dia = %(c_fecha)s AND (ag.apellido, ag.id_agente) > (%(c_apellido)s, %(c_id)s))
+        )""")
+        params.update({'c_fecha': cursor[0], 'c_apellido': cursor[1], 'c_id': cursor[2]})
+
+    filtro_extra = ''.join(f"\n          AND {c}" for c in condiciones)
+
+    sql = f"""
+        WITH dias AS (
+            SELECT g::date AS dia
+            FROM generate_series(%(desde)s::date, %(hasta)s::date, INTERVAL '1 day') g
+            WHERE EXTRACT(ISODOW FROM g) < 6
+              AND NOT EXISTS (
+                  SELECT 1 FROM feriado f
+                  WHERE f.activo = true
+                    AND g::date BETWEEN f.fecha_inicio AND f.fecha_fin
+              )
+        )
+        SELECT d.dia, ag.id_agente, ag.nombre, ag.apellido, ag.dni,
+               ag.horario_entrada, ag.horario_salida, ag.id_area, ar.nombre
+        FROM dias d
+        CROSS JOIN agente ag
+        LEFT JOIN area ar ON ar.id_area = ag.id_area
+        WHERE ag.activo = true
+          AND NOT EXISTS (
+              SELECT 1 FROM asistencia a
+              WHERE a.id_agente = ag.id_agente
+                AND a.fecha = d.dia
+                AND a.hora_entrada IS NOT NULL
+          ){filtro_extra}
+        ORDER BY d.dia DESC, ag.apellido, ag.id_agente
+        LIMIT %(limite)s
+    """
+
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        filas = db_cursor.fetchall()
+
+    ausentes = []
+    for dia, id_agente, nombre, apellido, dni, h_entrada, h_salida, id_area, area_nombre in filas[:limite]:
+        ausentes.append({
+            'id_asistencia': None,
+            'fecha': dia,
+            'agente_nombre': f"{apellido}, {nombre}",
+            'agente_dni': dni,
+            'area_nombre': area_nombre or 'Sin área',
+            'hora_entrada': None,
+            'hora_salida': None,
+            'horario_esperado_entrada': str(h_entrada) if h_entrada else None,
+            'horario_esperado_salida': str(h_salida) if h_salida else None,
+            'marcacion_entrada_automatica': False,
+            'marcacion_salida_automatica': False,
+            'es_correccion': False,
+            'corregido_por_nombre': None,
+            'observaciones': None,
+            'estado': 'sin_entrada',
+            'id_agente': id_agente,
+            'id_area': id_area,
+            '_clave': [dia, apellido, id_agente],
+        })
+
+    return ausentes, len(filas) > limite
+
+
+def _listar_asistencias_rango(fecha_desde, fecha_hasta, area_ids, estado_filtro, limite, cursor):
+    """
+    Asistencias del rango como proyección values() (sin serializer por fila).
+    Orden: fecha DESC, apellido, id_asistencia (paginación por clave).
+    """
+    queryset = Asistencia.objects.filter(
+        fecha__gte=fecha_desde,
+        fecha__lte=fecha_hasta
+    )
+
+    if area_ids is not None:
+        queryset = queryset.filter(id_area_id__in=area_ids)
+
+    if estado_filtro == 'completa':
+        queryset = queryset.filter(hora_entrada__isnull=False, hora_salida__isnull=False)
+    elif estado_filtro == 'sin_salida':
+        queryset = queryset.filter(hora_entrada__isnull=False, hora_salida__isnull=True)
+
+    if cursor:
+        c_fecha, c_apellido, c_id = cursor
+        queryset = queryset.filter(
+            Q(fecha__lt=c_fecha) |
+            Q(fecha=c_fecha, id_agente__apellido__gt=c_apellido) |
+            Q(fecha=c_fecha, id_agente__apellido=c_apellido, id_asistencia__gt=c_id)
+        )
+
+    filas = list(queryset.order_by('-fecha', 'id_agente__apellido', 'id_asistencia').values(
+        'id_asistencia', 'fecha', 'hora_entrada', 'hora_salida', 'horas_efectivas',
+        'marcacion_entrada_automatica', 'marcacion_salida_automatica',
+        'es_correccion', 'corregido_por', 'observaciones', 'creado_en', 'actualizado_en',
+        'id_agente', 'id_area',
+        'id_agente__nombre', 'id_agente__apellido', 'id_agente__dni',
+        'id_agente__horario_entrada', 'id_agente__horario_salida',
+        'id_area__nombre', 'corregido_por__nombre', 'corregido_por__apellido',
+    )[:limite + 1])
+
+    asistencias = []
+    for fila in filas[:limite]:
+        hora_entrada = fila['hora_entrada']
+        hora_salida = fila['hora_salida']
+        if hora_entrada and hora_salida:
+            estado = 'completa'
+        elif hora_entrada:
+            estado = 'sin_salida'
+        else:
+            estado = 'sin_entrada'
+
+        asistencias.append({
+            'id_asistencia': fila['id_asistencia'],
+            'fecha': fila['fecha'],
+            'hora_entrada': hora_entrada,
+            'hora_salida': hora_salida,
+            'horas_efectivas': fila['horas_efectivas'],
+            'marcacion_entrada_automatica': fila['marcacion_entrada_automatica'],
+            'marcacion_salida_automatica': fila['marcacion_salida_automatica'],
+            'es_correccion': fila['es_correccion'],
+            'corregido_por': fila['corregido_por'],
+            'corregido_por_nombre': (
+                f"{fila['corregido_por__nombre']} {fila['corregido_por__apellido']}"
+                if fila['corregido_por'] else None
+            ),
+            'observaciones': fila['observaciones'],
+            'creado_en': fila['creado_en'],
+            'actualizado_en': fila['actualizado_en'],
+            'id_agente': fila['id_agente'],
+            'agente_nombre': f"{fila['id_agente__nombre']} {fila['id_agente__apellido']}",
+            'agente_dni': fila['id_agente__dni'],
+            'id_area': fila['id_area'],
+            'area_nombre': fila['id_area__nombre'],
+            'estado': estado,
+            'horario_esperado_entrada': (
+                str(fila['id_agente__horario_entrada']) if fila['id_agente__horario_entrada'] else None
+            ),
+            'horario_esperado_salida': (
+                str(fila['id_agente__horario_salida']) if fila['id_agente__horario_salida'] else None
+            ),
+            '_clave': [fila['fecha'], fila['id_agente__apellido'], fila['id_asistencia']],
+        })
+
+    return asistencias, len(filas) > limite
+
+
 @api_view(['GET'])
 @permission_classes([IsJefaturaOrAbove])
 def listar_asistencias_admin(request):
@@ -827,6 +1031,9 @@ def listar_asistencias_admin(request):
     - Administrador: Todas las asistencias
     - Director: Asistencias de agentes de su área + sub-áreas
     - Jefatura: Asistencias de agentes de su área (sin sub-áreas)
+    
+    Paginación por clave: parámetros `limit` (500 por defecto, máx. 2000) y `cursor`.
+    La respuesta incluye `next_cursor` (None en la última página).
     """
     try:
         # RBAC: Obtener agente y rol
@@ -840,114 +1047,69 @@ def listar_asistencias_admin(request):
         rol_sesion = obtener_rol_agente(agente_sesion)
         
         # Filtros de consulta
-        fecha_desde = request.GET.get('fecha_desde', date.today().isoformat())
-        fecha_hasta = request.GET.get('fecha_hasta', date.today().isoformat())
+        try:
+            fecha_desde = datetime.strptime(
+                request.GET.get('fecha_desde', date.today().isoformat()), '%Y-%m-%d'
+            ).date()
+            fecha_hasta = datetime.strptime(
+                request.GET.get('fecha_hasta', fecha_desde.isoformat()), '%Y-%m-%d'
+            ).date()
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'Formato de fecha inválido. Use YYYY-MM-DD'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
         area_id = request.GET.get('area_id')
         estado_filtro = request.GET.get('estado')  # 'completa', 'sin_salida', 'sin_entrada'
+        limite = _obtener_limite(request)
         
-        # Caso especial: sin_entrada (ausentes) - buscar agentes sin registro de asistencia
-        if estado_filtro == 'sin_entrada':
-            # Verificar si la fecha consultada es un día laborable
-            fecha_consulta = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
-            if not es_dia_laborable(fecha_consulta):
-                # Si no es día laborable, no hay ausentes a mostrar
+        cursor = None
+        if request.GET.get('cursor'):
+            cursor = _decodificar_cursor(request.GET['cursor'])
+            if cursor is None:
                 return Response({
-                    'success': True,
-                    'data': [],
-                    'total': 0,
-                    'message': f'No se registra asistencia en {get_motivo_no_laborable(fecha_consulta)}'
-                })
-            
-            # Obtener agentes activos
-            agentes_query = Agente.objects.filter(activo=True)
-            
-            # RBAC: Filtrar agentes por áreas permitidas
-            # La lógica es la misma: Admin ve todos, Director área+sub, Jefatura solo área
-            if rol_sesion != 'administrador':
-                areas_permitidas = obtener_areas_jerarquia(agente_sesion)
-                area_ids_permitidas = [a.id_area for a in areas_permitidas]
-                agentes_query = agentes_query.filter(id_area__id_area__in=area_ids_permitidas)
-            
-            # Filtro adicional por área específica (si se proporciona)
-            if area_id:
-                agentes_query = agentes_query.filter(id_area_id=area_id)
-            
-            # Obtener IDs de agentes que SÍ tienen asistencia en ese rango de fechas
-            agentes_con_asistencia = Asistencia.objects.filter(
-                fecha__gte=fecha_desde,
-                fecha__lte=fecha_hasta
-            ).values_list('id_agente_id', flat=True).distinct()
-            
-            # Filtrar agentes que NO tienen asistencia (ausentes)
-            agentes_ausentes = agentes_query.exclude(
-                id_agente__in=agentes_con_asistencia
-            ).select_related('id_area').order_by('apellido')
-            
-            # Construir respuesta en formato similar al serializer de asistencias
-            ausentes_data = []
-            for agente_obj in agentes_ausentes:
-                ausentes_data.append({
-                    'id_asistencia': None,
-                    'fecha': fecha_desde,
-                    'agente_nombre': f"{agente_obj.apellido}, {agente_obj.nombre}",
-                    'agente_dni': agente_obj.dni,
-                    'area_nombre': agente_obj.id_area.nombre if agente_obj.id_area else 'Sin área',
-                    'hora_entrada': None,
-                    'hora_salida': None,
-                    'horario_esperado_entrada': str(agente_obj.horario_entrada) if agente_obj.horario_entrada else None,
-                    'horario_esperado_salida': str(agente_obj.horario_salida) if agente_obj.horario_salida else None,
-                    'marcacion_entrada_automatica': False,
-                    'marcacion_salida_automatica': False,
-                    'es_correccion': False,
-                    'corregido_por_nombre': None,
-                    'observaciones': None,
-                    'id_agente': agente_obj.id_agente,
-                    'id_area': agente_obj.id_area.id_area if agente_obj.id_area else None
-                })
-            
-            return Response({
-                'success': True,
-                'data': ausentes_data,
-                'total': len(ausentes_data)
-            })
-        
-        # Para otros estados, consultar asistencias normalmente
-        queryset = Asistencia.objects.select_related(
-            'id_agente', 'id_area', 'corregido_por'
-        ).filter(
-            fecha__gte=fecha_desde,
-            fecha__lte=fecha_hasta
-        ).distinct()
+                    'success': False,
+                    'message': 'Cursor de paginación inválido'
+                }, status=status.HTTP_400_BAD_REQUEST)
         
         # RBAC: Filtrar por áreas permitidas
+        # Admin ve todos, Director área+sub, Jefatura solo área
+        area_ids = None
         if rol_sesion != 'administrador':
-            areas_permitidas = obtener_areas_jerarquia(agente_sesion)
-            area_ids_permitidas = [a.id_area for a in areas_permitidas]
-            queryset = queryset.filter(id_area__id_area__in=area_ids_permitidas)
-        
-        # Filtro adicional por área específica (si se proporciona)
+            area_ids = [a.id_area for a in obtener_areas_jerarquia(agente_sesion)]
         if area_id:
-            queryset = queryset.filter(id_area_id=area_id)
-        
-        # Filtro por estado
-        if estado_filtro == 'completa':
-            queryset = queryset.filter(hora_entrada__isnull=False, hora_salida__isnull=False)
-        elif estado_filtro == 'sin_salida':
-            queryset = queryset.filter(hora_entrada__isnull=False, hora_salida__isnull=True)
-        
-        queryset = queryset.order_by('-fecha', 'id_agente__apellido')
+            try:
+                area_id = int(area_id)
+            except ValueError:
+                return Response({
+                    'success': False,
+                    'message': 'area_id inválido'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            area_ids = [area_id] if area_ids is None or area_id in area_ids else []
         
-        serializer = AsistenciaSerializer(queryset, many=True)
+        if estado_filtro == 'sin_entrada':
+            # Ausentes por cada día laborable del rango
+            data, hay_mas = _listar_ausentes_rango(fecha_desde, fecha_hasta, area_ids, limite, cursor)
+        else:
+            data, hay_mas = _listar_asistencias_rango(
+                fecha_desde, fecha_hasta, area_ids, estado_filtro, limite, cursor
+            )
         
-        # Deduplicar por id_asistencia para asegurar unicidad (fix para duplicados persistentes)
-        data_dict = {item['id_asistencia']: item for item in serializer.data}
-        unique_data = list(data_dict.values())
+        next_cursor = _codificar_cursor(data[-1]['_clave']) if hay_mas and data else None
+        for item in data:
+            del item['_clave']
         
-        return Response({
+        respuesta = {
             'success': True,
-            'data': unique_data,
-            'total': len(unique_data)
-        })
+            'data': data,
+            'total': len(data),
+            'next_cursor': next_cursor
+        }
+        if estado_filtro == 'sin_entrada' and fecha_desde == fecha_hasta and not es_dia_laborable(fecha_desde):
+            respuesta['message'] = f'No se registra asistencia en {get_motivo_no_laborable(fecha_desde)}'
+        
+        return Response(respuesta)
     
     except Exception as e:
         logger.error(f'Error en listar_asistencias: {str(e)}')
@@ -980,83 +1142,37 @@ def resumen_asistencias(request):
                 'message': 'No tiene permisos'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        fecha = request.GET.get('fecha', date.today().isoformat())
+        fecha_str = request.GET.get('fecha')
         area_id = request.GET.get('area_id')
         
-        # Obtener agentes activos del área
-        agentes_query = Agente.objects.filter(activo=True)
-        
-        if area_id:
-            agentes_query = agentes_query.filter(id_area_id=area_id)
-        elif rol.id_rol.nombre == 'Jefatura':
-            agentes_query = agentes_query.filter(id_area=agente.id_area)
-        
-        total_agentes = agentes_query.count()
+        try:
+            fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date() if fecha_str else date.today()
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'Formato de fecha inválido. Use YYYY-MM-DD'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Contar asistencias
-        asistencias = Asistencia.objects.filter(fecha=fecha)
+        # Alcance por área: el filtro explícito o el área propia para Jefatura
+        areas_ids = None
         if area_id:
-            asistencias = asistencias.filter(id_area_id=area_id)
+            try:
+                areas_ids = [int(area_id)]
+            except ValueError:
+                return Response({
+                    'success': False,
+                    'message': 'area_id inválido'
+                }, status=status.HTTP_400_BAD_REQUEST)
         elif rol.id_rol.nombre == 'Jefatura':
-            asistencias = asistencias.filter(id_area=agente.id_area)
-        
-        presentes = asistencias.filter(hora_entrada__isnull=False).count()
-        sin_salida = asistencias.filter(hora_entrada__isnull=False, hora_salida__isnull=True).count()
-        salidas_automaticas = asistencias.filter(marcacion_salida_automatica=True).count()
+            areas_ids = [agente.id_area_id] if agente.id_area_id else []
         
-        # Contar licencias
-        licencias = Licencia.objects.filter(
-            fecha_desde__lte=fecha,
-            fecha_hasta__gte=fecha,
-            estado='aprobada'
-        )
-        if area_id:
-            licencias = licencias.filter(id_agente__id_area_id=area_id)
-        elif rol.id_rol.nombre == 'Jefatura':
-            licencias = licencias.filter(id_agente__id_area=agente.id_area)
-        
-        en_licencia = licencias.count()
-        
-        # Obtener sets de IDs to avoid duplicates/overlaps
-        ids_presentes = set(asistencias.filter(hora_entrada__isnull=False).values_list('id_agente_id', flat=True))
-        ids_licencia = set(licencias.values_list('id_agente_id', flat=True))
-        
-        # Filtrar solo agentes activos en los conteos (por si acaso hay registros de inactivos)
-        ids_activos = set(agentes_query.values_list('id_agente', flat=True))
-        
-        # Intersección con activos para asegurar consistencia
-        ids_presentes = ids_presentes.intersection(ids_activos)
-        ids_licencia = ids_licencia.intersection(ids_activos)
-        
-        # Calcular uniones e intersecciones correctamente
-        presentes = len(ids_presentes)
-        en_licencia = len(ids_licencia)
-        sin_salida = asistencias.filter(
-            hora_entrada__isnull=False, 
-            hora_salida__isnull=True,
-            id_agente__in=ids_activos
-        ).count()
-        salidas_automaticas = asistencias.filter(
-            marcacion_salida_automatica=True,
-            id_agente__in=ids_activos
-        ).count()
-        
-        # Ausentes = Total - (Union de Presentes y Licencias)
-        # Esto maneja correctamente si alguien vino Y tiene licencia (no se resta doble)
-        ids_justificados_o_presentes = ids_presentes.union(ids_licencia)
-        ausentes = total_agentes - len(ids_justificados_o_presentes)
+        # Hoy se leen los contadores incrementales; otras fechas se calculan
+        # en una sola consulta con agregados condicionales
+        data = obtener_resumen(fecha, areas_ids)
         
         return Response({
             'success': True,
-            'data': {
-                'fecha': fecha,
-                'total_agentes': total_agentes,
-                'presentes': presentes,
-                'ausentes': max(0, ausentes), # Ensure never negative
-                'sin_salida': sin_salida,
-                'salidas_automaticas': salidas_automaticas,
-                'en_licencia': en_licencia
-            }
+            'data': data
         })
     
     except Exception as e:
@@ -1152,6 +1268,7 @@ def corregir_asistencia(request, asistencia_id):
                 asistencia.observaciones = f"CORRECCIÓN: {observacion}"
         
         asistencia.save()
+        programar_recalculo(asistencia.fecha, asistencia.id_agente.id_area_id)
         
         # Auditoría: Registrar corrección de asistencia
         valor_nuevo = {
@@ -1570,6 +1687,7 @@ def aprobar_licencia(request, licencia_id):
         licencia.fecha_aprobacion = timezone.now().date()
         licencia.observaciones_aprobacion = observaciones_aprobacion
         licencia.save()
+        registrar_licencia_aprobada(licencia)
         
         # Auditoría: Registrar aprobación de licencia
         valor_nuevo = {
@@ -1813,59 +1931,46 @@ def eliminar_licencia(request, licencia_id):
 
 
 @api_view(['POST'])
-@permission_classes([IsAuthenticatedGIGA])  # RBAC: Requiere autenticación
+@permission_classes([IsAdministrador])
 def ejecutar_marcacion_automatica(request):
     """
-    Ejecutar marcación automática de salidas a las 22:00.
-    Este endpoint debe ser llamado por un cron job o tarea programada.
+    Ejecutar manualmente el cierre de jornada (salidas automáticas a las 23:00,
+    horas efectivas y parte diario). El cierre corre todas las noches desde
+    el scheduler; este endpoint permite reprocesar una fecha puntual.
+    
+    Body opcional: {'fecha': 'YYYY-MM-DD'} (por defecto, ayer)
     """
     try:
-        # Solo permite ejecución desde el sistema
-        auth_key = request.data.get('auth_key')
-        if auth_key != 'GIGA_CRON_KEY_2025':
+        from personas.tasks import close_attendance_day
+        
+        fecha_str = request.data.get('fecha')
+        try:
+            fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date() if fecha_str else date.today() - timedelta(days=1)
+        except ValueError:
             return Response({
                 'success': False,
-                'message': 'No autorizado'
-            }, status=status.HTTP_403_FORBIDDEN)
-        
-        ayer = date.today() - timedelta(days=1)
+                'message': 'Formato de fecha inválido. Use YYYY-MM-DD'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        # 1. Verificar si ayer fue fin de semana (Sábado=5, Domingo=6)
-        if ayer.weekday() >= 5:
-            logger.info(f'Marcación automática omitida: {ayer} es fin de semana')
-            return Response({
-                'success': True,
-                'message': f'Marcación automática omitida: {ayer} es fin de semana',
-                'total_marcadas': 0
-            })
-
-        # 2. Verificar si ayer fue feriado
-        if Feriado.objects.filter(fecha=ayer).exists():
-            logger.info(f'Marcación automática omitida: {ayer} es feriado')
+        if fecha >= date.today():
             return Response({
-                'success': True,
-                'message': f'Marcación automática omitida: {ayer} es feriado',
-                'total_marcadas': 0
-            })
-
-        # Actualizar asistencias sin salida del día anterior
-        asistencias_actualizadas = Asistencia.objects.filter(
-            fecha=ayer,
-            hora_entrada__isnull=False,
-            hora_salida__isnull=True
-        ).update(
-            hora_salida=time(23, 0),
-            marcacion_salida_automatica=True,
-            actualizado_en=timezone.now()
-        )
+                'success': False,
+                'message': 'Solo se pueden cerrar jornadas de días anteriores'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        logger.info(f'Marcación automática ejecutada: {asistencias_actualizadas} salidas marcadas')
+        resultado = close_attendance_day(fecha=fecha)
+        if resultado['error']:
+            return Response({
+                'success': False,
+                'message': f"Error: {resultado['error']}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
         return Response({
             'success': True,
-            'message': f'Se marcaron {asistencias_actualizadas} salidas automáticas',
-            'fecha': ayer,
-            'total_marcadas': asistencias_actualizadas
+            'message': f"Se marcaron {resultado['salidas_cerradas']} salidas automáticas",
+            'fecha': fecha,
+            'total_marcadas': resultado['salidas_cerradas'],
+            'data': resultado
         })
     
     except Exception as e:
@@ -1939,6 +2044,7 @@ def marcar_como_ausente(request, asistencia_id):
             asistencia.observaciones = f"MARCADO COMO AUSENTE: {observacion}"
         
         asistencia.save()
+        programar_recalculo(asistencia.fecha, asistencia.id_agente.id_area_id)
         
         # Auditoría: Registrar marcado como ausente
         valor_nuevo = {
@@ -0,0 +1,277 @@
+"""
+Escritura diferida de auditoría - Sistema GIGA
+
+API única de auditoría para todos los módulos: encolar_auditoria(). Los
+registros no se insertan en el momento en que se generan:
+
+- dentro de una transacción se acumulan y pasan al buffer al confirmar; si la
+  transacción (o el savepoint donde se encolaron) se revierte, se descartan
+  con ella;
+- durante un request (AuditoriaBufferMiddleware) se acumulan en el buffer del
+  request y se insertan juntos, en un solo INSERT multi-fila, al terminar;
+- fuera de un request (comandos, tareas) se insertan al confirmar la
+  transacción o de inmediato si no hay ninguna.
+
+Con AUDITORIA_ESCRITURA = 'background' el buffer del request no se inserta al
+terminar el request: se entrega a un hilo que inserta en lotes cada
+AUDITORIA_FLUSH_INTERVALO segundos (o al juntar AUDITORIA_FLUSH_MAX registros).
+Lo pendiente se inserta al terminar el proceso; si el proceso muere de forma
+abrupta, se pierde.
+
+Los valores JSON de más de AUDITORIA_MAX_JSON caracteres se guardan truncados.
+Las acciones de autenticación se filtran por la allowlist (AUDIT_ALLOWLIST).
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import logging
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Auditoria
+
+logger = logging.getLogger(__name__)
+
+_estado = threading.local()
+_escritor = None
+_escritor_lock = threading.Lock()
+
+# Lista blanca de acciones que SÍ queremos auditar por defecto (solo_allowlist=True).
+# Definible por variable de entorno AUDIT_ALLOWLIST separada por comas.
+_DEFAULT_AUDIT_ALLOWLIST = {
+    # Fallos de seguridad
+    'LOGIN_FALLIDO',
+    'CAMBIO_EMAIL_FALLIDO',
+    'CAMBIO_PASSWORD_FALLIDO',
+    'RECUPERACION_FALLIDA',
+    # Acciones administrativas críticas
+    'CIERRE_MASIVO_SESIONES',
+    'SESION_CERRADA_POR_LIMITE',
+    'CREAR_USUARIO',
+    'ELIMINAR_USUARIO',
+    'CAMBIO_ROL',
+    'CAMBIO_PERMISOS',
+    # Cambios de credenciales (seguridad crítica)
+    'RESET_PASSWORD',
+    'RECUPERACION_PASSWORD',
+    'CAMBIO_EMAIL_EXITOSO',
+    'CAMBIO_PASSWORD_EXITOSO',
+}
+
+
+def _get_audit_allowlist():
+    """Obtiene la lista de acciones permitidas desde env o usa default."""
+    env = os.getenv('AUDIT_ALLOWLIST', '')
+    if env:
+        return set([a.strip() for a in env.split(',') if a.strip()])
+    return _DEFAULT_AUDIT_ALLOWLIST
+
+
+def _a_json(valor, max_len):
+    """
+    Convierte el valor a una estructura JSON serializable. Si la serialización
+    excede max_len caracteres se guarda truncada (como texto, sigue siendo JSON válido).
+    """
+    if valor is None:
+        return None
+    texto = json.dumps(valor, cls=DjangoJSONEncoder, ensure_ascii=False)
+    if max_len and len(texto) > max_len:
+        return {'truncado': True, 'contenido': texto[:max_len]}
+    return json.loads(texto)
+
+
+def _insertar(registros):
+    """Un INSERT multi-fila por cada AUDITORIA_FLUSH_MAX registros"""
+    try:
+        Auditoria.objects.bulk_create(registros, batch_size=getattr(settings, 'AUDITORIA_FLUSH_MAX', 500))
+    except Exception as e:
+        # No fallar la operación principal por error de auditoría
+        logger.error(f'Error insertando lote de auditoría ({len(registros)} registros): {e}')
+
+
+def _modo_background():
+    return getattr(settings, 'AUDITORIA_ESCRITURA', 'request') == 'background'
+
+
+def _escribir(registros):
+    """Inserta ya o entrega al hilo escritor, según AUDITORIA_ESCRITURA"""
+    if _modo_background():
+        _obtener_escritor().agregar(registros)
+    else:
+        _insertar(registros)
+
+
+def _entregar(registros):
+    """Registros confirmados: al buffer del request si hay uno abierto"""
+    buffer = getattr(_estado, 'buffer', None)
+    if buffer is not None:
+        buffer.extend(registros)
+    else:
+        _escribir(registros)
+
+
+class _LoteAuditoria:
+    """Registros pendientes de una transacción; se entregan al confirmar"""
+
+    def __init__(self):
+        self.registros = []
+
+    def __call__(self):
+        registros, self.registros = self.registros, []
+        if registros:
+            _entregar(registros)
+
+
+def _lote_actual(conexion):
+    """
+    Lote de la transacción y del savepoint en curso (o uno nuevo).
+
+    Cada savepoint tiene su propio lote, registrado con on_commit dentro de
+    él: si el savepoint se revierte, Django descarta su callback y con él los
+    registros encolados ahí, aunque la transacción externa se confirme.
+    """
+    registrados = {id(callback) for _, callback, *_ in conexion.run_on_commit}
+    # Los lotes sin callback registrado son de transacciones o savepoints ya terminados
+    lotes = _estado.lotes = {
+        clave: lote for clave, lote in getattr(_estado, 'lotes', {}).items()
+        if id(lote) in registrados
+    }
+    clave = tuple(conexion.savepoint_ids)
+    if clave not in lotes:
+        lotes[clave] = _LoteAuditoria()
+        transaction.on_commit(lotes[clave])
+    return lotes[clave]
+
+
+def encolar_auditoria(nombre_tabla, accion, pk_afectada=None, id_agente_id=None,
+                      valor_previo=None, valor_nuevo=None, id_agente=None, creado_en=None,
+                      solo_allowlist=False, max_len=None):
+    """
+    Encola un registro de auditoría (ver el docstring del módulo).
+
+    - id_agente acepta la instancia de Agente en lugar de id_agente_id.
+    - creado_en por defecto es el momento de la llamada, no el de la inserción.
+    - solo_allowlist=True descarta las acciones fuera de AUDIT_ALLOWLIST.
+    - max_len reemplaza AUDITORIA_MAX_JSON para este registro.
+    """
+    try:
+        if solo_allowlist and accion not in _get_audit_allowlist():
+            logger.debug(f'Auditoría omitida para acción no crítica: {accion}')
+            return
+
+        if max_len is None:
+            max_len = getattr(settings, 'AUDITORIA_MAX_JSON', 8192)
+        if id_agente is not None:
+            id_agente_id = id_agente.pk
+
+        registro = Auditoria(
+            pk_afectada=pk_afectada,
+            nombre_tabla=nombre_tabla,
+            creado_en=creado_en or timezone.now(),
+            valor_previo=_a_json(valor_previo, max_len),
+            valor_nuevo=_a_json(valor_nuevo, max_len),
+            accion=accion,
+            id_agente_id=id_agente_id,
+        )
+
+        conexion = transaction.get_connection()
+        if conexion.in_atomic_block:
+            _lote_actual(conexion).registros.append(registro)
+        else:
+            _entregar([registro])
+    except Exception as e:
+        logger.error(f'Error encolando auditoría {accion}: {e}')
+
+
+class AuditoriaBufferMiddleware:
+    """
+    Acumula la auditoría generada durante el request y la inserta al final,
+    en un solo INSERT (o la entrega al hilo escritor en modo 'background').
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _estado.buffer = []
+        try:
+            return self.get_response(request)
+        finally:
+            registros, _estado.buffer = _estado.buffer, None
+            if registros:
+                _escribir(registros)
+
+
+# -- Modo 'background' -----------------------------------------------------
+
+class _EscritorAuditoria(threading.Thread):
+    """Hilo que inserta la auditoría encolada en lotes periódicos"""
+
+    def __init__(self, intervalo, maximo):
+        super().__init__(name='auditoria-escritor', daemon=True)
+        self.intervalo = intervalo
+        self.maximo = maximo
+        self.cola = queue.Queue()
+
+    def agregar(self, registros):
+        for registro in registros:
+            self.cola.put(registro)
+
+    def _tomar(self):
+        """Espera hasta `intervalo` segundos o hasta juntar `maximo` registros"""
+        lote = []
+        limite = time.monotonic() + self.intervalo
+        while len(lote) < self.maximo:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self.cola.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def run(self):
+        while True:
+            lote = self._tomar()
+            if lote:
+                close_old_connections()
+                _insertar(lote)
+
+    def vaciar(self):
+        """Inserta lo pendiente en el hilo que llama (al terminar el proceso)"""
+        pendientes = []
+        while True:
+            try:
+                pendientes.append(self.cola.get_nowait())
+            except queue.Empty:
+                break
+        if pendientes:
+            _insertar(pendientes)
+
+
+def _obtener_escritor():
+    global _escritor
+    if _escritor is None:
+        with _escritor_lock:
+            if _escritor is None:
+                escritor = _EscritorAuditoria(
+                    getattr(settings, 'AUDITORIA_FLUSH_INTERVALO', 2.0),
+                    getattr(settings, 'AUDITORIA_FLUSH_MAX', 500),
+                )
+                escritor.start()
+                atexit.register(escritor.vaciar)
+                _escritor = escritor
+    return _escritor
+
+
+def pendientes_auditoria():
+    """Registros esperando al hilo escritor (0 en modo 'request')"""
+    return _escritor.cola.qsize() if _escritor is not None else 0
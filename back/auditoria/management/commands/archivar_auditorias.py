@@ -1,91 +1,146 @@
 #!/usr/bin/env python
 """
 Management command para archivar registros de auditoría antiguos.
-Mueve registros más antiguos de N meses a la tabla auditoria_archivo.
+Mueve registros más antiguos de N meses a la tabla auditoria_archivo en lotes
+por clave primaria, con punto de control: si se interrumpe, la próxima
+ejecución continúa donde quedó (ver common/archivado.py).
+Con auditoria particionada por mes, los meses completos se desacoplan al
+esquema archivo y por lotes solo se mueve lo que quede en auditoria_historico.
 """
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import connection
-from django.utils import timezone
-from dateutil.relativedelta import relativedelta
 import logging
 
+from common.archivado import (
+    ArchivadoEnCurso, archivar_por_lotes, auditoria_particionada, contar_candidatas,
+    desacoplar_particiones_auditoria, tabla_existe,
+)
+
 logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
     help = 'Archiva registros de auditoría antiguos (> N meses) a la tabla auditoria_archivo'
 
+    clave = 'auditoria'
+    tabla_archivo = 'auditoria_archivo'
+    descripcion = 'registros de auditoría'
+    meses_defecto = 6
+    particionada_por_mes = True
+
     def add_arguments(self, parser):
         parser.add_argument(
             '--months',
             type=int,
-            default=6,
-            help='Archivar auditorías más antiguas de MONTHS meses (default: 6)'
+            default=self.meses_defecto,
+            help=f'Archivar {self.descripcion} más antiguos de MONTHS meses (default: {self.meses_defecto})'
         )
         parser.add_argument(
             '--dry-run',
             action='store_true',
             help='Solo mostrar conteo sin archivar'
         )
+        parser.add_argument('--lote', type=int, help='Filas por lote (default: ARCHIVADO_TAMANO_LOTE)')
+        parser.add_argument('--pausa', type=float, help='Segundos de pausa entre lotes (default: ARCHIVADO_PAUSA)')
+        parser.add_argument('--max-lotes', type=int, help='Detenerse después de N lotes (se reanuda luego)')
+        parser.add_argument(
+            '--reiniciar',
+            action='store_true',
+            help='Ignorar una ejecución interrumpida y empezar con una fecha de corte nueva'
+        )
+        parser.add_argument('--sin-vacuum', action='store_true', help='No ejecutar VACUUM (ANALYZE) al terminar')
 
     def handle(self, *args, **options):
         months = options['months']
-        dry_run = options['dry_run']
-        
-        try:
-            # Calcular fecha de corte
-            cutoff_date = timezone.now() - relativedelta(months=months)
-            
-            with connection.cursor() as cursor:
-                # Primero verificar si la tabla de archivo existe
-                cursor.execute("""
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables 
-                        WHERE table_schema = 'public' AND table_name = 'auditoria_archivo'
-                    )
-                """)
-                table_exists = cursor.fetchone()[0]
-                
-                if not table_exists:
-                    self.stdout.write(self.style.ERROR(
-                        'La tabla auditoria_archivo no existe. '
-                        'Ejecute el script 07-retention-optimization.sql primero.'
-                    ))
-                    return
-                
-                # Contar registros candidatos usando fecha calculada
-                cursor.execute(
-                    "SELECT COUNT(*) FROM auditoria WHERE creado_en < %s",
-                    [cutoff_date]
+
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT EXISTS (
+                    SELECT FROM information_schema.tables
+                    WHERE table_schema = 'public' AND table_name = %s
                 )
-                count = cursor.fetchone()[0]
-                
-                self.stdout.write(self.style.WARNING(
-                    f'Registros de auditoría candidatos (> {months} meses): {count}'
-                ))
-                
-                if dry_run:
-                    self.stdout.write(self.style.NOTICE('Dry run: no se archivaron registros.'))
-                    return
-                
-                if count == 0:
-                    self.stdout.write(self.style.SUCCESS('No hay registros para archivar.'))
-                    return
-                
-                # Ejecutar función de archivo
-                cursor.execute("SELECT * FROM archivar_auditorias(%s)", [months])
-                result = cursor.fetchone()
-                
-                if result:
-                    archivados, eliminados = result
-                    self.stdout.write(self.style.SUCCESS(
-                        f'✅ Archivados: {archivados} registros, Eliminados de tabla principal: {eliminados}'
-                    ))
-                    logger.info(f'archivar_auditorias ejecutado: archivados={archivados}, eliminados={eliminados}')
-                else:
-                    self.stdout.write(self.style.WARNING('No se obtuvieron resultados de la función.'))
-                    
+            """, [self.tabla_archivo])
+            if not cursor.fetchone()[0]:
+                raise CommandError(
+                    f'La tabla {self.tabla_archivo} no existe. '
+                    'Ejecute el script 07-retention-optimization.sql primero.'
+                )
+
+        clave = self.clave
+        if self.particionada_por_mes and auditoria_particionada():
+            clave = self._desacoplar_particiones(months, options['dry_run'])
+            if clave is None:
+                return
+
+        if options['dry_run']:
+            count = contar_candidatas(clave, months)
+            self.stdout.write(self.style.WARNING(
+                f'Candidatos a archivar ({self.descripcion}, > {months} meses): {count}'
+            ))
+            self.stdout.write(self.style.NOTICE('Dry run: no se archivaron registros.'))
+            return
+
+        def progreso(info):
+            self.stdout.write(
+                f'  lote {info["lote"]:>5}: {info["filas_lote"]:>6} filas '
+                f'(total {info["eliminados"]}, hasta id {info["ultimo_id"]}, {info["lote_ms"]} ms)'
+            )
+
+        try:
+            resultado = archivar_por_lotes(
+                clave,
+                months,
+                tamano_lote=options['lote'],
+                pausa=options['pausa'],
+                max_lotes=options['max_lotes'],
+                reiniciar=options['reiniciar'],
+                vacuum=not options['sin_vacuum'],
+                progreso=progreso,
+            )
+        except ArchivadoEnCurso as e:
+            raise CommandError(str(e))
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error al archivar auditorías: {str(e)}'))
-            logger.exception('Error ejecutando archivar_auditorias')
+            self.stdout.write(self.style.ERROR(
+                f'Error al archivar {self.descripcion}: {str(e)} '
+                '(el avance quedó guardado; vuelva a ejecutar para continuar)'
+            ))
+            logger.exception(f'Error archivando {clave}')
             raise
+
+        if resultado['reanudado']:
+            self.stdout.write(self.style.NOTICE(f'Reanudado con fecha de corte {resultado["fecha_corte"]}'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Archivados: {resultado["archivados"]} {self.descripcion}, '
+            f'Eliminados de tabla principal: {resultado["eliminados"]} '
+            f'({resultado["lotes"]} lotes, {resultado["duracion_ms"]} ms)'
+        ))
+        if not resultado['completado']:
+            self.stdout.write(self.style.WARNING(
+                f'Quedan filas por archivar (detenido en id {resultado["ultimo_id"]}); '
+                'vuelva a ejecutar para continuar.'
+            ))
+        elif resultado['vacuum']:
+            self.stdout.write('VACUUM (ANALYZE) ejecutado.')
+        logger.info(f'archivado {clave} por comando: {resultado}')
+
+    def _desacoplar_particiones(self, months, dry_run):
+        """
+        Desacopla (o lista, en dry-run) las particiones mensuales vencidas.
+        Retorna la clave a archivar por lotes, o None si no queda nada por mover.
+        """
+        particiones = desacoplar_particiones_auditoria(months, solo_listar=dry_run)
+        verbo = 'A desacoplar' if dry_run else 'Desacopladas'
+        self.stdout.write(self.style.SUCCESS(f'{verbo}: {len(particiones)} particiones'))
+        for particion in particiones:
+            self.stdout.write(
+                f'  {particion["particion"]:<28} hasta {particion["hasta"]} '
+                f'(~{particion["filas_estimadas"]} filas)'
+            )
+        if particiones and not dry_run:
+            self.stdout.write('Las particiones desacopladas quedan en el esquema archivo.')
+            logger.info(f'particiones de auditoría desacopladas por comando: {particiones}')
+
+        if not tabla_existe('auditoria_historico'):
+            return None
+        return 'auditoria_historico'
@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+"""
+Suite de benchmarks de los endpoints más pesados del sistema.
+
+Mide latencia y cantidad de consultas de reporte_general, exportar_excel,
+get_agentes, listar_asistencias_admin, marcar_asistencia,
+generar_asignaciones_plus y de los listados grandes (guardias_por_mes,
+listar_licencias, auditoria_listado) sobre el dataset sintético (ver
+generar_dataset), en una o varias escalas, y guarda los resultados en un JSON
+comparable entre versiones.
+
+De cada respuesta JSON se registran además los bytes transferidos (con
+Accept-Encoding: gzip, br, ver common/compresion.py), los bytes sin comprimir y
+el tiempo de serialización con JSONRenderer de DRF y con ORJSONRenderer.
+
+Uso:
+    python manage.py benchmark_endpoints --escalas pequena,mediana --salida bench.json
+    python manage.py benchmark_endpoints --sin-generar --repeticiones 10
+    python manage.py benchmark_endpoints --escalas pequena --comparar bench-anterior.json
+
+Las llamadas HTTP se hacen en proceso con el cliente de pruebas de Django, con
+una sesión real del administrador sintético (pasan por todo el middleware).
+"""
+from datetime import date, datetime, timedelta
+from importlib import import_module
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from rest_framework.renderers import JSONRenderer
+
+from asistencia.models import Asistencia
+from asistencia.resumen import recalcular_contadores
+from auditoria.models import Auditoria
+from common.monitor_sql import registrar_consultas
+from guardias.utils import CalculadoraPlus
+from personas.models import Agente
+
+from .generar_dataset import DOMINIO, ESCALAS, contar_dataset
+
+ENDPOINTS = [
+    'reporte_general',
+    'exportar_excel',
+    'get_agentes',
+    'listar_asistencias_admin',
+    'marcar_asistencia',
+    'generar_asignaciones_plus',
+    'guardias_por_mes',
+    'listar_licencias',
+    'auditoria_listado',
+]
+
+
+def _percentil(valores, p):
+    """Percentil p (0-100) de una lista de latencias"""
+    if not valores:
+        return 0.0
+    if len(valores) == 1:
+        return valores[0]
+    return statistics.quantiles(valores, n=100, method='inclusive')[p - 1]
+
+
+def _tiempo_render(renderer, datos, repeticiones=3):
+    """Mejor tiempo (ms) de serializar los datos de la respuesta con el renderer"""
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        renderer.render(datos)
+        transcurrido = (time.perf_counter() - inicio) * 1000
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return round(mejor, 2)
+
+
+def _medir_serializacion(respuesta):
+    """Bytes y CPU de serialización de una respuesta de DRF (None si no es JSON de DRF)"""
+    datos = getattr(respuesta, 'data', None)
+    if datos is None or respuesta.streaming:
+        return None
+    cuerpo = JSONRenderer().render(datos)
+    medicion = {
+        'bytes': len(respuesta.content),
+        'bytes_sin_comprimir': len(cuerpo),
+        'codificacion': respuesta.get('Content-Encoding'),
+        'render_drf_ms': _tiempo_render(JSONRenderer(), datos),
+    }
+    try:
+        from common.renderers import ORJSONRenderer
+        medicion['render_orjson_ms'] = _tiempo_render(ORJSONRenderer(), datos)
+    except ImportError:
+        medicion['render_orjson_ms'] = None
+    return medicion
+
+
+def _version_git():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, timeout=5, cwd=settings.BASE_DIR
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia y consultas de los endpoints críticos sobre el dataset sintético'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escalas', type=str, default='pequena',
+            help=f'Escalas separadas por coma ({", ".join(ESCALAS)}); regenera el dataset en cada una'
+        )
+        parser.add_argument(
+            '--sin-generar', action='store_true',
+            help='Usar el dataset sintético existente (una sola medición, escala "actual")'
+        )
+        parser.add_argument('--repeticiones', type=int, default=5, help='Repeticiones por endpoint')
+        parser.add_argument(
+            '--endpoints', type=str, default=','.join(ENDPOINTS),
+            help='Endpoints a medir, separados por coma'
+        )
+        parser.add_argument(
+            '--salida', type=str,
+            help='Archivo JSON de resultados (default: benchmark-<fecha>.json)'
+        )
+        parser.add_argument(
+            '--comparar', type=str,
+            help='JSON de una corrida anterior para mostrar diferencias'
+        )
+        parser.add_argument(
+            '--conservar-dataset', action='store_true',
+            help='No eliminar el dataset sintético al terminar'
+        )
+
+    def handle(self, *args, **options):
+        endpoints = [e.strip() for e in options['endpoints'].split(',') if e.strip()]
+        desconocidos = set(endpoints) - set(ENDPOINTS)
+        if desconocidos:
+            raise CommandError(f'Endpoints desconocidos: {", ".join(sorted(desconocidos))}')
+        if options['repeticiones'] < 1:
+            raise CommandError('--repeticiones debe ser al menos 1')
+
+        if options['sin_generar']:
+            escalas = ['actual']
+        else:
+            escalas = [e.strip() for e in options['escalas'].split(',') if e.strip()]
+            invalidas = set(escalas) - set(ESCALAS)
+            if invalidas:
+                raise CommandError(f'Escalas inválidas: {", ".join(sorted(invalidas))}')
+
+        resultado = {
+            'generado_en': datetime.now().isoformat(timespec='seconds'),
+            'version': _version_git(),
+            'entorno': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'repeticiones': options['repeticiones'],
+            },
+            'escalas': {},
+        }
+
+        self.stdout.write(self.style.HTTP_INFO('\n⏱️  BENCHMARK DE ENDPOINTS\n'))
+        self.stdout.write('=' * 80)
+
+        for escala in escalas:
+            if escala != 'actual':
+                self.stdout.write(self.style.HTTP_INFO(f'\n📦 Generando dataset "{escala}"...'))
+                call_command('generar_dataset', escala=escala, reemplazar=True, stdout=self.stdout)
+
+            dataset = contar_dataset()
+            if not dataset['agente']:
+                raise CommandError('No hay dataset sintético. Ejecute generar_dataset o quite --sin-generar')
+
+            self.stdout.write(self.style.HTTP_INFO(f'\n▶ Escala: {escala}'))
+            self.stdout.write('-' * 80)
+            mediciones = self._medir_escala(endpoints, options['repeticiones'])
+            resultado['escalas'][escala] = {'dataset': dataset, 'endpoints': mediciones}
+
+        if not options['sin_generar'] and not options['conservar_dataset']:
+            call_command('generar_dataset', limpiar=True, stdout=self.stdout)
+
+        salida = options['salida'] or f'benchmark-{date.today().isoformat()}.json'
+        with open(salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Resultados guardados en {salida}'))
+
+        if options['comparar']:
+            self._comparar(options['comparar'], resultado)
+
+    # ------------------------------------------------------------------
+    # Medición
+    # ------------------------------------------------------------------
+
+    def _medir_escala(self, endpoints, repeticiones):
+        admin = (
+            Agente.objects.filter(email__endswith=f'@{DOMINIO}', activo=True)
+            .order_by('id_agente').first()
+        )
+        cliente = self._cliente_con_sesion(admin)
+        hoy = date.today()
+        mes_anterior = (hoy.replace(day=1) - timedelta(days=1))
+        filtros_reporte = {
+            'fecha_desde': mes_anterior.replace(day=1).isoformat(),
+            'fecha_hasta': mes_anterior.isoformat(),
+        }
+
+        dnis_marcacion = list(
+            Agente.objects.filter(email__endswith=f'@{DOMINIO}', activo=True)
+            .exclude(id_agente=admin.id_agente)
+            .order_by('id_agente')
+            .values_list('dni', flat=True)[:repeticiones]
+        )
+        marcados = iter(dnis_marcacion)
+
+        casos = {
+            'reporte_general': lambda: cliente.get(
+                '/api/guardias/guardias/reporte_general/', filtros_reporte
+            ),
+            'exportar_excel': lambda: cliente.post(
+                '/api/guardias/guardias/exportar_excel/',
+                {'tipo_reporte': 'general', **filtros_reporte}, content_type='application/json'
+            ),
+            'get_agentes': lambda: cliente.get('/api/personas/agentes/'),
+            'listar_asistencias_admin': lambda: cliente.get(
+                '/api/asistencia/admin/listar/',
+                {'fecha_desde': (hoy - timedelta(days=30)).isoformat(),
+                 'fecha_hasta': (hoy - timedelta(days=1)).isoformat()}
+            ),
+            'marcar_asistencia': lambda: cliente.post(
+                '/api/asistencia/marcar/', {'dni': next(marcados)}, content_type='application/json'
+            ),
+            'generar_asignaciones_plus': lambda: self._plus_sin_persistir(mes_anterior),
+            'guardias_por_mes': lambda: cliente.get(
+                '/api/guardias/guardias/por_mes/', {'anio': mes_anterior.year, 'mes': mes_anterior.month}
+            ),
+            'listar_licencias': lambda: cliente.get('/api/asistencia/licencias/'),
+            'auditoria_listado': lambda: cliente.get('/api/auditoria/auditoria/'),
+        }
+
+        mediciones = {}
+        try:
+            for nombre in endpoints:
+                mediciones[nombre] = self._medir(nombre, casos[nombre], repeticiones)
+        finally:
+            if 'marcar_asistencia' in endpoints:
+                self._limpiar_marcaciones(hoy, dnis_marcacion)
+        return mediciones
+
+    def _medir(self, nombre, caso, repeticiones):
+        latencias, consultas, tiempos_db, estados = [], [], [], []
+        respuesta = None
+        for _ in range(repeticiones):
+            with registrar_consultas(capturar_origen=False) as registro:
+                inicio = time.perf_counter()
+                respuesta = caso()
+                latencias.append((time.perf_counter() - inicio) * 1000)
+            consultas.append(registro.cantidad)
+            tiempos_db.append(registro.tiempo_ms)
+            estados.append(getattr(respuesta, 'status_code', 200))
+
+        latencias.sort()
+        errores = sum(1 for estado in estados if estado >= 400)
+        medicion = {
+            'p50_ms': round(_percentil(latencias, 50), 1),
+            'p95_ms': round(_percentil(latencias, 95), 1),
+            'max_ms': round(latencias[-1], 1),
+            'media_ms': round(statistics.mean(latencias), 1),
+            'consultas': int(statistics.median(consultas)),
+            'db_ms': round(statistics.median(tiempos_db), 1),
+            'errores': errores,
+            'estados': sorted(set(estados)),
+            'serializacion': _medir_serializacion(respuesta) if respuesta is not None else None,
+        }
+
+        estilo = self.style.ERROR if errores else (lambda texto: texto)
+        self.stdout.write(estilo(
+            f'{nombre:<28} p50={medicion["p50_ms"]:>8.1f}  p95={medicion["p95_ms"]:>8.1f}  '
+            f'consultas={medicion["consultas"]:>5}  db={medicion["db_ms"]:>8.1f}ms'
+            + (f'  errores={errores} {medicion["estados"]}' if errores else '')
+        ))
+        serializacion = medicion['serializacion']
+        if serializacion:
+            self.stdout.write(
+                f'{"":<28} bytes={serializacion["bytes"]:>9} (sin comprimir {serializacion["bytes_sin_comprimir"]}, '
+                f'{serializacion["codificacion"] or "identity"})  render drf={serializacion["render_drf_ms"]}ms '
+                f'orjson={serializacion["render_orjson_ms"]}ms'
+            )
+        return medicion
+
+    def _cliente_con_sesion(self, agente):
+        host = next((h for h in settings.ALLOWED_HOSTS if h and h != '*'), 'localhost')
+        cliente = Client(SERVER_NAME=host.lstrip('.'), HTTP_ACCEPT_ENCODING='gzip, br')
+        store = import_module(settings.SESSION_ENGINE).SessionStore()
+        store['user_id'] = agente.id_agente
+        store['is_authenticated'] = True
+        store.save()
+        cliente.cookies[settings.SESSION_COOKIE_NAME] = store.session_key
+        return cliente
+
+    def _plus_sin_persistir(self, mes_anterior):
+        """Calcula el plus del mes anterior y revierte lo escrito"""
+        with transaction.atomic():
+            CalculadoraPlus.generar_asignaciones_plus(mes_anterior.month, mes_anterior.year)
+            transaction.set_rollback(True)
+
+    def _limpiar_marcaciones(self, fecha, dnis):
+        """Elimina las asistencias (y su auditoría) generadas por marcar_asistencia"""
+        ids_asistencias = list(
+            Asistencia.objects.filter(fecha=fecha, id_agente__dni__in=dnis)
+            .values_list('id_asistencia', flat=True)
+        )
+        if not ids_asistencias:
+            return
+        with transaction.atomic():
+            Auditoria.objects.filter(nombre_tabla='asistencia', pk_afectada__in=ids_asistencias).delete()
+            Asistencia.objects.filter(id_asistencia__in=ids_asistencias).delete()
+            recalcular_contadores(fecha)
+
+    # ------------------------------------------------------------------
+    # Comparación
+    # ------------------------------------------------------------------
+
+    def _comparar(self, ruta, actual):
+        try:
+            with open(ruta, encoding='utf-8') as archivo:
+                anterior = json.load(archivo)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'No se pudo leer {ruta}: {e}')
+
+        self.stdout.write(self.style.HTTP_INFO(
+            f'\n📈 COMPARACIÓN con {ruta} (versión {anterior.get("version") or "?"})\n'
+        ))
+        self.stdout.write('=' * 80)
+        for escala, datos in actual['escalas'].items():
+            previos = anterior.get('escalas', {}).get(escala, {}).get('endpoints', {})
+            if not previos:
+                continue
+            self.stdout.write(self.style.HTTP_INFO(f'\n▶ Escala: {escala}'))
+            for nombre, medicion in datos['endpoints'].items():
+                previo = previos.get(nombre)
+                if not previo:
+                    continue
+                delta = (
+                    (medicion['p50_ms'] - previo['p50_ms']) / previo['p50_ms'] * 100
+                    if previo['p50_ms'] else 0.0
+                )
+                linea = (
+                    f'{nombre:<28} p50 {previo["p50_ms"]:>8.1f} → {medicion["p50_ms"]:>8.1f} ms '
+                    f'({delta:+.1f}%)  consultas {previo["consultas"]} → {medicion["consultas"]}'
+                )
+                if delta > 10:
+                    self.stdout.write(self.style.ERROR(linea))
+                elif delta < -10:
+                    self.stdout.write(self.style.SUCCESS(linea))
+                else:
+                    self.stdout.write(linea)
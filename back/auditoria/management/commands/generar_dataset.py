@@ -0,0 +1,475 @@
+#!/usr/bin/env python
+"""
+Management command para generar un dataset sintético escalable sobre el esquema
+de bd/init-scripts: áreas jerárquicas, agentes con roles, años de asistencias,
+licencias, cronogramas con guardias y auditoría.
+
+Pensado para benchmarks (ver benchmark_endpoints) y pruebas de carga. Todos los
+datos quedan identificados como sintéticos (email @sintetico.giga.local, áreas
+con prefijo 'SINT') y se eliminan con --limpiar. Los agentes sintéticos usan la
+contraseña 'sintetico' e incluyen administradores, por eso la generación solo
+corre con DEBUG activo o con --forzar.
+
+Uso:
+    python manage.py generar_dataset --escala mediana
+    python manage.py generar_dataset --agentes 3000 --areas 60 --anios 2 --reemplazar
+    python manage.py generar_dataset --limpiar
+    python manage.py generar_dataset --escala grande --forzar   # entorno de carga sin DEBUG
+"""
+from datetime import date
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+DOMINIO = 'sintetico.giga.local'
+PREFIJO_AREA = 'SINT'
+PASSWORD = 'sintetico'
+
+ESCALAS = {
+    'pequena': {'areas': 10, 'agentes': 200, 'anios': 1},
+    'mediana': {'areas': 40, 'agentes': 1000, 'anios': 2},
+    'grande': {'areas': 120, 'agentes': 5000, 'anios': 3},
+}
+
+ROLES = ['Administrador', 'Director', 'Jefatura', 'Agente Avanzado', 'Agente']
+
+# Tablas con filas de agentes sintéticos, en orden de borrado
+TABLAS_POR_AGENTE = [
+    ('guardia', 'id_agente'),
+    ('parte_diario', 'id_agente'),
+    ('asistencia', 'id_agente'),
+    ('licencia', 'id_agente'),
+    ('intento_marcacion_fraudulenta', 'id_agente_sesion'),
+    ('sesion_activa', 'id_agente'),
+    ('auditoria', 'id_agente'),
+    ('agente_rol', 'id_agente'),
+]
+
+
+def agentes_sinteticos_sql():
+    return f"SELECT id_agente FROM agente WHERE email LIKE '%%@{DOMINIO}'"
+
+
+def areas_sinteticas_sql():
+    return f"SELECT id_area FROM area WHERE nombre LIKE '{PREFIJO_AREA} %%'"
+
+
+def contar_dataset():
+    """Cantidad de filas sintéticas por tabla"""
+    conteos = {}
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM ({areas_sinteticas_sql()}) a")
+        conteos['area'] = cursor.fetchone()[0]
+        cursor.execute(f"SELECT COUNT(*) FROM ({agentes_sinteticos_sql()}) a")
+        conteos['agente'] = cursor.fetchone()[0]
+        for tabla, columna in TABLAS_POR_AGENTE:
+            if tabla in ('agente_rol', 'sesion_activa', 'intento_marcacion_fraudulenta', 'parte_diario'):
+                continue
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {tabla} WHERE {columna} IN ({agentes_sinteticos_sql()})"
+            )
+            conteos[tabla] = cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT COUNT(*) FROM cronograma WHERE id_area IN ({areas_sinteticas_sql()})"
+        )
+        conteos['cronograma'] = cursor.fetchone()[0]
+    return conteos
+
+
+class Command(BaseCommand):
+    help = 'Genera (o elimina) un dataset sintético escalable para benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escala', choices=sorted(ESCALAS), default='pequena',
+            help='Tamaño predefinido del dataset (default: pequena)'
+        )
+        parser.add_argument('--areas', type=int, help='Cantidad de áreas (sobrescribe la escala)')
+        parser.add_argument('--agentes', type=int, help='Cantidad de agentes (sobrescribe la escala)')
+        parser.add_argument('--anios', type=int, help='Años de historia (sobrescribe la escala)')
+        parser.add_argument('--semilla', type=float, default=0.42, help='Semilla de random() en [-1, 1]')
+        parser.add_argument(
+            '--reemplazar', action='store_true',
+            help='Eliminar el dataset sintético existente antes de generar'
+        )
+        parser.add_argument(
+            '--limpiar', action='store_true',
+            help='Solo eliminar el dataset sintético'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Mostrar qué se generaría sin escribir'
+        )
+        parser.add_argument(
+            '--forzar', action='store_true',
+            help='Generar aunque DEBUG esté desactivado (crea administradores con contraseña conocida)'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        if options['limpiar']:
+            self._titulo('🧹 ELIMINANDO DATASET SINTÉTICO')
+            if dry_run:
+                self._mostrar_conteos(contar_dataset())
+                self.stdout.write(self.style.WARNING('\n⚠️  Modo DRY-RUN: no se eliminó nada'))
+                return
+            self.limpiar()
+            self.stdout.write(self.style.SUCCESS('\n✅ Dataset sintético eliminado'))
+            return
+
+        params = dict(ESCALAS[options['escala']])
+        for clave in ('areas', 'agentes', 'anios'):
+            if options[clave] is not None:
+                params[clave] = options[clave]
+
+        if params['areas'] < 1 or params['agentes'] < params['areas'] or params['anios'] < 1:
+            raise CommandError('Se requiere al menos 1 área, 1 año y un agente por área')
+
+        if not settings.DEBUG and not options['forzar'] and not dry_run:
+            raise CommandError(
+                f"El dataset crea administradores con la contraseña '{PASSWORD}'. "
+                'Solo se genera con DEBUG activo; use --forzar en un entorno de carga aislado'
+            )
+
+        self._titulo('🧪 GENERANDO DATASET SINTÉTICO')
+        self.stdout.write(
+            f"Áreas: {params['areas']}  Agentes: {params['agentes']}  Años: {params['anios']}"
+        )
+
+        existentes = contar_dataset()
+        if existentes['agente'] and not options['reemplazar']:
+            raise CommandError(
+                f"Ya existe un dataset sintético ({existentes['agente']} agentes). "
+                'Use --reemplazar o --limpiar'
+            )
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('\n⚠️  Modo DRY-RUN: no se generó nada'))
+            return
+
+        if existentes['agente'] or existentes['area']:
+            self.limpiar()
+
+        inicio = time.monotonic()
+        self.generar(params['areas'], params['agentes'], params['anios'], options['semilla'])
+        self._analizar()
+
+        self.stdout.write('')
+        self._mostrar_conteos(contar_dataset())
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ Dataset generado en {time.monotonic() - inicio:.1f}s '
+            f"(usuarios: cualquier email @{DOMINIO}, contraseña '{PASSWORD}')"
+        ))
+
+    # ------------------------------------------------------------------
+    # Generación
+    # ------------------------------------------------------------------
+
+    def generar(self, n_areas, n_agentes, anios, semilla):
+        hoy = date.today()
+        desde = date(hoy.year - anios, hoy.month, 1)
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT setseed(%s)', [semilla])
+
+                self._paso('Áreas')
+                areas = self._crear_areas(cursor, n_areas)
+
+                self._paso('Agentes y roles')
+                self._crear_agentes(cursor, n_agentes, areas)
+                self._asignar_roles(cursor)
+
+                self._paso('Licencias')
+                self._crear_licencias(cursor, desde, hoy, anios)
+
+                # El trigger de auditoría de asistencia generaría una fila por
+                # registro; la auditoría se genera después en un solo INSERT.
+                # El DDL es transaccional: ante un error se revierte con el resto.
+                self._paso('Asistencias')
+                cursor.execute('ALTER TABLE asistencia DISABLE TRIGGER trigger_audit_asistencia')
+                self._crear_asistencias(cursor, desde, hoy)
+                cursor.execute('ALTER TABLE asistencia ENABLE TRIGGER trigger_audit_asistencia')
+
+                self._paso('Cronogramas y guardias')
+                self._crear_cronogramas(cursor, desde, hoy)
+
+                self._paso('Auditoría')
+                self._crear_auditoria(cursor)
+
+    def _crear_areas(self, cursor, n_areas):
+        """Árbol de áreas con 4 hijas por nodo. Retorna los ids de todas las áreas."""
+        cursor.execute(
+            "INSERT INTO area (nombre, descripcion, nivel, activo) "
+            "VALUES (%s, 'Área sintética para benchmarks', 0, true) RETURNING id_area",
+            [f'{PREFIJO_AREA} Raíz']
+        )
+        ids = [cursor.fetchone()[0]]
+        padres = list(ids)
+        nivel = 1
+        while len(ids) < n_areas:
+            siguientes = []
+            for padre in padres:
+                for _ in range(4):
+                    if len(ids) >= n_areas:
+                        break
+                    cursor.execute(
+                        "INSERT INTO area (nombre, descripcion, id_area_padre, nivel, activo) "
+                        "VALUES (%s, 'Área sintética para benchmarks', %s, %s, true) RETURNING id_area",
+                        [f'{PREFIJO_AREA} Área {len(ids):04d}', padre, nivel]
+                    )
+                    nuevo = cursor.fetchone()[0]
+                    ids.append(nuevo)
+                    siguientes.append(nuevo)
+            padres = siguientes
+            nivel += 1
+        return ids
+
+    def _crear_agentes(self, cursor, n_agentes, areas):
+        cursor.execute(
+            """
+            INSERT INTO agente (
+                email, dni, cuil, legajo, nombre, apellido, password_hash,
+                horario_entrada, horario_salida, activo, id_area, creado_en
+            )
+            SELECT
+                'sint' || g || '@' || %(dominio)s,
+                (90000000 + g)::text,
+                '20-' || (90000000 + g)::text || '-0',
+                'SINT-' || lpad(g::text, 6, '0'),
+                'Agente' || g,
+                'Sintético',
+                %(password)s,
+                '08:00', '16:00',
+                (g = 1 OR random() > 0.03),
+                (%(areas)s::bigint[])[1 + (g %% array_length(%(areas)s::bigint[], 1))],
+                NOW() - (random() * INTERVAL '5 years')
+            FROM generate_series(1, %(n)s) AS g
+            """,
+            {'dominio': DOMINIO, 'password': make_password(PASSWORD), 'areas': areas, 'n': n_agentes}
+        )
+
+    def _asignar_roles(self, cursor):
+        """Agente 1 administrador; primer agente de cada área jefatura (director en nivel 1)"""
+        cursor.execute(
+            f"""
+            WITH agentes AS (
+                SELECT ag.id_agente, ar.nivel,
+                       row_number() OVER (PARTITION BY ag.id_area ORDER BY ag.id_agente) AS rn,
+                       row_number() OVER (ORDER BY ag.id_agente) AS orden
+                FROM agente ag
+                JOIN area ar ON ar.id_area = ag.id_area
+                WHERE ag.id_agente IN ({agentes_sinteticos_sql()})
+            )
+            INSERT INTO agente_rol (id_agente, id_rol, asignado_en)
+            SELECT a.id_agente, r.id_rol, NOW()
+            FROM agentes a
+            JOIN rol r ON r.nombre = CASE
+                WHEN a.orden = 1 THEN 'Administrador'
+                WHEN a.rn = 1 AND a.nivel <= 1 THEN 'Director'
+                WHEN a.rn = 1 THEN 'Jefatura'
+                WHEN mod(a.rn, 10) = 0 THEN 'Agente Avanzado'
+                ELSE 'Agente'
+            END
+            """
+        )
+        if cursor.rowcount == 0:
+            raise CommandError(f'No se encontraron los roles base ({", ".join(ROLES)}). ¿Se cargó 03-seed-data.sql?')
+
+    def _crear_licencias(self, cursor, desde, hasta, anios):
+        """~3 licencias por agente y año, 70% aprobadas"""
+        cursor.execute(
+            f"""
+            INSERT INTO licencia (
+                fecha_desde, fecha_hasta, estado, id_agente, id_tipo_licencia,
+                observaciones, creado_en
+            )
+            SELECT
+                l.inicio,
+                l.inicio + (1 + floor(random() * 10))::int,
+                CASE WHEN l.r < 0.70 THEN 'aprobada' WHEN l.r < 0.85 THEN 'pendiente' ELSE 'rechazada' END,
+                l.id_agente,
+                (SELECT array_agg(id_tipo_licencia) FROM tipo_licencia)[1 + floor(random() * (SELECT COUNT(*) FROM tipo_licencia))::int],
+                'Licencia sintética',
+                l.inicio - 7
+            FROM (
+                SELECT ag.id_agente,
+                       %(desde)s::date + floor(random() * (%(hasta)s::date - %(desde)s::date))::int AS inicio,
+                       random() AS r
+                FROM agente ag
+                CROSS JOIN generate_series(1, %(por_agente)s)
+                WHERE ag.id_agente IN ({agentes_sinteticos_sql()})
+            ) l
+            """,
+            {'desde': desde, 'hasta': hasta, 'por_agente': 3 * anios}
+        )
+
+    def _crear_asistencias(self, cursor, desde, hasta):
+        """Días hábiles hasta ayer; ~5% de ausencias y sin marcar durante licencias aprobadas"""
+        cursor.execute(
+            f"""
+            INSERT INTO asistencia (
+                id_agente, fecha, id_area, hora_entrada, hora_salida, horas_efectivas,
+                marcacion_salida_automatica, creado_en, actualizado_en
+            )
+            SELECT
+                m.id_agente, m.fecha, m.id_area, m.entrada, m.salida,
+                ROUND((EXTRACT(EPOCH FROM (m.salida - m.entrada)) / 3600.0)::numeric, 2),
+                m.automatica,
+                m.fecha + m.entrada,
+                m.fecha + m.salida
+            FROM (
+                SELECT ag.id_agente, d::date AS fecha, ag.id_area,
+                       TIME '07:30' + random() * INTERVAL '75 minutes' AS entrada,
+                       CASE WHEN random() < 0.02 THEN TIME '23:00'
+                            ELSE TIME '15:30' + random() * INTERVAL '90 minutes' END AS salida,
+                       false AS automatica
+                FROM agente ag
+                CROSS JOIN generate_series(%(desde)s::date, %(hasta)s::date - 1, INTERVAL '1 day') AS d
+                WHERE ag.id_agente IN ({agentes_sinteticos_sql()})
+                  AND ag.activo
+                  AND EXTRACT(ISODOW FROM d) < 6
+                  AND random() > 0.05
+                  AND NOT EXISTS (
+                      SELECT 1 FROM licencia l
+                      WHERE l.id_agente = ag.id_agente AND l.estado = 'aprobada'
+                        AND d::date BETWEEN l.fecha_desde AND l.fecha_hasta
+                  )
+            ) m
+            """,
+            {'desde': desde, 'hasta': hasta}
+        )
+        cursor.execute(
+            f"""
+            UPDATE asistencia SET marcacion_salida_automatica = true
+            WHERE hora_salida = TIME '23:00' AND id_agente IN ({agentes_sinteticos_sql()})
+            """
+        )
+
+    def _crear_cronogramas(self, cursor, desde, hasta):
+        """Un cronograma publicado por área y mes, guardias de fin de semana rotativas"""
+        cursor.execute(
+            f"""
+            WITH jefes AS (
+                SELECT DISTINCT ON (ag.id_area) ag.id_area, ag.id_agente
+                FROM agente ag
+                WHERE ag.id_agente IN ({agentes_sinteticos_sql()})
+                ORDER BY ag.id_area, ag.id_agente
+            ), admin AS (
+                SELECT MIN(id_agente) AS id_agente FROM ({agentes_sinteticos_sql()}) s
+            )
+            INSERT INTO cronograma (
+                tipo, hora_inicio, hora_fin, estado, fecha_creacion, fecha_aprobacion,
+                id_jefe, id_director, id_area, anio, mes, fecha_desde, fecha_hasta,
+                creado_por_rol, creado_por_id, aprobado_por_id
+            )
+            SELECT
+                'regular', '08:00', '16:00',
+                CASE WHEN m.mes_inicio < date_trunc('month', %(hasta)s::date) THEN 'publicada' ELSE 'aprobada' END,
+                (m.mes_inicio - INTERVAL '10 days')::date,
+                (m.mes_inicio - INTERVAL '5 days')::date,
+                j.id_agente, admin.id_agente, j.id_area,
+                EXTRACT(YEAR FROM m.mes_inicio)::int, EXTRACT(MONTH FROM m.mes_inicio)::int,
+                m.mes_inicio::date, (m.mes_inicio + INTERVAL '1 month - 1 day')::date,
+                'jefatura', j.id_agente, admin.id_agente
+            FROM jefes j
+            CROSS JOIN admin
+            CROSS JOIN generate_series(%(desde)s::date, %(hasta)s::date, INTERVAL '1 month') AS m(mes_inicio)
+            """,
+            {'desde': desde, 'hasta': hasta}
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO guardia (
+                fecha, hora_inicio, hora_fin, tipo, activa, estado,
+                horas_planificadas, horas_efectivas, id_cronograma, id_agente, creado_en
+            )
+            SELECT
+                d::date, '08:00', '16:00', 'regular', true, 'planificada',
+                8, CASE WHEN d::date < %(hasta)s::date THEN 8 END,
+                c.id_cronograma, ag.id_agente, c.fecha_aprobacion
+            FROM cronograma c
+            JOIN agente ag ON ag.id_area = c.id_area AND ag.activo
+            CROSS JOIN generate_series(c.fecha_desde, c.fecha_hasta, INTERVAL '1 day') AS d
+            WHERE c.id_area IN ({areas_sinteticas_sql()})
+              AND EXTRACT(ISODOW FROM d) >= 6
+              AND (ag.id_agente + EXTRACT(DOY FROM d)::int) %% 4 = 0
+            """,
+            {'hasta': hasta}
+        )
+
+    def _crear_auditoria(self, cursor):
+        """Una fila por asistencia (lo que habría generado el trigger) y por licencia"""
+        cursor.execute(
+            f"""
+            INSERT INTO auditoria (nombre_tabla, pk_afectada, accion, valor_nuevo, id_agente, creado_en)
+            SELECT 'asistencia', a.id_asistencia, 'CREAR',
+                   jsonb_build_object('fecha', a.fecha, 'hora_entrada', a.hora_entrada, 'hora_salida', a.hora_salida),
+                   a.id_agente, a.creado_en
+            FROM asistencia a
+            WHERE a.id_agente IN ({agentes_sinteticos_sql()})
+            """
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO auditoria (nombre_tabla, pk_afectada, accion, valor_nuevo, id_agente, creado_en)
+            SELECT 'licencia', l.id_licencia, 'SOLICITAR_LICENCIA',
+                   jsonb_build_object('fecha_desde', l.fecha_desde, 'fecha_hasta', l.fecha_hasta, 'estado', l.estado),
+                   l.id_agente, l.creado_en
+            FROM licencia l
+            WHERE l.id_agente IN ({agentes_sinteticos_sql()})
+            """
+        )
+
+    # ------------------------------------------------------------------
+    # Limpieza
+    # ------------------------------------------------------------------
+
+    def limpiar(self):
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM guardia WHERE id_cronograma IN ("
+                    f"SELECT id_cronograma FROM cronograma WHERE id_area IN ({areas_sinteticas_sql()}))"
+                )
+                cursor.execute(f"DELETE FROM cronograma WHERE id_area IN ({areas_sinteticas_sql()})")
+                for tabla, columna in TABLAS_POR_AGENTE:
+                    cursor.execute(
+                        f"DELETE FROM {tabla} WHERE {columna} IN ({agentes_sinteticos_sql()})"
+                    )
+                    self._paso(f'{tabla}: {cursor.rowcount} filas eliminadas')
+                cursor.execute(f"DELETE FROM resumen_asistencia_diaria WHERE id_area IN ({areas_sinteticas_sql()})")
+                cursor.execute(f"DELETE FROM agente WHERE id_agente IN ({agentes_sinteticos_sql()})")
+                self._paso(f'agente: {cursor.rowcount} filas eliminadas')
+                # El borrado de la raíz elimina el árbol (ON DELETE CASCADE)
+                cursor.execute(
+                    f"DELETE FROM area WHERE nombre LIKE '{PREFIJO_AREA} %%' AND id_area_padre IS NULL"
+                )
+
+    # ------------------------------------------------------------------
+    # Utilidades
+    # ------------------------------------------------------------------
+
+    def _analizar(self):
+        self._paso('ANALYZE')
+        with connection.cursor() as cursor:
+            for tabla in ('area', 'agente', 'agente_rol', 'asistencia', 'licencia',
+                          'cronograma', 'guardia', 'auditoria'):
+                cursor.execute(f'ANALYZE {tabla}')
+
+    def _titulo(self, texto):
+        self.stdout.write(self.style.HTTP_INFO(f'\n{texto}\n'))
+        self.stdout.write('=' * 60)
+
+    def _paso(self, texto):
+        self.stdout.write(f'  • {texto}')
+
+    def _mostrar_conteos(self, conteos):
+        self.stdout.write(f'\n{"Tabla":<20} {"Filas sintéticas":>18}')
+        self.stdout.write('-' * 40)
+        for tabla, cantidad in conteos.items():
+            self.stdout.write(f'{tabla:<20} {cantidad:>18,}')
@@ -0,0 +1,386 @@
+#!/usr/bin/env python
+"""
+Prueba de carga del pico de inicio de jornada contra un stack levantado.
+
+Cada usuario virtual es un agente del dataset sintético (ver generar_dataset)
+con su propia sesión (cookies reales): hace login, verifica la sesión, consulta
+su estado de asistencia, marca entrada, vuelve a consultar y, opcionalmente,
+sigue consultando con tiempo de espera entre ciclos antes de cerrar sesión.
+
+Los usuarios llegan según un perfil de rampa a lo largo de --duracion segundos.
+Mientras corre, un hilo muestrea pg_stat_activity y pg_locks para reportar
+conexiones usadas y esperas por locks.
+
+Uso:
+    python manage.py generar_dataset --escala mediana
+    python manage.py prueba_carga --url http://localhost:8000 --usuarios 300 --perfil pico --duracion 60
+    python manage.py prueba_carga --usuarios 100 --perfil rafaga --ciclos 3 --salida carga.json
+
+Las marcaciones de hoy de los agentes usados se eliminan al terminar salvo que
+se indique --conservar.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from http.cookiejar import CookieJar
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from asistencia.models import Asistencia
+from asistencia.resumen import recalcular_contadores
+from auditoria.models import Auditoria
+from personas.models import Agente
+
+from .generar_dataset import DOMINIO, PASSWORD
+
+
+def _llegadas_rafaga(n, duracion):
+    """Todos llegan casi a la vez (primeros segundos)"""
+    return [random.uniform(0, min(duracion, 2)) for _ in range(n)]
+
+
+def _llegadas_rampa(n, duracion):
+    """Llegadas uniformes a lo largo de la duración"""
+    return [duracion * i / n for i in range(n)]
+
+
+def _llegadas_escalones(n, duracion, escalones=4):
+    """Bloques de n/escalones usuarios al inicio de cada tramo"""
+    return [duracion * (i * escalones // n) / escalones for i in range(n)]
+
+
+def _llegadas_pico(n, duracion):
+    """Inicio de turno: pocos al principio, la mayoría en el tercio central"""
+    return sorted(min(max(random.triangular(0, duracion, duracion / 2), 0), duracion) for _ in range(n))
+
+
+PERFILES = {
+    'rafaga': _llegadas_rafaga,
+    'rampa': _llegadas_rampa,
+    'escalones': _llegadas_escalones,
+    'pico': _llegadas_pico,
+}
+
+
+def _percentil(valores, p):
+    """Percentil p (0-100) de una lista de latencias"""
+    if not valores:
+        return 0.0
+    if len(valores) == 1:
+        return valores[0]
+    return statistics.quantiles(valores, n=100, method='inclusive')[p - 1]
+
+
+class Resultados:
+    """Latencias y errores por operación, compartidos entre hilos"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+        self.estados = defaultdict(lambda: defaultdict(int))
+        self.activos = 0
+        self.max_activos = 0
+
+    def registrar(self, operacion, ms, estado):
+        with self._lock:
+            self.latencias[operacion].append(ms)
+            self.estados[operacion][estado] += 1
+            if estado == 0 or estado >= 400:
+                self.errores[operacion] += 1
+
+    def usuario(self, delta):
+        with self._lock:
+            self.activos += delta
+            self.max_activos = max(self.max_activos, self.activos)
+
+    def resumen(self, duracion):
+        operaciones = {}
+        for operacion, latencias in self.latencias.items():
+            latencias = sorted(latencias)
+            total = len(latencias)
+            operaciones[operacion] = {
+                'requests': total,
+                'errores': self.errores[operacion],
+                'tasa_error': round(self.errores[operacion] / total, 4) if total else 0.0,
+                'rps': round(total / duracion, 2) if duracion else None,
+                'p50_ms': round(_percentil(latencias, 50), 1),
+                'p95_ms': round(_percentil(latencias, 95), 1),
+                'p99_ms': round(_percentil(latencias, 99), 1),
+                'max_ms': round(latencias[-1], 1) if latencias else 0.0,
+                'estados': {str(k): v for k, v in sorted(self.estados[operacion].items())},
+            }
+        return operaciones
+
+
+class MuestreoDB(threading.Thread):
+    """Muestrea conexiones y esperas por locks de la base mientras dura la prueba"""
+
+    SQL_CONEXIONES = """
+        SELECT count(*),
+               count(*) FILTER (WHERE state = 'active'),
+               count(*) FILTER (WHERE state = 'idle in transaction'),
+               count(*) FILTER (WHERE wait_event_type = 'Lock')
+        FROM pg_stat_activity
+        WHERE datname = current_database() AND pid <> pg_backend_pid()
+    """
+    SQL_LOCKS = "SELECT count(*) FROM pg_locks WHERE NOT granted"
+    SQL_DEADLOCKS = "SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()"
+
+    def __init__(self, intervalo):
+        super().__init__(name='giga-prueba-carga-db', daemon=True)
+        self.intervalo = intervalo
+        self.detener = threading.Event()
+        self.muestras = []
+        self.deadlocks_inicio = None
+        self.deadlocks_fin = None
+        self.error = None
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(self.SQL_DEADLOCKS)
+                self.deadlocks_inicio = cursor.fetchone()[0]
+                while not self.detener.is_set():
+                    cursor.execute(self.SQL_CONEXIONES)
+                    total, activas, idle_tx, esperando = cursor.fetchone()
+                    cursor.execute(self.SQL_LOCKS)
+                    locks = cursor.fetchone()[0]
+                    self.muestras.append((total, activas, idle_tx, esperando, locks))
+                    self.detener.wait(self.intervalo)
+                cursor.execute(self.SQL_DEADLOCKS)
+                self.deadlocks_fin = cursor.fetchone()[0]
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            connection.close()
+
+    def resumen(self):
+        if self.error:
+            return {'error': self.error}
+        if not self.muestras:
+            return {}
+        columnas = list(zip(*self.muestras))
+        total, activas, idle_tx, esperando, locks = columnas
+        return {
+            'muestras': len(self.muestras),
+            'conexiones_max': max(total),
+            'conexiones_media': round(statistics.mean(total), 1),
+            'activas_max': max(activas),
+            'idle_en_transaccion_max': max(idle_tx),
+            'esperando_lock_max': max(esperando),
+            'muestras_con_espera_lock': sum(1 for n in esperando if n),
+            'locks_no_otorgados_max': max(locks),
+            'deadlocks': (
+                self.deadlocks_fin - self.deadlocks_inicio
+                if self.deadlocks_fin is not None and self.deadlocks_inicio is not None else None
+            ),
+        }
+
+
+class UsuarioVirtual:
+    """Sesión HTTP de un agente, con su propio jar de cookies"""
+
+    def __init__(self, base_url, agente, resultados, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.agente = agente
+        self.resultados = resultados
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+    def request(self, operacion, metodo, ruta, datos=None):
+        cuerpo = json.dumps(datos).encode() if datos is not None else None
+        req = urllib.request.Request(
+            self.base_url + ruta, data=cuerpo, method=metodo,
+            headers={'Content-Type': 'application/json', 'Accept': 'application/json'}
+        )
+        inicio = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=self.timeout) as respuesta:
+                respuesta.read()
+                estado = respuesta.status
+        except urllib.error.HTTPError as e:
+            estado = e.code
+        except Exception:
+            estado = 0  # timeout o conexión rechazada
+        self.resultados.registrar(operacion, (time.perf_counter() - inicio) * 1000, estado)
+        return estado
+
+    def jornada(self, marcar, ciclos, pensar):
+        if self.request('login', 'POST', '/api/personas/auth/login/',
+                        {'cuil': self.agente['dni'], 'password': PASSWORD}) != 200:
+            return
+        self.request('check_session', 'GET', '/api/personas/auth/check-session/')
+        self.request('estado_asistencia', 'GET', '/api/asistencia/estado/')
+        if marcar:
+            self.request('marcar_asistencia', 'POST', '/api/asistencia/marcar/', {'dni': self.agente['dni']})
+            self.request('estado_asistencia', 'GET', '/api/asistencia/estado/')
+        for _ in range(ciclos):
+            time.sleep(random.uniform(pensar / 2, pensar * 1.5))
+            self.request('check_session', 'GET', '/api/personas/auth/check-session/')
+            self.request('estado_asistencia', 'GET', '/api/asistencia/estado/')
+        self.request('logout', 'POST', '/api/personas/auth/logout/')
+
+
+class Command(BaseCommand):
+    help = 'Prueba de carga del pico de login y marcación contra un servidor levantado'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', type=str, default='http://localhost:8000', help='URL base del backend')
+        parser.add_argument('--usuarios', type=int, default=100, help='Usuarios virtuales (agentes sintéticos)')
+        parser.add_argument(
+            '--perfil', choices=sorted(PERFILES), default='pico',
+            help='Perfil de llegada de los usuarios'
+        )
+        parser.add_argument('--duracion', type=float, default=60, help='Segundos en los que llegan los usuarios')
+        parser.add_argument('--ciclos', type=int, default=0, help='Consultas extra por usuario tras marcar')
+        parser.add_argument('--pensar', type=float, default=5, help='Segundos de espera media entre ciclos')
+        parser.add_argument('--sin-marcar', action='store_true', help='No marcar asistencia (solo sesión y estado)')
+        parser.add_argument('--timeout', type=float, default=30, help='Timeout por request en segundos')
+        parser.add_argument('--muestreo', type=float, default=0.5, help='Intervalo de muestreo de la base (s)')
+        parser.add_argument('--sin-db', action='store_true', help='No muestrear la base de datos')
+        parser.add_argument('--semilla', type=int, default=1, help='Semilla de aleatoriedad')
+        parser.add_argument('--salida', type=str, help='Archivo JSON con los resultados')
+        parser.add_argument('--conservar', action='store_true', help='No eliminar las marcaciones generadas')
+
+    def handle(self, *args, **options):
+        if options['usuarios'] < 1 or options['duracion'] < 0:
+            raise CommandError('--usuarios debe ser positivo y --duracion no negativa')
+        random.seed(options['semilla'])
+
+        agentes = list(
+            Agente.objects.filter(email__endswith=f'@{DOMINIO}', activo=True)
+            .order_by('id_agente')
+            .values('id_agente', 'dni')[:options['usuarios']]
+        )
+        if len(agentes) < options['usuarios']:
+            raise CommandError(
+                f'Solo hay {len(agentes)} agentes sintéticos activos; '
+                f'genere un dataset más grande (generar_dataset --agentes N)'
+            )
+
+        hoy = date.today()
+        marcar = not options['sin_marcar']
+        if marcar and Asistencia.objects.filter(
+            fecha=hoy, id_agente_id__in=[a['id_agente'] for a in agentes]
+        ).exists():
+            raise CommandError('Los agentes sintéticos ya tienen marcaciones hoy; ejecute la limpieza o use --sin-marcar')
+
+        llegadas = PERFILES[options['perfil']](len(agentes), options['duracion'])
+        random.shuffle(agentes)
+
+        self.stdout.write(self.style.HTTP_INFO('\n🚦 PRUEBA DE CARGA - PICO DE INICIO DE JORNADA\n'))
+        self.stdout.write('=' * 80)
+        self.stdout.write(
+            f'URL: {options["url"]}  usuarios: {len(agentes)}  perfil: {options["perfil"]}  '
+            f'duración: {options["duracion"]}s  ciclos: {options["ciclos"]}'
+        )
+
+        resultados = Resultados()
+        muestreo = None
+        if not options['sin_db']:
+            muestreo = MuestreoDB(options['muestreo'])
+            muestreo.start()
+
+        inicio = time.perf_counter()
+        hilos = []
+        try:
+            for agente, llegada in sorted(zip(agentes, llegadas), key=lambda par: par[1]):
+                espera = llegada - (time.perf_counter() - inicio)
+                if espera > 0:
+                    time.sleep(espera)
+                hilo = threading.Thread(
+                    target=self._ejecutar_usuario,
+                    args=(UsuarioVirtual(options['url'], agente, resultados, options['timeout']),
+                          marcar, options['ciclos'], options['pensar'], resultados),
+                    daemon=True,
+                )
+                hilo.start()
+                hilos.append(hilo)
+            for hilo in hilos:
+                hilo.join()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('\n⚠️  Interrumpido: se reportan los resultados parciales'))
+        finally:
+            duracion_real = time.perf_counter() - inicio
+            if muestreo:
+                muestreo.detener.set()
+                muestreo.join()
+
+        reporte = {
+            'generado_en': datetime.now().isoformat(timespec='seconds'),
+            'parametros': {
+                clave: options[clave]
+                for clave in ('url', 'usuarios', 'perfil', 'duracion', 'ciclos', 'pensar', 'semilla')
+            },
+            'duracion_s': round(duracion_real, 1),
+            'usuarios_simultaneos_max': resultados.max_activos,
+            'operaciones': resultados.resumen(duracion_real),
+            'base_de_datos': muestreo.resumen() if muestreo else None,
+        }
+        self._mostrar(reporte)
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f'\n✅ Resultados guardados en {options["salida"]}'))
+
+        if marcar and not options['conservar']:
+            eliminadas = self._limpiar(hoy, [a['id_agente'] for a in agentes])
+            self.stdout.write(f'🧹 Marcaciones de prueba eliminadas: {eliminadas}')
+
+    def _ejecutar_usuario(self, usuario, marcar, ciclos, pensar, resultados):
+        resultados.usuario(1)
+        try:
+            usuario.jornada(marcar, ciclos, pensar)
+        finally:
+            resultados.usuario(-1)
+
+    def _mostrar(self, reporte):
+        self.stdout.write(self.style.HTTP_INFO(f'\n📊 RESULTADOS ({reporte["duracion_s"]}s, '
+                                               f'{reporte["usuarios_simultaneos_max"]} usuarios simultáneos máx.)'))
+        self.stdout.write('-' * 80)
+        self.stdout.write(
+            f'{"Operación":<20}{"req":>7}{"err %":>8}{"rps":>8}{"p50":>9}{"p95":>9}{"p99":>9}{"max":>9}'
+        )
+        for operacion, datos in reporte['operaciones'].items():
+            linea = (
+                f'{operacion:<20}{datos["requests"]:>7}{datos["tasa_error"] * 100:>7.1f}%'
+                f'{datos["rps"] or 0:>8.1f}{datos["p50_ms"]:>9.1f}{datos["p95_ms"]:>9.1f}'
+                f'{datos["p99_ms"]:>9.1f}{datos["max_ms"]:>9.1f}'
+            )
+            self.stdout.write(self.style.ERROR(linea) if datos['errores'] else linea)
+
+        db = reporte['base_de_datos']
+        if db is None:
+            return
+        self.stdout.write(self.style.HTTP_INFO('\n🗄️  BASE DE DATOS'))
+        self.stdout.write('-' * 80)
+        if 'error' in db:
+            self.stdout.write(self.style.WARNING(f'No se pudo muestrear: {db["error"]}'))
+            return
+        for clave, valor in db.items():
+            self.stdout.write(f'{clave:<28}{valor}')
+
+    def _limpiar(self, fecha, ids_agentes):
+        """Elimina las asistencias de hoy de los agentes usados y su auditoría"""
+        # La auditoría de las marcaciones se escribe en diferido desde el servidor
+        time.sleep(2)
+        ids_asistencias = list(
+            Asistencia.objects.filter(fecha=fecha, id_agente_id__in=ids_agentes)
+            .values_list('id_asistencia', flat=True)
+        )
+        if not ids_asistencias:
+            return 0
+        with transaction.atomic():
+            Auditoria.objects.filter(nombre_tabla='asistencia', pk_afectada__in=ids_asistencias).delete()
+            eliminadas, _ = Asistencia.objects.filter(id_asistencia__in=ids_asistencias).delete()
+            recalcular_contadores(fecha)
+        return eliminadas
@@ -1,11 +1,13 @@
 from django.db import models
+from django.utils import timezone
 
 
 class Auditoria(models.Model):
     id_auditoria = models.BigAutoField(primary_key=True)
     pk_afectada = models.BigIntegerField(blank=True, null=True)
     nombre_tabla = models.CharField(max_length=100, blank=True, null=True)
-    creado_en = models.DateTimeField(blank=True, null=True)
+    # Clave de partición (NOT NULL en la tabla particionada)
+    creado_en = models.DateTimeField(default=timezone.now)
     valor_previo = models.JSONField(blank=True, null=True)
     valor_nuevo = models.JSONField(blank=True, null=True)
     accion = models.CharField(max_length=50)
@@ -1,3 +1,32 @@
-from django.test import TestCase
+from django.db import transaction
+from django.test import TransactionTestCase
 
-# Create your tests here.
+from .buffer import encolar_auditoria
+from .models import Auditoria
+
+
+class EncolarAuditoriaTransaccionTests(TransactionTestCase):
+    """La auditoría encolada sigue el destino de su transacción y savepoint"""
+
+    def acciones(self):
+        return sorted(Auditoria.objects.values_list('accion', flat=True))
+
+    def test_savepoint_revertido_descarta_sus_registros(self):
+        with transaction.atomic():
+            encolar_auditoria('prueba', 'EXTERNA')
+            try:
+                with transaction.atomic():
+                    encolar_auditoria('prueba', 'REVERTIDA')
+                    raise ValueError
+            except ValueError:
+                pass
+            with transaction.atomic():
+                encolar_auditoria('prueba', 'INTERNA')
+            encolar_auditoria('prueba', 'FINAL')
+        self.assertEqual(self.acciones(), ['EXTERNA', 'FINAL', 'INTERNA'])
+
+    def test_transaccion_revertida_descarta_todo(self):
+        with transaction.atomic():
+            encolar_auditoria('prueba', 'REVERTIDA')
+            transaction.set_rollback(True)
+        self.assertEqual(self.acciones(), [])
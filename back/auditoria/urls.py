@@ -7,7 +7,8 @@ from .views import (
     AuditoriaViewSet, 
     registros_auditoria,
     log_unauthorized_access,
-    log_successful_access
+    log_successful_access,
+    requests_lentos_view
 )
 
 # Router para las APIs REST
@@ -19,4 +20,5 @@ urlpatterns = [
     path('registros/', registros_auditoria, name='registros_auditoria'),
     path('log-unauthorized/', log_unauthorized_access, name='log_unauthorized_access'),
     path('log-access/', log_successful_access, name='log_successful_access'),
+    path('rendimiento/lentos/', requests_lentos_view, name='requests_lentos'),
 ]
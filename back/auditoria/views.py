@@ -1,4 +1,7 @@
+from datetime import datetime, timedelta
+
 from rest_framework import viewsets
+from rest_framework.exceptions import ValidationError
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
@@ -8,7 +11,25 @@ from .models import Auditoria
 from .serializers import AuditoriaSerializer
 
 # RBAC Permissions
-from common.permissions import IsAuthenticatedGIGA
+from common.permissions import IsAuthenticatedGIGA, IsAdministrador
+from common.monitor_sql import requests_lentos
+
+
+def _rango_creado_en(fecha_desde, fecha_hasta):
+    """
+    Filtros ?fecha_desde=/?fecha_hasta= (AAAA-MM-DD, inclusivos) como rango
+    semiabierto sobre creado_en. Un filtro __date aplica una función sobre la
+    columna y Postgres no puede descartar particiones ni usar los índices.
+    """
+    filtros = {}
+    try:
+        if fecha_desde:
+            filtros['creado_en__gte'] = datetime.strptime(fecha_desde, '%Y-%m-%d')
+        if fecha_hasta:
+            filtros['creado_en__lt'] = datetime.strptime(fecha_hasta, '%Y-%m-%d') + timedelta(days=1)
+    except ValueError:
+        raise ValidationError({'fecha': 'Formato de fecha inválido (AAAA-MM-DD)'})
+    return filtros
 
 
 class AuditoriaViewSet(viewsets.ReadOnlyModelViewSet):
@@ -28,11 +49,8 @@ class AuditoriaViewSet(viewsets.ReadOnlyModelViewSet):
         tabla = self.request.query_params.get('tabla')
         agente_id = self.request.query_params.get('agente')
         
-        if fecha_desde:
-            queryset = queryset.filter(creado_en__date__gte=fecha_desde)
-        
-        if fecha_hasta:
-            queryset = queryset.filter(creado_en__date__lte=fecha_hasta)
+        # Rango sobre creado_en (no __date): permite leer solo las particiones mensuales involucradas
+        queryset = queryset.filter(**_rango_creado_en(fecha_desde, fecha_hasta))
             
         if accion:
             queryset = queryset.filter(accion__icontains=accion)
@@ -108,11 +126,8 @@ def registros_auditoria(request):
         accion = request.query_params.get('accion')
         tabla = request.query_params.get('tabla')
         
-        if fecha_desde:
-            registros = registros.filter(creado_en__date__gte=fecha_desde)
-        
-        if fecha_hasta:
-            registros = registros.filter(creado_en__date__lte=fecha_hasta)
+        # Rango sobre creado_en (no __date): permite leer solo las particiones mensuales involucradas
+        registros = registros.filter(**_rango_creado_en(fecha_desde, fecha_hasta))
             
         if accion:
             registros = registros.filter(accion__icontains=accion)
@@ -237,3 +252,30 @@ def log_successful_access(request):
             'success': False,
             'message': f'Error al registrar auditoría: {str(e)}'
         }, status=500)
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdministrador])
+def requests_lentos_view(request):
+    """
+    Requests lentos registrados por el monitor SQL en este proceso
+    (SQL completo, tiempos y origen de cada consulta).
+    GET lista (más recientes primero, ?limite=N); DELETE vacía el buffer.
+    """
+    if request.method == 'DELETE':
+        requests_lentos.limpiar()
+        return Response({'success': True, 'message': 'Buffer de requests lentos vaciado'})
+
+    items = requests_lentos.listar()
+    try:
+        limite = int(request.query_params.get('limite', len(items)))
+    except ValueError:
+        limite = len(items)
+
+    return Response({
+        'success': True,
+        'data': {
+            'count': len(items),
+            'results': items[:max(limite, 0)]
+        }
+    })
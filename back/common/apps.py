@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class CommonConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "common"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from .metricas import conexion_creada
+        from .signals import conectar_invalidaciones
+        conectar_invalidaciones()
+        connection_created.connect(conexion_creada, dispatch_uid='giga_metricas_conexion')
@@ -0,0 +1,506 @@
+"""
+Archivado por lotes reanudable - Sistema GIGA
+
+Mueve filas antiguas a su tabla de archivo en lotes acotados, avanzando por
+clave primaria. Cada lote (insertar en el archivo + borrar del original +
+actualizar el punto de control) es una transacción corta, de modo que:
+
+- no hay una única transacción gigante (picos de WAL, locks largos, bloat),
+- si el proceso se interrumpe, la próxima ejecución retoma desde el último
+  lote confirmado con la misma fecha de corte (tabla archivado_progreso),
+- entre lotes se hace una pausa para no competir con el tráfico normal.
+
+Al terminar se ejecuta VACUUM (ANALYZE) sobre la tabla origen y ANALYZE sobre
+el archivo. No se cuenta de antemano (solo en dry_run).
+
+Uso:
+    from common.archivado import archivar_por_lotes
+    resultado = archivar_por_lotes('auditoria', meses=6)
+
+Cuando auditoria está particionada por mes (15-auditoria-particionada.sql)
+las particiones completas se archivan desacoplándolas, sin mover filas
+(desacoplar_particiones_auditoria). Por lotes solo se archiva la partición
+auditoria_historico (la tabla anterior a la conversión), hasta que su rango
+entero queda fuera de la retención y también se desacopla.
+
+Las tablas sin archivo (notificaciones) se purgan con el mismo mecanismo de
+lotes y puntos de control (purgar_por_lotes, ver PURGAS).
+"""
+
+import time
+import logging
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_COLUMNAS_AUDITORIA = [
+    'id_auditoria', 'pk_afectada', 'nombre_tabla', 'creado_en', 'valor_previo',
+    'valor_nuevo', 'accion', 'id_agente',
+]
+
+DEFINICIONES = {
+    'auditoria': {
+        'tabla': 'auditoria',
+        'archivo': 'auditoria_archivo',
+        'pk': 'id_auditoria',
+        'columnas': _COLUMNAS_AUDITORIA,
+        'filtro': 'creado_en < %(corte)s',
+    },
+    # Con auditoria particionada: filas previas a la conversión (ver más abajo)
+    'auditoria_historico': {
+        'tabla': 'auditoria_historico',
+        'archivo': 'auditoria_archivo',
+        'pk': 'id_auditoria',
+        'columnas': _COLUMNAS_AUDITORIA,
+        'filtro': 'creado_en < %(corte)s',
+    },
+    'incidencia': {
+        'tabla': 'incidencia',
+        'archivo': 'incidencia_archivo',
+        'pk': 'id',
+        'columnas': [
+            'id', 'numero', 'titulo', 'descripcion', 'estado', 'prioridad', 'creado_por',
+            'asignado_a', 'area_involucrada', 'fecha_creacion', 'fecha_asignacion',
+            'fecha_resolucion', 'resolucion', 'comentarios_seguimiento', 'creado_en', 'actualizado_en',
+        ],
+        'filtro': "estado IN ('cerrada', 'resuelta') AND fecha_resolucion < %(corte)s",
+    },
+}
+
+REINTENTOS_LOCK = 3
+
+
+class ArchivadoEnCurso(Exception):
+    """Otro proceso está archivando la misma tabla"""
+
+
+def _sql_lote(definicion):
+    pk = definicion['pk']
+    columnas = ', '.join(definicion['columnas'])
+    origen = ', '.join(f't.{columna}' for columna in definicion['columnas'])
+    return f"""
+        WITH lote AS (
+            SELECT {pk} FROM {definicion['tabla']}
+            WHERE {pk} > %(desde)s AND {definicion['filtro']}
+            ORDER BY {pk}
+            LIMIT %(limite)s
+        ), movidas AS (
+            INSERT INTO {definicion['archivo']} ({columnas})
+            SELECT {origen} FROM {definicion['tabla']} t JOIN lote l ON l.{pk} = t.{pk}
+            ON CONFLICT ({pk}) DO NOTHING
+            RETURNING 1
+        ), borradas AS (
+            DELETE FROM {definicion['tabla']} t USING lote l
+            WHERE t.{pk} = l.{pk}
+            RETURNING t.{pk}
+        )
+        SELECT (SELECT COUNT(*) FROM movidas), COUNT(*), MAX({pk}) FROM borradas
+    """
+
+
+def _leer_progreso(cursor, clave):
+    cursor.execute("""
+        SELECT fecha_corte, ultimo_id, archivados, eliminados, lotes, estado
+        FROM archivado_progreso WHERE clave = %s
+    """, [clave])
+    fila = cursor.fetchone()
+    if not fila:
+        return None
+    return dict(zip(('fecha_corte', 'ultimo_id', 'archivados', 'eliminados', 'lotes', 'estado'), fila))
+
+
+def _iniciar_progreso(cursor, clave, corte):
+    cursor.execute("""
+        INSERT INTO archivado_progreso (clave, fecha_corte, ultimo_id, archivados, eliminados, lotes,
+                                        estado, iniciado_en, actualizado_en, finalizado_en, error)
+        VALUES (%s, %s, 0, 0, 0, 0, 'en_curso', %s, %s, NULL, NULL)
+        ON CONFLICT (clave) DO UPDATE SET
+            fecha_corte = EXCLUDED.fecha_corte, ultimo_id = 0, archivados = 0, eliminados = 0,
+            lotes = 0, estado = 'en_curso', iniciado_en = EXCLUDED.iniciado_en,
+            actualizado_en = EXCLUDED.actualizado_en, finalizado_en = NULL, error = NULL
+    """, [clave, corte, timezone.now(), timezone.now()])
+
+
+def _finalizar_progreso(clave, estado, error=None):
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            UPDATE archivado_progreso
+            SET estado = %s, error = %s, actualizado_en = %s,
+                finalizado_en = CASE WHEN %s = 'completado' THEN %s ELSE finalizado_en END
+            WHERE clave = %s
+        """, [estado, error, timezone.now(), estado, timezone.now(), clave])
+
+
+def _ejecutar_lote(sql, clave, parametros, lock_timeout_ms):
+    """Un lote: mover, borrar y avanzar el punto de control en la misma transacción"""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"SET LOCAL lock_timeout = '{int(lock_timeout_ms)}ms'")
+            cursor.execute(sql, parametros)
+            archivados, eliminados, ultimo = cursor.fetchone()
+            if eliminados:
+                cursor.execute("""
+                    UPDATE archivado_progreso
+                    SET ultimo_id = %s, archivados = archivados + %s, eliminados = eliminados + %s,
+                        lotes = lotes + 1, actualizado_en = %s
+                    WHERE clave = %s
+                """, [ultimo, archivados, eliminados, timezone.now(), clave])
+    return archivados, eliminados, ultimo
+
+
+def _tomar_lock(clave):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(hashtext('giga'), hashtext(%s))", [f'archivado.{clave}'])
+        if not cursor.fetchone()[0]:
+            raise ArchivadoEnCurso(f'Ya hay un archivado de {clave} en ejecución')
+
+
+def _liberar_lock(clave):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext('giga'), hashtext(%s))", [f'archivado.{clave}'])
+    except Exception:
+        # Sin conexión el lock ya se liberó con la sesión
+        logger.warning(f'archivado {clave}: no se pudo liberar el advisory lock')
+
+
+def contar_candidatas(clave, meses):
+    """Conteo explícito (recorre la tabla): solo para dry-run o diagnóstico"""
+    definicion = DEFINICIONES[clave]
+    corte = timezone.now() - relativedelta(months=meses)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {definicion['tabla']} WHERE {definicion['filtro']}",
+            {'corte': corte}
+        )
+        return cursor.fetchone()[0]
+
+
+def archivar_por_lotes(clave, meses, tamano_lote=None, pausa=None, max_lotes=None,
+                       reiniciar=False, vacuum=True, progreso=None):
+    """
+    Archiva las filas de DEFINICIONES[clave] más antiguas que `meses`.
+
+    - Si hay una ejecución interrumpida ('en_curso' o 'error') se reanuda desde su
+      último lote con su fecha de corte original, salvo reiniciar=True.
+    - max_lotes limita los lotes de esta llamada (el resto queda para la próxima).
+    - progreso(dict) se llama después de cada lote.
+
+    Retorna dict con archivados, eliminados, lotes, reanudado, completado,
+    fecha_corte, ultimo_id, vacuum y duracion_ms (acumulados de la ejecución).
+    Lanza ArchivadoEnCurso si otro proceso está archivando la misma tabla.
+    """
+    definicion = DEFINICIONES[clave]
+    tamano_lote = tamano_lote or getattr(settings, 'ARCHIVADO_TAMANO_LOTE', 5000)
+    pausa = getattr(settings, 'ARCHIVADO_PAUSA', 0.2) if pausa is None else pausa
+    lock_timeout_ms = getattr(settings, 'ARCHIVADO_LOCK_TIMEOUT_MS', 5000)
+    sql = _sql_lote(definicion)
+    inicio = time.monotonic()
+
+    _tomar_lock(clave)
+
+    try:
+        with connection.cursor() as cursor:
+            estado = _leer_progreso(cursor, clave)
+            reanudado = bool(estado) and estado['estado'] != 'completado' and not reiniciar
+            if not reanudado:
+                _iniciar_progreso(cursor, clave, timezone.now() - relativedelta(months=meses))
+            estado = _leer_progreso(cursor, clave)
+
+        corte = estado['fecha_corte']
+        desde = estado['ultimo_id']
+        if reanudado:
+            logger.info(
+                f'archivado {clave}: reanudando desde {definicion["pk"]} > {desde} '
+                f'(corte {corte}, {estado["eliminados"]} filas ya movidas)'
+            )
+
+        lotes_llamada = 0
+        completado = False
+        reintentos = 0
+        while max_lotes is None or lotes_llamada < max_lotes:
+            inicio_lote = time.monotonic()
+            try:
+                archivados, eliminados, ultimo = _ejecutar_lote(
+                    sql, clave, {'desde': desde, 'corte': corte, 'limite': tamano_lote}, lock_timeout_ms
+                )
+            except OperationalError as e:
+                # lock_timeout: otro proceso tiene filas del lote; reintentar tras una pausa
+                reintentos += 1
+                if reintentos > REINTENTOS_LOCK:
+                    raise
+                logger.warning(f'archivado {clave}: lote en espera de locks ({e}), reintento {reintentos}')
+                time.sleep(max(pausa, 1) * reintentos)
+                continue
+
+            reintentos = 0
+            if not eliminados:
+                completado = True
+                break
+
+            lotes_llamada += 1
+            desde = ultimo
+            estado['archivados'] += archivados
+            estado['eliminados'] += eliminados
+            estado['lotes'] += 1
+
+            if progreso:
+                progreso({
+                    'clave': clave,
+                    'lote': estado['lotes'],
+                    'filas_lote': eliminados,
+                    'eliminados': estado['eliminados'],
+                    'archivados': estado['archivados'],
+                    'ultimo_id': ultimo,
+                    'lote_ms': int((time.monotonic() - inicio_lote) * 1000),
+                })
+            if estado['lotes'] % 20 == 0:
+                logger.info(f'archivado {clave}: {estado["eliminados"]} filas en {estado["lotes"]} lotes')
+
+            if eliminados < tamano_lote:
+                completado = True
+                break
+            if pausa:
+                time.sleep(pausa)
+
+        if completado:
+            _finalizar_progreso(clave, 'completado')
+
+        vacuum_ejecutado = False
+        if completado and vacuum and estado['eliminados']:
+            if connection.in_atomic_block:
+                logger.warning(f'archivado {clave}: VACUUM omitido (no puede ejecutarse dentro de una transacción)')
+            else:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"VACUUM (ANALYZE) {definicion['tabla']}")
+                    cursor.execute(f"ANALYZE {definicion['archivo']}")
+                vacuum_ejecutado = True
+
+
+        return {
+            'archivados': estado['archivados'],
+            'eliminados': estado['eliminados'],
+            'lotes': estado['lotes'],
+            'reanudado': reanudado,
+            'completado': completado,
+            'fecha_corte': str(corte),
+            'ultimo_id': desde,
+            'vacuum': vacuum_ejecutado,
+            'duracion_ms': int((time.monotonic() - inicio) * 1000),
+        }
+    except Exception as e:
+        try:
+            _finalizar_progreso(clave, 'error', str(e))
+        except Exception:
+            logger.exception(f'archivado {clave}: no se pudo registrar el error')
+        raise
+    finally:
+        _liberar_lock(clave)
+
+
+# -- Purga por lotes (sin tabla de archivo) ----------------------------------
+#
+# Mismo esquema de lotes por clave primaria y puntos de control que el
+# archivado, pero las filas se borran sin copiarlas. Cada tabla tiene varias
+# retenciones en días (por ejemplo, notificaciones leídas y no leídas); en
+# archivado_progreso.fecha_corte se guarda el instante de referencia de la
+# ejecución y cada corte es referencia - días, así una purga reanudada usa
+# los mismos cortes.
+
+PURGAS = {
+    'notificacion': {
+        'tabla': 'notificacion',
+        'pk': 'id',
+        'fecha': 'fecha_creacion',
+        'filtro': (
+            '(leida AND fecha_creacion < %(corte_leidas)s)'
+            ' OR (NOT leida AND fecha_creacion < %(corte_no_leidas)s)'
+        ),
+    },
+    # Las lecturas (notificacion_difusion_lectura) se borran en cascada
+    'notificacion_difusion': {
+        'tabla': 'notificacion_difusion',
+        'pk': 'id',
+        'fecha': 'fecha_creacion',
+        'filtro': 'fecha_creacion < %(corte_no_leidas)s',
+    },
+}
+
+
+def _sql_purga(definicion):
+    pk = definicion['pk']
+    return f"""
+        WITH lote AS (
+            SELECT {pk} FROM {definicion['tabla']}
+            WHERE {pk} > %(desde)s AND {pk} <= %(tope)s AND ({definicion['filtro']})
+            ORDER BY {pk}
+            LIMIT %(limite)s
+        ), borradas AS (
+            DELETE FROM {definicion['tabla']} t USING lote l
+            WHERE t.{pk} = l.{pk}
+            RETURNING t.{pk}
+        )
+        SELECT 0, COUNT(*), MAX({pk}) FROM borradas
+    """
+
+
+def _cortes(referencia, dias):
+    return {f'corte_{nombre}': referencia - timedelta(days=cantidad) for nombre, cantidad in dias.items()}
+
+
+def _tope_purga(definicion, cortes):
+    """
+    Mayor clave primaria anterior al corte más reciente (por el índice de
+    fecha): los lotes no recorren las filas nuevas, que nunca se purgan.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {definicion['pk']} FROM {definicion['tabla']} "
+            f"WHERE {definicion['fecha']} < %s ORDER BY {definicion['fecha']} DESC LIMIT 1",
+            [max(cortes.values())]
+        )
+        fila = cursor.fetchone()
+        return fila[0] if fila else None
+
+
+def contar_candidatas_purga(clave, dias):
+    """Conteo explícito (recorre la tabla): solo para dry-run o diagnóstico"""
+    definicion = PURGAS[clave]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {definicion['tabla']} WHERE {definicion['filtro']}",
+            _cortes(timezone.now(), dias)
+        )
+        return cursor.fetchone()[0]
+
+
+def purgar_por_lotes(clave, dias, tamano_lote=None, pausa=None, max_lotes=None,
+                     reiniciar=False, vacuum=True):
+    """
+    Borra por lotes las filas de PURGAS[clave] fuera de retención.
+    `dias` da la retención de cada corte del filtro, p. ej.
+    {'leidas': 90, 'no_leidas': 365}. Reanudación, max_lotes y resultado
+    como en archivar_por_lotes (archivados siempre es 0).
+    """
+    definicion = PURGAS[clave]
+    tamano_lote = tamano_lote or getattr(settings, 'ARCHIVADO_TAMANO_LOTE', 5000)
+    pausa = getattr(settings, 'ARCHIVADO_PAUSA', 0.2) if pausa is None else pausa
+    lock_timeout_ms = getattr(settings, 'ARCHIVADO_LOCK_TIMEOUT_MS', 5000)
+    sql = _sql_purga(definicion)
+    inicio = time.monotonic()
+
+    _tomar_lock(clave)
+    try:
+        with connection.cursor() as cursor:
+            estado = _leer_progreso(cursor, clave)
+            reanudado = bool(estado) and estado['estado'] != 'completado' and not reiniciar
+            if not reanudado:
+                _iniciar_progreso(cursor, clave, timezone.now())
+            estado = _leer_progreso(cursor, clave)
+
+        referencia = estado['fecha_corte']
+        cortes = _cortes(referencia, dias)
+        desde = estado['ultimo_id']
+        tope = _tope_purga(definicion, cortes)
+
+        lotes_llamada = 0
+        completado = tope is None or tope <= desde
+        reintentos = 0
+        while not completado and (max_lotes is None or lotes_llamada < max_lotes):
+            parametros = {'desde': desde, 'tope': tope, 'limite': tamano_lote, **cortes}
+            try:
+                _, eliminados, ultimo = _ejecutar_lote(sql, clave, parametros, lock_timeout_ms)
+            except OperationalError as e:
+                reintentos += 1
+                if reintentos > REINTENTOS_LOCK:
+                    raise
+                logger.warning(f'purga {clave}: lote en espera de locks ({e}), reintento {reintentos}')
+                time.sleep(max(pausa, 1) * reintentos)
+                continue
+
+            reintentos = 0
+            if eliminados:
+                lotes_llamada += 1
+                desde = ultimo
+                estado['eliminados'] += eliminados
+                estado['lotes'] += 1
+                if estado['lotes'] % 20 == 0:
+                    logger.info(f'purga {clave}: {estado["eliminados"]} filas en {estado["lotes"]} lotes')
+            if eliminados < tamano_lote:
+                completado = True
+            elif pausa:
+                time.sleep(pausa)
+
+        if completado:
+            _finalizar_progreso(clave, 'completado')
+
+        vacuum_ejecutado = False
+        if completado and vacuum and estado['eliminados'] and not connection.in_atomic_block:
+            with connection.cursor() as cursor:
+                cursor.execute(f"VACUUM (ANALYZE) {definicion['tabla']}")
+            vacuum_ejecutado = True
+
+        return {
+            'archivados': 0,
+            'eliminados': estado['eliminados'],
+            'lotes': estado['lotes'],
+            'reanudado': reanudado,
+            'completado': completado,
+            'fecha_corte': str(referencia),
+            'ultimo_id': desde,
+            'vacuum': vacuum_ejecutado,
+            'duracion_ms': int((time.monotonic() - inicio) * 1000),
+        }
+    except Exception as e:
+        try:
+            _finalizar_progreso(clave, 'error', str(e))
+        except Exception:
+            logger.exception(f'purga {clave}: no se pudo registrar el error')
+        raise
+    finally:
+        _liberar_lock(clave)
+
+
+# -- Auditoría particionada -------------------------------------------------
+
+def tabla_existe(tabla):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [f'public.{tabla}'])
+        return cursor.fetchone()[0]
+
+
+def auditoria_particionada():
+    """True si auditoria ya es una tabla particionada (relkind 'p')"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('public.auditoria')")
+        fila = cursor.fetchone()
+        return bool(fila and fila[0])
+
+
+def crear_particiones_auditoria(meses_adelante=3):
+    """Crea las particiones mensuales faltantes; retorna los nombres creados"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT crear_particiones_auditoria(%s)", [meses_adelante])
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def desacoplar_particiones_auditoria(meses, solo_listar=False):
+    """
+    Desacopla las particiones cuyo rango entero es anterior a `meses` y las
+    mueve al esquema archivo. Con solo_listar=True únicamente las informa.
+    Retorna lista de dicts (particion, hasta, filas_estimadas).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT particion, hasta, filas_estimadas FROM desacoplar_particiones_auditoria(%s, %s)",
+            [meses, solo_listar]
+        )
+        return [
+            {'particion': particion, 'hasta': str(hasta), 'filas_estimadas': filas}
+            for particion, hasta, filas in cursor.fetchall()
+        ]
@@ -0,0 +1,178 @@
+"""
+Caché de aplicación - Sistema GIGA
+
+Capa de caché para datos de referencia que cambian poco (roles, áreas, feriados,
+tipos de licencia, parámetros de área y reglas de plus).
+
+- Claves con espacio de nombres y versión: giga:<espacio>:v<versión>:<partes>
+- Invalidar un espacio incrementa su versión; las entradas anteriores quedan
+  inaccesibles y expiran solas. La invalidación se dispara desde los signals
+  post_save/post_delete de los modelos (ver common/signals.py).
+- Backend: el alias 'default' de CACHES (memoria local por proceso, o Redis
+  compartido si se configura REDIS_URL).
+- Estadísticas de aciertos/fallos por espacio de nombres en el proceso.
+
+Uso:
+    from common.cache import cache_app, cacheado
+
+    @cacheado('roles', ttl=600)
+    def roles_ordenados():
+        return list(Rol.objects.order_by('nombre').values('id_rol', 'nombre'))
+"""
+
+from collections import defaultdict
+from functools import wraps
+import hashlib
+import threading
+import time
+import logging
+
+from django.core.cache import caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+PREFIJO = 'giga'
+TTL_DEFECTO = 300
+
+_AUSENTE = object()
+
+
+class CacheAplicacion:
+    """Caché con espacios de nombres versionados e invalidación explícita"""
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {'hits': 0, 'misses': 0, 'invalidaciones': 0})
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    # -- Claves y versiones ----------------------------------------------
+
+    def _clave_version(self, espacio):
+        return f'{PREFIJO}:{espacio}:version'
+
+    def version(self, espacio):
+        """Versión vigente del espacio de nombres"""
+        clave = self._clave_version(espacio)
+        version = self.backend.get(clave)
+        if version is None:
+            # Base temporal: si la clave de versión se pierde (desalojo o reinicio
+            # del backend) nunca se reutiliza una versión anterior
+            version = int(time.time() * 1000)
+            if not self.backend.add(clave, version, timeout=None):
+                version = self.backend.get(clave, version)
+        return version
+
+    def clave(self, espacio, *partes):
+        """Clave completa para las partes dadas dentro del espacio"""
+        crudo = ':'.join(str(parte) for parte in partes)
+        if len(crudo) > 100:
+            crudo = hashlib.md5(crudo.encode()).hexdigest()
+        return f'{PREFIJO}:{espacio}:v{self.version(espacio)}:{crudo}'
+
+    # -- Lectura y escritura ---------------------------------------------
+
+    def _contar(self, espacio, campo):
+        with self._lock:
+            self._stats[espacio][campo] += 1
+
+    def obtener(self, espacio, partes, calcular, ttl=TTL_DEFECTO):
+        """
+        Retorna el valor cacheado para (espacio, partes) o lo calcula y lo guarda.
+        Si el backend falla se calcula directamente (la caché nunca rompe el request).
+        """
+        try:
+            clave = self.clave(espacio, *partes)
+            valor = self.backend.get(clave, _AUSENTE)
+        except Exception as e:
+            logger.warning(f'Caché no disponible ({espacio}): {e}')
+            return calcular()
+
+        if valor is not _AUSENTE:
+            self._contar(espacio, 'hits')
+            return valor
+
+        self._contar(espacio, 'misses')
+        valor = calcular()
+        try:
+            self.backend.set(clave, valor, ttl)
+        except Exception as e:
+            logger.warning(f'No se pudo guardar en caché ({espacio}): {e}')
+        return valor
+
+    def invalidar(self, espacio):
+        """
+        Invalida todas las entradas del espacio.
+        Dentro de una transacción se invalida ahora y otra vez al confirmar, para
+        que ningún request vuelva a cachear el valor previo a la escritura.
+        """
+        self._incrementar_version(espacio)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self._incrementar_version(espacio))
+
+    def _incrementar_version(self, espacio):
+        clave = self._clave_version(espacio)
+        try:
+            try:
+                self.backend.incr(clave)
+            except ValueError:
+                # La clave no existe: se crea con una versión nueva
+                self.version(espacio)
+            self._contar(espacio, 'invalidaciones')
+        except Exception as e:
+            logger.error(f'Error invalidando caché {espacio}: {e}')
+
+    # -- Estadísticas ----------------------------------------------------
+
+    def estadisticas(self):
+        """Aciertos, fallos e invalidaciones por espacio de nombres (en este proceso)"""
+        with self._lock:
+            resultado = {}
+            for espacio, valores in self._stats.items():
+                consultas = valores['hits'] + valores['misses']
+                resultado[espacio] = {
+                    **valores,
+                    'hit_ratio': round(valores['hits'] / consultas, 3) if consultas else None,
+                }
+            return resultado
+
+    def reiniciar_estadisticas(self):
+        with self._lock:
+            self._stats.clear()
+
+
+cache_app = CacheAplicacion()
+
+
+def cacheado(espacio, ttl=TTL_DEFECTO, clave=None):
+    """
+    Decorador que cachea el resultado de la función en el espacio indicado.
+
+    La clave se arma con el nombre de la función y sus argumentos; `clave` permite
+    pasar una función propia que reciba los mismos argumentos y retorne las partes.
+    El resultado debe ser serializable (listas, dicts, valores; no QuerySets).
+    La función original queda disponible como `.sin_cache`.
+    """
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if clave is not None:
+                partes = clave(*args, **kwargs)
+                if not isinstance(partes, (list, tuple)):
+                    partes = (partes,)
+            else:
+                partes = args + tuple(f'{k}={v}' for k, v in sorted(kwargs.items()))
+            return cache_app.obtener(
+                espacio,
+                (funcion.__qualname__, *partes),
+                lambda: funcion(*args, **kwargs),
+                ttl,
+            )
+
+        envoltura.sin_cache = funcion
+        return envoltura
+    return decorador
@@ -0,0 +1,78 @@
+"""
+Compresión de respuestas - Sistema GIGA
+
+Comprime con brotli (si el paquete está instalado y el cliente lo acepta) o
+gzip las respuestas de texto/JSON de al menos COMPRESION_MIN_BYTES. Debajo de
+ese tamaño la compresión no compensa el CPU.
+
+No se comprimen:
+- respuestas streaming (SSE de notificaciones, descargas de archivos),
+- respuestas que ya tienen Content-Encoding,
+- tipos ya comprimidos (PDF, XLSX, imágenes).
+
+El gzip (nivel 6) agrega bytes aleatorios en el encabezado, como
+GZipMiddleware de Django, para mitigar BREACH en respuestas con datos sensibles.
+"""
+
+import importlib.util
+import re
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+BROTLI_DISPONIBLE = importlib.util.find_spec('brotli') is not None
+
+TIPOS_COMPRIMIBLES = (
+    'application/json', 'text/', 'application/javascript', 'application/xml', 'image/svg+xml',
+)
+
+_ACEPTA_BR = re.compile(r'\bbr\b')
+_ACEPTA_GZIP = re.compile(r'\bgzip\b')
+
+
+def _comprimible(respuesta):
+    tipo = respuesta.get('Content-Type', '').split(';')[0].strip().lower()
+    return tipo.startswith(TIPOS_COMPRIMIBLES)
+
+
+class CompresionMiddleware:
+    """gzip/brotli con umbral de tamaño (ver COMPRESION_* en settings.py)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_bytes = getattr(settings, 'COMPRESION_MIN_BYTES', 1024)
+        self.nivel_brotli = getattr(settings, 'COMPRESION_NIVEL_BROTLI', 4)
+
+    def __call__(self, request):
+        respuesta = self.get_response(request)
+
+        if respuesta.streaming or respuesta.has_header('Content-Encoding'):
+            return respuesta
+        if len(respuesta.content) < self.min_bytes or not _comprimible(respuesta):
+            return respuesta
+
+        patch_vary_headers(respuesta, ('Accept-Encoding',))
+        acepta = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if BROTLI_DISPONIBLE and _ACEPTA_BR.search(acepta):
+            import brotli
+            codificacion = 'br'
+            contenido = brotli.compress(respuesta.content, quality=self.nivel_brotli)
+        elif _ACEPTA_GZIP.search(acepta):
+            codificacion = 'gzip'
+            contenido = compress_string(respuesta.content, max_random_bytes=GZipMiddleware.max_random_bytes)
+        else:
+            return respuesta
+
+        if len(contenido) >= len(respuesta.content):
+            return respuesta
+
+        respuesta.content = contenido
+        respuesta['Content-Length'] = str(len(contenido))
+        respuesta['Content-Encoding'] = codificacion
+        # El cuerpo cambió: un ETag fuerte dejaría de ser válido
+        etag = respuesta.get('ETag')
+        if etag and etag.startswith('"'):
+            respuesta['ETag'] = f'W/{etag}'
+        return respuesta
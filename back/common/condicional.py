@@ -0,0 +1,134 @@
+"""
+Respuestas condicionales (ETag / Last-Modified) - Sistema GIGA
+
+Para endpoints de datos de referencia (áreas, roles, feriados, organigrama,
+tipos de licencia). Los validadores salen de la tabla version_datos, que los
+signals de common/signals.py incrementan con cada alta, modificación o baja
+en la misma transacción que la escritura. No se toman de la caché de
+aplicación: con memoria local cada worker tiene sus propias versiones y
+respondería 304 con datos viejos. Calcularlos cuesta una consulta por clave
+primaria, sin ejecutar la vista ni serializar.
+
+Si el navegador envía un If-None-Match que coincide (o, sin él, un
+If-Modified-Since no anterior al último cambio) se responde 304 sin ejecutar
+la vista. Las respuestas 200 llevan ETag, Last-Modified y
+Cache-Control: private, no-cache (el navegador guarda la respuesta y la
+revalida en cada uso).
+
+Uso (debajo de @api_view / @action, que entregan el request de DRF):
+
+    @api_view(['GET'])
+    @permission_classes([IsAuthenticatedGIGA])
+    @respuesta_condicional('roles')
+    def get_roles(request):
+        ...
+"""
+
+from functools import wraps
+import hashlib
+import logging
+import time
+
+from django.db import connection, transaction
+from django.http import HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+
+from .models import VersionDatos
+
+logger = logging.getLogger(__name__)
+
+CACHE_CONTROL = 'private, no-cache'
+
+
+def _etags(cabecera):
+    """Valores de If-None-Match sin el prefijo W/ (comparación débil)"""
+    if not cabecera:
+        return set()
+    return {valor.strip().removeprefix('W/') for valor in cabecera.split(',')}
+
+
+def registrar_cambio(espacio):
+    """
+    Incrementa la versión del espacio. Se llama dentro de la transacción de la
+    escritura, así el validador cambia exactamente cuando el cambio es visible.
+    Si falla (por ejemplo sin la tabla) se registra sin afectar la escritura.
+    """
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'INSERT INTO version_datos (espacio, version, modificado) VALUES (%s, 1, %s) '
+                    'ON CONFLICT (espacio) DO UPDATE SET '
+                    'version = version_datos.version + 1, modificado = EXCLUDED.modificado',
+                    [espacio, int(time.time())],
+                )
+    except Exception as e:
+        logger.error(f'Error registrando cambio de {espacio}: {e}')
+
+
+def _validadores(nombre_vista, espacios, request):
+    """
+    (etag, modificado). Un espacio sin fila (sin cambios desde que existe la
+    tabla) cuenta como versión 0 y deja la respuesta sin Last-Modified.
+    """
+    filas = {
+        espacio: (version, modificado)
+        for espacio, version, modificado in VersionDatos.objects.filter(
+            espacio__in=espacios,
+        ).values_list('espacio', 'version', 'modificado')
+    }
+    versiones = [str(filas.get(espacio, (0, None))[0]) for espacio in espacios]
+    crudo = '|'.join([nombre_vista, *versiones, request.get_full_path()])
+    etag = f'"{hashlib.md5(crudo.encode()).hexdigest()[:20]}"'
+    modificado = max(filas[espacio][1] for espacio in espacios) if len(filas) == len(espacios) else None
+    return etag, modificado
+
+
+def _sin_cambios(request, etag, modificado):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = _etags(if_none_match)
+        return '*' in etags or etag in etags
+    desde = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return desde is not None and modificado is not None and modificado <= desde
+
+
+def _marcar(respuesta, etag, modificado):
+    # Débil: GZipMiddleware puede recomprimir el cuerpo
+    respuesta['ETag'] = f'W/{etag}'
+    if modificado is not None:
+        respuesta['Last-Modified'] = http_date(modificado)
+    respuesta['Cache-Control'] = CACHE_CONTROL
+    return respuesta
+
+
+def respuesta_condicional(*espacios):
+    """
+    Decorador para vistas GET cuyo resultado depende solo de los espacios
+    indicados (ver INVALIDACIONES en common/signals.py) y de la URL (query
+    string incluida). Funciona con vistas
+    función y con métodos de ViewSet. Otros métodos pasan sin cambios.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            request = args[0] if hasattr(args[0], 'META') else args[1]
+            if request.method not in ('GET', 'HEAD'):
+                return vista(*args, **kwargs)
+
+            try:
+                etag, modificado = _validadores(vista.__qualname__, espacios, request)
+            except Exception as e:
+                # Sin versiones se responde completo, como si no hubiera validadores
+                logger.warning(f'Validadores no disponibles para {vista.__qualname__}: {e}')
+                return vista(*args, **kwargs)
+
+            if _sin_cambios(request, etag, modificado):
+                return _marcar(HttpResponseNotModified(), etag, modificado)
+
+            respuesta = vista(*args, **kwargs)
+            if respuesta.status_code == 200:
+                _marcar(respuesta, etag, modificado)
+            return respuesta
+        return envoltura
+    return decorador
@@ -0,0 +1,561 @@
+"""
+Métricas en formato Prometheus - Sistema GIGA
+
+Registro en memoria de contadores, gauges e histogramas, expuesto en texto
+Prometheus por /metrics/ (ver giga/health_views.py). Sin dependencias externas.
+
+Qué se mide:
+- Requests por vista (nombre de URL): latencia, códigos de estado, consultas y
+  tiempo de base de datos. Se registra desde MonitorSQLMiddleware, que ya mide
+  todo eso, así que el costo extra por request es un par de sumas bajo un lock.
+- Conexiones a la base: conexiones abiertas, requests que reutilizaron una
+  conexión persistente (CONN_MAX_AGE) y edad de la conexión al terminar el request.
+  Con pool (DB_POOL) cada request toma una conexión del pool: se exponen el
+  uso, la espera y los timeouts del pool (giga/db_pool.py).
+- Tareas del scheduler (personas/scheduler.py): duración y resultado.
+- Envío de emails por Resend: latencia y resultado.
+- Tamaño y filas de las tablas principales (consultado al exponer, cacheado).
+- Aciertos y fallos de la caché de aplicación.
+
+Los valores se registran por proceso. Con METRICS_DIR cada worker vuelca sus
+contadores e histogramas a un archivo en ese directorio (como mucho cada
+METRICS_DUMP_INTERVAL segundos, y siempre al exponer) y /metrics/ responde con
+la suma de todos los workers, incluidos los que ya terminaron, para que los
+contadores no retrocedan. El directorio se vacía al iniciar el servidor (ver
+Dockerfile.prod). Los gauges calculados al exponer (pool, tablas) son los del
+worker que atiende el scrape. Sin METRICS_DIR cada scrape ve solo su worker.
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+import logging
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_TAREAS = (0.1, 0.5, 1, 5, 15, 30, 60, 300, 900, 1800)
+BUCKETS_EDAD_CONEXION = (1, 10, 60, 120, 300, 600, 900, 1800)
+
+TABLAS_MONITOREADAS = (
+    'auditoria', 'auditoria_archivo',
+    'incidencia', 'incidencia_archivo',
+    'sesion_activa', 'django_session',
+    'asistencia', 'guardia', 'licencia',
+    'agente', 'area', 'cronograma',
+)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(nombres, valores, extra=''):
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(valor):
+    valor = float(valor)
+    if valor == float('inf'):
+        return '+Inf'
+    if valor.is_integer():
+        return str(int(valor))
+    return repr(valor)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+
+    def _encabezado(self):
+        return [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}']
+
+
+class Contador(_Metrica):
+    """
+    Valor que solo crece. Con `funcion` se lee al exponer de un acumulado que
+    lleva otro componente: [(etiquetas, valor), ...]
+    """
+
+    tipo = 'counter'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), funcion=None):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.funcion = funcion
+        self._valores = {}
+
+    def inc(self, *valores_etiquetas, cantidad=1):
+        with self._lock:
+            self._valores[valores_etiquetas] = self._valores.get(valores_etiquetas, 0) + cantidad
+
+    def total(self):
+        with self._lock:
+            return sum(self._valores.values())
+
+    def estado(self):
+        """Valores del proceso, serializables: [[etiquetas], valor]"""
+        if self.funcion is not None:
+            try:
+                valores = [(tuple(etiquetas), valor) for etiquetas, valor in self.funcion()]
+            except Exception as e:
+                logger.warning(f'No se pudo calcular la métrica {self.nombre}: {e}')
+                valores = []
+        else:
+            with self._lock:
+                valores = list(self._valores.items())
+        return [[list(etiquetas), valor] for etiquetas, valor in valores if valor is not None]
+
+    def exponer(self, externos=()):
+        """Valores del proceso sumados a los estados de otros workers"""
+        valores = {}
+        for estado in (self.estado(), *externos):
+            for etiquetas, valor in estado:
+                etiquetas = tuple(etiquetas)
+                valores[etiquetas] = valores.get(etiquetas, 0) + valor
+        lineas = self._encabezado()
+        for etiquetas, valor in valores.items():
+            lineas.append(f'{self.nombre}{_etiquetas(self.etiquetas, etiquetas)} {_numero(valor)}')
+        return lineas
+
+
+class Gauge(_Metrica):
+    """Valor instantáneo; `funcion` lo calcula al exponer: [(etiquetas, valor), ...]"""
+
+    tipo = 'gauge'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), funcion=None):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.funcion = funcion
+        self._valores = {}
+
+    def set(self, valor, *valores_etiquetas):
+        with self._lock:
+            self._valores[valores_etiquetas] = valor
+
+    def estado(self):
+        """Valores fijados con set (los calculados al exponer no se comparten)"""
+        if self.funcion is not None:
+            return None
+        with self._lock:
+            return [[list(etiquetas), valor] for etiquetas, valor in self._valores.items()]
+
+    def exponer(self, externos=()):
+        """Entre workers se toma el mayor valor (las marcas de tiempo, por ejemplo)"""
+        if self.funcion is not None:
+            try:
+                valores = list(self.funcion())
+            except Exception as e:
+                logger.warning(f'No se pudo calcular la métrica {self.nombre}: {e}')
+                valores = []
+        else:
+            combinados = {}
+            for estado in (self.estado(), *externos):
+                for etiquetas, valor in estado:
+                    etiquetas = tuple(etiquetas)
+                    combinados[etiquetas] = max(valor, combinados.get(etiquetas, valor))
+            valores = list(combinados.items())
+        lineas = self._encabezado()
+        for etiquetas, valor in valores:
+            if valor is not None:
+                lineas.append(f'{self.nombre}{_etiquetas(self.etiquetas, etiquetas)} {_numero(valor)}')
+        return lineas
+
+
+class Histograma(_Metrica):
+    """Distribución de valores en buckets acumulativos"""
+
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(buckets)
+        self._series = {}  # etiquetas -> [conteos por bucket (+Inf al final), suma]
+
+    def observar(self, valor, *valores_etiquetas):
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(valores_etiquetas)
+            if serie is None:
+                serie = self._series[valores_etiquetas] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def estado(self):
+        with self._lock:
+            return [
+                [list(etiquetas), list(conteos), suma]
+                for etiquetas, (conteos, suma) in self._series.items()
+            ]
+
+    def exponer(self, externos=()):
+        """Conteos y sumas del proceso sumados a los de otros workers"""
+        series = {}
+        for estado in (self.estado(), *externos):
+            for etiquetas, conteos, suma in estado:
+                etiquetas = tuple(etiquetas)
+                if etiquetas not in series:
+                    series[etiquetas] = [[0] * (len(self.buckets) + 1), 0.0]
+                serie = series[etiquetas]
+                serie[0] = [a + b for a, b in zip(serie[0], conteos)]
+                serie[1] += suma
+        lineas = self._encabezado()
+        for etiquetas, (conteos, suma) in series.items():
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (float('inf'),), conteos):
+                acumulado += conteo
+                le = 'le="%s"' % _numero(float(limite))
+                lineas.append(f'{self.nombre}_bucket{_etiquetas(self.etiquetas, etiquetas, le)} {acumulado}')
+            lineas.append(f'{self.nombre}_sum{_etiquetas(self.etiquetas, etiquetas)} {_numero(suma)}')
+            lineas.append(f'{self.nombre}_count{_etiquetas(self.etiquetas, etiquetas)} {acumulado}')
+        return lineas
+
+
+class RegistroMetricas:
+    """Conjunto de métricas expuestas juntas"""
+
+    def __init__(self):
+        self._metricas = []
+
+    def agregar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def estado(self):
+        """Estado compartible de cada métrica, por nombre"""
+        estados = {}
+        for metrica in self._metricas:
+            estado = metrica.estado()
+            if estado is not None:
+                estados[metrica.nombre] = estado
+        return estados
+
+    def exponer(self, externos=()):
+        """Texto Prometheus; `externos` son estados de otros workers"""
+        lineas = []
+        for metrica in self._metricas:
+            lineas.extend(metrica.exponer([e[metrica.nombre] for e in externos if metrica.nombre in e]))
+        return '\n'.join(lineas) + '\n'
+
+
+registro = RegistroMetricas()
+
+# -- Requests --------------------------------------------------------------
+
+requests_total = registro.agregar(Contador(
+    'giga_http_requests_total', 'Requests atendidos por vista, método y código de estado',
+    ('vista', 'metodo', 'status')
+))
+request_duracion = registro.agregar(Histograma(
+    'giga_http_request_duration_seconds', 'Latencia de los requests por vista', ('vista',)
+))
+consultas_total = registro.agregar(Contador(
+    'giga_db_queries_total', 'Consultas SQL ejecutadas por vista', ('vista',)
+))
+consultas_tiempo = registro.agregar(Contador(
+    'giga_db_query_seconds_total', 'Tiempo total en base de datos por vista', ('vista',)
+))
+
+# -- Conexiones ------------------------------------------------------------
+
+conexiones_creadas = registro.agregar(Contador(
+    'giga_db_connections_created_total', 'Conexiones nuevas abiertas a la base'
+))
+requests_conexion = registro.agregar(Contador(
+    'giga_db_connection_requests_total',
+    'Requests con consultas según si reutilizaron una conexión persistente', ('conexion',)
+))
+edad_conexion = registro.agregar(Histograma(
+    'giga_db_connection_age_seconds', 'Edad de la conexión al terminar cada request con consultas',
+    buckets=BUCKETS_EDAD_CONEXION
+))
+
+
+def _ratio_reutilizacion():
+    with requests_conexion._lock:
+        reutilizadas = requests_conexion._valores.get(('reutilizada',), 0)
+        nuevas = requests_conexion._valores.get(('nueva',), 0)
+    total = reutilizadas + nuevas
+    return [((), round(reutilizadas / total, 4) if total else None)]
+
+
+registro.agregar(Gauge(
+    'giga_db_connection_reuse_ratio', 'Fracción de requests que reutilizaron la conexión',
+    funcion=_ratio_reutilizacion
+))
+registro.agregar(Gauge(
+    'giga_db_conn_max_age_seconds', 'CONN_MAX_AGE configurado',
+    funcion=lambda: [((), settings.DATABASES['default'].get('CONN_MAX_AGE', 0) or 0)]
+))
+
+
+def _pool():
+    from giga.db_pool import estadisticas_pool
+    return estadisticas_pool()
+
+
+def _gauge_pool(campo):
+    def funcion():
+        datos = _pool()
+        return [((), datos[campo])] if datos else []
+    return funcion
+
+
+for _campo, _nombre, _ayuda in (
+    ('max', 'giga_db_pool_max', 'Tamaño máximo del pool de conexiones'),
+    ('abiertas', 'giga_db_pool_connections', 'Conexiones abiertas en el pool'),
+    ('en_uso', 'giga_db_pool_connections_in_use', 'Conexiones del pool tomadas por un hilo'),
+    ('esperando', 'giga_db_pool_waiting', 'Hilos esperando una conexión libre'),
+):
+    registro.agregar(Gauge(_nombre, _ayuda, funcion=_gauge_pool(_campo)))
+
+# Acumulados del pool: contadores, sumados entre workers
+for _campo, _nombre, _ayuda in (
+    ('solicitudes', 'giga_db_pool_requests_total', 'Conexiones pedidas al pool'),
+    ('solicitudes_en_cola', 'giga_db_pool_requests_queued_total', 'Pedidos que tuvieron que esperar'),
+    ('timeouts', 'giga_db_pool_timeouts_total', 'Pedidos que agotaron DB_POOL_TIMEOUT'),
+    ('conexiones_creadas', 'giga_db_pool_connections_opened_total', 'Conexiones abiertas por el pool'),
+):
+    registro.agregar(Contador(_nombre, _ayuda, funcion=_gauge_pool(_campo)))
+
+
+def _espera_pool():
+    datos = _pool()
+    return [((), datos['espera_total_ms'] / 1000)] if datos else []
+
+
+registro.agregar(Contador(
+    'giga_db_pool_wait_seconds_total', 'Tiempo total esperando conexiones del pool', funcion=_espera_pool
+))
+
+# -- Scheduler y email -----------------------------------------------------
+
+tarea_duracion = registro.agregar(Histograma(
+    'giga_scheduler_job_duration_seconds', 'Duración de las tareas programadas', ('tarea',),
+    buckets=BUCKETS_TAREAS
+))
+tarea_ejecuciones = registro.agregar(Contador(
+    'giga_scheduler_job_runs_total', 'Ejecuciones de tareas programadas por resultado', ('tarea', 'resultado')
+))
+tarea_ultima = registro.agregar(Gauge(
+    'giga_scheduler_job_last_run_timestamp_seconds', 'Última ejecución de cada tarea por resultado',
+    ('tarea', 'resultado')
+))
+email_duracion = registro.agregar(Histograma(
+    'giga_email_send_duration_seconds', 'Latencia de envío de emails por Resend'
+))
+emails_total = registro.agregar(Contador(
+    'giga_email_sent_total', 'Emails enviados por resultado', ('resultado',)
+))
+
+# -- Tablas y caché (calculadas al exponer) --------------------------------
+
+_tablas_cache = {'momento': 0.0, 'filas': []}
+_tablas_lock = threading.Lock()
+
+
+def _estadisticas_tablas():
+    """
+    Filas y tamaño de las tablas principales; cacheado METRICS_TABLE_STATS_TTL
+    segundos. Las particiones (auditoria) se suman a su tabla padre.
+    """
+    ttl = getattr(settings, 'METRICS_TABLE_STATS_TTL', 60)
+    with _tablas_lock:
+        if time.monotonic() - _tablas_cache['momento'] < ttl:
+            return _tablas_cache['filas']
+        with connections['default'].cursor() as cursor:
+            cursor.execute("""
+                SELECT COALESCE(padre.relname, s.relname) AS tabla,
+                       SUM(s.n_live_tup), SUM(s.n_dead_tup), SUM(pg_total_relation_size(s.relid))
+                FROM pg_stat_user_tables s
+                LEFT JOIN pg_inherits i ON i.inhrelid = s.relid
+                LEFT JOIN pg_class padre ON padre.oid = i.inhparent
+                WHERE COALESCE(padre.relname, s.relname) = ANY(%s)
+                GROUP BY 1
+            """, [list(TABLAS_MONITOREADAS)])
+            _tablas_cache['filas'] = cursor.fetchall()
+        _tablas_cache['momento'] = time.monotonic()
+        return _tablas_cache['filas']
+
+
+registro.agregar(Gauge(
+    'giga_table_rows', 'Filas vivas estimadas por tabla', ('tabla',),
+    funcion=lambda: [((tabla,), vivas) for tabla, vivas, _, _ in _estadisticas_tablas()]
+))
+registro.agregar(Gauge(
+    'giga_table_dead_rows', 'Filas muertas estimadas por tabla', ('tabla',),
+    funcion=lambda: [((tabla,), muertas) for tabla, _, muertas, _ in _estadisticas_tablas()]
+))
+registro.agregar(Gauge(
+    'giga_table_size_bytes', 'Tamaño total (datos, índices y TOAST) por tabla', ('tabla',),
+    funcion=lambda: [((tabla,), tamanio) for tabla, _, _, tamanio in _estadisticas_tablas()]
+))
+
+
+def _estadisticas_cache():
+    from .cache import cache_app
+    for espacio, datos in cache_app.estadisticas().items():
+        yield (espacio, 'hit'), datos['hits']
+        yield (espacio, 'miss'), datos['misses']
+
+
+registro.agregar(Contador(
+    'giga_cache_requests_total', 'Lecturas de la caché de aplicación por espacio y resultado',
+    ('espacio', 'resultado'), funcion=_estadisticas_cache
+))
+
+
+def _auditoria_pendiente():
+    from auditoria.buffer import pendientes_auditoria
+    yield (), pendientes_auditoria()
+
+
+registro.agregar(Gauge(
+    'giga_audit_pending', 'Registros de auditoría esperando al hilo escritor (modo background)',
+    funcion=_auditoria_pendiente
+))
+
+_inicio_proceso = time.time()
+registro.agregar(Gauge(
+    'giga_process_start_time_seconds', 'Inicio del proceso (epoch)', funcion=lambda: [((), _inicio_proceso)]
+))
+
+
+# -- API de registro -------------------------------------------------------
+
+def registrar_request(vista, metodo, status, duracion_ms, consultas, db_ms):
+    """Llamado por MonitorSQLMiddleware al terminar cada request"""
+    vista = vista or 'sin_ruta'
+    requests_total.inc(vista, metodo, str(status))
+    request_duracion.observar(duracion_ms / 1000, vista)
+    if consultas:
+        consultas_total.inc(vista, cantidad=consultas)
+        consultas_tiempo.inc(vista, cantidad=db_ms / 1000)
+    volcar()
+
+
+def conexion_creada(sender, connection, **kwargs):
+    """
+    Receptor de connection_created: marca la conexión con su momento de apertura.
+    Con pool la señal se emite en cada préstamo, no al abrir: las conexiones
+    abiertas se cuentan en giga_db_pool_connections_opened_total.
+    """
+    connection._giga_creada_en = time.monotonic()
+    if not getattr(connection, 'pool', None):
+        conexiones_creadas.inc()
+
+
+def marca_conexion(alias='default'):
+    """Momento de apertura de la conexión actual (None si no hay conexión abierta)"""
+    conexion = connections[alias]
+    if conexion.connection is None:
+        return None
+    return getattr(conexion, '_giga_creada_en', None)
+
+
+def registrar_uso_conexion(marca_previa, alias='default'):
+    """Registra si el request reutilizó la conexión y la edad de la conexión"""
+    marca = marca_conexion(alias)
+    if marca is None:
+        return
+    requests_conexion.inc('reutilizada' if marca == marca_previa else 'nueva')
+    edad_conexion.observar(time.monotonic() - marca)
+
+
+def registrar_tarea(nombre, segundos, resultado):
+    """Registra duración y resultado ('ok', 'error', 'omitida') de una tarea programada"""
+    tarea_duracion.observar(segundos, nombre)
+    tarea_ejecuciones.inc(nombre, resultado)
+    tarea_ultima.set(time.time(), nombre, resultado)
+    volcar(forzar=True)
+
+
+@contextmanager
+def medir_email():
+    """Mide la latencia de un envío de email y su resultado"""
+    inicio = time.perf_counter()
+    resultado = 'error'
+    try:
+        yield
+        resultado = 'ok'
+    finally:
+        email_duracion.observar(time.perf_counter() - inicio)
+        emails_total.inc(resultado)
+
+
+# -- Agregación entre workers (METRICS_DIR) --------------------------------
+
+_volcado = {'momento': 0.0}
+_volcado_lock = threading.Lock()
+
+
+def _directorio():
+    return getattr(settings, 'METRICS_DIR', '')
+
+
+def volcar(forzar=False):
+    """
+    Escribe el estado del proceso en METRICS_DIR/metricas-<pid>.json, como
+    mucho cada METRICS_DUMP_INTERVAL segundos salvo con forzar.
+    """
+    directorio = _directorio()
+    if not directorio:
+        return
+    ahora = time.monotonic()
+    intervalo = getattr(settings, 'METRICS_DUMP_INTERVAL', 10)
+    if not forzar and ahora - _volcado['momento'] < intervalo:
+        return
+    if not _volcado_lock.acquire(blocking=forzar):
+        return
+    try:
+        _volcado['momento'] = ahora
+        archivo = os.path.join(directorio, f'metricas-{os.getpid()}.json')
+        temporal = f'{archivo}.tmp'
+        with open(temporal, 'w') as destino:
+            json.dump(registro.estado(), destino)
+        os.replace(temporal, archivo)
+    except Exception as e:
+        logger.warning(f'No se pudieron volcar las métricas en {directorio}: {e}')
+    finally:
+        _volcado_lock.release()
+
+
+def _estados_otros_workers():
+    directorio = _directorio()
+    propio = f'metricas-{os.getpid()}.json'
+    estados = []
+    try:
+        nombres = os.listdir(directorio)
+    except OSError as e:
+        logger.warning(f'No se pudo leer METRICS_DIR ({directorio}): {e}')
+        return estados
+    for nombre in nombres:
+        if not nombre.startswith('metricas-') or not nombre.endswith('.json') or nombre == propio:
+            continue
+        try:
+            with open(os.path.join(directorio, nombre)) as origen:
+                estados.append(json.load(origen))
+        except (OSError, ValueError) as e:
+            logger.warning(f'Métricas ilegibles en {nombre}: {e}')
+    return estados
+
+
+def exponer():
+    """Texto Prometheus del proceso o, con METRICS_DIR, de todos los workers"""
+    if not _directorio():
+        return registro.exponer()
+    volcar(forzar=True)
+    return registro.exponer(_estados_otros_workers())
@@ -0,0 +1,19 @@
+from django.db import models
+
+
+class VersionDatos(models.Model):
+    """
+    Versión de un grupo de datos de referencia (espacio de nombres de
+    common/signals.py). Validador de las respuestas condicionales.
+    """
+    espacio = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    # Epoch (segundos) del último cambio
+    modificado = models.BigIntegerField()
+
+    class Meta:
+        managed = False
+        db_table = 'version_datos'
+
+    def __str__(self):
+        return f'{self.espacio} v{self.version}'
@@ -0,0 +1,255 @@
+"""
+Monitor de consultas SQL por request - Sistema GIGA
+
+Middleware que registra, para cada request, la cantidad de consultas, el tiempo
+total en base de datos y las consultas duplicadas (mismo SQL y parámetros).
+
+- Los totales se agregan a la respuesta (X-DB-Queries, X-DB-Time-Ms,
+  X-DB-Duplicate-Queries) y a una línea de log estructurada (logger 'giga.sql'):
+  en nivel DEBUG para todos los requests, en INFO solo para los lentos o que
+  exceden su presupuesto.
+- Los requests más lentos que SQL_MONITOR_SLOW_MS quedan en un buffer circular
+  en memoria con todo su SQL y tiempos (consultable por administradores en
+  /api/auditoria/rendimiento/lentos/).
+- El origen de una consulta en el código (recorrer la pila) solo se captura
+  para consultas más lentas que SQL_MONITOR_ORIGIN_MS, o para todas con
+  SQL_MONITOR_CAPTURE_ORIGIN.
+- Latencia, códigos de estado, consultas y uso de conexiones por vista se
+  acumulan en common/metricas.py (expuestas en /metrics/).
+- Presupuestos de consultas por endpoint (SQL_QUERY_BUDGETS, por nombre de URL):
+  al excederse se registra una advertencia, o se lanza PresupuestoConsultasExcedido
+  si SQL_QUERY_BUDGET_STRICT está activo (por defecto al correr tests).
+
+Funciona con DEBUG=False: usa connection.execute_wrapper en lugar de
+connection.queries.
+"""
+
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from time import perf_counter
+import json
+import os
+import sys
+import threading
+import logging
+
+from django.conf import settings
+from django.db import connections
+
+from . import metricas
+
+logger = logging.getLogger('giga.sql')
+
+_ESTE_ARCHIVO = os.path.abspath(__file__)
+
+
+class PresupuestoConsultasExcedido(AssertionError):
+    """Un endpoint ejecutó más consultas que las permitidas por su presupuesto"""
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def _origen_consulta():
+    """Primer frame del proyecto (fuera de Django y librerías) que originó la consulta"""
+    base = str(settings.BASE_DIR)
+    frame = sys._getframe(2)
+    while frame is not None:
+        archivo = frame.f_code.co_filename
+        if (archivo.startswith(base) and 'site-packages' not in archivo
+                and os.path.abspath(archivo) != _ESTE_ARCHIVO):
+            return f'{os.path.relpath(archivo, base)}:{frame.f_lineno} en {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+class RegistroConsultas:
+    """Execute wrapper que acumula las consultas ejecutadas"""
+
+    def __init__(self, capturar_origen=True, umbral_origen_ms=0):
+        self.capturar_origen = capturar_origen
+        self.umbral_origen_ms = umbral_origen_ms
+        self.consultas = []  # (sql, params, ms, origen)
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (perf_counter() - inicio) * 1000
+            origen = (
+                _origen_consulta()
+                if self.capturar_origen and ms >= self.umbral_origen_ms else None
+            )
+            self.consultas.append((sql, params, ms, origen))
+
+    @property
+    def cantidad(self):
+        return len(self.consultas)
+
+    @property
+    def tiempo_ms(self):
+        return sum(ms for _, _, ms, _ in self.consultas)
+
+    def duplicadas(self):
+        """Cantidad de ejecuciones repetidas del mismo SQL con los mismos parámetros"""
+        conteo = Counter((sql, repr(params)) for sql, params, _, _ in self.consultas)
+        return sum(n - 1 for n in conteo.values() if n > 1)
+
+    def similares(self, minimo=2):
+        """SQL repetidos con distintos parámetros (típico N+1), más frecuentes primero"""
+        conteo = Counter(sql for sql, _, _, _ in self.consultas)
+        return [(sql, n) for sql, n in conteo.most_common() if n >= minimo]
+
+    def detalle(self, max_sql=2000):
+        return [
+            {
+                'sql': sql[:max_sql],
+                'params': repr(params)[:500] if params is not None else None,
+                'ms': round(ms, 2),
+                'origen': origen,
+            }
+            for sql, params, ms, origen in self.consultas
+        ]
+
+
+@contextmanager
+def registrar_consultas(capturar_origen=True, umbral_origen_ms=0):
+    """
+    Registra las consultas ejecutadas en todas las conexiones dentro del bloque.
+    El origen se captura solo para consultas de al menos umbral_origen_ms.
+    """
+    registro = RegistroConsultas(capturar_origen, umbral_origen_ms)
+    with ExitStack() as pila:
+        for conexion in connections.all():
+            pila.enter_context(conexion.execute_wrapper(registro))
+        yield registro
+
+
+@contextmanager
+def presupuesto_consultas(maximo, descripcion='bloque'):
+    """
+    Falla si el bloque ejecuta más de `maximo` consultas. Pensado para tests:
+
+        with presupuesto_consultas(8, 'marcar_asistencia'):
+            client.post('/api/asistencia/marcar/', ...)
+    """
+    with registrar_consultas() as registro:
+        yield registro
+    if registro.cantidad > maximo:
+        raise PresupuestoConsultasExcedido(_mensaje_presupuesto(descripcion, registro, maximo))
+
+
+def _mensaje_presupuesto(descripcion, registro, maximo):
+    lineas = [f'{descripcion}: {registro.cantidad} consultas (presupuesto {maximo})']
+    for sql, n in registro.similares()[:5]:
+        lineas.append(f'  {n}x {sql[:200]}')
+    return '\n'.join(lineas)
+
+
+class RequestsLentos:
+    """Buffer circular con el detalle de los requests más lentos que el umbral"""
+
+    def __init__(self, tamanio):
+        self._lock = threading.Lock()
+        self._items = deque(maxlen=tamanio)
+
+    def agregar(self, item):
+        with self._lock:
+            self._items.append(item)
+
+    def listar(self):
+        with self._lock:
+            return list(reversed(self._items))
+
+    def limpiar(self):
+        with self._lock:
+            self._items.clear()
+
+
+requests_lentos = RequestsLentos(_config('SQL_MONITOR_BUFFER_SIZE', 50))
+
+
+class MonitorSQLMiddleware:
+    """Cuenta consultas y tiempo de base de datos por request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.habilitado = _config('SQL_MONITOR_ENABLED', True)
+        self.umbral_lento_ms = _config('SQL_MONITOR_SLOW_MS', 1000)
+        self.umbral_origen_ms = (
+            0 if _config('SQL_MONITOR_CAPTURE_ORIGIN', False)
+            else _config('SQL_MONITOR_ORIGIN_MS', 100)
+        )
+        self.presupuestos = _config('SQL_QUERY_BUDGETS', {})
+        self.estricto = _config('SQL_QUERY_BUDGET_STRICT', False)
+
+    def __call__(self, request):
+        if not self.habilitado:
+            return self.get_response(request)
+
+        marca_conexion = metricas.marca_conexion()
+        inicio = perf_counter()
+        with registrar_consultas(umbral_origen_ms=self.umbral_origen_ms) as registro:
+            response = self.get_response(request)
+        duracion_ms = (perf_counter() - inicio) * 1000
+
+        cantidad = registro.cantidad
+        tiempo_db = registro.tiempo_ms
+        duplicadas = registro.duplicadas()
+
+        response['X-DB-Queries'] = str(cantidad)
+        response['X-DB-Time-Ms'] = f'{tiempo_db:.1f}'
+        response['X-DB-Duplicate-Queries'] = str(duplicadas)
+
+        match = getattr(request, 'resolver_match', None)
+        endpoint = match.url_name if match else None
+
+        metricas.registrar_request(
+            endpoint, request.method, response.status_code, duracion_ms, cantidad, tiempo_db
+        )
+        if cantidad:
+            metricas.registrar_uso_conexion(marca_conexion)
+
+        lento = duracion_ms >= self.umbral_lento_ms
+        maximo = self.presupuestos.get(endpoint) if endpoint else None
+        excedido = maximo is not None and cantidad > maximo
+
+        if lento or excedido or logger.isEnabledFor(logging.DEBUG):
+            logger.log(logging.INFO if lento or excedido else logging.DEBUG, json.dumps({
+                'metodo': request.method,
+                'ruta': request.path,
+                'endpoint': endpoint,
+                'status': response.status_code,
+                'duracion_ms': round(duracion_ms, 1),
+                'consultas': cantidad,
+                'db_ms': round(tiempo_db, 1),
+                'duplicadas': duplicadas,
+            }))
+
+        if lento:
+            requests_lentos.agregar({
+                'registrado_en': datetime.now().isoformat(timespec='seconds'),
+                'metodo': request.method,
+                'ruta': request.get_full_path(),
+                'endpoint': endpoint,
+                'status': response.status_code,
+                'agente_id': request.session.get('user_id') if hasattr(request, 'session') else None,
+                'duracion_ms': round(duracion_ms, 1),
+                'consultas': cantidad,
+                'db_ms': round(tiempo_db, 1),
+                'duplicadas': duplicadas,
+                'similares': [{'sql': sql[:500], 'veces': n} for sql, n in registro.similares()[:10]],
+                'detalle': registro.detalle(),
+            })
+
+        if excedido:
+            mensaje = _mensaje_presupuesto(endpoint, registro, maximo)
+            if self.estricto:
+                raise PresupuestoConsultasExcedido(mensaje)
+            logger.warning(f'Presupuesto de consultas excedido - {mensaje}')
+            response['X-DB-Query-Budget'] = f'exceeded ({maximo})'
+
+        return response
@@ -0,0 +1,21 @@
+"""
+Parser JSON con orjson - Sistema GIGA
+
+Reemplaza a rest_framework.parsers.JSONParser (ver REST_FRAMEWORK en
+settings.py). Como el de DRF, rechaza NaN/Infinity y responde 400 ante un
+cuerpo inválido.
+"""
+
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser de DRF con la decodificación de orjson (el cuerpo debe ser UTF-8)"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
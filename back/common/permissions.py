@@ -15,9 +15,12 @@ Jerarquía de Roles:
 """
 
 from rest_framework import permissions
+from django.conf import settings
 from django.core.exceptions import PermissionDenied
 import logging
 
+from .cache import cache_app, cacheado
+
 logger = logging.getLogger(__name__)
 
 
@@ -58,13 +61,33 @@ def obtener_rol_agente(agente):
     if not agente:
         return None
     
-    rol_asignacion = agente.agenterol_set.first()
+    # Se consulta en cada chequeo de permisos: se cachea por agente
+    # (invalidado por cambios en Rol y AgenteRol; TTL corto sin caché compartida)
+    return cache_app.obtener(
+        'roles', ('rol_agente', agente.id_agente), lambda: _rol_agente_db(agente),
+        ttl=settings.CACHE_TTL_PERMISOS
+    )
+
+
+def _rol_agente_db(agente):
+    rol_asignacion = agente.agenterol_set.select_related('id_rol').first()
     if not rol_asignacion or not rol_asignacion.id_rol:
         return None
     
     return rol_asignacion.id_rol.nombre.lower()
 
 
+@cacheado('areas', ttl=settings.CACHE_TTL_PERMISOS)
+def _arbol_areas():
+    """{id_area_padre: [id_area hijas]} de todas las áreas"""
+    from personas.models import Area
+
+    arbol = {}
+    for id_area, id_padre in Area.objects.values_list('id_area', 'id_area_padre'):
+        arbol.setdefault(id_padre, []).append(id_area)
+    return arbol
+
+
 def obtener_area_y_subareas(area):
     """
     Obtiene un área y todas sus sub-áreas recursivamente.
@@ -80,13 +103,19 @@ def obtener_area_y_subareas(area):
         except Area.DoesNotExist:
             return []
 
-    areas = [area]
-
-    subareas = Area.objects.filter(id_area_padre=area)
-    for subarea in subareas:
-        areas.extend(obtener_area_y_subareas(subarea))
-
-    return areas
+    # Recorrer la jerarquía cacheada y traer las sub-áreas en una sola consulta
+    arbol = _arbol_areas()
+    ids = []
+    pendientes = list(reversed(arbol.get(area.id_area, [])))
+    while pendientes:
+        id_area = pendientes.pop()
+        if id_area in ids or id_area == area.id_area:
+            continue
+        ids.append(id_area)
+        pendientes.extend(reversed(arbol.get(id_area, [])))
+
+    subareas = Area.objects.in_bulk(ids)
+    return [area] + [subareas[id_area] for id_area in ids if id_area in subareas]
 
 
 
@@ -0,0 +1,39 @@
+"""
+Renderer JSON con orjson - Sistema GIGA
+
+Reemplaza a rest_framework.renderers.JSONRenderer (ver REST_FRAMEWORK en
+settings.py, que lo usa solo si orjson está instalado). La salida es la misma
+que la de DRF: compacta, UTF-8 sin escapar y con los mismos formatos para
+fechas (isoformat, 'Z' para UTC), Decimal (número), UUID, timedelta,
+QuerySets y textos traducibles: fechas y UUID los resuelve orjson en C y el
+resto pasa por el JSONEncoder de DRF.
+"""
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder()
+
+# OPT_UTC_Z: '...Z' en lugar de '+00:00', como DRF
+OPCIONES = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+
+def _default(valor):
+    return _encoder.default(valor)
+
+
+def dumps(datos, indentar=False):
+    """Serializa como el renderer (también usable fuera de DRF)"""
+    opciones = OPCIONES | orjson.OPT_INDENT_2 if indentar else OPCIONES
+    return orjson.dumps(datos, default=_default, option=opciones)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer de DRF con la serialización de orjson"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indentar = bool(self.get_indent(accepted_media_type, renderer_context or {}))
+        return dumps(data, indentar)
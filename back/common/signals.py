@@ -0,0 +1,44 @@
+"""
+Invalidación de la caché de aplicación por signals de modelos.
+
+Cada alta, modificación o baja de un modelo invalida los espacios de nombres
+de caché que dependen de él e incrementa su versión en version_datos
+(validadores de common/condicional.py).
+"""
+
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete
+
+from .cache import cache_app
+from .condicional import registrar_cambio
+
+# modelo -> espacios de nombres de caché que dependen de él
+INVALIDACIONES = {
+    'personas.Rol': ('roles',),
+    'personas.AgenteRol': ('roles',),
+    'personas.Area': ('areas',),
+    # Áreas incluye jefes y cantidad de agentes (solo como validador HTTP)
+    'personas.Agente': ('agentes',),
+    'personas.Organigrama': ('organigrama',),
+    'guardias.Feriado': ('feriados',),
+    'asistencia.TipoLicencia': ('tipos_licencia',),
+    'guardias.ParametrosArea': ('parametros_area',),
+    'guardias.ReglaPlus': ('reglas_plus',),
+}
+
+
+def _receptor(espacios):
+    def invalidar(sender, **kwargs):
+        for espacio in espacios:
+            cache_app.invalidar(espacio)
+            registrar_cambio(espacio)
+    return invalidar
+
+
+def conectar_invalidaciones():
+    for etiqueta, espacios in INVALIDACIONES.items():
+        modelo = apps.get_model(etiqueta)
+        receptor = _receptor(espacios)
+        uid = f'cache_app:{etiqueta}'
+        post_save.connect(receptor, sender=modelo, weak=False, dispatch_uid=uid)
+        post_delete.connect(receptor, sender=modelo, weak=False, dispatch_uid=uid)
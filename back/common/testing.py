@@ -0,0 +1,63 @@
+"""
+Runner de tests del Sistema GIGA
+
+La mayoría de los modelos son managed=False: sus tablas las crean los scripts
+de bd/init-scripts y las migraciones no las incluyen, así que la base de tests
+que arma Django quedaría sin ellas. Durante los tests este runner marca esos
+modelos como administrados y crea las tablas directamente desde los modelos
+(sin migraciones), de modo que los tests de endpoints corren contra el mismo
+esquema que usa el ORM.
+
+Las funciones y triggers de PL/pgSQL no se crean: los endpoints que dependen
+de ellos (por ejemplo el resumen de asistencias) no se cubren con este runner.
+
+Configurado en settings.TEST_RUNNER:
+
+    python manage.py test
+"""
+
+from django.apps import apps
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class GigaTestRunner(DiscoverRunner):
+    """DiscoverRunner que crea también las tablas de los modelos no administrados"""
+
+    def setup_databases(self, **kwargs):
+        self._no_administrados = [
+            modelo for modelo in apps.get_models() if not modelo._meta.managed
+        ]
+        for modelo in self._no_administrados:
+            modelo._meta.managed = True
+
+        self._migraciones = getattr(settings, 'MIGRATION_MODULES', {})
+        settings.MIGRATION_MODULES = {app.label: None for app in apps.get_app_configs()}
+        return super().setup_databases(**kwargs)
+
+    def teardown_databases(self, old_config, **kwargs):
+        super().teardown_databases(old_config, **kwargs)
+        settings.MIGRATION_MODULES = self._migraciones
+        for modelo in self._no_administrados:
+            modelo._meta.managed = False
+
+
+class PresupuestoEndpointMixin:
+    """
+    Aserciones sobre SQL_QUERY_BUDGETS para tests de endpoints.
+
+    El middleware ya falla en modo estricto si un endpoint excede su
+    presupuesto; esta aserción además verifica que el request terminó bien
+    (un error temprano pasaría cualquier presupuesto).
+    """
+
+    def assertDentroDelPresupuesto(self, endpoint, metodo='get', **kwargs):
+        """Ejecuta el request al endpoint (nombre de URL) y verifica su presupuesto"""
+        from django.urls import reverse
+
+        from .monitor_sql import presupuesto_consultas
+
+        with presupuesto_consultas(settings.SQL_QUERY_BUDGETS[endpoint], endpoint):
+            response = getattr(self.client, metodo)(reverse(endpoint), **kwargs)
+        self.assertLess(response.status_code, 400, getattr(response, 'data', response.content))
+        return response
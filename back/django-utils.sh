@@ -51,7 +51,7 @@ show_help() {
     requirements   - Actualizar requirements.txt"
     echo ""
     echo "Comandos de Asistencias:"
-    echo "  marcar-salidas - Marcar salidas automáticas (22:00)"
+    echo "  marcar-salidas - Cierre de jornada del día anterior (salidas 23:00 y parte diario)"
     echo ""
     echo "  help           - Mostrar esta ayuda"
     echo ""
@@ -329,17 +329,11 @@ case "$1" in
         ;;
     marcar-salidas)
         check_docker
-        echo -e "${BLUE}⏰ Ejecutando marcación automática de salidas...${NC}"
-        RESPONSE=$(docker exec $DJANGO_CONTAINER curl -s -X POST http://localhost:8000/api/asistencia/cron/marcar-salidas/ \
-            -H "Content-Type: application/json" \
-            -d '{"auth_key":"GIGA_CRON_KEY_2025"}')
-        
-        if echo "$RESPONSE" | grep -q '"success":true'; then
-            MARCADAS=$(echo "$RESPONSE" | grep -o '"total_marcadas":[0-9]*' | cut -d':' -f2)
-            echo -e "${GREEN}✅ Se marcaron $MARCADAS salidas automáticas${NC}"
+        echo -e "${BLUE}⏰ Ejecutando cierre de jornada (salidas automáticas)...${NC}"
+        if docker exec $DJANGO_CONTAINER python manage.py cerrar_jornada "${@:2}"; then
+            echo -e "${GREEN}✅ Cierre de jornada completado${NC}"
         else
-            echo -e "${RED}❌ Error al marcar salidas${NC}"
-            echo "$RESPONSE"
+            echo -e "${RED}❌ Error al ejecutar el cierre de jornada${NC}"
         fi
         ;;
     help|--help|-h)
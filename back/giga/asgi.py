@@ -3,6 +3,12 @@ ASGI config for giga project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Lo usa solo el stream SSE de notificaciones (/api/notificaciones/stream/), que
+mantiene conexiones abiertas sin ocupar un hilo por cliente. En producción corre
+en un proceso Uvicorn aparte (SERVIDOR=notificaciones en Dockerfile.prod) y nginx
+le envía únicamente esa ruta; el resto de la API sigue en Gunicorn con WSGI,
+donde el stream responde el estado y el navegador reconecta.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -0,0 +1,67 @@
+"""
+Pool de conexiones a PostgreSQL - Sistema GIGA
+
+Con DB_POOL activo (y psycopg 3 + psycopg_pool instalados) cada proceso de
+Gunicorn mantiene un pool de conexiones compartido por sus hilos en lugar de
+una conexión persistente por hilo (CONN_MAX_AGE). Django toma una conexión del
+pool al primer uso en el request y la devuelve al terminarlo.
+
+Este módulo no importa Django al cargarse: settings.py lo usa para configurar
+el pool (reiniciar_conexion).
+"""
+
+
+def reiniciar_conexion(conexion):
+    """
+    Callback 'reset' del pool: se ejecuta cada vez que una conexión vuelve al pool.
+    Libera los advisory locks de sesión (scheduler, archivado, tareas) que sin
+    pool se liberaban al cerrar la conexión.
+    """
+    conexion.execute('SELECT pg_advisory_unlock_all()')
+
+
+def pool_activo(alias='default'):
+    from django.conf import settings
+    return bool(settings.DATABASES[alias].get('OPTIONS', {}).get('pool'))
+
+
+def estadisticas_pool(alias='default'):
+    """
+    Estado del pool del proceso actual, o None si no hay pool.
+    Los contadores (solicitudes, esperas, timeouts) son acumulados desde que
+    se creó el pool.
+    """
+    if not pool_activo(alias):
+        return None
+
+    from django.db import connections
+    pool = connections[alias].pool
+    datos = pool.get_stats()
+
+    maximo = datos.get('pool_max', pool.max_size)
+    tamano = datos.get('pool_size', 0)
+    disponibles = datos.get('pool_available', 0)
+    en_uso = max(tamano - disponibles, 0)
+    en_cola = datos.get('requests_queued', 0)
+    espera_ms = datos.get('requests_wait_ms', 0)
+
+    return {
+        'min': datos.get('pool_min', pool.min_size),
+        'max': maximo,
+        'abiertas': tamano,
+        'en_uso': en_uso,
+        'disponibles': disponibles,
+        'esperando': datos.get('requests_waiting', 0),
+        # Fracción del máximo en uso: cerca de 1 con 'esperando' > 0 indica pool chico
+        'saturacion': round(en_uso / maximo, 3) if maximo else 0,
+        'solicitudes': datos.get('requests_num', 0),
+        'solicitudes_en_cola': en_cola,
+        'espera_total_ms': espera_ms,
+        'espera_media_ms': round(espera_ms / en_cola, 1) if en_cola else 0,
+        'timeouts': datos.get('requests_errors', 0),
+        'conexiones_creadas': datos.get('connections_num', 0),
+        'conexiones_fallidas': datos.get('connections_errors', 0),
+        'conexiones_perdidas': datos.get('connections_lost', 0),
+        'timeout_s': pool.timeout,
+        'max_lifetime_s': pool.max_lifetime,
+    }
@@ -1,11 +1,16 @@
 """
 Health check views para el sistema GIGA
 """
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.db import connection
 from django.conf import settings
+from django.utils.crypto import constant_time_compare
+
+from common.cache import cache_app
+from common.metricas import exponer as exponer_metricas
+from giga.db_pool import estadisticas_pool
 
 @csrf_exempt
 @require_http_methods(["GET"])
@@ -22,7 +27,9 @@ def health_check(request):
         return JsonResponse({
             'status': 'healthy',
             'database': 'connected',
-            'version': '1.0.0'
+            'version': '1.0.0',
+            'cache': cache_app.estadisticas(),
+            'database_pool': estadisticas_pool()
         })
     except Exception as e:
         return JsonResponse({
@@ -36,4 +43,84 @@ def simple_health(request):
     """
     Health check muy simple sin BD - solo para nginx
     """
-    return JsonResponse({'status': 'ok'})
\ No newline at end of file
+    return JsonResponse({'status': 'ok'})
+
+
+def _autorizado(request):
+    """
+    Se exige 'Authorization: Bearer <METRICS_TOKEN>'. Sin token configurado
+    los endpoints solo quedan abiertos con DEBUG.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        return settings.DEBUG
+    return constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def metrics(request):
+    """
+    Métricas en formato de texto Prometheus (ver common/metricas.py).
+    Exige 'Authorization: Bearer <METRICS_TOKEN>' (abierto solo con DEBUG y sin token).
+    """
+    if not _autorizado(request):
+        return HttpResponse('No autorizado\n', status=401, content_type='text/plain')
+
+    return HttpResponse(
+        exponer_metricas(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def database_pool(request):
+    """
+    Pool de conexiones del proceso que atiende (ver giga/db_pool.py) y
+    dimensionamiento frente a max_connections de Postgres:
+    GUNICORN_WORKERS x tamaño máximo del pool (o x hilos de Gunicorn más
+    DB_POOL_HILOS_FONDO, sin pool)
+    debe dejar margen para conexiones administrativas y de mantenimiento.
+    Mismo control de acceso que /metrics/.
+    """
+    if not _autorizado(request):
+        return JsonResponse({'error': 'No autorizado'}, status=401)
+
+    try:
+        pool = estadisticas_pool()
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT current_setting('max_connections')::int,
+                       current_setting('superuser_reserved_connections')::int,
+                       (SELECT COUNT(*) FROM pg_stat_activity WHERE backend_type = 'client backend'),
+                       (SELECT COUNT(*) FROM pg_stat_activity
+                        WHERE backend_type = 'client backend' AND datname = current_database()
+                          AND usename = current_user)
+            """)
+            max_connections, reservadas, conexiones_total, conexiones_app = cursor.fetchone()
+
+        por_proceso = pool['max'] if pool else settings.GUNICORN_THREADS + settings.DB_POOL_HILOS_FONDO
+        maximo_app = settings.GUNICORN_WORKERS * por_proceso
+        disponibles = max_connections - reservadas
+
+        return JsonResponse({
+            'pool': pool,
+            'postgres': {
+                'max_connections': max_connections,
+                'superuser_reserved_connections': reservadas,
+                'conexiones_actuales': conexiones_total,
+                'conexiones_aplicacion': conexiones_app,
+            },
+            'dimensionamiento': {
+                'workers': settings.GUNICORN_WORKERS,
+                'threads': settings.GUNICORN_THREADS,
+                'hilos_fondo': settings.DB_POOL_HILOS_FONDO,
+                'conexiones_por_proceso': por_proceso,
+                'maximo_aplicacion': maximo_app,
+                'uso_max_connections': round(maximo_app / disponibles, 3) if disponibles else None,
+                'excede_max_connections': maximo_app > disponibles,
+            },
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
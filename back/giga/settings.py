@@ -10,7 +10,9 @@ Basado en Django 4.2.7 con arquitectura de contenedores separados:
 - Frontend Svelte (contenedor front)
 """
 
+import importlib.util
 import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -70,7 +72,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # gzip/brotli para respuestas de texto/JSON grandes (COMPRESION_MIN_BYTES)
+    'common.compresion.CompresionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    # Antes de sesiones/auth para contar también sus consultas
+    'common.monitor_sql.MonitorSQLMiddleware',
+    # Inserta la auditoría del request en un solo INSERT al terminar
+    'auditoria.buffer.AuditoriaBufferMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -120,6 +128,82 @@ DATABASES = {
     }
 }
 
+# Pool de conexiones (giga/db_pool.py). Requiere psycopg 3 con psycopg_pool
+# (psycopg[binary,pool]); sin esos paquetes se mantiene una conexión
+# persistente por hilo (CONN_MAX_AGE). El pool es por proceso: el total de
+# conexiones de la aplicación es GUNICORN_WORKERS x DB_POOL_MAX_SIZE y debe
+# quedar por debajo de max_connections de Postgres (ver /api/health/).
+# DB_POOL_MAX_SIZE cubre los hilos de Gunicorn más los hilos propios del
+# proceso que usan la base (DB_POOL_HILOS_FONDO): el elector del scheduler
+# (retiene su conexión mientras es líder), el volcado de actividad de sesiones,
+# el escritor de auditoría en modo 'background' y hasta SCHEDULER_MAX_WORKERS
+# tareas programadas más otras tantas manuales. El hilo LISTEN de
+# notificaciones usa una conexión propia, fuera del pool.
+
+GUNICORN_WORKERS = config('GUNICORN_WORKERS', default=4, cast=int)
+GUNICORN_THREADS = config('GUNICORN_THREADS', default=2, cast=int)
+SCHEDULER_MAX_WORKERS = config('SCHEDULER_MAX_WORKERS', default=2, cast=int)
+DB_POOL_HILOS_FONDO = config('DB_POOL_HILOS_FONDO', default=3 + 2 * SCHEDULER_MAX_WORKERS, cast=int)
+
+DB_POOL = config('DB_POOL', default=True, cast=bool)
+if DB_POOL and importlib.util.find_spec('psycopg') and importlib.util.find_spec('psycopg_pool'):
+    from giga.db_pool import reiniciar_conexion
+
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=GUNICORN_THREADS + DB_POOL_HILOS_FONDO, cast=int),
+        # Segundos de espera por una conexión libre antes de fallar el request
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+        # Las conexiones se renuevan tras este tiempo (segundos), aunque estén sanas
+        'max_lifetime': config('DB_POOL_MAX_LIFETIME', default=1800, cast=float),
+        # Conexiones ociosas por encima de min_size se cierran tras este tiempo
+        'max_idle': config('DB_POOL_MAX_IDLE', default=300, cast=float),
+        'reset': reiniciar_conexion,
+    }
+
+
+# Caché
+# Por defecto en memoria local de cada proceso. Con REDIS_URL se usa Redis compartido
+# entre workers (requiere el paquete redis).
+
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'giga',
+        },
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'giga-sesiones',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'giga-default',
+            # Con el máximo por defecto (300) se desalojan las claves de versión
+            # de los espacios de common/cache.py junto con las entradas por agente
+            'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=20000, cast=int)},
+        },
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'giga-sesiones',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        },
+    }
+
+# Segundos que se cachean el rol de cada agente y el árbol de áreas usados en
+# los chequeos de permisos. Sin Redis cada worker tiene su propia caché y la
+# invalidación solo llega al proceso que hizo el cambio: el TTL corto acota
+# cuánto tiempo otro worker puede seguir aplicando un rol revocado.
+CACHE_TTL_PERMISOS = config('CACHE_TTL_PERMISOS', default=600 if REDIS_URL else 30, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -176,6 +260,18 @@ SESSION_COOKIE_AGE = 3600  # 1 hora en segundos
 # Renovar cookie en cada request para mantener sesión activa
 SESSION_SAVE_EVERY_REQUEST = True
 
+# Sesiones servidas desde caché: la renovación de cada request se resuelve en caché
+# y django_session se escribe como máximo una vez cada SESSION_DB_WRITE_INTERVAL segundos
+SESSION_ENGINE = 'personas.session_store'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_DB_WRITE_INTERVAL = config('SESSION_DB_WRITE_INTERVAL', default=300, cast=int)
+
+# Con caché local (por proceso), cada cuánto revalidar la sesión contra la base
+SESSION_CACHE_REVALIDATE = config('SESSION_CACHE_REVALIDATE', default=30, cast=int)
+
+# Cada cuánto se vuelca sesion_activa.ultimo_acceso (en lote)
+SESSION_ACTIVITY_FLUSH_INTERVAL = config('SESSION_ACTIVITY_FLUSH_INTERVAL', default=60, cast=int)
+
 # Nombre de la cookie de sesión
 SESSION_COOKIE_NAME = 'sessionid'
 
@@ -215,6 +311,8 @@ CSRF_TRUSTED_ORIGINS = [origin.strip() for origin in csrf_origins_env.split(',')
 # ============================================================================
 
 # Django REST Framework
+_ORJSON = importlib.util.find_spec('orjson') is not None
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'personas.authentication.CustomSessionAuthentication',
@@ -225,8 +323,14 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # orjson si está instalado (misma salida que JSONRenderer/JSONParser, ver common/renderers.py)
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'common.renderers.ORJSONRenderer' if _ORJSON else 'rest_framework.renderers.JSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'common.parsers.ORJSONParser' if _ORJSON else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -254,6 +358,13 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+# Métricas de BD por request visibles desde el frontend (common/monitor_sql.py)
+CORS_EXPOSE_HEADERS = [
+    'x-db-queries',
+    'x-db-time-ms',
+    'x-db-duplicate-queries',
+]
+
 CORS_ALLOWED_METHODS = [
     'DELETE',
     'GET', 
@@ -297,9 +408,159 @@ LOGGING = {
             'level': 'DEBUG' if DEBUG else 'INFO',
             'handlers': ['console'],
         },
+        # Una línea JSON por request con consultas y tiempo de BD (common/monitor_sql.py):
+        # en INFO solo los requests lentos o que exceden su presupuesto, en DEBUG todos
+        'giga.sql': {
+            'level': config('SQL_MONITOR_LOG_LEVEL', default='INFO'),
+            'handlers': ['console'],
+            'propagate': False,
+        },
     },
 }
 
+# ============================================================================
+# MONITOR SQL POR REQUEST
+# ============================================================================
+
+SQL_MONITOR_ENABLED = config('SQL_MONITOR_ENABLED', default=True, cast=bool)
+
+# Requests más lentos que este umbral se guardan con su SQL completo
+SQL_MONITOR_SLOW_MS = config('SQL_MONITOR_SLOW_MS', default=1000, cast=int)
+SQL_MONITOR_BUFFER_SIZE = config('SQL_MONITOR_BUFFER_SIZE', default=50, cast=int)
+
+# Origen en el código (archivo:línea) de las consultas más lentas que este
+# umbral; SQL_MONITOR_CAPTURE_ORIGIN lo captura para todas (costoso, solo para
+# diagnóstico)
+SQL_MONITOR_ORIGIN_MS = config('SQL_MONITOR_ORIGIN_MS', default=100, cast=int)
+SQL_MONITOR_CAPTURE_ORIGIN = config('SQL_MONITOR_CAPTURE_ORIGIN', default=False, cast=bool)
+
+# Máximo de consultas por endpoint (nombre de URL). Al correr tests se exige
+# estrictamente: un endpoint que lo excede hace fallar el test.
+SQL_QUERY_BUDGETS = {
+    'login': 20,
+    'check_session': 8,
+    'marcar_asistencia': 12,
+    'marcar_asistencia_lote': 25,
+    'obtener_estado_asistencia': 8,
+    'listar_asistencias': 12,
+    'resumen_asistencias': 10,
+    'listar_tipos_licencia': 6,
+    'get_roles': 6,
+    'get_areas': 10,
+}
+SQL_QUERY_BUDGET_STRICT = config(
+    'SQL_QUERY_BUDGET_STRICT', default=len(sys.argv) > 1 and sys.argv[1] == 'test', cast=bool
+)
+
+# Crea en la base de tests también las tablas de los modelos managed=False
+# (common/testing.py); los tests de endpoints verifican SQL_QUERY_BUDGETS
+TEST_RUNNER = 'common.testing.GigaTestRunner'
+
+# ============================================================================
+# SCHEDULER DE TAREAS (personas/scheduler.py)
+# ============================================================================
+
+# Procesos que inician el elector del scheduler (personas/apps.py):
+# 'auto' solo gunicorn, uvicorn y runserver; 'true' / 'false' fuerzan el valor
+# (por ejemplo para otro servidor de aplicaciones o para no ejecutar tareas en
+# una réplica)
+SCHEDULER_ENABLED = config('SCHEDULER_ENABLED', default='auto')
+
+# Segundos entre intentos de tomar el liderazgo y entre latidos del líder
+SCHEDULER_LEADER_INTERVAL = config('SCHEDULER_LEADER_INTERVAL', default=30, cast=int)
+
+# Al asumir el liderazgo se ejecutan las tareas que debían correr en esta ventana
+# (segundos) y no tienen ejecución registrada. 0 desactiva la recuperación.
+SCHEDULER_CATCHUP_WINDOW = config('SCHEDULER_CATCHUP_WINDOW', default=3600, cast=int)
+
+# ============================================================================
+# ARCHIVADO POR LOTES (common/archivado.py)
+# ============================================================================
+
+ARCHIVADO_TAMANO_LOTE = config('ARCHIVADO_TAMANO_LOTE', default=5000, cast=int)
+# Pausa entre lotes (segundos) para no competir con el tráfico normal
+ARCHIVADO_PAUSA = config('ARCHIVADO_PAUSA', default=0.2, cast=float)
+# Un lote que espera locks más que esto se reintenta más tarde
+ARCHIVADO_LOCK_TIMEOUT_MS = config('ARCHIVADO_LOCK_TIMEOUT_MS', default=5000, cast=int)
+
+# ============================================================================
+# ESCRITURA DE AUDITORÍA (auditoria/buffer.py)
+# ============================================================================
+
+# 'request': un INSERT multi-fila al terminar cada request.
+# 'background': un hilo inserta en lotes fuera del request (lo pendiente se
+# pierde si el proceso muere abruptamente).
+AUDITORIA_ESCRITURA = config('AUDITORIA_ESCRITURA', default='request')
+# Modo background: segundos entre inserciones y máximo de filas por INSERT
+AUDITORIA_FLUSH_INTERVALO = config('AUDITORIA_FLUSH_INTERVALO', default=2.0, cast=float)
+AUDITORIA_FLUSH_MAX = config('AUDITORIA_FLUSH_MAX', default=500, cast=int)
+# valor_previo/valor_nuevo más largos (caracteres JSON) se guardan truncados
+AUDITORIA_MAX_JSON = config('AUDITORIA_MAX_JSON', default=8192, cast=int)
+
+# ============================================================================
+# NOTIFICACIONES EN TIEMPO REAL (notificaciones/tiempo_real.py)
+# ============================================================================
+
+# 'postgres': NOTIFY/LISTEN entre procesos. 'local': solo dentro del proceso
+# (runserver o pruebas con un único proceso).
+NOTIFICACIONES_BROKER = config('NOTIFICACIONES_BROKER', default='postgres')
+# Vigencia (segundos) del contador de no leídas en memoria antes de recontar
+NOTIFICACIONES_CONTADOR_TTL = config('NOTIFICACIONES_CONTADOR_TTL', default=600, cast=int)
+# Stream SSE: latido, duración máxima de cada conexión y reintento sugerido al navegador
+NOTIFICACIONES_SSE_LATIDO = config('NOTIFICACIONES_SSE_LATIDO', default=25, cast=int)
+NOTIFICACIONES_SSE_DURACION = config('NOTIFICACIONES_SSE_DURACION', default=1800, cast=int)
+NOTIFICACIONES_SSE_REINTENTO_MS = config('NOTIFICACIONES_SSE_REINTENTO_MS', default=5000, cast=int)
+
+# Retención (días) de la purga diaria (personas.tasks.purge_old_notifications).
+# Las difusiones se conservan lo mismo que las no leídas.
+NOTIFICACIONES_RETENCION_LEIDAS_DIAS = config('NOTIFICACIONES_RETENCION_LEIDAS_DIAS', default=90, cast=int)
+NOTIFICACIONES_RETENCION_NO_LEIDAS_DIAS = config('NOTIFICACIONES_RETENCION_NO_LEIDAS_DIAS', default=365, cast=int)
+
+# ============================================================================
+# MARCACIONES POR LOTE (asistencia/kiosco.py)
+# ============================================================================
+
+# Sin rol de supervisión, diferencia máxima (segundos) entre el timestamp de
+# cada marcación y la hora del servidor; la marcación individual usa la hora
+# del servidor, así que un agente no puede cargar horas pasadas ni futuras
+KIOSCO_TOLERANCIA_SEGUNDOS = config('KIOSCO_TOLERANCIA_SEGUNDOS', default=300, cast=int)
+
+# ============================================================================
+# PLANIFICACIÓN AUTOMÁTICA DE GUARDIAS (guardias/services/planificacion.py)
+# ============================================================================
+
+# Horas mínimas entre el fin de una guardia y el inicio de la siguiente
+GUARDIAS_DESCANSO_MINIMO_HORAS = config('GUARDIAS_DESCANSO_MINIMO_HORAS', default=12, cast=int)
+# Meses de guardias anteriores que se suman al repartir fines de semana y feriados
+GUARDIAS_EQUIDAD_MESES = config('GUARDIAS_EQUIDAD_MESES', default=6, cast=int)
+
+# ============================================================================
+# COMPRESIÓN DE RESPUESTAS (common/compresion.py)
+# ============================================================================
+
+# Respuestas más chicas se envían sin comprimir
+COMPRESION_MIN_BYTES = config('COMPRESION_MIN_BYTES', default=1024, cast=int)
+# Calidad brotli (0-11): 4 comprime cerca de gzip 6 con bastante menos CPU
+COMPRESION_NIVEL_BROTLI = config('COMPRESION_NIVEL_BROTLI', default=4, cast=int)
+
+# ============================================================================
+# MÉTRICAS PROMETHEUS (/metrics/)
+# ============================================================================
+
+# /metrics/ y /api/health/db/ exigen el header 'Authorization: Bearer <token>'.
+# Sin token solo responden con DEBUG activo.
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Directorio compartido por los workers de un mismo servidor: cada uno vuelca
+# ahí sus contadores (como mucho cada METRICS_DUMP_INTERVAL segundos) y
+# /metrics/ responde con la suma de todos. Vacío: métricas del worker que
+# atiende el scrape. Debe vaciarse al iniciar el servidor.
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_DUMP_INTERVAL = config('METRICS_DUMP_INTERVAL', default=10, cast=int)
+
+# Segundos que se reutilizan las estadísticas de tablas entre scrapes
+METRICS_TABLE_STATS_TTL = config('METRICS_TABLE_STATS_TTL', default=60, cast=int)
+
 # ============================================================================
 # EMAIL CONFIGURATION - Resend API
 # ============================================================================
@@ -16,7 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from .health_views import health_check, simple_health
+from .health_views import health_check, simple_health, metrics, database_pool
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -29,4 +29,6 @@ urlpatterns = [
     # Health check endpoints
     path('health/', simple_health, name='health'),
     path('api/health/', health_check, name='api_health'),
+    path('api/health/db/', database_pool, name='api_health_db'),
+    path('metrics/', metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""
+Benchmark del motor de planificación automática de guardias
+(guardias/services/planificacion.py).
+
+Sin --area mide solo el cálculo en memoria sobre datos sintéticos (por defecto
+un área de 200 agentes durante un mes, con licencias, guardias previas,
+historial de equidad y jornadas por área); no necesita base de datos.
+
+Con --area mide la planificación completa sobre un área real: carga (cantidad
+de consultas incluida), cálculo y, con --guardar, la escritura del cronograma
+y sus guardias dentro de una transacción que se revierte al terminar.
+
+Uso:
+    python manage.py benchmark_planificador
+    python manage.py benchmark_planificador --agentes 500 --mes 2026-03 --repeticiones 10
+    python manage.py benchmark_planificador --area 12 --guardar
+"""
+from datetime import date, datetime, time, timedelta
+import calendar
+import random
+import statistics
+import time as reloj
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from common.monitor_sql import registrar_consultas
+from guardias.services.planificacion import (
+    FERIADO, FIN_DE_SEMANA, calcular_plan, planificar, resumen_equidad,
+)
+from personas.models import Agente
+
+# Turno diurno de 10 h (límite de ValidadorHorarios.validar_duracion_guardia)
+TURNO = (time(8), time(18))
+
+
+def _periodo(mes):
+    """(primer día, último día) del mes 'YYYY-MM'; por defecto el mes siguiente"""
+    if mes:
+        try:
+            inicio = datetime.strptime(mes, '%Y-%m').date()
+        except ValueError:
+            raise CommandError('--mes debe tener formato YYYY-MM')
+    else:
+        hoy = date.today()
+        inicio = (hoy.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return inicio, inicio.replace(day=calendar.monthrange(inicio.year, inicio.month)[1])
+
+
+def datos_sinteticos(n_agentes, fecha_inicio, fecha_fin, semilla=42):
+    """Entrada de calcular_plan con una distribución parecida a la de producción"""
+    azar = random.Random(semilla)
+    areas = list(range(1, 5))
+    agentes = [(id_agente, azar.choice(areas)) for id_agente in range(1, n_agentes + 1)]
+
+    # Un feriado a mitad de mes que cae en día hábil
+    feriado = fecha_inicio + timedelta(days=14)
+    while feriado.weekday() in (5, 6):
+        feriado += timedelta(days=1)
+
+    dias, jornadas_base = [], {}
+    dia = fecha_inicio - timedelta(days=1)
+    while dia <= fecha_fin + timedelta(days=1):
+        if dia == feriado:
+            clase = FERIADO
+        elif dia.weekday() in (5, 6):
+            clase = FIN_DE_SEMANA
+        else:
+            clase = None
+            jornadas_base[dia] = (datetime.combine(dia, time(7, 30)), datetime.combine(dia, time(18, 30)))
+        if clase and fecha_inicio <= dia <= fecha_fin:
+            dias.append((dia, clase))
+        dia += timedelta(days=1)
+    jornadas = {id_area: jornadas_base for id_area in areas}
+
+    licencias, ocupadas, historial = {}, {}, {}
+    for id_agente, _ in agentes:
+        if azar.random() < 0.08:
+            desde = fecha_inicio + timedelta(days=azar.randrange(0, 28))
+            licencias[id_agente] = {desde + timedelta(days=i) for i in range(azar.randint(3, 10))}
+        if azar.random() < 0.05:
+            fecha, _ = azar.choice(dias)
+            ocupadas[id_agente] = [(datetime.combine(fecha, time(20)), datetime.combine(fecha + timedelta(days=1), time(8)))]
+        historial[id_agente] = {FIN_DE_SEMANA: azar.randint(0, 6), FERIADO: azar.randint(0, 2)}
+
+    return {
+        'agentes': agentes,
+        'dias': dias,
+        'licencias': licencias,
+        'ocupadas': ocupadas,
+        'historial': historial,
+        'jornadas': jornadas,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Mide el motor de planificación automática de guardias'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--agentes', type=int, default=200, help='Agentes del área sintética')
+        parser.add_argument('--mes', type=str, help='Mes a planificar (YYYY-MM, default: el siguiente)')
+        parser.add_argument('--agentes-por-dia', type=int, default=1, help='Agentes de guardia por día')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Repeticiones del cálculo')
+        parser.add_argument('--area', type=int, help='Área real a planificar (usa la base de datos)')
+        parser.add_argument(
+            '--guardar', action='store_true',
+            help='Con --area: incluir la escritura (se revierte al terminar)'
+        )
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1:
+            raise CommandError('--repeticiones debe ser al menos 1')
+        fecha_inicio, fecha_fin = _periodo(options['mes'])
+
+        self.stdout.write(self.style.HTTP_INFO('\n⏱️  BENCHMARK DEL PLANIFICADOR DE GUARDIAS\n'))
+        self.stdout.write('=' * 80)
+        self.stdout.write(f'Período: {fecha_inicio} → {fecha_fin}')
+
+        if options['area']:
+            self._medir_area(options['area'], fecha_inicio, fecha_fin, options)
+        else:
+            self._medir_sintetico(fecha_inicio, fecha_fin, options)
+
+    def _medir_sintetico(self, fecha_inicio, fecha_fin, options):
+        datos = datos_sinteticos(options['agentes'], fecha_inicio, fecha_fin)
+        self.stdout.write(f'Agentes: {len(datos["agentes"])}  días de guardia: {len(datos["dias"])}')
+
+        tiempos = []
+        for _ in range(options['repeticiones']):
+            inicio = reloj.perf_counter()
+            asignaciones, sin_cubrir, carga = calcular_plan(
+                datos['agentes'], datos['dias'], TURNO[0], TURNO[1],
+                licencias=datos['licencias'],
+                ocupadas=datos['ocupadas'],
+                historial=datos['historial'],
+                jornadas=datos['jornadas'],
+                agentes_por_dia=options['agentes_por_dia'],
+            )
+            tiempos.append((reloj.perf_counter() - inicio) * 1000)
+
+        self.stdout.write(
+            f'cálculo  p50={statistics.median(tiempos):.2f}ms  max={max(tiempos):.2f}ms  '
+            f'guardias={len(asignaciones)}  sin cubrir={len(sin_cubrir)}'
+        )
+        self._mostrar_equidad(resumen_equidad(carga))
+
+    def _medir_area(self, area_id, fecha_inicio, fecha_fin, options):
+        creado_por = Agente.objects.filter(id_area_id=area_id, activo=True).order_by('id_agente').first()
+        if creado_por is None:
+            raise CommandError(f'El área {area_id} no tiene agentes activos')
+
+        for repeticion in range(options['repeticiones']):
+            with transaction.atomic():
+                with registrar_consultas(capturar_origen=False) as registro:
+                    resultado = planificar(
+                        area_id, fecha_inicio, fecha_fin, TURNO[0], TURNO[1],
+                        agentes_por_dia=options['agentes_por_dia'],
+                        creado_por=creado_por,
+                        guardar=options['guardar'],
+                    )
+                transaction.set_rollback(True)
+
+            tiempos = resultado['tiempos_ms']
+            self.stdout.write(
+                f'#{repeticion + 1}  carga={tiempos["carga"]}ms  cálculo={tiempos["calculo"]}ms  '
+                f'escritura={tiempos["escritura"]}ms  total={tiempos["total"]}ms  '
+                f'consultas={registro.cantidad}'
+            )
+
+        self.stdout.write(
+            f'Agentes: {resultado["agentes"]}  días: {resultado["dias"]}  '
+            f'guardias: {len(resultado["asignaciones"])}  sin cubrir: {len(resultado["sin_cubrir"])}'
+        )
+        self._mostrar_equidad(resultado['equidad'])
+
+    def _mostrar_equidad(self, equidad):
+        for clase, rango in equidad.items():
+            self.stdout.write(f'{clase:<14} acumulado min={rango["min"]}  max={rango["max"]}')
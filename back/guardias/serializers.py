@@ -2,6 +2,8 @@
 Serializers para la app guardias - Incluyendo nuevos modelos de cronogramas.
 """
 
+from datetime import time
+
 from rest_framework import serializers
 from .models import Cronograma, Guardia, ResumenGuardiaMes, ReglaPlus, ParametrosArea, Feriado, NotaGuardia, HoraCompensacion
 
@@ -86,6 +88,10 @@ class CronogramaExtendidoSerializer(serializers.ModelSerializer):
     jefe_nombre = serializers.CharField(source='id_jefe.nombre', read_only=True, allow_null=True)
     jefe_apellido = serializers.CharField(source='id_jefe.apellido', read_only=True, allow_null=True)
     total_guardias = serializers.SerializerMethodField()
+    # Solo con el queryset anotado (guardias.utils.anotar_cronogramas); si no, None
+    guardias_pendientes = serializers.IntegerField(source='total_guardias_pendientes', read_only=True, default=None)
+    total_agentes = serializers.IntegerField(read_only=True, default=None)
+    puede_aprobar = serializers.BooleanField(source='puede_aprobar_agente', read_only=True, default=None)
     
     # Campos de aprobación - con manejo de NULL
     creado_por_nombre = serializers.CharField(source='creado_por_id.nombre', read_only=True, allow_null=True, default=None)
@@ -101,15 +107,19 @@ class CronogramaExtendidoSerializer(serializers.ModelSerializer):
             'id_cronograma', 'fecha_aprobacion', 'tipo',
             'hora_inicio', 'hora_fin', 'creado_en', 'actualizado_en',
             'id_jefe', 'jefe_nombre', 'jefe_apellido',
-            'id_area', 'area_nombre', 'total_guardias', 'estado', 'fecha_creacion',
+            'id_area', 'area_nombre', 'total_guardias', 'guardias_pendientes', 'total_agentes',
+            'estado', 'fecha_creacion',
             'creado_por_rol', 'creado_por_id', 'creado_por_nombre', 'creado_por_apellido',
             'aprobado_por_id', 'aprobado_por_nombre', 'aprobado_por_apellido',
-            'requiere_aprobacion', 'puede_aprobar_rol'
+            'requiere_aprobacion', 'puede_aprobar_rol', 'puede_aprobar'
         ]
         read_only_fields = ['id_cronograma', 'creado_en', 'actualizado_en', 'total_guardias', 
                           'requiere_aprobacion', 'puede_aprobar_rol']
     
     def get_total_guardias(self, obj):
+        # Queryset anotado: sin consulta por cronograma
+        if hasattr(obj, 'total_guardias_activas'):
+            return obj.total_guardias_pendientes if obj.estado == 'pendiente' else obj.total_guardias_activas
         if obj.estado == 'pendiente':
             return obj.guardia_set.filter(estado='pendiente').count()
         return obj.guardia_set.filter(activa=True).count()
@@ -231,16 +241,18 @@ class PlanificacionCronogramaSerializer(serializers.Serializer):
         allow_empty=True
     )
     tipo_cronograma = serializers.CharField(max_length=50, default='automatico')
-    hora_inicio = serializers.TimeField(default='08:00:00')
-    hora_fin = serializers.TimeField(default='20:00:00')
+    hora_inicio = serializers.TimeField(default=time(8, 0))
+    hora_fin = serializers.TimeField(default=time(20, 0))
+    agentes_por_dia = serializers.IntegerField(default=1, min_value=1)
     
     def validate(self, data):
         """Validaciones personalizadas"""
         if data['fecha_inicio'] > data['fecha_fin']:
             raise serializers.ValidationError("La fecha de inicio debe ser anterior a la fecha de fin")
         
-        if data['hora_inicio'] >= data['hora_fin']:
-            raise serializers.ValidationError("La hora de inicio debe ser anterior a la hora de fin")
+        # hora_inicio > hora_fin: guardia nocturna que termina al día siguiente
+        if data['hora_inicio'] == data['hora_fin']:
+            raise serializers.ValidationError("La hora de inicio debe ser distinta de la hora de fin")
         
         return data
 
@@ -269,6 +281,63 @@ class CalculoPlusSerializer(serializers.Serializer):
         return data
 
 
+class ReglaSimuladaSerializer(serializers.Serializer):
+    """Regla de plus propuesta (no guardada) para un escenario de simulación"""
+    
+    horas_minimas_mensuales = serializers.DecimalField(max_digits=6, decimal_places=2, min_value=0)
+    porcentaje_plus = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0)
+    aplica_areas_operativas = serializers.BooleanField(default=True)
+    aplica_areas_administrativas = serializers.BooleanField(default=False)
+
+
+class EscenarioPlusSerializer(serializers.Serializer):
+    """Escenario: reglas existentes (reglas_ids), reglas propuestas o ambas"""
+    
+    nombre = serializers.CharField(max_length=100)
+    reglas_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    reglas = ReglaSimuladaSerializer(many=True, required=False, default=list)
+    
+    def validate(self, data):
+        if not data['reglas_ids'] and not data['reglas']:
+            raise serializers.ValidationError("Cada escenario necesita reglas_ids o reglas")
+        return data
+
+
+class SimulacionPlusSerializer(serializers.Serializer):
+    """Serializer para simular reglas de plus sobre meses históricos"""
+    
+    MAX_MESES = 24
+    MAX_ESCENARIOS = 10
+    
+    desde = serializers.RegexField(r'^\d{4}-(0[1-9]|1[0-2])$', help_text="Primer mes (YYYY-MM)")
+    hasta = serializers.RegexField(r'^\d{4}-(0[1-9]|1[0-2])$', help_text="Último mes (YYYY-MM)")
+    escenarios = EscenarioPlusSerializer(many=True)
+    incluir_vigentes = serializers.BooleanField(default=True)
+    area_id = serializers.IntegerField(required=False, help_text="Limitar al área y sus sub-áreas")
+    monto_base = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0, required=False)
+    limite_detalle = serializers.IntegerField(default=500, min_value=0, max_value=5000)
+    
+    def validate(self, data):
+        """Validaciones del período y de los escenarios"""
+        desde = tuple(int(parte) for parte in data['desde'].split('-'))
+        hasta = tuple(int(parte) for parte in data['hasta'].split('-'))
+        if desde > hasta:
+            raise serializers.ValidationError("El mes desde debe ser anterior al mes hasta")
+        if (hasta[0] - desde[0]) * 12 + hasta[1] - desde[1] + 1 > self.MAX_MESES:
+            raise serializers.ValidationError(f"El período no puede superar {self.MAX_MESES} meses")
+        if len(data['escenarios']) > self.MAX_ESCENARIOS:
+            raise serializers.ValidationError(f"Se admiten hasta {self.MAX_ESCENARIOS} escenarios")
+        
+        nombres = [escenario['nombre'] for escenario in data['escenarios']]
+        if data['incluir_vigentes']:
+            nombres.append('vigentes')
+        if len(set(nombres)) != len(nombres):
+            raise serializers.ValidationError("Los nombres de los escenarios deben ser únicos ('vigentes' está reservado)")
+        
+        data['desde'], data['hasta'] = desde, hasta
+        return data
+
+
 class AprobacionPlusSerializer(serializers.Serializer):
     """Serializer para aprobar asignaciones de plus"""
     
@@ -0,0 +1,383 @@
+"""
+Motor de planificación automática de guardias - Sistema GIGA
+
+Arma el plan completo del período en memoria y lo guarda con un único
+bulk_create. Los datos se leen con una cantidad fija de consultas (agentes,
+licencias, guardias ya cargadas y parámetros de área); los feriados salen del
+calendario laboral en memoria (asistencia/calendario.py).
+
+Se planifican los días no laborables del período (sábados, domingos y
+feriados), que son los únicos en los que se admiten guardias.
+
+Restricciones duras (un agente que no las cumple no se asigna ese día):
+- licencia aprobada en alguno de los días que cubre la guardia
+- superposición con la jornada habitual de su área en un día laborable
+  (ventana_entrada_inicio a ventana_salida_fin de ParametrosArea vigente)
+- descanso menor a GUARDIAS_DESCANSO_MINIMO_HORAS respecto de otra guardia,
+  propia del plan o ya cargada
+
+Equidad (objetivo blando): entre los agentes habilitados se elige el que menos
+guardias de la misma clase de día (fin de semana o feriado) acumula en los
+últimos GUARDIAS_EQUIDAD_MESES meses más el plan en curso; a igualdad, el que
+menos guardias lleva en el plan y el que hace más tiempo que no tiene una.
+"""
+
+from datetime import date, datetime, timedelta
+import logging
+import time as reloj
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from asistencia.calendario import calendario
+
+logger = logging.getLogger(__name__)
+
+FIN_DE_SEMANA = 'fin_de_semana'
+FERIADO = 'feriado'
+
+
+class PlanificacionError(Exception):
+    """Errores de negocio de la planificación automática."""
+
+
+def _descanso_minimo():
+    return timedelta(hours=getattr(settings, 'GUARDIAS_DESCANSO_MINIMO_HORAS', 12))
+
+
+def _inicio_historial(fecha_inicio, meses):
+    """Primer día del mes que está `meses` meses antes del inicio del período"""
+    indice = fecha_inicio.year * 12 + fecha_inicio.month - 1 - meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def _rango(desde, hasta):
+    dia = desde
+    while dia <= hasta:
+        yield dia
+        dia += timedelta(days=1)
+
+
+def clase_de_dia(fecha):
+    """FERIADO, FIN_DE_SEMANA o None si es laborable"""
+    if calendario.es_feriado(fecha):
+        return FERIADO
+    if fecha.weekday() in (5, 6):
+        return FIN_DE_SEMANA
+    return None
+
+
+def intervalo_turno(fecha, hora_inicio, hora_fin):
+    """(inicio, fin) de una guardia; si cruza la medianoche termina al día siguiente"""
+    fin = fecha + timedelta(days=1) if hora_inicio > hora_fin else fecha
+    return datetime.combine(fecha, hora_inicio), datetime.combine(fin, hora_fin)
+
+
+# ----------------------------------------------------------------------------
+# Carga de datos
+# ----------------------------------------------------------------------------
+
+def cargar_datos(area_id, fecha_inicio, fecha_fin, agentes_ids=None, meses_historial=None):
+    """
+    Lee todo lo que necesita calcular_plan con cuatro consultas.
+
+    Returns:
+        dict con agentes [(id_agente, id_area)], licencias {id_agente: set(fechas)},
+        ocupadas {id_agente: [(inicio, fin)]}, historial {id_agente: {clase: n}} y
+        jornadas {id_area: {fecha: (inicio, fin)}}
+    """
+    from asistencia.models import Licencia
+    from personas.models import Agente
+    from ..models import Guardia, ParametrosArea
+
+    if meses_historial is None:
+        meses_historial = getattr(settings, 'GUARDIAS_EQUIDAD_MESES', 6)
+
+    agentes_qs = Agente.objects.filter(activo=True)
+    if agentes_ids:
+        agentes_qs = agentes_qs.filter(id_agente__in=agentes_ids)
+    else:
+        agentes_qs = agentes_qs.filter(id_area_id=area_id)
+    agentes = list(agentes_qs.order_by('id_agente').values_list('id_agente', 'id_area_id'))
+    ids = [id_agente for id_agente, _ in agentes]
+
+    # Una guardia nocturna del último día termina al día siguiente
+    hasta = fecha_fin + timedelta(days=1)
+
+    licencias = {}
+    for id_agente, desde_lic, hasta_lic in Licencia.objects.filter(
+        id_agente_id__in=ids,
+        estado='aprobada',
+        fecha_desde__lte=hasta,
+        fecha_hasta__gte=fecha_inicio,
+    ).values_list('id_agente_id', 'fecha_desde', 'fecha_hasta'):
+        licencias.setdefault(id_agente, set()).update(
+            _rango(max(desde_lic, fecha_inicio), min(hasta_lic, hasta))
+        )
+
+    # Guardias ya cargadas: historial de equidad y ocupación para el descanso
+    desde_historial = _inicio_historial(fecha_inicio, meses_historial)
+    ocupadas, historial = {}, {}
+    for id_agente, fecha, hora_inicio, hora_fin in Guardia.objects.filter(
+        id_agente_id__in=ids,
+        activa=True,
+        fecha__range=(desde_historial, hasta),
+    ).values_list('id_agente_id', 'fecha', 'hora_inicio', 'hora_fin'):
+        if fecha >= fecha_inicio - timedelta(days=1):
+            ocupadas.setdefault(id_agente, []).append(intervalo_turno(fecha, hora_inicio, hora_fin))
+        clase = clase_de_dia(fecha) if fecha <= fecha_fin else None
+        if clase:
+            conteo = historial.setdefault(id_agente, {FIN_DE_SEMANA: 0, FERIADO: 0})
+            conteo[clase] += 1
+
+    # Jornada habitual de cada área en los días laborables alrededor del período
+    areas = {id_area for _, id_area in agentes if id_area is not None}
+    parametros = {}
+    for id_area, vigente_desde, vigente_hasta, entrada, salida in ParametrosArea.objects.filter(
+        id_area_id__in=areas,
+        activo=True,
+        vigente_desde__lte=hasta,
+    ).filter(
+        Q(vigente_hasta__isnull=True) | Q(vigente_hasta__gte=fecha_inicio - timedelta(days=1))
+    ).order_by('vigente_desde').values_list(
+        'id_area_id', 'vigente_desde', 'vigente_hasta', 'ventana_entrada_inicio', 'ventana_salida_fin'
+    ):
+        parametros.setdefault(id_area, []).append((vigente_desde, vigente_hasta, entrada, salida))
+
+    jornadas = {}
+    for id_area, vigencias in parametros.items():
+        por_fecha = jornadas.setdefault(id_area, {})
+        for dia in _rango(fecha_inicio - timedelta(days=1), hasta):
+            if clase_de_dia(dia):
+                continue
+            # Gana la vigencia más reciente (mismo criterio que parametros_area_vigentes)
+            for vigente_desde, vigente_hasta, entrada, salida in reversed(vigencias):
+                if vigente_desde <= dia and (vigente_hasta is None or vigente_hasta >= dia):
+                    por_fecha[dia] = (datetime.combine(dia, entrada), datetime.combine(dia, salida))
+                    break
+
+    return {
+        'agentes': agentes,
+        'licencias': licencias,
+        'ocupadas': ocupadas,
+        'historial': historial,
+        'jornadas': jornadas,
+    }
+
+
+# ----------------------------------------------------------------------------
+# Cálculo
+# ----------------------------------------------------------------------------
+
+def dias_de_guardia(fecha_inicio, fecha_fin):
+    """[(fecha, clase)] de los días no laborables del período"""
+    return [(dia, clase) for dia in _rango(fecha_inicio, fecha_fin) if (clase := clase_de_dia(dia))]
+
+
+def calcular_plan(agentes, dias, hora_inicio, hora_fin, licencias=None, ocupadas=None,
+                  historial=None, jornadas=None, agentes_por_dia=1, descanso=None):
+    """
+    Asigna agentes_por_dia agentes a cada día de `dias` respetando las
+    restricciones duras y minimizando la carga acumulada (ver módulo).
+    No accede a la base de datos.
+
+    Returns:
+        tuple: ([(fecha, id_agente)], [fechas con cupos sin cubrir], {id_agente: {clase: n}})
+    """
+    licencias = licencias or {}
+    jornadas = jornadas or {}
+    historial = historial or {}
+    descanso = descanso if descanso is not None else _descanso_minimo()
+
+    # Copias: el plan agrega guardias y conteos sin tocar los datos cargados
+    intervalos = {id_agente: list(lista) for id_agente, lista in (ocupadas or {}).items()}
+    carga = {
+        id_agente: dict(historial.get(id_agente) or {FIN_DE_SEMANA: 0, FERIADO: 0})
+        for id_agente, _ in agentes
+    }
+    en_plan = dict.fromkeys(carga, 0)
+    ultima = dict.fromkeys(carga, date.min)
+
+    choques_jornada = {}
+
+    def choca_con_jornada(id_area, inicio, fin):
+        clave = (id_area, inicio)
+        if clave not in choques_jornada:
+            por_fecha = jornadas.get(id_area, {})
+            choques_jornada[clave] = any(
+                (jornada := por_fecha.get(dia)) and inicio < jornada[1] and jornada[0] < fin
+                for dia in _rango(inicio.date() - timedelta(days=1), fin.date())
+            )
+        return choques_jornada[clave]
+
+    def habilitado(id_agente, id_area, fechas_turno, inicio, fin):
+        bloqueadas = licencias.get(id_agente)
+        if bloqueadas and not bloqueadas.isdisjoint(fechas_turno):
+            return False
+        if id_area is not None and choca_con_jornada(id_area, inicio, fin):
+            return False
+        return not any(
+            inicio < otro_fin + descanso and otro_inicio < fin + descanso
+            for otro_inicio, otro_fin in intervalos.get(id_agente, ())
+        )
+
+    asignaciones, sin_cubrir = [], []
+    for fecha, clase in dias:
+        inicio, fin = intervalo_turno(fecha, hora_inicio, hora_fin)
+        fechas_turno = {fecha, fin.date()}
+        candidatos = [
+            (carga[id_agente][clase], en_plan[id_agente], ultima[id_agente], id_agente)
+            for id_agente, id_area in agentes
+            if habilitado(id_agente, id_area, fechas_turno, inicio, fin)
+        ]
+        candidatos.sort()
+        elegidos = candidatos[:agentes_por_dia]
+        if len(elegidos) < agentes_por_dia:
+            sin_cubrir.append(fecha)
+
+        for *_, id_agente in elegidos:
+            asignaciones.append((fecha, id_agente))
+            intervalos.setdefault(id_agente, []).append((inicio, fin))
+            carga[id_agente][clase] += 1
+            en_plan[id_agente] += 1
+            ultima[id_agente] = fecha
+
+    return asignaciones, sin_cubrir, carga
+
+
+def resumen_equidad(carga):
+    """Mínimo y máximo acumulado por clase de día entre los agentes"""
+    resumen = {}
+    for clase in (FIN_DE_SEMANA, FERIADO):
+        valores = [conteo[clase] for conteo in carga.values()]
+        resumen[clase] = {'min': min(valores, default=0), 'max': max(valores, default=0)}
+    return resumen
+
+
+# ----------------------------------------------------------------------------
+# Planificación completa
+# ----------------------------------------------------------------------------
+
+def _ms(desde):
+    return round((reloj.perf_counter() - desde) * 1000, 1)
+
+
+def director_del_area(area_id):
+    """
+    id del agente activo con rol de director en el área o, si no tiene, en
+    el área superior más cercana. None si ninguna de la cadena tiene director.
+    """
+    from personas.models import AgenteRol, Area
+
+    cadena, actual = [], area_id
+    while actual is not None and actual not in cadena:
+        cadena.append(actual)
+        actual = Area.objects.filter(id_area=actual).values_list('id_area_padre_id', flat=True).first()
+
+    directores = {}
+    for id_area, id_agente in AgenteRol.objects.filter(
+        id_rol__nombre__icontains='director',
+        id_agente__activo=True,
+        id_agente__id_area_id__in=cadena,
+    ).order_by('id_agente_id').values_list('id_agente__id_area_id', 'id_agente_id'):
+        directores.setdefault(id_area, id_agente)
+    return next((directores[id_area] for id_area in cadena if id_area in directores), None)
+
+
+def planificar(area_id, fecha_inicio, fecha_fin, hora_inicio, hora_fin, agentes_ids=None,
+               agentes_por_dia=1, creado_por=None, creado_por_rol=None, guardar=True):
+    """
+    Calcula el plan del período y, si guardar=True, crea el cronograma y todas
+    sus guardias en una transacción (un INSERT por lote de bulk_create).
+
+    Returns:
+        dict con el cronograma creado, las asignaciones, los días sin cubrir,
+        el resumen de equidad y los tiempos de cada etapa en ms
+    """
+    from personas.models import Area
+    from ..models import Cronograma, Guardia
+
+    if fecha_inicio > fecha_fin:
+        raise PlanificacionError('La fecha de inicio debe ser anterior a la fecha de fin')
+    if agentes_por_dia < 1:
+        raise PlanificacionError('Se requiere al menos un agente por día')
+    if guardar and creado_por is None:
+        raise PlanificacionError('Se requiere el agente que crea el cronograma')
+    if not Area.objects.filter(id_area=area_id).exists():
+        raise PlanificacionError(f'Área {area_id} no encontrada')
+
+    inicio_total = reloj.perf_counter()
+    datos = cargar_datos(area_id, fecha_inicio, fecha_fin, agentes_ids)
+    if not datos['agentes']:
+        raise PlanificacionError('No hay agentes activos para planificar')
+    tiempos = {'carga': _ms(inicio_total)}
+
+    inicio = reloj.perf_counter()
+    dias = dias_de_guardia(fecha_inicio, fecha_fin)
+    asignaciones, sin_cubrir, carga = calcular_plan(
+        datos['agentes'], dias, hora_inicio, hora_fin,
+        licencias=datos['licencias'],
+        ocupadas=datos['ocupadas'],
+        historial=datos['historial'],
+        jornadas=datos['jornadas'],
+        agentes_por_dia=agentes_por_dia,
+    )
+    tiempos['calculo'] = _ms(inicio)
+
+    cronograma = None
+    inicio = reloj.perf_counter()
+    if guardar:
+        desde, hasta = intervalo_turno(fecha_inicio, hora_inicio, hora_fin)
+        horas = round((hasta - desde).total_seconds() / 3600)
+        un_mes = (fecha_inicio.year, fecha_inicio.month) == (fecha_fin.year, fecha_fin.month)
+        with transaction.atomic():
+            cronograma = Cronograma.objects.create(
+                id_area_id=area_id,
+                id_jefe=creado_por,
+                id_director_id=director_del_area(area_id),
+                tipo='automatico',
+                hora_inicio=hora_inicio,
+                hora_fin=hora_fin,
+                estado='generada',
+                fecha_creacion=date.today(),
+                creado_por_rol=creado_por_rol,
+                creado_por_id=creado_por,
+                anio=fecha_inicio.year if un_mes else None,
+                mes=fecha_inicio.month if un_mes else None,
+                fecha_desde=fecha_inicio,
+                fecha_hasta=fecha_fin,
+            )
+            Guardia.objects.bulk_create(
+                [
+                    Guardia(
+                        id_cronograma=cronograma,
+                        id_agente_id=id_agente,
+                        fecha=fecha,
+                        hora_inicio=hora_inicio,
+                        hora_fin=hora_fin,
+                        tipo='automatica',
+                        estado='programada',
+                        activa=True,
+                        horas_planificadas=horas,
+                    )
+                    for fecha, id_agente in asignaciones
+                ],
+                batch_size=1000,
+            )
+    tiempos['escritura'] = _ms(inicio)
+    tiempos['total'] = _ms(inicio_total)
+
+    logger.info(
+        f'Planificación área {area_id} {fecha_inicio}→{fecha_fin}: {len(asignaciones)} guardias, '
+        f'{len(datos["agentes"])} agentes, {len(sin_cubrir)} días sin cubrir, {tiempos["total"]} ms'
+    )
+    return {
+        'cronograma': cronograma,
+        'asignaciones': asignaciones,
+        'agentes': len(datos['agentes']),
+        'dias': len(dias),
+        'sin_cubrir': sin_cubrir,
+        'equidad': resumen_equidad(carga),
+        'tiempos_ms': tiempos,
+    }
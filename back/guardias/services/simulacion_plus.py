@@ -0,0 +1,254 @@
+"""
+Simulador de reglas de plus sobre meses históricos - Sistema GIGA
+
+Responde "¿qué se habría pagado con estas reglas?" para toda la organización
+sin recalcular agente por agente:
+
+- Las horas de cada agente y mes del período salen de dos consultas agregadas
+  (guardias planificadas activas y horas de compensación aprobadas, igual que
+  calcular_plus_agente en SQL).
+- Los valores actuales salen de ResumenGuardiaMes (una consulta).
+- Cada escenario (conjunto de ReglaPlus existentes o reglas propuestas) se
+  compila por mes y tipo de área en una tabla de umbrales ordenados con el
+  máximo porcentaje alcanzado; evaluar una fila es una búsqueda binaria.
+
+Una regla aplica a una fila si el área es del tipo que la regla cubre
+(aplica_areas_operativas / aplica_areas_administrativas), la regla está
+vigente en algún día del mes y las horas alcanzan horas_minimas_mensuales.
+Sin horas no hay plus. Entre las reglas que aplican gana la de mayor
+porcentaje, que es la que elige CalculadoraPlus.evaluar_reglas_plus al
+recorrerlas de mayor a menor porcentaje y tomar la primera alcanzada. Esa
+función no distingue tipo de área y toma la vigencia a la fecha del cálculo,
+así que los resultados coinciden solo con reglas que cubren ambos tipos de
+área y vigentes todo el mes.
+"""
+
+from bisect import bisect_right
+from datetime import date
+from decimal import Decimal
+import calendar
+import time as reloj
+
+from django.db.models import F, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from ..models import Guardia, HoraCompensacion, ReglaPlus, ResumenGuardiaMes
+from ..utils import es_area_operativa_nombre
+
+ESCENARIO_VIGENTES = 'vigentes'
+
+
+def _siguiente(anio, mes):
+    return (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+
+class Escenario:
+    """Conjunto de reglas a evaluar, compilado por mes y tipo de área"""
+
+    def __init__(self, nombre, reglas):
+        """
+        Args:
+            nombre (str): Nombre del escenario en la respuesta
+            reglas (list): dicts con horas_minimas_mensuales, porcentaje_plus,
+                aplica_areas_operativas, aplica_areas_administrativas y, opcionales,
+                vigente_desde / vigente_hasta
+        """
+        self.nombre = nombre
+        self.reglas = reglas
+        self._tablas = {}
+
+    @classmethod
+    def desde_reglas(cls, nombre, queryset, con_vigencia=True, adicionales=()):
+        """
+        Escenario con las ReglaPlus del queryset más reglas propuestas.
+        con_vigencia=False aplica las reglas en todo el período ("si hubieran regido").
+        """
+        campos = ['horas_minimas_mensuales', 'porcentaje_plus', 'aplica_areas_operativas', 'aplica_areas_administrativas']
+        if con_vigencia:
+            campos += ['vigente_desde', 'vigente_hasta']
+        return cls(nombre, list(queryset.values(*campos)) + list(adicionales))
+
+    def _tabla(self, anio, mes, operativa):
+        clave = (anio, mes, operativa)
+        if clave not in self._tablas:
+            inicio = date(anio, mes, 1)
+            fin = date(anio, mes, calendar.monthrange(anio, mes)[1])
+            aplicables = sorted(
+                (Decimal(regla['horas_minimas_mensuales']), Decimal(regla['porcentaje_plus']))
+                for regla in self.reglas
+                if (regla.get('aplica_areas_operativas') if operativa else regla.get('aplica_areas_administrativas'))
+                and (regla.get('vigente_desde') is None or regla['vigente_desde'] <= fin)
+                and (regla.get('vigente_hasta') is None or regla['vigente_hasta'] >= inicio)
+            )
+            umbrales, maximos, maximo = [], [], Decimal('0.0')
+            for horas_minimas, porcentaje in aplicables:
+                maximo = max(maximo, porcentaje)
+                umbrales.append(horas_minimas)
+                maximos.append(maximo)
+            self._tablas[clave] = (umbrales, maximos)
+        return self._tablas[clave]
+
+    def porcentaje(self, horas, anio, mes, operativa):
+        """Mayor porcentaje entre las reglas aplicables; 0 sin horas o sin reglas alcanzadas"""
+        if horas <= 0:
+            return Decimal('0.0')
+        umbrales, maximos = self._tabla(anio, mes, operativa)
+        posicion = bisect_right(umbrales, horas)
+        return maximos[posicion - 1] if posicion else Decimal('0.0')
+
+
+def cargar_filas(desde, hasta, areas_ids=None):
+    """
+    Horas y porcentaje actual por agente y mes del período.
+
+    Returns:
+        dict {(id_agente, anio, mes): {'id_area', 'operativa', 'horas', 'actual'}}
+    """
+    fecha_inicio = date(*desde, 1)
+    fecha_fin = date(*_siguiente(*hasta), 1)
+    filas = {}
+
+    def fila(id_agente, anio, mes, id_area, area_nombre):
+        return filas.setdefault((id_agente, anio, mes), {
+            'id_area': id_area,
+            'operativa': es_area_operativa_nombre(area_nombre),
+            'horas': Decimal('0.0'),
+            'actual': Decimal('0.0'),
+        })
+
+    fuentes = (
+        (Guardia.objects.filter(activa=True, estado='planificada'), 'fecha', 'horas_efectivas'),
+        (HoraCompensacion.objects.filter(estado='aprobada'), 'fecha_servicio', 'horas_extra'),
+    )
+    for queryset, campo_fecha, campo_horas in fuentes:
+        queryset = queryset.filter(**{f'{campo_fecha}__gte': fecha_inicio, f'{campo_fecha}__lt': fecha_fin})
+        if areas_ids:
+            queryset = queryset.filter(id_agente__id_area_id__in=areas_ids)
+        agregado = queryset.annotate(
+            anio=ExtractYear(campo_fecha), mes=ExtractMonth(campo_fecha),
+        ).values(
+            'id_agente_id', 'anio', 'mes', 'id_agente__id_area_id', 'id_agente__id_area__nombre',
+        ).annotate(horas=Sum(campo_horas)).order_by()
+        for registro in agregado:
+            datos = fila(
+                registro['id_agente_id'], registro['anio'], registro['mes'],
+                registro['id_agente__id_area_id'], registro['id_agente__id_area__nombre'],
+            )
+            datos['horas'] += Decimal(registro['horas'] or 0)
+
+    resumenes = ResumenGuardiaMes.objects.annotate(
+        periodo=F('anio') * 100 + F('mes'),
+    ).filter(periodo__range=(desde[0] * 100 + desde[1], hasta[0] * 100 + hasta[1]))
+    if areas_ids:
+        resumenes = resumenes.filter(id_agente__id_area_id__in=areas_ids)
+    for id_agente, anio, mes, id_area, area_nombre, porcentaje in resumenes.values_list(
+        'id_agente_id', 'anio', 'mes', 'id_agente__id_area_id', 'id_agente__id_area__nombre', 'porcentaje_plus',
+    ):
+        fila(id_agente, anio, mes, id_area, area_nombre)['actual'] = porcentaje or Decimal('0.0')
+
+    return filas
+
+
+def _totales(porcentajes, monto_base):
+    distribucion = {}
+    for porcentaje in porcentajes:
+        if porcentaje > 0:
+            distribucion[float(porcentaje)] = distribucion.get(float(porcentaje), 0) + 1
+    totales = {
+        'filas_con_plus': sum(distribucion.values()),
+        'distribucion': dict(sorted(distribucion.items())),
+        'suma_porcentajes': float(sum(porcentajes, Decimal('0.0'))),
+    }
+    if monto_base is not None:
+        totales['monto_estimado'] = float(sum(monto_base * p / 100 for p in porcentajes))
+    return totales
+
+
+def simular(desde, hasta, escenarios, areas_ids=None, monto_base=None, limite_detalle=500):
+    """
+    Evalúa los escenarios sobre el período y los compara con ResumenGuardiaMes.
+
+    Args:
+        desde, hasta: (anio, mes) inclusive
+        escenarios: lista de Escenario
+        areas_ids: limitar a agentes de estas áreas (None: toda la organización)
+        monto_base (Decimal): si se indica, estima montos como monto_base × porcentaje / 100
+        limite_detalle (int): máximo de filas agente-mes con diferencias en el detalle
+
+    Returns:
+        dict con totales actuales y por escenario, diferencias, detalle y tiempos
+    """
+    inicio = reloj.perf_counter()
+    filas = cargar_filas(desde, hasta, areas_ids)
+    tiempos = {'carga': round((reloj.perf_counter() - inicio) * 1000, 1)}
+
+    inicio = reloj.perf_counter()
+    claves = list(filas)
+    actuales = [filas[clave]['actual'] for clave in claves]
+    # (horas, anio, mes, operativa): los argumentos de Escenario.porcentaje
+    entradas = [(filas[clave]['horas'], clave[1], clave[2], filas[clave]['operativa']) for clave in claves]
+    resultados = {
+        escenario.nombre: [escenario.porcentaje(*entrada) for entrada in entradas]
+        for escenario in escenarios
+    }
+
+    comparacion = []
+    for escenario in escenarios:
+        porcentajes = resultados[escenario.nombre]
+        diferencias = [nuevo - actual for nuevo, actual in zip(porcentajes, actuales)]
+        totales = _totales(porcentajes, monto_base)
+        totales['diferencia'] = {
+            'aumentan': sum(1 for d in diferencias if d > 0),
+            'disminuyen': sum(1 for d in diferencias if d < 0),
+            'sin_cambio': sum(1 for d in diferencias if d == 0),
+        }
+        if monto_base is not None:
+            totales['diferencia']['monto'] = float(sum(monto_base * d / 100 for d in diferencias))
+        comparacion.append({'nombre': escenario.nombre, 'totales': totales})
+
+    # Detalle: filas donde algún escenario cambia el porcentaje, las mayores diferencias primero
+    cambios = []
+    for indice, clave in enumerate(claves):
+        mayor = max(
+            (abs(resultados[e.nombre][indice] - actuales[indice]) for e in escenarios),
+            default=Decimal('0.0'),
+        )
+        if mayor:
+            cambios.append((mayor, indice))
+    cambios.sort(key=lambda cambio: (-cambio[0], claves[cambio[1]]))
+
+    detalle = []
+    for _, indice in cambios[:limite_detalle]:
+        id_agente, anio, mes = claves[indice]
+        datos = filas[claves[indice]]
+        detalle.append({
+            'id_agente': id_agente,
+            'id_area': datos['id_area'],
+            'anio': anio,
+            'mes': mes,
+            'horas': float(datos['horas']),
+            'actual': float(datos['actual']),
+            'escenarios': {
+                e.nombre: {
+                    'porcentaje': float(resultados[e.nombre][indice]),
+                    'diferencia': float(resultados[e.nombre][indice] - datos['actual']),
+                }
+                for e in escenarios
+            },
+        })
+    tiempos['calculo'] = round((reloj.perf_counter() - inicio) * 1000, 1)
+
+    return {
+        'filas': len(claves),
+        'agentes': len({clave[0] for clave in claves}),
+        'actual': _totales(actuales, monto_base),
+        'escenarios': comparacion,
+        'detalle': detalle,
+        'detalle_omitido': max(len(cambios) - limite_detalle, 0),
+        'tiempos_ms': tiempos,
+    }
+
+
+def escenario_vigentes():
+    """Reglas activas tal como están cargadas (cada una con su vigencia)"""
+    return Escenario.desde_reglas(ESCENARIO_VIGENTES, ReglaPlus.objects.filter(activa=True))
@@ -1,3 +1,206 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+import random
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+
+from personas.models import Area, Rol
+from personas.tests import crear_agente
+
+from .services.planificacion import FERIADO, FIN_DE_SEMANA, calcular_plan, director_del_area
+from .services.simulacion_plus import Escenario
+
+SABADO = date(2026, 3, 7)
+DOMINGO = date(2026, 3, 8)
+LUNES = date(2026, 3, 9)
+DESCANSO = timedelta(hours=12)
+
+
+def planificar(agentes, dias, turno=(time(8), time(18)), **kwargs):
+    kwargs.setdefault('descanso', DESCANSO)
+    return calcular_plan(agentes, dias, *turno, **kwargs)
+
+
+class CalcularPlanRestriccionesTests(SimpleTestCase):
+    """Restricciones duras: licencias, jornada del área y descanso mínimo"""
+
+    def test_licencia_excluye_al_agente(self):
+        asignaciones, sin_cubrir, _ = planificar(
+            [(1, None), (2, None)], [(SABADO, FIN_DE_SEMANA)], licencias={1: {SABADO}},
+        )
+        self.assertEqual(asignaciones, [(SABADO, 2)])
+        self.assertEqual(sin_cubrir, [])
+
+    def test_licencia_el_dia_siguiente_bloquea_guardia_nocturna(self):
+        asignaciones, _, _ = planificar(
+            [(1, None), (2, None)], [(DOMINGO, FIN_DE_SEMANA)],
+            turno=(time(20), time(8)), licencias={1: {LUNES}},
+        )
+        self.assertEqual(asignaciones, [(DOMINGO, 2)])
+
+    def test_sin_agentes_habilitados_el_dia_queda_sin_cubrir(self):
+        asignaciones, sin_cubrir, _ = planificar(
+            [(1, None)], [(SABADO, FIN_DE_SEMANA)], licencias={1: {SABADO}},
+        )
+        self.assertEqual(asignaciones, [])
+        self.assertEqual(sin_cubrir, [SABADO])
+
+    def test_cupos_incompletos_se_informan(self):
+        asignaciones, sin_cubrir, _ = planificar(
+            [(1, None), (2, None)], [(SABADO, FIN_DE_SEMANA)],
+            licencias={2: {SABADO}}, agentes_por_dia=2,
+        )
+        self.assertEqual(asignaciones, [(SABADO, 1)])
+        self.assertEqual(sin_cubrir, [SABADO])
+
+    def test_superposicion_con_la_jornada_del_area(self):
+        jornadas = {10: {LUNES: (datetime.combine(LUNES, time(7, 30)), datetime.combine(LUNES, time(18, 30)))}}
+        asignaciones, _, _ = planificar(
+            [(1, 10), (2, 20)], [(DOMINGO, FIN_DE_SEMANA)],
+            turno=(time(20), time(9)), jornadas=jornadas,
+        )
+        self.assertEqual(asignaciones, [(DOMINGO, 2)])
+
+    def test_descanso_respecto_de_guardias_cargadas(self):
+        ocupada = (datetime.combine(SABADO, time(0)), datetime.combine(SABADO, time(6)))
+        asignaciones, _, _ = planificar(
+            [(1, None), (2, None)], [(SABADO, FIN_DE_SEMANA)], ocupadas={1: [ocupada]},
+        )
+        self.assertEqual(asignaciones, [(SABADO, 2)])
+
+    def test_descanso_entre_guardias_del_plan(self):
+        dias = [(SABADO, FIN_DE_SEMANA), (DOMINGO, FIN_DE_SEMANA)]
+        turno = (time(20), time(8))
+
+        # Sábado 20 h a domingo 8 h y domingo 20 h: exactamente 12 h de descanso
+        asignaciones, sin_cubrir, _ = planificar([(1, None)], dias, turno=turno)
+        self.assertEqual(asignaciones, [(SABADO, 1), (DOMINGO, 1)])
+        self.assertEqual(sin_cubrir, [])
+
+        asignaciones, sin_cubrir, _ = planificar(
+            [(1, None)], dias, turno=turno, descanso=timedelta(hours=13),
+        )
+        self.assertEqual(asignaciones, [(SABADO, 1)])
+        self.assertEqual(sin_cubrir, [DOMINGO])
+
+    def test_no_modifica_los_datos_cargados(self):
+        ocupadas = {1: []}
+        historial = {1: {FIN_DE_SEMANA: 2, FERIADO: 0}}
+        planificar([(1, None)], [(SABADO, FIN_DE_SEMANA)], ocupadas=ocupadas, historial=historial)
+        self.assertEqual(ocupadas, {1: []})
+        self.assertEqual(historial, {1: {FIN_DE_SEMANA: 2, FERIADO: 0}})
+
+
+class CalcularPlanEquidadTests(SimpleTestCase):
+    """Equidad: gana quien menos guardias acumula en la misma clase de día"""
+
+    def test_prioriza_al_de_menor_historial(self):
+        dias = [(SABADO + timedelta(weeks=semana), FIN_DE_SEMANA) for semana in range(4)]
+        asignaciones, _, carga = planificar(
+            [(1, None), (2, None)], dias,
+            historial={1: {FIN_DE_SEMANA: 3, FERIADO: 0}},
+        )
+        self.assertEqual([id_agente for _, id_agente in asignaciones], [2, 2, 2, 1])
+        # A igualdad de acumulado (3 y 3) desempata quien menos guardias lleva en el plan
+        self.assertEqual((carga[1][FIN_DE_SEMANA], carga[2][FIN_DE_SEMANA]), (4, 3))
+
+    def test_clases_de_dia_se_cuentan_por_separado(self):
+        asignaciones, _, carga = planificar(
+            [(1, None), (2, None)], [(SABADO, FIN_DE_SEMANA), (LUNES, FERIADO)],
+            historial={1: {FIN_DE_SEMANA: 0, FERIADO: 5}, 2: {FIN_DE_SEMANA: 1, FERIADO: 0}},
+        )
+        self.assertEqual(asignaciones, [(SABADO, 1), (LUNES, 2)])
+        self.assertEqual(carga[1], {FIN_DE_SEMANA: 1, FERIADO: 5})
+
+    def test_a_igual_carga_reparte_dentro_del_plan(self):
+        dias = [(SABADO + timedelta(weeks=semana), FIN_DE_SEMANA) for semana in range(6)]
+        _, _, carga = planificar([(1, None), (2, None), (3, None)], dias)
+        self.assertEqual({conteo[FIN_DE_SEMANA] for conteo in carga.values()}, {2})
+
+
+class DirectorDelAreaTests(TestCase):
+    """Director del cronograma automático: el del área o el del área superior más cercana"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.direccion = Area.objects.create(nombre='Dirección')
+        cls.departamento = Area.objects.create(nombre='Departamento', id_area_padre=cls.direccion, nivel=1)
+        cls.division = Area.objects.create(nombre='División', id_area_padre=cls.departamento, nivel=2)
+        cls.rol_director = Rol.objects.create(nombre='Director')
+        cls.rol_agente = Rol.objects.create(nombre='Agente')
+
+    def test_sin_director_en_la_cadena(self):
+        crear_agente(self.division, self.rol_agente, '30200001')
+        self.assertIsNone(director_del_area(self.division.id_area))
+
+    def test_director_del_area_superior(self):
+        director = crear_agente(self.direccion, self.rol_director, '30200002')
+        self.assertEqual(director_del_area(self.division.id_area), director.id_agente)
+
+    def test_gana_el_director_mas_cercano_y_activo(self):
+        crear_agente(self.direccion, self.rol_director, '30200003')
+        cercano = crear_agente(self.departamento, self.rol_director, '30200004')
+        inactivo = crear_agente(self.division, self.rol_director, '30200005')
+        inactivo.activo = False
+        inactivo.save()
+        self.assertEqual(director_del_area(self.division.id_area), cercano.id_agente)
+
+
+def regla(horas, porcentaje, operativas=True, administrativas=True, desde=None, hasta=None):
+    return {
+        'horas_minimas_mensuales': horas, 'porcentaje_plus': porcentaje,
+        'aplica_areas_operativas': operativas, 'aplica_areas_administrativas': administrativas,
+        'vigente_desde': desde, 'vigente_hasta': hasta,
+    }
+
+
+class EscenarioPlusTests(SimpleTestCase):
+    """Compilación de umbrales y vigencias del simulador de plus"""
+
+    def test_umbrales(self):
+        escenario = Escenario('prueba', [regla(10, 20), regla(20, 40), regla(30, 30)])
+        casos = {0: '0', 5: '0', 10: '20', 19: '20', 20: '40', 25: '40', 35: '40'}
+        for horas, esperado in casos.items():
+            with self.subTest(horas=horas):
+                self.assertEqual(escenario.porcentaje(Decimal(horas), 2026, 3, True), Decimal(esperado))
+
+    def test_sin_horas_no_hay_plus(self):
+        escenario = Escenario('prueba', [regla(0, 10)])
+        self.assertEqual(escenario.porcentaje(Decimal('0'), 2026, 3, True), Decimal('0'))
+        self.assertEqual(escenario.porcentaje(Decimal('0.5'), 2026, 3, True), Decimal('10'))
+
+    def test_tipo_de_area(self):
+        escenario = Escenario('prueba', [regla(10, 20, administrativas=False), regla(10, 5, operativas=False)])
+        self.assertEqual(escenario.porcentaje(Decimal(12), 2026, 3, True), Decimal(20))
+        self.assertEqual(escenario.porcentaje(Decimal(12), 2026, 3, False), Decimal(5))
+
+    def test_vigencia_en_algun_dia_del_mes(self):
+        escenario = Escenario('prueba', [
+            regla(10, 20, desde=date(2026, 3, 15)),
+            regla(10, 30, hasta=date(2026, 2, 1)),
+        ])
+        self.assertEqual(escenario.porcentaje(Decimal(12), 2026, 1, True), Decimal(30))
+        self.assertEqual(escenario.porcentaje(Decimal(12), 2026, 2, True), Decimal(30))
+        self.assertEqual(escenario.porcentaje(Decimal(12), 2026, 3, True), Decimal(20))
+
+    def test_tabla_compilada_una_vez_por_mes_y_tipo(self):
+        escenario = Escenario('prueba', [regla(10, 20)])
+        for horas in (5, 15, 25):
+            escenario.porcentaje(Decimal(horas), 2026, 3, True)
+        escenario.porcentaje(Decimal(15), 2026, 3, False)
+        escenario.porcentaje(Decimal(15), 2026, 4, True)
+        self.assertEqual(set(escenario._tablas), {(2026, 3, True), (2026, 3, False), (2026, 4, True)})
+
+    def test_equivale_a_la_primera_regla_alcanzada_de_mayor_porcentaje(self):
+        """Mismo resultado que CalculadoraPlus.evaluar_reglas_plus con reglas vigentes para ambos tipos de área"""
+        azar = random.Random(7)
+        for _ in range(200):
+            reglas = [regla(azar.randint(0, 200), azar.choice([5, 10, 20, 30, 40, 50])) for _ in range(azar.randint(0, 6))]
+            horas = Decimal(azar.randint(1, 220))
+            ordenadas = sorted(reglas, key=lambda r: -r['porcentaje_plus'])
+            esperado = next(
+                (Decimal(r['porcentaje_plus']) for r in ordenadas if horas >= r['horas_minimas_mensuales']),
+                Decimal('0.0'),
+            )
+            with self.subTest(reglas=reglas, horas=horas):
+                self.assertEqual(Escenario('prueba', reglas).porcentaje(horas, 2026, 3, True), esperado)
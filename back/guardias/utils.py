@@ -8,9 +8,64 @@ from datetime import datetime, date, time
 from decimal import Decimal
 import logging
 
+from common.cache import cacheado
+
 logger = logging.getLogger(__name__)
 
 
+@cacheado('reglas_plus', ttl=3600)
+def reglas_plus_vigentes(fecha):
+    """
+    Reglas de plus activas y vigentes en la fecha, de mayor a menor porcentaje.
+    Retorna lista de (horas_minimas_mensuales, porcentaje_plus).
+    """
+    from .models import ReglaPlus
+
+    return list(
+        ReglaPlus.objects.filter(
+            activa=True,
+            vigente_desde__lte=fecha
+        ).filter(
+            models.Q(vigente_hasta__isnull=True) |
+            models.Q(vigente_hasta__gte=fecha)
+        ).order_by('-porcentaje_plus').values_list('horas_minimas_mensuales', 'porcentaje_plus')
+    )
+
+
+@cacheado('parametros_area', ttl=3600)
+def parametros_area_vigentes(area_id, fecha):
+    """Ventanas horarias vigentes del área en la fecha (None si no hay parámetros)"""
+    from .models import ParametrosArea
+
+    return ParametrosArea.objects.filter(
+        id_area=area_id,
+        activo=True,
+        vigente_desde__lte=fecha
+    ).filter(
+        models.Q(vigente_hasta__isnull=True) |
+        models.Q(vigente_hasta__gte=fecha)
+    ).values(
+        'ventana_entrada_inicio', 'ventana_entrada_fin',
+        'ventana_salida_inicio', 'ventana_salida_fin'
+    ).first()
+
+
+# Áreas operativas según el nombre (mismo criterio que calcular_plus_agente en SQL)
+AREAS_OPERATIVAS = (
+    'secretaría de protección civil',
+    'departamento operativo',
+    'operativo',
+    'emergencias',
+    'rescate',
+)
+
+
+def es_area_operativa_nombre(nombre):
+    """True si el nombre del área corresponde a un área operativa"""
+    nombre = (nombre or '').lower()
+    return any(operativa in nombre for operativa in AREAS_OPERATIVAS)
+
+
 class CalculadoraPlus:
     """Calculadora de plus salarial usando funciones SQL existentes"""
     
@@ -56,14 +111,7 @@ class CalculadoraPlus:
             area_nombre = agente.id_area.nombre.lower() if agente.id_area else ""
             
             # Determinar si es área operativa
-            areas_operativas = [
-                'secretaría de protección civil',
-                'departamento operativo',
-                'operativo',
-                'emergencias',
-                'rescate'
-            ]
-            es_area_operativa = any(op in area_nombre for op in areas_operativas)
+            es_area_operativa = es_area_operativa_nombre(area_nombre)
             
             # Obtener horas de guardia en el mes
             from .models import Guardia, HoraCompensacion
@@ -131,19 +179,9 @@ class CalculadoraPlus:
         Evalúa las reglas de plus vigentes para determinar el porcentaje aplicable.
         DEPRECADO: Usar calcular_plus_simplificado en su lugar.
         """
-        from .models import ReglaPlus
-        
-        reglas = ReglaPlus.objects.filter(
-            activa=True,
-            vigente_desde__lte=date.today()
-        ).filter(
-            models.Q(vigente_hasta__isnull=True) | 
-            models.Q(vigente_hasta__gte=date.today())
-        ).order_by('-porcentaje_plus')
-        
-        for regla in reglas:
-            if horas_efectivas >= regla.horas_minimas_mensuales:
-                return regla.porcentaje_plus
+        for horas_minimas, porcentaje in reglas_plus_vigentes(date.today()):
+            if horas_efectivas >= horas_minimas:
+                return porcentaje
         
         return Decimal('0.0')
     
@@ -194,87 +232,60 @@ class CalculadoraPlus:
         }
 
 
+# Celdas de la matriz de disponibilidad (PlanificadorCronograma.matriz_disponibilidad)
+LIBRE = b'.'
+GUARDIA = b'G'
+LICENCIA = b'L'
+FERIADO = b'F'
+
+CELDAS_DISPONIBILIDAD = {
+    LIBRE.decode(): 'libre',
+    GUARDIA.decode(): 'guardia',
+    LICENCIA.decode(): 'licencia',
+    FERIADO.decode(): 'feriado',
+}
+
+
 class PlanificadorCronograma:
     """Planificador automático de cronogramas aprovechando la estructura existente"""
     
     @staticmethod
-    def planificar_automatico(area_id, fecha_inicio, fecha_fin, agentes_ids=None):
+    def planificar_automatico(area_id, fecha_inicio, fecha_fin, agentes_ids=None,
+                              hora_inicio=time(8, 0), hora_fin=time(20, 0), agentes_por_dia=1,
+                              creado_por=None, creado_por_rol=None):
         """
-        Planifica automáticamente guardias para un período determinado.
+        Planifica automáticamente guardias para un período determinado con el
+        motor de guardias/services/planificacion.py (restricciones de licencias,
+        jornada y descanso, y equidad de fines de semana y feriados).
         """
-        from .models import Cronograma, Guardia
-        from personas.models import Agente, Area
-        
+        from .services.planificacion import planificar, PlanificacionError
+
         try:
-            area = Area.objects.get(id_area=area_id)
-            
-            # Crear cronograma base
-            cronograma = Cronograma.objects.create(
-                id_area=area,
-                tipo='automatico',
-                hora_inicio=time(8, 0),  # 8:00 AM por defecto
-                hora_fin=time(20, 0),    # 8:00 PM por defecto
-                estado='generada',
-                fecha_creacion=date.today()
-            )
-            
-            # Si no se especifican agentes, usar todos los activos del área
-            if not agentes_ids:
-                agentes = Agente.objects.filter(id_area=area, activo=True)
-            else:
-                agentes = Agente.objects.filter(id_agente__in=agentes_ids, activo=True)
-            
-            # Distribuir guardias de manera equitativa
-            guardias_creadas = PlanificadorCronograma._distribuir_guardias(
-                cronograma, agentes, fecha_inicio, fecha_fin
+            resultado = planificar(
+                area_id, fecha_inicio, fecha_fin, hora_inicio, hora_fin,
+                agentes_ids=agentes_ids,
+                agentes_por_dia=agentes_por_dia,
+                creado_por=creado_por,
+                creado_por_rol=creado_por_rol,
             )
-            
-            return {
-                'cronograma_id': cronograma.id_cronograma,
-                'guardias_creadas': guardias_creadas,
-                'agentes_asignados': len(agentes),
-                'periodo': f"{fecha_inicio} - {fecha_fin}"
-            }
-            
+        except PlanificacionError:
+            raise
         except Exception as e:
             logger.error(f"Error en planificación automática: {e}")
             return None
-    
-    @staticmethod
-    def _distribuir_guardias(cronograma, agentes, fecha_inicio, fecha_fin):
-        """Distribuye las guardias de manera equitativa entre los agentes"""
-        from .models import Guardia
-        from datetime import timedelta
-        
-        guardias_creadas = 0
-        fecha_actual = fecha_inicio
-        agente_index = 0
-        
-        while fecha_actual <= fecha_fin:
-            # Verificar si es feriado
-            if not ValidadorHorarios.es_feriado(fecha_actual):
-                agente = agentes[agente_index % len(agentes)]
-                
-                # Crear guardia
-                Guardia.objects.create(
-                    id_cronograma=cronograma,
-                    id_agente=agente,
-                    fecha=fecha_actual,
-                    hora_inicio=cronograma.hora_inicio,
-                    hora_fin=cronograma.hora_fin,
-                    tipo='automatica',
-                    estado='programada',
-                    activa=True,
-                    horas_planificadas=8  # 8 horas por defecto
-                )
-                
-                guardias_creadas += 1
-                agente_index += 1
-            
-            fecha_actual += timedelta(days=1)
-        
-        return guardias_creadas
-    
+
+        return {
+            'cronograma_id': resultado['cronograma'].id_cronograma,
+            'guardias_creadas': len(resultado['asignaciones']),
+            'agentes_asignados': len({id_agente for _, id_agente in resultado['asignaciones']}),
+            'agentes_disponibles': resultado['agentes'],
+            'dias_planificados': resultado['dias'],
+            'dias_sin_cubrir': [fecha.isoformat() for fecha in resultado['sin_cubrir']],
+            'equidad': resultado['equidad'],
+            'tiempos_ms': resultado['tiempos_ms'],
+            'periodo': f"{fecha_inicio} - {fecha_fin}"
+        }
+
     @staticmethod
     def validar_disponibilidad(agente_id, fecha_hora):
         """
@@ -305,9 +316,75 @@ class PlanificadorCronograma:
         
         if guardias_existentes:
             return False, "Agente ya tiene guardia asignada"
-        
+
         return True, "Agente disponible"
 
+    @staticmethod
+    def matriz_disponibilidad(agentes_ids, fecha_desde, fecha_hasta):
+        """
+        Disponibilidad de varios agentes en un rango de fechas con tres
+        consultas (guardias, licencias y feriados), sin importar cuántos
+        agentes o días abarque.
+
+        Cada agente recibe una cadena con un carácter por día (ver
+        CELDAS_DISPONIBILIDAD). Si coinciden varios estados gana la licencia,
+        luego la guardia y por último el feriado. Una guardia que cruza la
+        medianoche (Guardia.es_multiples_dias) ocupa también el día siguiente,
+        por eso se leen las guardias desde el día anterior al rango.
+
+        Returns:
+            tuple: (fechas, {id_agente: cadena}, {fecha ISO: nombre del feriado})
+        """
+        from asistencia.models import Licencia
+        from .models import Feriado, Guardia
+        from datetime import timedelta
+
+        dias = (fecha_hasta - fecha_desde).days + 1
+        fechas = [fecha_desde + timedelta(days=i) for i in range(dias)]
+        celdas = {agente_id: bytearray(LIBRE * dias) for agente_id in agentes_ids}
+        if not celdas or dias <= 0:
+            return fechas, {agente_id: '' for agente_id in celdas}, {}
+
+        def marcar(fila, desde, hasta, codigo):
+            inicio = max((desde - fecha_desde).days, 0)
+            fin = min((hasta - fecha_desde).days, dias - 1)
+            if inicio <= fin:
+                fila[inicio:fin + 1] = codigo * (fin - inicio + 1)
+
+        # Feriados: afectan a todos los agentes por igual
+        feriados = {}
+        for nombre, inicio, fin in Feriado.feriados_en_rango(fecha_desde, fecha_hasta).values_list(
+            'nombre', 'fecha_inicio', 'fecha_fin'
+        ):
+            for fila in celdas.values():
+                marcar(fila, inicio, fin, FERIADO)
+            dia = max(inicio, fecha_desde)
+            while dia <= min(fin, fecha_hasta):
+                feriados.setdefault(dia.isoformat(), nombre)
+                dia += timedelta(days=1)
+
+        guardias = Guardia.objects.filter(
+            id_agente_id__in=list(celdas),
+            activa=True,
+            fecha__range=(fecha_desde - timedelta(days=1), fecha_hasta),
+        ).values_list('id_agente_id', 'fecha', 'hora_inicio', 'hora_fin')
+        for agente_id, fecha, hora_inicio, hora_fin in guardias:
+            cruza_medianoche = hora_inicio is not None and hora_fin is not None and hora_inicio > hora_fin
+            fin = fecha + timedelta(days=1) if cruza_medianoche else fecha
+            marcar(celdas[agente_id], fecha, fin, GUARDIA)
+
+        licencias = Licencia.objects.filter(
+            id_agente_id__in=list(celdas),
+            estado='aprobada',
+            fecha_desde__lte=fecha_hasta,
+            fecha_hasta__gte=fecha_desde,
+        ).values_list('id_agente_id', 'fecha_desde', 'fecha_hasta')
+        for agente_id, desde, hasta in licencias:
+            marcar(celdas[agente_id], desde, hasta, LICENCIA)
+
+        filas = {agente_id: fila.decode('ascii') for agente_id, fila in celdas.items()}
+        return fechas, filas, feriados
+
 
 class ValidadorHorarios:
     """Validador de horarios usando parámetros de área y feriados"""
@@ -317,21 +394,13 @@ class ValidadorHorarios:
         """
         Valida si una marca está dentro de la ventana horaria permitida.
         """
-        from .models import ParametrosArea
         from personas.models import Agente
         
         try:
             agente = Agente.objects.get(id_agente=agente_id)
             
-            # Obtener parámetros vigentes del área
-            parametros = ParametrosArea.objects.filter(
-                id_area=agente.id_area,
-                activo=True,
-                vigente_desde__lte=timestamp.date()
-            ).filter(
-                models.Q(vigente_hasta__isnull=True) | 
-                models.Q(vigente_hasta__gte=timestamp.date())
-            ).first()
+            # Obtener parámetros vigentes del área (cacheados)
+            parametros = parametros_area_vigentes(agente.id_area_id, timestamp.date())
             
             if not parametros:
                 return True, "Sin parámetros configurados"
@@ -339,16 +408,16 @@ class ValidadorHorarios:
             hora_marca = timestamp.time()
             
             if tipo_marca == 'entrada':
-                if parametros.ventana_entrada_inicio <= hora_marca <= parametros.ventana_entrada_fin:
+                if parametros['ventana_entrada_inicio'] <= hora_marca <= parametros['ventana_entrada_fin']:
                     return True, "Entrada en horario"
                 else:
-                    return False, f"Entrada fuera de ventana ({parametros.ventana_entrada_inicio}-{parametros.ventana_entrada_fin})"
+                    return False, f"Entrada fuera de ventana ({parametros['ventana_entrada_inicio']}-{parametros['ventana_entrada_fin']})"
             
             elif tipo_marca == 'salida':
-                if parametros.ventana_salida_inicio <= hora_marca <= parametros.ventana_salida_fin:
+                if parametros['ventana_salida_inicio'] <= hora_marca <= parametros['ventana_salida_fin']:
                     return True, "Salida en horario"
                 else:
-                    return False, f"Salida fuera de ventana ({parametros.ventana_salida_inicio}-{parametros.ventana_salida_fin})"
+                    return False, f"Salida fuera de ventana ({parametros['ventana_salida_inicio']}-{parametros['ventana_salida_fin']})"
             
             return False, "Tipo de marca no reconocido"
             
@@ -652,6 +721,53 @@ def puede_aprobar(cronograma, rol_aprobador):
     return rol_aprobador.lower().strip() in roles_permitidos
 
 
+ROLES_CREADORES = ('jefatura', 'director', 'administrador')
+
+
+def anotar_cronogramas(queryset, rol_aprobador=None):
+    """
+    Anota en una sola consulta los datos que los listados de cronogramas
+    calculaban fila por fila:
+
+    - total_guardias_activas / total_guardias_pendientes / total_agentes
+    - puede_aprobar_agente: lo mismo que puede_aprobar(cronograma, rol_aprobador),
+      resuelto en SQL sobre creado_por_rol
+
+    Args:
+        queryset: QuerySet de Cronograma
+        rol_aprobador (str): Rol del agente que consulta (None: nadie aprueba)
+
+    Returns:
+        QuerySet anotado
+    """
+    from django.db.models import BooleanField, Case, Count, Q, Value, When
+    from django.db.models.functions import Lower, Trim
+
+    queryset = queryset.annotate(
+        total_guardias_activas=Count('guardia', filter=Q(guardia__activa=True)),
+        total_guardias_pendientes=Count('guardia', filter=Q(guardia__estado='pendiente')),
+        total_agentes=Count('guardia__id_agente', distinct=True),
+    )
+
+    rol = (rol_aprobador or '').lower().strip()
+    if rol == 'administrador':
+        # Administrador SIEMPRE puede aprobar (ver puede_aprobar)
+        return queryset.annotate(puede_aprobar_agente=Value(True, output_field=BooleanField()))
+
+    roles_creador = [creador for creador in ROLES_CREADORES if rol and rol in get_approval_hierarchy(creador)]
+    if not roles_creador:
+        return queryset.annotate(puede_aprobar_agente=Value(False, output_field=BooleanField()))
+
+    return queryset.annotate(
+        creado_por_rol_normalizado=Lower(Trim('creado_por_rol')),
+        puede_aprobar_agente=Case(
+            When(creado_por_rol_normalizado__in=roles_creador, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
+    )
+
+
 def get_agente_rol(agente):
     """
     Obtiene el rol principal de un agente.
@@ -17,12 +17,12 @@ import logging
 from .models import Cronograma, Guardia, ResumenGuardiaMes, ReglaPlus, ParametrosArea, Feriado, HoraCompensacion
 # Importar funciones de validacion de Dias laborables
 from asistencia.views import es_dia_laborable, get_motivo_no_laborable
-from auditoria.models import Auditoria
+from auditoria.buffer import encolar_auditoria
 from .serializers import (
     CronogramaExtendidoSerializer, GuardiaResumenSerializer,
     ResumenGuardiaMesExtendidoSerializer, ReglaPlusSerializer,
     ParametrosAreaSerializer, FeriadoSerializer,
-    PlanificacionCronogramaSerializer, CalculoPlusSerializer, AprobacionPlusSerializer,
+    PlanificacionCronogramaSerializer, CalculoPlusSerializer, AprobacionPlusSerializer, SimulacionPlusSerializer,
     HoraCompensacionSerializer, CrearCompensacionSerializer, AprobacionCompensacionSerializer, ResumenCompensacionSerializer
 )
 from .utils import CalculadoraPlus, PlanificadorCronograma
@@ -31,9 +31,10 @@ from .services.reportes import obtener_datos_reporte, ReporteError
 
 # RBAC Permissions
 from common.permissions import (
-    IsAuthenticatedGIGA, obtener_agente_sesion, obtener_rol_agente,
+    IsAuthenticatedGIGA, IsAdministrador, obtener_agente_sesion, obtener_rol_agente,
     obtener_areas_jerarquia
 )
+from common.condicional import respuesta_condicional
 
 logger = logging.getLogger(__name__)
 
@@ -83,6 +84,57 @@ class ReglaPlusViewSet(viewsets.ModelViewSet):
 
         return Response(resultado)
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAdministrador])
+    def simular_periodo(self, request):
+        """
+        Simula uno o más conjuntos de reglas sobre meses históricos de toda la
+        organización (o de un área y sus sub-áreas) y los compara con los
+        porcentajes de ResumenGuardiaMes. Ver guardias/services/simulacion_plus.py.
+        """
+        from common.permissions import obtener_area_y_subareas
+        from .services.simulacion_plus import Escenario, escenario_vigentes, simular
+
+        serializer = SimulacionPlusSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        datos = serializer.validated_data
+
+        areas_ids = None
+        if datos.get('area_id'):
+            areas_ids = [area.id_area for area in obtener_area_y_subareas(datos['area_id'])]
+            if not areas_ids:
+                return Response({'error': 'Área no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+
+        escenarios = [escenario_vigentes()] if datos['incluir_vigentes'] else []
+        for escenario in datos['escenarios']:
+            reglas = ReglaPlus.objects.filter(id_regla_plus__in=escenario['reglas_ids'])
+            faltantes = set(escenario['reglas_ids']) - set(reglas.values_list('id_regla_plus', flat=True))
+            if faltantes:
+                return Response(
+                    {'error': f"Reglas inexistentes en '{escenario['nombre']}': {sorted(faltantes)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            escenarios.append(Escenario.desde_reglas(
+                escenario['nombre'], reglas, con_vigencia=False, adicionales=escenario['reglas']
+            ))
+
+        try:
+            resultado = simular(
+                datos['desde'], datos['hasta'], escenarios,
+                areas_ids=areas_ids,
+                monto_base=datos.get('monto_base'),
+                limite_detalle=datos['limite_detalle'],
+            )
+        except Exception as e:
+            logger.error(f"Error simulando reglas de plus: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        resultado['periodo'] = {
+            'desde': '{:04d}-{:02d}'.format(*datos['desde']),
+            'hasta': '{:04d}-{:02d}'.format(*datos['hasta']),
+        }
+        return Response(resultado)
+
 
 class ParametrosAreaViewSet(viewsets.ModelViewSet):
     """ViewSet para parÃ¡metros de control horario por Ã¡rea"""
@@ -260,6 +312,7 @@ class FeriadoViewSet(viewsets.ModelViewSet):
             )
 
     @action(detail=False, methods=['get', 'post'])
+    @respuesta_condicional('feriados')
     def por_mes(self, request):
         """Obtiene feriados para un mes especifico (optimizado para calendario)"""
         anio = request.query_params.get('anio')
@@ -365,8 +418,6 @@ class FeriadoViewSet(viewsets.ModelViewSet):
     def _crear_auditoria_feriado(self, accion, feriado_id, valor_previo=None, valor_nuevo=None):
         """Crear registro de auditorÃ­a para cambios en feriados"""
         try:
-            from auditoria.models import Auditoria
-            from django.utils import timezone
             import logging
             logger = logging.getLogger(__name__)
 
@@ -375,10 +426,9 @@ class FeriadoViewSet(viewsets.ModelViewSet):
             if hasattr(self.request.user, 'agente'):
                 agente_id = self.request.user.agente.id
 
-            Auditoria.objects.create(
+            encolar_auditoria(
                 pk_afectada=feriado_id,
                 nombre_tabla='feriado',
-                creado_en=timezone.now(),
                 valor_previo=valor_previo,
                 valor_nuevo=valor_nuevo,
                 accion=accion,
@@ -409,6 +459,29 @@ class CronogramaViewSet(viewsets.ModelViewSet):
 
         return queryset.order_by('-creado_en')
 
+    def list(self, request, *args, **kwargs):
+        """
+        Cronogramas de las áreas visibles para el rol (administrador: todas),
+        con totales y aprobación anotados: cantidad de consultas constante.
+        """
+        from .utils import anotar_cronogramas
+
+        agente = obtener_agente_sesion(request)
+        if not agente:
+            return Response({'error': 'No hay sesión activa'}, status=status.HTTP_401_UNAUTHORIZED)
+        rol = obtener_rol_agente(agente)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if rol != 'administrador':
+            areas = [area.id_area for area in obtener_areas_jerarquia(agente)]
+            queryset = queryset.filter(id_area__in=areas)
+        queryset = anotar_cronogramas(queryset, rol)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
+
     @action(detail=False, methods=['post'])
     def crear_con_guardias(self, request):
         import calendar
@@ -543,10 +616,9 @@ class CronogramaViewSet(viewsets.ModelViewSet):
                     cronograma_creado = True
 
                     # Auditoría SOLO si efectivamente se creó el cronograma
-                    Auditoria.objects.create(
+                    encolar_auditoria(
                         pk_afectada=cronograma.id_cronograma,
                         nombre_tabla='cronograma',
-                        creado_en=timezone.now(),
                         valor_previo=None,
                         valor_nuevo={
                             'nombre': (data.get('nombre') or '').strip(),
@@ -600,10 +672,9 @@ class CronogramaViewSet(viewsets.ModelViewSet):
                     )
                     guardias_creadas.append(guardia)
 
-                    Auditoria.objects.create(
+                    encolar_auditoria(
                         pk_afectada=guardia.id_guardia,
                         nombre_tabla='guardia',
-                        creado_en=timezone.now(),
                         valor_previo=None,
                         valor_nuevo={
                             'id_cronograma': cronograma.id_cronograma,
@@ -753,10 +824,9 @@ class CronogramaViewSet(viewsets.ModelViewSet):
             cronograma.save()
 
             # Registrar auditorÃ­a del cronograma
-            Auditoria.objects.create(
+            encolar_auditoria(
                 pk_afectada=cronograma.id_cronograma,
                 nombre_tabla='cronograma',
-                creado_en=timezone.now(),
                 valor_previo=valor_previo_cronograma,
                 valor_nuevo={
                     'tipo': cronograma.tipo,
@@ -783,10 +853,9 @@ class CronogramaViewSet(viewsets.ModelViewSet):
                     guardia_previa_serializable['hora_fin'] = str(
                         guardia_previa_serializable['hora_fin'])
 
-                Auditoria.objects.create(
+                encolar_auditoria(
                     pk_afectada=guardia_previa['id_guardia'],
                     nombre_tabla='guardia',
-                    creado_en=timezone.now(),
                     valor_previo=guardia_previa_serializable,
                     valor_nuevo=None,
                     accion='ELIMINAR',
@@ -827,10 +896,9 @@ class CronogramaViewSet(viewsets.ModelViewSet):
                 guardias_creadas.append(guardia)
 
                 # Registrar auditorÃ­a de cada nueva guardia
-                Auditoria.objects.create(
+                encolar_auditoria(
                     pk_afectada=guardia.id_guardia,
                     nombre_tabla='guardia',
-                    creado_en=timezone.now(),
                     valor_previo=None,
                     valor_nuevo={
                         'id_cronograma': cronograma.id_cronograma,
@@ -847,10 +915,9 @@ class CronogramaViewSet(viewsets.ModelViewSet):
                 )
 
             # Registrar resumen en auditorÃ­a
-            Auditoria.objects.create(
+            encolar_auditoria(
                 pk_afectada=cronograma.id_cronograma,
                 nombre_tabla='cronograma',
-                creado_en=timezone.now(),
                 valor_previo={'guardias_previas_count': len(guardias_previas)},
                 valor_nuevo={'guardias_nuevas_count': len(
                     guardias_creadas), 'actualizacion_completa': True},
@@ -884,6 +951,12 @@ class CronogramaViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def planificar(self, request):
         """PlanificaciÃ³n automÃ¡tica de guardias"""
+        from .services.planificacion import PlanificacionError
+
+        agente_sesion = obtener_agente_sesion(request)
+        if not agente_sesion:
+            return Response({'error': 'No autenticado'}, status=status.HTTP_401_UNAUTHORIZED)
+
         serializer = PlanificacionCronogramaSerializer(data=request.data)
         if serializer.is_valid():
             try:
@@ -891,7 +964,12 @@ class CronogramaViewSet(viewsets.ModelViewSet):
                     area_id=serializer.validated_data['area_id'],
                     fecha_inicio=serializer.validated_data['fecha_inicio'],
                     fecha_fin=serializer.validated_data['fecha_fin'],
-                    agentes_ids=serializer.validated_data.get('agentes_ids')
+                    agentes_ids=serializer.validated_data.get('agentes_ids'),
+                    hora_inicio=serializer.validated_data['hora_inicio'],
+                    hora_fin=serializer.validated_data['hora_fin'],
+                    agentes_por_dia=serializer.validated_data['agentes_por_dia'],
+                    creado_por=agente_sesion,
+                    creado_por_rol=obtener_rol_agente(agente_sesion),
                 )
 
                 if resultado:
@@ -902,6 +980,8 @@ class CronogramaViewSet(viewsets.ModelViewSet):
                         status=status.HTTP_500_INTERNAL_SERVER_ERROR
                     )
 
+            except PlanificacionError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             except Exception as e:
                 logger.error(f"Error en planificaciÃ³n: {e}")
                 return Response(
@@ -977,10 +1057,9 @@ class CronogramaViewSet(viewsets.ModelViewSet):
         )
 
         # Registrar en auditorÃ­a
-        Auditoria.objects.create(
+        encolar_auditoria(
             pk_afectada=cronograma.id_cronograma,
             nombre_tabla='cronograma',
-            creado_en=timezone.now(),
             valor_previo={'estado': 'pendiente'},
             valor_nuevo={'estado': 'publicada',
                          'guardias_activadas': guardias_activadas},
@@ -1012,10 +1091,9 @@ class CronogramaViewSet(viewsets.ModelViewSet):
         cronograma.save()
 
         # Registrar en auditorÃ­a
-        Auditoria.objects.create(
+        encolar_auditoria(
             pk_afectada=cronograma.id_cronograma,
             nombre_tabla='cronograma',
-            creado_en=timezone.now(),
             valor_previo={'estado': estado_previo},
             valor_nuevo={'estado': 'publicada'},
             accion='PUBLICAR_DIRECTO',
@@ -1058,10 +1136,9 @@ class CronogramaViewSet(viewsets.ModelViewSet):
         cronograma.save()
 
         # Registrar en auditorÃ­a
-        Auditoria.objects.create(
+        encolar_auditoria(
             pk_afectada=cronograma.id_cronograma,
             nombre_tabla='cronograma',
-            creado_en=timezone.now(),
             valor_previo={'estado': estado_previo},
             valor_nuevo={'estado': 'pendiente'},
             accion='DESPUBLICAR',
@@ -1116,10 +1193,9 @@ class CronogramaViewSet(viewsets.ModelViewSet):
         # Registrar eliminaciÃ³n de guardias asociadas
         guardias = cronograma.guardia_set.all()
         for guardia in guardias:
-            Auditoria.objects.create(
+            encolar_auditoria(
                 pk_afectada=guardia.id_guardia,
                 nombre_tabla='guardia',
-                creado_en=timezone.now(),
                 valor_previo={
                     'id_guardia': guardia.id_guardia,
                     'id_cronograma': cronograma_id,
@@ -1131,10 +1207,9 @@ class CronogramaViewSet(viewsets.ModelViewSet):
             )
 
         # Registrar eliminaciÃ³n del cronograma
-        Auditoria.objects.create(
+        encolar_auditoria(
             pk_afectada=cronograma_id,
             nombre_tabla='cronograma',
-            creado_en=timezone.now(),
             valor_previo=cronograma_data,
             valor_nuevo=None,
             accion='ELIMINAR',
@@ -1152,8 +1227,7 @@ class CronogramaViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get', 'post'])
     def pendientes(self, request):
         """Lista cronogramas pendientes de aprobaciÃ³n segun rol del usuario"""
-        from .utils import get_agente_rol, get_approval_hierarchy
-        from django.db.models import Prefetch
+        from .utils import get_agente_rol, anotar_cronogramas
 
         # Obtener agente del usuario (por ahora via query param)
         agente_id = request.query_params.get('agente_id')
@@ -1183,42 +1257,27 @@ class CronogramaViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # Filtrar cronogramas pendientes que el agente puede aprobar
-        cronogramas_pendientes = []
-        queryset = Cronograma.objects.filter(estado='pendiente').select_related(
-            'id_area', 'id_jefe', 'creado_por_id'
-        ).prefetch_related( 
-            Prefetch(
-                'guardia_set',
-                queryset=Guardia.objects.filter(estado='pendiente'),
-                to_attr='guardias_pendientes'
-            ))
-
-        for cronograma in queryset:
-            # Verificar si el rol del agente puede aprobar este cronograma
-            if cronograma.creado_por_rol:
-                roles_permitidos = get_approval_hierarchy(
-                    cronograma.creado_por_rol)
-                if rol_agente.lower() in roles_permitidos:
-                    cronogramas_pendientes.append(cronograma)
-            elif rol_agente.lower() == 'administrador':
-                # Si no tiene creado_por_rol, solo admin puede aprobar
-                cronogramas_pendientes.append(cronograma)
+        # Pendientes que el rol puede aprobar (puede_aprobar resuelto en la consulta)
+        queryset = anotar_cronogramas(
+            Cronograma.objects.filter(estado='pendiente').select_related(
+                'id_area', 'id_jefe', 'creado_por_id', 'aprobado_por_id'
+            ),
+            rol_agente
+        ).filter(puede_aprobar_agente=True).order_by('-creado_en')
 
         # Serializar resultados
-        serializer = CronogramaExtendidoSerializer(
-            cronogramas_pendientes, many=True)
+        serializer = CronogramaExtendidoSerializer(queryset, many=True)
+        cronogramas = serializer.data
 
         return Response({
-            'count': len(cronogramas_pendientes),
+            'count': len(cronogramas),
             'rol_agente': rol_agente,
-            'cronogramas': serializer.data
+            'cronogramas': cronogramas
         })
 
 
     @action(detail=True, methods=['post'])
     def rechazar(self, request, pk=None):
-        from auditoria.models import Auditoria
         from .utils import get_agente_rol, puede_aprobar
 
         cronograma = self.get_object()
@@ -1264,10 +1323,9 @@ class CronogramaViewSet(viewsets.ModelViewSet):
                 estado='rechazada'
             )
 
-            Auditoria.objects.create(
+            encolar_auditoria(
                 pk_afectada=cronograma.id_cronograma,
                 nombre_tabla='cronograma',
-                creado_en=timezone.now(),
                 valor_previo={'estado': estado_previo},
                 valor_nuevo={
                     'estado': 'rechazada',
@@ -1436,6 +1494,91 @@ class GuardiaViewSet(viewsets.ModelViewSet):
 
         return Response({'resultados': resultados}, status=status.HTTP_200_OK)
 
+    MAX_DIAS_MATRIZ = 93
+
+    @action(detail=False, methods=['get'])
+    def matriz_disponibilidad(self, request):
+        """
+        Matriz agentes × fechas de un área y sus sub-áreas para planificar un
+        período en un solo pedido.
+
+        Parámetros: fecha_desde, fecha_hasta (YYYY-MM-DD, hasta MAX_DIAS_MATRIZ
+        días) y area_id (por defecto, el área del agente de la sesión).
+        Cada agente trae una cadena 'disponibilidad' con un carácter por fecha
+        de 'fechas'; 'leyenda' explica los códigos.
+        """
+        from common.permissions import obtener_area_y_subareas
+        from personas.models import Agente
+        from .utils import CELDAS_DISPONIBILIDAD
+
+        agente_sesion = obtener_agente_sesion(request)
+        if not agente_sesion:
+            return Response({'error': 'No autenticado'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            fd = datetime.strptime(request.query_params.get('fecha_desde', ''), '%Y-%m-%d').date()
+            fh = datetime.strptime(request.query_params.get('fecha_hasta', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return Response(
+                {'error': 'Se requieren fecha_desde y fecha_hasta con formato YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if fh < fd:
+            return Response({'error': 'fecha_hasta debe ser posterior a fecha_desde'}, status=status.HTTP_400_BAD_REQUEST)
+        if (fh - fd).days + 1 > self.MAX_DIAS_MATRIZ:
+            return Response(
+                {'error': f'El rango no puede superar {self.MAX_DIAS_MATRIZ} días'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        area_id = request.query_params.get('area_id') or agente_sesion.id_area_id
+        try:
+            area_id = int(area_id)
+        except (TypeError, ValueError):
+            return Response({'error': 'area_id inválido'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if obtener_rol_agente(agente_sesion) != 'administrador':
+            areas_permitidas = {
+                getattr(area, 'id_area', area) for area in obtener_areas_jerarquia(agente_sesion)
+            }
+            if area_id not in areas_permitidas:
+                return Response({'error': 'Sin permisos sobre el área solicitada'}, status=status.HTTP_403_FORBIDDEN)
+
+        areas = obtener_area_y_subareas(area_id)
+        if not areas:
+            return Response({'error': 'Área no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            agentes = list(
+                Agente.objects.filter(
+                    id_area__in=[area.id_area for area in areas],
+                    activo=True,
+                ).order_by('apellido', 'nombre').values('id_agente', 'nombre', 'apellido', 'legajo', 'id_area')
+            )
+            fechas, filas, feriados = PlanificadorCronograma.matriz_disponibilidad(
+                [agente['id_agente'] for agente in agentes], fd, fh
+            )
+            for agente in agentes:
+                agente['disponibilidad'] = filas[agente['id_agente']]
+
+            return Response({
+                'area_id': area_id,
+                'areas': [{'id_area': area.id_area, 'nombre': area.nombre} for area in areas],
+                'fecha_desde': fd.isoformat(),
+                'fecha_hasta': fh.isoformat(),
+                'fechas': [fecha.isoformat() for fecha in fechas],
+                'feriados': feriados,
+                'leyenda': CELDAS_DISPONIBILIDAD,
+                'agentes': agentes,
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.error(f'Error armando matriz de disponibilidad: {e}')
+            return Response(
+                {'error': f'Error armando matriz de disponibilidad: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
     @action(detail=True, methods=['get', 'post'], url_path='notas')
     def notas_guardia(self, request, pk=None):
         """
@@ -2967,10 +3110,9 @@ class HoraCompensacionViewSet(viewsets.ModelViewSet):
                 )
 
                 # Registrar en auditoría
-                Auditoria.objects.create(
+                encolar_auditoria(
                     pk_afectada=compensacion.id_hora_compensacion,
                     nombre_tabla='hora_compensacion',
-                    creado_en=timezone.now(),
                     valor_previo=None,
                     valor_nuevo={
                         'agente': agente.nombre + ' ' + agente.apellido,
@@ -3038,10 +3180,9 @@ class HoraCompensacionViewSet(viewsets.ModelViewSet):
                                 agente_aprobador, observaciones)
 
                         # Registrar en auditoría
-                        Auditoria.objects.create(
+                        encolar_auditoria(
                             pk_afectada=compensacion.id_hora_compensacion,
                             nombre_tabla='hora_compensacion',
-                            creado_en=timezone.now(),
                             valor_previo={'estado': 'pendiente'},
                             valor_nuevo={'estado': compensacion.estado},
                             accion='APROBAR_COMPENSACION' if accion == 'aprobar' else 'RECHAZAR_COMPENSACION',
@@ -3433,53 +3574,132 @@ class HoraCompensacionViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            from asistencia.models import Asistencia
+            from asistencia.models import Asistencia, CierreJornada, Licencia, ParteDiario
             from datetime import datetime, timedelta
 
             fecha_inicio = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
             fecha_fin = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
 
-            # Obtener asistencias del período
-            asistencias_filter = {
-                'fecha__range': [fecha_inicio, fecha_fin]
-            }
+            campos_agente = (
+                'id_agente__nombre', 'id_agente__apellido', 'id_agente__legajo',
+                'id_agente__horario_entrada', 'id_agente__horario_salida',
+            )
+
+            # Parte diario materializado por el cierre nocturno de jornada
+            partes = ParteDiario.objects.filter(
+                fecha_parte__range=[fecha_inicio, fecha_fin]
+            )
 
             if area_id:
-                asistencias_filter['id_agente__area_id'] = area_id
+                partes = partes.filter(id_area_id=area_id)
+
+            partes = list(partes.values(
+                'fecha_parte', 'estado', 'horas_efectivas', *campos_agente,
+                'id_asistencia__hora_entrada', 'id_asistencia__hora_salida',
+                'id_asistencia__marcacion_salida_automatica',
+                'id_licencia__id_tipo_licencia__descripcion',
+            ))
 
-            asistencias = Asistencia.objects.filter(
-                **asistencias_filter).order_by('fecha', 'id_agente__apellido')
+            # Días todavía sin cierre (hoy, o días que el cierre no procesó):
+            # se leen en vivo de asistencia y licencias aprobadas. Los ausentes
+            # recién se conocen al cerrar la jornada, así que no se listan.
+            cerradas = set(CierreJornada.objects.filter(
+                fecha__range=[fecha_inicio, fecha_fin], estado='ok'
+            ).values_list('fecha', flat=True))
+            cerradas.update(parte['fecha_parte'] for parte in partes)
+            pendientes = []
+            dia = fecha_inicio
+            while dia <= fecha_fin:
+                if dia not in cerradas:
+                    pendientes.append(dia)
+                dia += timedelta(days=1)
+
+            if pendientes:
+                asistencias = Asistencia.objects.filter(fecha__in=pendientes)
+                licencias = Licencia.objects.filter(
+                    estado='aprobada',
+                    fecha_desde__lte=pendientes[-1],
+                    fecha_hasta__gte=pendientes[0],
+                )
+                if area_id:
+                    asistencias = asistencias.filter(id_agente__id_area_id=area_id)
+                    licencias = licencias.filter(id_agente__id_area_id=area_id)
+
+                # Mismas reglas que cerrar_jornada: la marcación prevalece sobre
+                # la licencia y las licencias solo cuentan en días laborables
+                presentes = set()
+                for asistencia in asistencias.filter(hora_entrada__isnull=False).values(
+                    'id_agente_id', 'fecha', 'hora_entrada', 'hora_salida', 'horas_efectivas',
+                    'marcacion_salida_automatica', *campos_agente,
+                ):
+                    presentes.add((asistencia['id_agente_id'], asistencia['fecha']))
+                    partes.append({
+                        **{campo: asistencia[campo] for campo in campos_agente},
+                        'fecha_parte': asistencia['fecha'],
+                        'estado': 'presente',
+                        'horas_efectivas': asistencia['horas_efectivas'],
+                        'id_asistencia__hora_entrada': asistencia['hora_entrada'],
+                        'id_asistencia__hora_salida': asistencia['hora_salida'],
+                        'id_asistencia__marcacion_salida_automatica': asistencia['marcacion_salida_automatica'],
+                        'id_licencia__id_tipo_licencia__descripcion': None,
+                    })
+
+                from asistencia.calendario import calendario
+                laborables = [dia for dia in pendientes if calendario.es_dia_laborable(dia)]
+                for licencia in licencias.filter(id_agente__activo=True).order_by('id_licencia').values(
+                    'id_agente_id', 'fecha_desde', 'fecha_hasta', *campos_agente,
+                    'id_tipo_licencia__descripcion',
+                ):
+                    for dia in laborables:
+                        clave = (licencia['id_agente_id'], dia)
+                        if licencia['fecha_desde'] <= dia <= licencia['fecha_hasta'] and clave not in presentes:
+                            presentes.add(clave)
+                            partes.append({
+                                **{campo: licencia[campo] for campo in campos_agente},
+                                'fecha_parte': dia,
+                                'estado': 'licencia',
+                                'horas_efectivas': None,
+                                'id_asistencia__hora_entrada': None,
+                                'id_asistencia__hora_salida': None,
+                                'id_asistencia__marcacion_salida_automatica': False,
+                                'id_licencia__id_tipo_licencia__descripcion': licencia['id_tipo_licencia__descripcion'],
+                            })
+
+            partes.sort(key=lambda parte: (parte['fecha_parte'], parte['id_agente__apellido'] or ''))
 
             # Formatear datos
             registros = []
-            for asistencia in asistencias:
-                # Calcular horas trabajadas
+            for parte in partes:
+                hora_ingreso = parte['id_asistencia__hora_entrada']
+                hora_egreso = parte['id_asistencia__hora_salida']
+
                 horas_trabajadas = "N/A"
-                if asistencia.hora_ingreso and asistencia.hora_egreso:
-                    inicio = datetime.combine(
-                        asistencia.fecha, asistencia.hora_ingreso)
-                    fin = datetime.combine(
-                        asistencia.fecha, asistencia.hora_egreso)
-                    if fin < inicio:
-                        fin += timedelta(days=1)
-                    horas = (fin - inicio).total_seconds() / 3600
-                    horas_trabajadas = f"{int(horas)}h {int((horas % 1) * 60)}m"
+                if parte['horas_efectivas'] is not None:
+                    horas = float(parte['horas_efectivas'])
+                    horas_trabajadas = f"{int(horas)}h {int(round((horas % 1) * 60))}m"
 
                 # Determinar novedades
-                novedad = "Jornada habitual"
-                if asistencia.llegada_tarde:
+                if parte['estado'] == 'licencia':
+                    novedad = f"Licencia ({parte['id_licencia__id_tipo_licencia__descripcion'] or 'sin tipo'})"
+                elif parte['estado'] == 'ausente':
+                    novedad = "Ausente"
+                elif parte['id_asistencia__marcacion_salida_automatica']:
+                    novedad = "Salida automática"
+                elif (hora_ingreso and parte['id_agente__horario_entrada']
+                      and hora_ingreso > parte['id_agente__horario_entrada']):
                     novedad = "Llegada tarde"
-                elif asistencia.retiro_temprano:
+                elif (hora_egreso and parte['id_agente__horario_salida']
+                      and hora_egreso < parte['id_agente__horario_salida']):
                     novedad = "Retiro temprano"
-                elif asistencia.comision_oficial:
-                    novedad = "Comisión oficial"
+                else:
+                    novedad = "Jornada habitual"
 
                 registros.append({
-                    'fecha': asistencia.fecha.strftime('%d/%m/%Y'),
-                    'agente': f"{asistencia.id_agente.apellido}, {asistencia.id_agente.nombre}",
-                    'legajo': asistencia.id_agente.legajo,
-                    'hora_ingreso': asistencia.hora_ingreso.strftime('%H:%M') if asistencia.hora_ingreso else "Sin registro",
-                    'hora_egreso': asistencia.hora_egreso.strftime('%H:%M') if asistencia.hora_egreso else "Sin registro",
+                    'fecha': parte['fecha_parte'].strftime('%d/%m/%Y'),
+                    'agente': f"{parte['id_agente__apellido']}, {parte['id_agente__nombre']}",
+                    'legajo': parte['id_agente__legajo'],
+                    'hora_ingreso': hora_ingreso.strftime('%H:%M') if hora_ingreso else "Sin registro",
+                    'hora_egreso': hora_egreso.strftime('%H:%M') if hora_egreso else "Sin registro",
                     'horas_trabajadas': horas_trabajadas,
                     'novedad': novedad
                 })
@@ -3495,7 +3715,9 @@ class HoraCompensacionViewSet(viewsets.ModelViewSet):
                     'total_registros': len(registros),
                     'total_llegadas_tarde': len([r for r in registros if 'tarde' in r['novedad']]),
                     'total_retiros_temprano': len([r for r in registros if 'temprano' in r['novedad']]),
-                    'total_comisiones': len([r for r in registros if 'Comisión' in r['novedad']])
+                    'total_comisiones': len([r for r in registros if 'Comisión' in r['novedad']]),
+                    'total_ausentes': len([r for r in registros if r['novedad'] == 'Ausente']),
+                    'total_licencias': len([r for r in registros if r['novedad'].startswith('Licencia')])
                 }
             })
 
@@ -3692,10 +3914,9 @@ class HoraCompensacionViewSet(viewsets.ModelViewSet):
             compensacion.aprobar(agente_aprobador, observaciones)
 
             # Registrar en auditoría
-            Auditoria.objects.create(
+            encolar_auditoria(
                 pk_afectada=compensacion.id_hora_compensacion,
                 nombre_tabla='hora_compensacion',
-                creado_en=timezone.now(),
                 valor_previo={'estado': 'pendiente'},
                 valor_nuevo={'estado': 'aprobada'},
                 accion='APROBAR_COMPENSACION',
@@ -3750,10 +3971,9 @@ class HoraCompensacionViewSet(viewsets.ModelViewSet):
             compensacion.rechazar(agente_rechazador, motivo_rechazo)
 
             # Registrar en auditoría
-            Auditoria.objects.create(
+            encolar_auditoria(
                 pk_afectada=compensacion.id_hora_compensacion,
                 nombre_tabla='hora_compensacion',
-                creado_en=timezone.now(),
                 valor_previo={'estado': 'pendiente'},
                 valor_nuevo={'estado': 'rechazada'},
                 accion='RECHAZAR_COMPENSACION',
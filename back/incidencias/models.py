@@ -117,20 +117,12 @@ class Incidencia(models.Model):
         self.save()
         
         # Registrar en auditoría
-        from auditoria.models import Auditoria
-        try:
-            Auditoria.objects.create(
-                pk_afectada=self.id,
-                nombre_tabla='incidencia',
-                creado_en=timezone.now(),
-                valor_nuevo={'comentario': comentario[:200]},
-                accion='COMENTAR',
-                id_agente=autor
-            )
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Error al registrar auditoría de comentario: {str(e)}")
+        from auditoria.buffer import encolar_auditoria
+        encolar_auditoria(
+            'incidencia', 'COMENTAR', self.id,
+            valor_nuevo={'comentario': comentario[:200]},
+            id_agente=autor
+        )
     
     def resolver_incidencia(self, resolucion, autor=None):
         """Resolver la incidencia"""
@@ -7,6 +7,8 @@ from django.conf import settings
 from django.core.mail.backends.base import BaseEmailBackend
 from django.core.mail.message import sanitize_address
 
+from common.metricas import medir_email
+
 
 class ResendEmailBackend(BaseEmailBackend):
     """
@@ -91,7 +93,8 @@ class ResendEmailBackend(BaseEmailBackend):
 
         # Enviar email via Resend
         try:
-            response = resend.Emails.send(params)
+            with medir_email():
+                response = resend.Emails.send(params)
             return True
         except Exception as e:
             if not self.fail_silently:
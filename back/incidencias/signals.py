@@ -4,29 +4,20 @@ Signals para el envío automático de emails y auditoría de incidencias.
 
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
-from django.utils import timezone
 from .models import Incidencia
 from .email_service import IncidenciaEmailService
-from auditoria.models import Auditoria
+from auditoria.buffer import encolar_auditoria
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 def registrar_auditoria(accion, incidencia, valor_previo=None, valor_nuevo=None, agente=None):
-    """Registrar acción en auditoría"""
-    try:
-        Auditoria.objects.create(
-            pk_afectada=incidencia.id,
-            nombre_tabla='incidencia',
-            creado_en=timezone.now(),
-            valor_previo=valor_previo,
-            valor_nuevo=valor_nuevo,
-            accion=accion,
-            id_agente=agente
-        )
-    except Exception as e:
-        logger.error(f"Error al registrar auditoría de incidencia: {str(e)}")
+    """Registrar acción en auditoría (se inserta con el resto del request)"""
+    encolar_auditoria(
+        'incidencia', accion, incidencia.id,
+        valor_previo=valor_previo, valor_nuevo=valor_nuevo, id_agente=agente
+    )
 
 
 @receiver(post_save, sender=Incidencia)
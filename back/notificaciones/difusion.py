@@ -0,0 +1,106 @@
+"""
+Notificaciones de difusión - Sistema GIGA
+
+Los avisos para muchos agentes (nuevo feriado, organigrama, cronogramas
+pendientes de aprobación) se guardan una sola vez en notificacion_difusion
+con su audiencia:
+
+- 'todos': todos los agentes
+- 'area':  los agentes del área id_area
+- 'rol':   los agentes con el rol id_rol
+
+Crear una difusión es un único INSERT sin importar cuántos agentes la reciben.
+La lectura de cada agente se registra en notificacion_difusion_lectura recién
+cuando la marca como leída: una difusión sin fila de lectura del agente está
+no leída. Un agente no ve las difusiones anteriores a su alta (creado_en).
+"""
+
+from django.db import connection
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Notificacion, NotificacionDifusion, LecturaDifusion
+from . import tiempo_real
+
+
+def crear_difusion(titulo, mensaje, tipo='GENERICO', link=None, audiencia='todos', id_area=None, id_rol=None):
+    """Guarda la difusión y la publica a los clientes conectados al confirmar"""
+    difusion = NotificacionDifusion.objects.create(
+        titulo=titulo,
+        mensaje=mensaje,
+        tipo=tipo,
+        link=link,
+        audiencia=audiencia,
+        area_id=id_area if audiencia == 'area' else None,
+        rol_id=id_rol if audiencia == 'rol' else None,
+    )
+    tiempo_real.publicar_difusion(difusion)
+    return difusion
+
+
+def perfil_agente(agente_id):
+    """(id_area, roles, creado_en) del agente: define qué difusiones le llegan"""
+    from personas.models import Agente, AgenteRol
+
+    agente = Agente.objects.filter(id_agente=agente_id).values('id_area', 'creado_en').first()
+    if agente is None:
+        return None, frozenset(), None
+    roles = frozenset(
+        AgenteRol.objects.filter(id_agente=agente_id).values_list('id_rol', flat=True)
+    )
+    return agente['id_area'], roles, agente['creado_en']
+
+
+def filtro_audiencia(id_area, roles):
+    """Q de las difusiones dirigidas a un agente con ese área y roles"""
+    filtro = Q(audiencia='todos')
+    if id_area is not None:
+        filtro |= Q(audiencia='area', area_id=id_area)
+    if roles:
+        filtro |= Q(audiencia='rol', rol_id__in=list(roles))
+    return filtro
+
+
+def difusiones_no_leidas(agente_id, perfil=None):
+    """Difusiones dirigidas al agente sin lectura registrada"""
+    id_area, roles, creado_en = perfil or perfil_agente(agente_id)
+    queryset = NotificacionDifusion.objects.filter(filtro_audiencia(id_area, roles))
+    if creado_en is not None:
+        queryset = queryset.filter(fecha_creacion__gte=creado_en)
+    leida = LecturaDifusion.objects.filter(difusion_id=OuterRef('pk'), agente_id=agente_id)
+    return queryset.filter(~Exists(leida))
+
+
+def contar_no_leidas(agente_id, perfil=None):
+    """Notificaciones personales no leídas más difusiones no leídas"""
+    personales = Notificacion.objects.filter(agente_id=agente_id, leida=False).count()
+    return personales + difusiones_no_leidas(agente_id, perfil).count()
+
+
+def marcar_difusion_leida(agente_id, difusion_id):
+    """Registra la lectura; devuelve False si ya estaba leída"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO notificacion_difusion_lectura (id_difusion, id_agente)
+            VALUES (%s, %s)
+            ON CONFLICT (id_difusion, id_agente) DO NOTHING
+            """,
+            [difusion_id, agente_id],
+        )
+        return cursor.rowcount > 0
+
+
+def marcar_todas_difusiones_leidas(agente_id, perfil=None):
+    """Registra la lectura de todas las difusiones pendientes del agente en un solo INSERT ... SELECT"""
+    pendientes = difusiones_no_leidas(agente_id, perfil).order_by().values('pk')
+    sql, params = pendientes.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO notificacion_difusion_lectura (id_difusion, id_agente)
+            SELECT pendientes.pk, %s FROM ({sql}) AS pendientes
+            ON CONFLICT (id_difusion, id_agente) DO NOTHING
+            """,
+            [agente_id, *params],
+        )
+        return cursor.rowcount
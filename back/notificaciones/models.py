@@ -34,3 +34,44 @@ class Notificacion(models.Model):
 
     def __str__(self):
         return f"{self.agente.nombre} {self.agente.apellido} - {self.titulo}"
+
+
+class NotificacionDifusion(models.Model):
+    """
+    Notificación para una audiencia (todos, un área o un rol) guardada una sola
+    vez. Cada agente la ve como no leída hasta que existe su LecturaDifusion.
+    """
+    AUDIENCIA_CHOICES = (
+        ('todos', 'Todos los agentes'),
+        ('area', 'Área'),
+        ('rol', 'Rol'),
+    )
+
+    titulo = models.CharField(max_length=255)
+    mensaje = models.TextField()
+    tipo = models.CharField(max_length=50, choices=Notificacion.TIPO_CHOICES, default='GENERICO')
+    link = models.CharField(max_length=255, blank=True, null=True)
+    audiencia = models.CharField(max_length=10, choices=AUDIENCIA_CHOICES, default='todos')
+    area = models.ForeignKey('personas.Area', models.CASCADE, db_column='id_area', blank=True, null=True)
+    rol = models.ForeignKey('personas.Rol', models.CASCADE, db_column='id_rol', blank=True, null=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        managed = False
+        db_table = 'notificacion_difusion'
+        ordering = ['-fecha_creacion']
+
+    def __str__(self):
+        return f"{self.get_audiencia_display()} - {self.titulo}"
+
+
+class LecturaDifusion(models.Model):
+    """Acuse de lectura de una difusión por un agente"""
+    pk = models.CompositePrimaryKey('difusion_id', 'agente_id')
+    difusion = models.ForeignKey(NotificacionDifusion, models.CASCADE, related_name='lecturas', db_column='id_difusion')
+    agente = models.ForeignKey(Agente, models.CASCADE, db_column='id_agente')
+    leida_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        managed = False
+        db_table = 'notificacion_difusion_lectura'
@@ -1,7 +1,28 @@
 from rest_framework import serializers
-from .models import Notificacion
+from .models import Notificacion, NotificacionDifusion
 
 class NotificacionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notificacion
         fields = '__all__'
+
+    def to_representation(self, instance):
+        datos = super().to_representation(instance)
+        datos['origen'] = 'personal'
+        return datos
+
+
+class NotificacionDifusionSerializer(serializers.ModelSerializer):
+    """Difusión en la bandeja del agente: mismo formato que una notificación personal"""
+    leida = serializers.SerializerMethodField()
+    origen = serializers.SerializerMethodField()
+
+    class Meta:
+        model = NotificacionDifusion
+        fields = ['id', 'titulo', 'mensaje', 'tipo', 'link', 'fecha_creacion', 'leida', 'origen']
+
+    def get_leida(self, obj):
+        return False
+
+    def get_origen(self, obj):
+        return 'difusion'
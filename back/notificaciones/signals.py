@@ -4,19 +4,21 @@ from django.contrib.auth.models import User
 from django.contrib.auth.signals import user_logged_in
 from django.utils import timezone
 from .models import Notificacion
+from . import difusion, tiempo_real
 from guardias.models import Guardia, HoraCompensacion, Feriado, Cronograma
 from asistencia.models import Licencia, Asistencia
 from incidencias.models import Incidencia
-from personas.models import Agente, AgenteRol, Organigrama, SesionActiva
+from personas.models import Agente, AgenteRol, Organigrama, Rol, SesionActiva
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def get_users_by_role(role_name):
-    """Helper para encontrar Agentes con un nombre de rol específico vía AgenteRol"""
-    agente_ids = AgenteRol.objects.filter(id_rol__nombre=role_name).values_list('id_agente', flat=True)
-    return Agente.objects.filter(id_agente__in=agente_ids)
+@receiver(post_save, sender=Notificacion)
+def publicar_notificacion(sender, instance, created, **kwargs):
+    """Avisa a los clientes conectados (SSE) y actualiza el contador de no leídas"""
+    if created:
+        tiempo_real.publicar_nueva(instance)
 
 
 @receiver(post_save, sender=Guardia)
@@ -176,43 +178,22 @@ def notificar_licencia(sender, instance, created, **kwargs):
 @receiver(post_save, sender=Feriado)
 def notificar_nuevo_feriado(sender, instance, created, **kwargs):
     if created:
-        agentes_activos = Agente.objects.filter(activo=True)
-        notificaciones = []
-        
-        titulo = "Nuevo Feriado"
-        mensaje = f"Se ha agregado un nuevo feriado al calendario: {instance.nombre} ({instance.fecha_inicio})"
-        
-        for agente in agentes_activos:
-            notificaciones.append(Notificacion(
-                agente=agente,
-                titulo=titulo,
-                mensaje=mensaje,
-                tipo="FERIADO",
-                link="/calendario"
-            ))
-        
-        if notificaciones:
-            Notificacion.objects.bulk_create(notificaciones)
+        # Una difusión para todos en lugar de una notificación por agente activo
+        difusion.crear_difusion(
+            titulo="Nuevo Feriado",
+            mensaje=f"Se ha agregado un nuevo feriado al calendario: {instance.nombre} ({instance.fecha_inicio})",
+            tipo="FERIADO",
+            link="/calendario"
+        )
 
 @receiver(post_save, sender=Organigrama)
 def notificar_organigrama(sender, instance, created, **kwargs):
-    titulo = "Actualización de Organigrama"
-    mensaje = f"Se ha publicado una nueva versión del organigrama: {instance.nombre} (v{instance.version})"
-    
-    agentes_activos = Agente.objects.filter(activo=True)
-    notificaciones = []
-    
-    for agente in agentes_activos:
-        notificaciones.append(Notificacion(
-            agente=agente,
-            titulo=titulo,
-            mensaje=mensaje,
-            tipo="ORGANIGRAMA",
-            link="/organigrama"
-        ))
-            
-    if notificaciones:
-        Notificacion.objects.bulk_create(notificaciones)
+    difusion.crear_difusion(
+        titulo="Actualización de Organigrama",
+        mensaje=f"Se ha publicado una nueva versión del organigrama: {instance.nombre} (v{instance.version})",
+        tipo="ORGANIGRAMA",
+        link="/organigrama"
+    )
 
 
 
@@ -267,14 +248,15 @@ def notificar_cronograma(sender, instance, created, **kwargs):
     
     if estado != old_estado:
         if estado == 'pendiente_aprobacion':
-            directores = get_users_by_role('Director')
-            for director in directores:
-                Notificacion.objects.create(
-                    agente=director,
+            rol_director = Rol.objects.filter(nombre='Director').values_list('id_rol', flat=True).first()
+            if rol_director:
+                difusion.crear_difusion(
                     titulo="Cronograma Pendiente de Aprobación",
                     mensaje=f"Hay un cronograma pendiente para el área {instance.id_area.nombre}",
                     tipo="CRONOGRAMA",
-                    link="/paneladmin/guardias/aprobaciones"
+                    link="/paneladmin/guardias/aprobaciones",
+                    audiencia='rol',
+                    id_rol=rol_director
                 )
         elif estado in ['aprobada', 'publicada']:
             if instance.id_jefe:
@@ -301,5 +283,6 @@ def notificar_cronograma(sender, instance, created, **kwargs):
                     ))
                 if notificaciones_agentes:
                     Notificacion.objects.bulk_create(notificaciones_agentes)
+                    tiempo_real.publicar_nuevas(notificaciones_agentes)
             except Exception as e:
                 logger.error(f"Error notificando agentes del cronograma: {e}")
@@ -0,0 +1,332 @@
+"""
+Notificaciones en tiempo real - Sistema GIGA
+
+Cada proceso mantiene en memoria:
+- las suscripciones de los clientes conectados al stream SSE
+  (/api/notificaciones/stream/, ver views.stream_notificaciones), y
+- el contador de no leídas de cada agente consultado, que se actualiza con
+  los eventos en lugar de volver a contar en la base, junto con su perfil
+  (área y roles) para saber qué difusiones le corresponden (ver difusion.py).
+
+Los receptores de notificaciones/signals.py y las vistas publican eventos al
+confirmar la transacción. El broker los reparte a todos los procesos:
+
+- 'postgres' (por defecto): NOTIFY/LISTEN sobre el canal giga_notificaciones;
+  cada proceso tiene un hilo con una conexión dedicada escuchando.
+- 'local': dentro del mismo proceso (runserver, pruebas).
+
+Un cliente conectado sin eventos no genera consultas: solo recibe un latido
+cada NOTIFICACIONES_SSE_LATIDO segundos. El contador se vuelve a contar en la
+base cuando vence NOTIFICACIONES_CONTADOR_TTL y alguien lo necesita, o si el
+hilo de escucha perdió la conexión (pudo perder eventos).
+"""
+
+import asyncio
+import json
+import threading
+import time
+import logging
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+CANAL = 'giga_notificaciones'
+# NOTIFY admite hasta 8000 bytes de payload
+MAX_AGENTES_POR_EVENTO = 500
+MAX_MENSAJE = 500
+
+
+class Central:
+    """Suscripciones y contadores de no leídas del proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscripciones = {}
+        self._contadores = {}
+        self._perfiles = {}
+
+    # -- Suscripciones (clientes SSE) ----------------------------------------
+
+    def suscribir(self, agente_id, loop):
+        cola = asyncio.Queue(maxsize=100)
+        with self._lock:
+            self._suscripciones.setdefault(agente_id, set()).add((loop, cola))
+        return cola
+
+    def desuscribir(self, agente_id, loop, cola):
+        with self._lock:
+            suscripciones = self._suscripciones.get(agente_id)
+            if suscripciones:
+                suscripciones.discard((loop, cola))
+                if not suscripciones:
+                    del self._suscripciones[agente_id]
+
+    def conectados(self):
+        with self._lock:
+            return sum(len(s) for s in self._suscripciones.values())
+
+    # -- Contadores de no leídas ---------------------------------------------
+
+    def no_leidas(self, agente_id):
+        """Contador en memoria, o None si no se conoce o venció"""
+        ttl = getattr(settings, 'NOTIFICACIONES_CONTADOR_TTL', 600)
+        with self._lock:
+            dato = self._contadores.get(agente_id)
+        if dato is None or time.monotonic() - dato[1] > ttl:
+            return None
+        return dato[0]
+
+    def fijar_no_leidas(self, agente_id, cantidad, perfil=None):
+        with self._lock:
+            self._contadores[agente_id] = (max(cantidad, 0), time.monotonic())
+            if perfil is not None:
+                self._perfiles[agente_id] = perfil
+
+    def perfil(self, agente_id):
+        with self._lock:
+            return self._perfiles.get(agente_id)
+
+    def invalidar(self):
+        with self._lock:
+            self._contadores.clear()
+            self._perfiles.clear()
+
+    # -- Eventos -------------------------------------------------------------
+
+    def recibir(self, evento):
+        """Aplica el evento a los contadores y lo reenvía a los clientes conectados"""
+        agentes = evento['agentes'] if 'agentes' in evento else self._destinatarios(evento)
+        for agente_id in agentes:
+            with self._lock:
+                dato = self._contadores.get(agente_id)
+                if 'no_leidas' in evento:
+                    self._contadores[agente_id] = (evento['no_leidas'], time.monotonic())
+                elif dato is not None:
+                    # Se actualiza el valor sin renovar su vigencia (TTL)
+                    self._contadores[agente_id] = (max(dato[0] + evento.get('delta', 0), 0), dato[1])
+                suscripciones = list(self._suscripciones.get(agente_id, ()))
+            for loop, cola in suscripciones:
+                loop.call_soon_threadsafe(_encolar, cola, evento)
+
+    def _destinatarios(self, evento):
+        """
+        Agentes conocidos por el proceso (con contador o conectados) a los que
+        llega una difusión. Sin perfil conocido solo se les aplican las
+        dirigidas a todos; el contador de esos agentes se vuelve a contar.
+        """
+        audiencia = evento.get('audiencia')
+        destinatarios = []
+        with self._lock:
+            for agente_id in set(self._contadores) | set(self._suscripciones):
+                if audiencia == 'todos':
+                    destinatarios.append(agente_id)
+                    continue
+                perfil = self._perfiles.get(agente_id)
+                if perfil is None:
+                    self._contadores.pop(agente_id, None)
+                elif (audiencia == 'area' and perfil[0] == evento.get('id_area')) or \
+                        (audiencia == 'rol' and evento.get('id_rol') in perfil[1]):
+                    destinatarios.append(agente_id)
+        return destinatarios
+
+
+def _encolar(cola, evento):
+    try:
+        cola.put_nowait(evento)
+    except asyncio.QueueFull:
+        # Cliente que no consume: se descarta el evento (recibirá el contador actualizado con el próximo)
+        pass
+
+
+central = Central()
+
+
+# ----------------------------------------------------------------------
+# Brokers
+# ----------------------------------------------------------------------
+
+class BrokerLocal:
+    """Entrega en el mismo proceso; suficiente con un solo proceso de servidor"""
+
+    def enviar(self, evento):
+        central.recibir(evento)
+
+    def iniciar(self):
+        pass
+
+
+class BrokerPostgres:
+    """NOTIFY para publicar y un hilo con LISTEN por proceso para recibir"""
+
+    def __init__(self):
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def enviar(self, evento):
+        with connections['default'].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CANAL, json.dumps(evento, default=str)])
+
+    def iniciar(self):
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._escuchar, name='giga-notificaciones', daemon=True)
+                self._hilo.start()
+
+    def _conectar(self):
+        # Conexión propia, fuera del pool: queda tomada mientras el proceso viva
+        conexion_django = connections['default']
+        conexion = conexion_django.Database.connect(**conexion_django.get_connection_params())
+        conexion.autocommit = True
+        with conexion.cursor() as cursor:
+            cursor.execute(f'LISTEN {CANAL}')
+        return conexion
+
+    def _escuchar(self):
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+        while True:
+            conexion = None
+            try:
+                conexion = self._conectar()
+                # Pudieron perderse eventos mientras no se escuchaba
+                central.invalidar()
+                if is_psycopg3:
+                    while True:
+                        for aviso in conexion.notifies(timeout=30):
+                            self._despachar(aviso.payload)
+                else:
+                    import select
+                    while True:
+                        if select.select([conexion], [], [], 30) != ([], [], []):
+                            conexion.poll()
+                            while conexion.notifies:
+                                self._despachar(conexion.notifies.pop(0).payload)
+            except Exception as e:
+                logger.warning(f'Notificaciones: escucha interrumpida ({e}), se reintenta en 5s')
+                time.sleep(5)
+            finally:
+                if conexion is not None:
+                    try:
+                        conexion.close()
+                    except Exception:
+                        pass
+
+    def _despachar(self, payload):
+        try:
+            central.recibir(json.loads(payload))
+        except Exception as e:
+            logger.error(f'Notificaciones: evento inválido descartado: {e}')
+
+
+_broker = None
+
+
+def broker():
+    global _broker
+    if _broker is None:
+        tipo = getattr(settings, 'NOTIFICACIONES_BROKER', 'postgres')
+        _broker = BrokerLocal() if tipo == 'local' else BrokerPostgres()
+        _broker.iniciar()
+    return _broker
+
+
+# ----------------------------------------------------------------------
+# Publicación (desde signals y vistas)
+# ----------------------------------------------------------------------
+
+def _publicar(evento):
+    def enviar():
+        try:
+            broker().enviar(evento)
+        except Exception as e:
+            logger.error(f'Notificaciones: no se pudo publicar el evento {evento.get("evento")}: {e}')
+    transaction.on_commit(enviar)
+
+
+def _resumen(notificacion, origen='personal'):
+    return {
+        'id': notificacion.pk,
+        'origen': origen,
+        'titulo': notificacion.titulo,
+        'mensaje': notificacion.mensaje[:MAX_MENSAJE],
+        'tipo': notificacion.tipo,
+        'link': notificacion.link,
+        'fecha_creacion': notificacion.fecha_creacion,
+    }
+
+
+def publicar_nueva(notificacion):
+    _publicar({
+        'evento': 'nueva',
+        'agentes': [notificacion.agente_id],
+        'delta': 1,
+        'notificacion': _resumen(notificacion),
+    })
+
+
+def publicar_nuevas(notificaciones):
+    """Notificaciones creadas con bulk_create (sin post_save): un evento por grupo de agentes"""
+    por_contenido = {}
+    for notificacion in notificaciones:
+        clave = (notificacion.titulo, notificacion.mensaje, notificacion.tipo, notificacion.link)
+        por_contenido.setdefault(clave, (notificacion, []))[1].append(notificacion.agente_id)
+    for ejemplo, agentes in por_contenido.values():
+        resumen = _resumen(ejemplo)
+        resumen['id'] = None
+        for inicio in range(0, len(agentes), MAX_AGENTES_POR_EVENTO):
+            _publicar({
+                'evento': 'nueva',
+                'agentes': agentes[inicio:inicio + MAX_AGENTES_POR_EVENTO],
+                'delta': 1,
+                'notificacion': resumen,
+            })
+
+
+def publicar_difusion(difusion):
+    """Un solo evento sin lista de agentes: cada proceso resuelve la audiencia con sus perfiles"""
+    _publicar({
+        'evento': 'nueva',
+        'audiencia': difusion.audiencia,
+        'id_area': difusion.area_id,
+        'id_rol': difusion.rol_id,
+        'delta': 1,
+        'notificacion': _resumen(difusion, origen='difusion'),
+    })
+
+
+def publicar_leidas(agente_id, ids, origen='personal'):
+    """ids de notificaciones personales o de difusiones (según origen) que pasaron a leídas"""
+    if ids:
+        _publicar({
+            'evento': 'leida', 'agentes': [agente_id], 'delta': -len(ids),
+            'ids': list(ids), 'origen': origen,
+        })
+
+
+def publicar_todas_leidas(agente_id):
+    _publicar({'evento': 'todas_leidas', 'agentes': [agente_id], 'no_leidas': 0})
+
+
+# ----------------------------------------------------------------------
+# Contador de no leídas
+# ----------------------------------------------------------------------
+
+def contar_no_leidas_db(agente_id, perfil=None):
+    """Personales más difusiones no leídas (ver difusion.contar_no_leidas)"""
+    from . import difusion
+    return difusion.contar_no_leidas(agente_id, perfil)
+
+
+def no_leidas(agente_id):
+    """Contador del agente: de memoria, o contado en la base si no se conoce"""
+    from . import difusion
+
+    broker()
+    cantidad = central.no_leidas(agente_id)
+    if cantidad is None:
+        perfil = difusion.perfil_agente(agente_id)
+        cantidad = contar_no_leidas_db(agente_id, perfil)
+        central.fijar_no_leidas(agente_id, cantidad, perfil[:2])
+    return cantidad
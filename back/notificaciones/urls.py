@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import NotificacionViewSet
+from .views import NotificacionViewSet, stream_notificaciones
 
 router = DefaultRouter()
 router.register(r'', NotificacionViewSet, basename='notificacion')
 
 urlpatterns = [
+    path('stream/', stream_notificaciones, name='notificaciones-stream'),
     path('', include(router.urls)),
 ]
  
\ No newline at end of file
@@ -1,9 +1,21 @@
+import asyncio
+import heapq
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.utils.urls import replace_query_param
 from .models import Notificacion
-from .serializers import NotificacionSerializer
+from .serializers import NotificacionSerializer, NotificacionDifusionSerializer
+from . import difusion, tiempo_real
 
 class NotificacionViewSet(viewsets.ModelViewSet):
     serializer_class = NotificacionSerializer
@@ -17,16 +29,150 @@ class NotificacionViewSet(viewsets.ModelViewSet):
             
         return Notificacion.objects.filter(agente_id=agente_id, leida=False).order_by('-fecha_creacion')
 
+    def list(self, request, *args, **kwargs):
+        """
+        Bandeja del agente: notificaciones personales y difusiones no leídas,
+        de la más reciente a la más antigua. Cada página lee a lo sumo
+        página * tamaño filas de cada origen y las intercala (ya vienen
+        ordenadas por fecha_creacion).
+        """
+        agente_id = request.session.get('user_id')
+        if not agente_id:
+            return Response({'count': 0, 'next': None, 'previous': None, 'results': []})
+
+        perfil = difusion.perfil_agente(agente_id)
+        personales = self.get_queryset()
+        difusiones = difusion.difusiones_no_leidas(agente_id, perfil).order_by('-fecha_creacion')
 
+        paginador = self.paginator
+        tamano = paginador.get_page_size(request) or 20
+        try:
+            pagina = max(int(request.query_params.get(paginador.page_query_param, 1)), 1)
+        except ValueError:
+            pagina = 1
+        desde, hasta = (pagina - 1) * tamano, pagina * tamano
+
+        items = heapq.merge(
+            ((n.fecha_creacion, NotificacionSerializer, n) for n in personales[:hasta]),
+            ((d.fecha_creacion, NotificacionDifusionSerializer, d) for d in difusiones[:hasta]),
+            key=lambda item: item[0],
+            reverse=True,
+        )
+        resultados = [serializer(obj).data for _, serializer, obj in list(items)[desde:hasta]]
+
+        total = personales.count() + difusiones.count()
+        url = request.build_absolute_uri()
+        return Response({
+            'count': total,
+            'next': replace_query_param(url, paginador.page_query_param, pagina + 1) if hasta < total else None,
+            'previous': replace_query_param(url, paginador.page_query_param, pagina - 1) if pagina > 1 else None,
+            'results': resultados,
+        })
+
+    @action(detail=False, methods=['get'])
+    def no_leidas(self, request):
+        """Cantidad de no leídas desde el contador en memoria (ver tiempo_real.py)"""
+        agente_id = request.session.get('user_id')
+        if not agente_id:
+            return Response({'no_leidas': 0})
+        return Response({'no_leidas': tiempo_real.no_leidas(agente_id)})
 
     @action(detail=True, methods=['post'])
     def marcar_leida(self, request, pk=None):
         notificacion = self.get_object()
-        notificacion.leida = True
-        notificacion.save()
+        # Actualización condicional: solo quien la pasa de no leída a leída
+        # descuenta del contador (dos clics seguidos no restan dos veces)
+        if Notificacion.objects.filter(pk=notificacion.pk, leida=False).update(leida=True):
+            tiempo_real.publicar_leidas(notificacion.agente_id, [notificacion.pk])
         return Response({'status': 'notificación marcada como leída'})
 
+    @action(detail=True, methods=['post'])
+    def marcar_difusion_leida(self, request, pk=None):
+        """Registra la lectura de una difusión (pk = id de la difusión) por el agente en sesión"""
+        agente_id = request.session.get('user_id')
+        if not agente_id:
+            return Response({'error': 'No autenticado'}, status=status.HTTP_401_UNAUTHORIZED)
+        if not difusion.difusiones_no_leidas(agente_id).filter(pk=pk).exists():
+            return Response({'status': 'la difusión no está pendiente para el agente'}, status=status.HTTP_404_NOT_FOUND)
+        if difusion.marcar_difusion_leida(agente_id, pk):
+            tiempo_real.publicar_leidas(agente_id, [int(pk)], origen='difusion')
+        return Response({'status': 'difusión marcada como leída'})
+
     @action(detail=False, methods=['post'])
     def marcar_todas_leidas(self, request):
+        agente_id = request.session.get('user_id')
         self.get_queryset().update(leida=True)
+        if agente_id:
+            difusion.marcar_todas_difusiones_leidas(agente_id)
+        tiempo_real.publicar_todas_leidas(agente_id)
         return Response({'status': 'todas las notificaciones marcadas como leídas'})
+
+
+def _evento_sse(nombre, datos):
+    return f'event: {nombre}\ndata: {json.dumps(datos, cls=DjangoJSONEncoder)}\n\n'
+
+
+async def _flujo_eventos(agente_id, no_leidas):
+    """
+    Stream SSE del agente: estado inicial, un evento por novedad (con el
+    contador actualizado) y un comentario de latido mientras no hay novedades.
+    Termina tras NOTIFICACIONES_SSE_DURACION; el navegador reconecta solo.
+    """
+    latido = getattr(settings, 'NOTIFICACIONES_SSE_LATIDO', 25)
+    fin = time.monotonic() + getattr(settings, 'NOTIFICACIONES_SSE_DURACION', 1800)
+    loop = asyncio.get_running_loop()
+    cola = tiempo_real.central.suscribir(agente_id, loop)
+    try:
+        yield f'retry: {getattr(settings, "NOTIFICACIONES_SSE_REINTENTO_MS", 5000)}\n\n'
+        yield _evento_sse('estado', {'no_leidas': no_leidas})
+        while time.monotonic() < fin:
+            try:
+                evento = await asyncio.wait_for(cola.get(), timeout=latido)
+            except asyncio.TimeoutError:
+                yield ': latido\n\n'
+                continue
+            cantidad = tiempo_real.central.no_leidas(agente_id)
+            if cantidad is None:
+                cantidad = await sync_to_async(tiempo_real.no_leidas)(agente_id)
+            yield _evento_sse(evento['evento'], {
+                'no_leidas': cantidad,
+                'notificacion': evento.get('notificacion'),
+                'ids': evento.get('ids'),
+                'origen': evento.get('origen'),
+            })
+    finally:
+        tiempo_real.central.desuscribir(agente_id, loop, cola)
+
+
+async def stream_notificaciones(request):
+    """
+    GET /api/notificaciones/stream/ - Server-Sent Events con las notificaciones
+    nuevas y el contador de no leídas del agente en sesión.
+
+    Se autentica solo con la sesión (en caché), sin consultar al agente. Bajo
+    WSGI no se mantiene la conexión abierta (ocuparía un hilo de Gunicorn): se
+    responde el estado actual y el navegador reconecta cada
+    NOTIFICACIONES_SSE_REINTENTO_MS, como un polling sin consultas mientras el
+    contador esté vigente. El stream continuo lo sirve un proceso ASGI aparte
+    (SERVIDOR=notificaciones en Dockerfile.prod), solo para esta ruta.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+    agente_id = await request.session.aget('user_id')
+    if not agente_id or not await request.session.aget('is_authenticated', False):
+        return JsonResponse({'error': 'No autenticado'}, status=401)
+
+    no_leidas = await sync_to_async(tiempo_real.no_leidas)(agente_id)
+
+    if isinstance(request, ASGIRequest):
+        contenido = _flujo_eventos(agente_id, no_leidas)
+    else:
+        reintento = getattr(settings, 'NOTIFICACIONES_SSE_REINTENTO_MS', 5000)
+        contenido = iter([f'retry: {reintento}\n\n', _evento_sse('estado', {'no_leidas': no_leidas})])
+
+    respuesta = StreamingHttpResponse(contenido, content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    # nginx: no acumular la respuesta en buffer
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
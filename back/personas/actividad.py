@@ -0,0 +1,100 @@
+"""
+Registro diferido de actividad de sesiones - Sistema GIGA
+
+Cada request autenticado anota en memoria el último acceso de su sesión.
+Un hilo en segundo plano vuelca los accesos pendientes a sesion_activa.ultimo_acceso
+en lotes (un solo UPDATE por volcado), en lugar de escribir en cada request.
+"""
+
+import atexit
+import threading
+import time
+import logging
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_pendientes = {}
+_lock = threading.Lock()
+_hilo = None
+
+
+SQL_VOLCAR = """
+    UPDATE sesion_activa sa
+    SET ultimo_acceso = v.momento
+    FROM unnest(%s::varchar[], %s::timestamp[]) AS v(session_key, momento)
+    WHERE sa.session_key = v.session_key
+      AND sa.activa = true
+      AND (sa.ultimo_acceso IS NULL OR sa.ultimo_acceso < v.momento)
+"""
+
+
+def _intervalo():
+    return getattr(settings, 'SESSION_ACTIVITY_FLUSH_INTERVAL', 60)
+
+
+def registrar_acceso(session_key, momento=None):
+    """Anota el último acceso de la sesión; se persiste en el próximo volcado"""
+    if not session_key:
+        return
+    with _lock:
+        _pendientes[session_key] = momento or timezone.now()
+    _iniciar_hilo()
+
+
+def pendientes():
+    """Cantidad de sesiones con accesos aún no volcados"""
+    with _lock:
+        return len(_pendientes)
+
+
+def volcar_accesos():
+    """
+    Persiste los accesos pendientes en un único UPDATE.
+    Retorna la cantidad de sesiones actualizadas.
+    """
+    with _lock:
+        if not _pendientes:
+            return 0
+        lote = dict(_pendientes)
+        _pendientes.clear()
+
+    claves = list(lote.keys())
+    momentos = [lote[clave] for clave in claves]
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(SQL_VOLCAR, [claves, momentos])
+            return cursor.rowcount
+    except Exception as e:
+        logger.error(f'Error volcando actividad de {len(claves)} sesiones: {e}')
+        # Reencolar sin pisar accesos más recientes registrados mientras tanto
+        with _lock:
+            for clave, momento in lote.items():
+                _pendientes.setdefault(clave, momento)
+        return 0
+
+
+def _bucle():
+    while True:
+        time.sleep(_intervalo())
+        try:
+            volcar_accesos()
+        finally:
+            # El hilo tiene su propia conexión: no retenerla entre volcados
+            connection.close()
+
+
+def _iniciar_hilo():
+    global _hilo
+    if _hilo is not None:
+        return
+    with _lock:
+        if _hilo is not None:
+            return
+        _hilo = threading.Thread(target=_bucle, name='giga-actividad-sesiones', daemon=True)
+        _hilo.start()
+        atexit.register(volcar_accesos)
@@ -1,9 +1,40 @@
 from django.apps import AppConfig
 import logging
+import os
 import sys
 
 logger = logging.getLogger(__name__)
 
+PROCESOS_SERVIDOR = ('gunicorn', 'uvicorn')
+
+
+def _es_proceso_servidor():
+    """
+    True en procesos que atienden requests: gunicorn, uvicorn o runserver
+    (lista explícita; SCHEDULER_ENABLED='true'/'false' la sobrescribe).
+    Cualquier otro proceso (comandos manage.py, shell, scripts, celery, tests)
+    no inicia el scheduler: no debe competir por el liderazgo ni ejecutar tareas.
+    """
+    from django.conf import settings
+
+    habilitado = str(getattr(settings, 'SCHEDULER_ENABLED', 'auto')).lower()
+    if habilitado in ('true', '1'):
+        return True
+    if habilitado in ('false', '0'):
+        return False
+
+    programa = os.path.basename(sys.argv[0]) if sys.argv else ''
+    if programa in PROCESOS_SERVIDOR:
+        return True
+    # python -m gunicorn / python -m uvicorn
+    if programa == '__main__.py' and os.path.basename(os.path.dirname(sys.argv[0])) in PROCESOS_SERVIDOR:
+        return True
+    if programa != 'manage.py' or len(sys.argv) < 2 or sys.argv[1] != 'runserver':
+        return False
+    # Con autoreload solo el proceso hijo (RUN_MAIN) sirve requests
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+
+
 class PersonasConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "personas"
@@ -11,10 +42,8 @@ class PersonasConfig(AppConfig):
     def ready(self):
         # Iniciar scheduler solo en proceso de servidor (evitar comandos manage.py como migrate)
         try:
-            # Evitar ejecución en procesos de migración/collectstatic/tests:
-            disallowed = ['makemigrations', 'migrate', 'collectstatic', 'test', 'shell', 'loaddata']
-            if len(sys.argv) > 1 and sys.argv[1] in disallowed:
-                logger.debug('No se inicia scheduler (comando manage.py detectado).')
+            if not _es_proceso_servidor():
+                logger.debug('No se inicia scheduler (no es un proceso servidor).')
                 return
 
             # IMPORT TARDÍO para no cargar APScheduler en contextos no web
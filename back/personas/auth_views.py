@@ -3,14 +3,13 @@ Vistas de autenticación para el sistema GIGA
 Compatible con Database First y nueva estructura de BD
 """
 import json
-import os
 import secrets
 import string
 from datetime import datetime
 from django.contrib.auth.hashers import check_password, make_password
 from django.core.mail import send_mail
 from django.conf import settings
-from django.db import transaction, connection
+from django.db import transaction
 from django.db.models import Q
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
@@ -22,7 +21,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from threading import Thread
 from .models import Agente, AgenteRol, Rol, Area
-from auditoria.models import Auditoria
+from auditoria.buffer import encolar_auditoria
 import logging
 
 # RBAC Permissions
@@ -59,74 +58,16 @@ def send_email_async(subject, message, recipient_list):
     thread = Thread(target=_send, daemon=True)
     thread.start()
 
-# Lista blanca de acciones que SÍ queremos auditar por defecto.
-# Definible por variable de entorno AUDIT_ALLOWLIST separada por comas.
-_DEFAULT_AUDIT_ALLOWLIST = {
-    # Fallos de seguridad
-    'LOGIN_FALLIDO',
-    'CAMBIO_EMAIL_FALLIDO',
-    'CAMBIO_PASSWORD_FALLIDO',
-    'RECUPERACION_FALLIDA',
-    # Acciones administrativas críticas
-    'CIERRE_MASIVO_SESIONES',
-    'SESION_CERRADA_POR_LIMITE',
-    'CREAR_USUARIO',
-    'ELIMINAR_USUARIO',
-    'CAMBIO_ROL',
-    'CAMBIO_PERMISOS',
-    # Cambios de credenciales (seguridad crítica)
-    'RESET_PASSWORD',
-    'RECUPERACION_PASSWORD',
-    'CAMBIO_EMAIL_EXITOSO',
-    'CAMBIO_PASSWORD_EXITOSO',
-}
-
-
-def _get_audit_allowlist():
-    """Obtiene la lista de acciones permitidas desde env o usa default."""
-    env = os.getenv('AUDIT_ALLOWLIST', '')
-    if env:
-        return set([a.strip() for a in env.split(',') if a.strip()])
-    return _DEFAULT_AUDIT_ALLOWLIST
-
-
-def _safe_json_dump(payload, max_len=2048):
-    """Serializa payload a JSON truncando si excede max_len."""
-    try:
-        s = json.dumps(payload, ensure_ascii=False)
-        if len(s) > max_len:
-            # Truncar y añadir indicación
-            return s[:max_len] + '... (truncated)'
-        return s
-    except Exception:
-        return None
-
-
 def registrar_auditoria(agente_id, accion, detalle=""):
     """
-    Inserta en tabla auditoria sólo si la acción está en la allowlist.
-    Además limita el tamaño del JSON insertado para evitar registros enormes.
+    Encola la auditoría de autenticación sólo si la acción está en la allowlist
+    (AUDIT_ALLOWLIST, ver auditoria/buffer.py). El detalle se trunca a 2048 caracteres.
     """
-    try:
-        allowlist = _get_audit_allowlist()
-        if accion not in allowlist:
-            logger.debug(f"Auditoría omitida para acción no crítica: {accion}")
-            return
-
-        valor_json = None
-        if detalle:
-            valor_json = _safe_json_dump({'detalle': detalle}, max_len=2048)
-
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                INSERT INTO auditoria (id_agente, accion, nombre_tabla, pk_afectada, creado_en, valor_nuevo)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """,
-                [agente_id, accion, 'auth', agente_id, datetime.now(), valor_json]
-            )
-    except Exception as e:
-        logger.exception(f"Error registrando auditoría: {e}")
+    encolar_auditoria(
+        'auth', accion, agente_id, agente_id,
+        valor_nuevo={'detalle': detalle} if detalle else None,
+        solo_allowlist=True, max_len=2048
+    )
 
 def clean_cuil(cuil_input):
     """Limpia un CUIL removiendo guiones, espacios y caracteres no numéricos"""
@@ -271,7 +212,7 @@ def login_view(request):
         
         # ✅ CONTROL DE SESIONES CONCURRENTES (Máximo 2)
         from .models import SesionActiva
-        from django.contrib.sessions.models import Session
+        from .session_store import SessionStore
         from django.utils import timezone
         
         # Obtener sesiones activas del usuario
@@ -317,11 +258,8 @@ def login_view(request):
             sesion_mas_antigua.activa = False
             sesion_mas_antigua.save()
             
-            # Eliminar de django_session
-            try:
-                Session.objects.filter(session_key=sesion_mas_antigua.session_key).delete()
-            except Session.DoesNotExist:
-                pass
+            # Eliminar de django_session y de la caché de sesiones
+            SessionStore.cerrar_sesiones([sesion_mas_antigua.session_key])
             
             # Registrar cierre en auditoría
             registrar_auditoria(
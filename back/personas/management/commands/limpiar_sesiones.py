@@ -6,7 +6,7 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
 from personas.models import SesionActiva
-from django.contrib.sessions.models import Session
+from personas.session_store import SessionStore
 
 
 class Command(BaseCommand):
@@ -36,12 +36,14 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS('No hay sesiones expiradas para limpiar'))
             return
         
+        # Las claves se leen antes del update: después el filtro activa=True ya no las encuentra
+        session_keys = list(sesiones_expiradas.values_list('session_key', flat=True))
+        
         # Marcar como inactivas
         sesiones_expiradas.update(activa=False)
         
-        # Eliminar de django_session
-        session_keys = list(sesiones_expiradas.values_list('session_key', flat=True))
-        Session.objects.filter(session_key__in=session_keys).delete()
+        # Eliminar de django_session y de la caché de sesiones
+        SessionStore.cerrar_sesiones(session_keys)
         
         self.stdout.write(
             self.style.SUCCESS(
@@ -288,3 +288,44 @@ class SesionActiva(models.Model):
     def __str__(self):
         agente_nombre = f"{self.id_agente.nombre} {self.id_agente.apellido}" if self.id_agente else "Unknown"
         return f"Sesión de {agente_nombre} - {self.session_key[:10]}..."
+
+
+class EjecucionTarea(models.Model):
+    """Historial de ejecuciones de las tareas del scheduler (programadas y manuales)"""
+    id_ejecucion = models.BigAutoField(primary_key=True)
+    tarea = models.CharField(max_length=100)
+    origen = models.CharField(max_length=20, default='programada')  # 'programada', 'manual'
+    disparada_por = models.ForeignKey(
+        'Agente', models.SET_NULL, db_column='disparada_por', blank=True, null=True
+    )
+    parametros = models.JSONField(blank=True, null=True)
+    iniciado_en = models.DateTimeField()
+    finalizado_en = models.DateTimeField(blank=True, null=True)
+    duracion_ms = models.IntegerField(blank=True, null=True)
+    estado = models.CharField(max_length=20, default='en_curso')  # 'en_curso', 'ok', 'error', 'omitida'
+    resultado = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    proceso = models.CharField(max_length=255, blank=True, null=True)
+
+    class Meta:
+        managed = False
+        db_table = 'ejecucion_tarea'
+        ordering = ['-iniciado_en']
+
+    def __str__(self):
+        return f"{self.tarea} {self.iniciado_en:%Y-%m-%d %H:%M} ({self.estado})"
+
+
+class SchedulerLider(models.Model):
+    """Proceso que ejecuta las tareas programadas (fila única)"""
+    id = models.SmallIntegerField(primary_key=True, default=1)
+    proceso = models.CharField(max_length=255)
+    lider_desde = models.DateTimeField()
+    ultimo_latido = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = 'scheduler_lider'
+
+    def __str__(self):
+        return f"Líder {self.proceso} desde {self.lider_desde}"
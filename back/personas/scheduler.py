@@ -2,98 +2,374 @@
 """
 Scheduler para tareas de mantenimiento del sistema GIGA.
 Incluye limpieza de sesiones y archivado de datos antiguos.
+
+Cada proceso (worker de gunicorn) inicia un hilo elector, pero solo uno ejecuta
+las tareas: el que obtiene el advisory lock de Postgres. El lock es de sesión,
+así que si el proceso líder muere (o pierde la conexión) Postgres lo libera y
+otro proceso lo toma en el siguiente intento (SCHEDULER_LEADER_INTERVAL). Al
+asumir, el nuevo líder ejecuta las tareas que debían correr dentro de
+SCHEDULER_CATCHUP_WINDOW y no tienen ejecución registrada.
+
+Cada ejecución (programada o manual) queda en ejecucion_tarea con su duración,
+los conteos que retorna la tarea y el error, si lo hubo. Una misma tarea nunca
+corre dos veces a la vez: se toma además un advisory lock por tarea.
 """
+from datetime import datetime, timedelta
+import atexit
 import logging
 import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from apscheduler.executors.pool import ThreadPoolExecutor as EjecutorAPScheduler
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-from .tasks import cleanup_sessions, archive_old_audits, archive_old_incidencias
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from common.metricas import registrar_tarea
+from .models import EjecucionTarea
+from .tasks import (
+    cleanup_sessions, archive_old_audits, archive_old_incidencias, close_attendance_day,
+    ensure_audit_partitions, purge_old_notifications,
+)
 
 logger = logging.getLogger(__name__)
-_scheduler = None
+_elector = None
+
+TAREAS = {
+    # Diaria: limpieza de sesiones a las 03:00
+    'cleanup_sessions': {
+        'funcion': cleanup_sessions,
+        'parametros': {'days': 7, 'dry_run': False},
+        'trigger': CronTrigger(hour=3, minute=0),
+        'job_id': 'cleanup_sessions_daily',
+        'descripcion': 'Limpia sesiones inactivas (diario 03:00)',
+    },
+    # Semanal: archivado de auditorías (domingo a las 04:00)
+    'archive_old_audits': {
+        'funcion': archive_old_audits,
+        'parametros': {'months': 6, 'dry_run': False},
+        'trigger': CronTrigger(day_of_week='sun', hour=4, minute=0),
+        'job_id': 'archive_audits_weekly',
+        'descripcion': 'Archiva auditorías de más de 6 meses (domingos 04:00)',
+    },
+    # Diaria: particiones mensuales de auditoría por adelantado (02:30)
+    'ensure_audit_partitions': {
+        'funcion': ensure_audit_partitions,
+        'parametros': {'months_ahead': 3},
+        'trigger': CronTrigger(hour=2, minute=30),
+        'job_id': 'ensure_audit_partitions_daily',
+        'descripcion': 'Crea las particiones de auditoría de los próximos 3 meses (diario 02:30)',
+    },
+    # Diaria: purga de notificaciones fuera de retención (03:30)
+    'purge_old_notifications': {
+        'funcion': purge_old_notifications,
+        'parametros': {'dry_run': False},
+        'trigger': CronTrigger(hour=3, minute=30),
+        'job_id': 'purge_notifications_daily',
+        'descripcion': 'Purga notificaciones leídas y no leídas fuera de retención (diario 03:30)',
+    },
+    # Mensual: archivado de incidencias (día 1 a las 04:30)
+    'archive_old_incidencias': {
+        'funcion': archive_old_incidencias,
+        'parametros': {'months': 12, 'dry_run': False},
+        'trigger': CronTrigger(day=1, hour=4, minute=30),
+        'job_id': 'archive_incidencias_monthly',
+        'descripcion': 'Archiva incidencias cerradas de más de 12 meses (día 1, 04:30)',
+    },
+    # Diaria: cierre de jornada del día anterior (00:30)
+    'close_attendance_day': {
+        'funcion': close_attendance_day,
+        'parametros': {'dry_run': False},
+        'trigger': CronTrigger(hour=0, minute=30),
+        'job_id': 'close_attendance_day_daily',
+        'descripcion': 'Cierre de asistencias del día anterior (diario 00:30)',
+    },
+}
+
+SQL_LOCK_LIDER = "SELECT pg_try_advisory_lock(hashtext('giga'), hashtext('scheduler'))"
+SQL_LOCK_TAREA = "SELECT pg_try_advisory_lock(hashtext('giga'), hashtext(%s))"
+SQL_UNLOCK_TAREA = "SELECT pg_advisory_unlock(hashtext('giga'), hashtext(%s))"
+
+
+def proceso_actual():
+    return f'{socket.gethostname()}:{os.getpid()}'
 
 
 def start_scheduler():
     """
-    Inicia un scheduler en background con tareas de mantenimiento:
-    - cleanup_sessions: diario a las 03:00 - limpia sesiones inactivas
-    - archive_audits: semanal (domingo 04:00) - archiva auditorías > 6 meses
-    - archive_incidencias: mensual (día 1, 04:30) - archiva incidencias cerradas > 12 meses
-    
+    Inicia el hilo elector del scheduler. Las tareas (ver TAREAS) solo se
+    programan en el proceso que resulta líder.
+
     Control por variable de entorno SCHEDULER_ENABLED (default 'true').
     """
-    global _scheduler
+    global _elector
     enabled = os.environ.get('SCHEDULER_ENABLED', 'true').lower()
     if enabled not in ('1', 'true', 'yes'):
         logger.info('Scheduler deshabilitado por SCHEDULER_ENABLED env var.')
         return
 
-    if _scheduler is not None:
+    if _elector is not None:
         logger.debug('Scheduler ya iniciado, saltando start.')
         return
 
     try:
-        scheduler = BackgroundScheduler()
-        
-        # Tarea diaria: limpieza de sesiones a las 03:00
-        scheduler.add_job(
-            _run_cleanup,
-            trigger=CronTrigger(hour=3, minute=0),
-            id='cleanup_sessions_daily',
-            replace_existing=True,
-            max_instances=1
-        )
-        
-        # Tarea semanal: archivado de auditorías (domingo a las 04:00)
-        scheduler.add_job(
-            _run_archive_audits,
-            trigger=CronTrigger(day_of_week='sun', hour=4, minute=0),
-            id='archive_audits_weekly',
-            replace_existing=True,
-            max_instances=1
-        )
-        
-        # Tarea mensual: archivado de incidencias (día 1 a las 04:30)
-        scheduler.add_job(
-            _run_archive_incidencias,
-            trigger=CronTrigger(day=1, hour=4, minute=30),
-            id='archive_incidencias_monthly',
-            replace_existing=True,
-            max_instances=1
-        )
-        
-        scheduler.start()
-        _scheduler = scheduler
-        logger.info(
-            'Scheduler iniciado: cleanup_sessions_daily, '
-            'archive_audits_weekly, archive_incidencias_monthly programados.'
-        )
+        _elector = ElectorLider(getattr(settings, 'SCHEDULER_LEADER_INTERVAL', 30))
+        _elector.start()
+        atexit.register(_elector.detener_y_esperar)
+        logger.info(f'Scheduler: elector iniciado en {proceso_actual()}')
     except Exception as e:
         logger.exception(f'Error iniciando scheduler: {e}')
 
 
-def _run_cleanup():
-    """Ejecuta limpieza de sesiones inactivas."""
+def es_lider():
+    return _elector is not None and _elector.scheduler is not None
+
+
+def proximas_ejecuciones():
+    """Próxima ejecución de cada tarea según su trigger (calculable en cualquier proceso)"""
+    proximas = {}
+    for nombre, definicion in TAREAS.items():
+        trigger = definicion['trigger']
+        proxima = trigger.get_next_fire_time(None, datetime.now(trigger.timezone))
+        proximas[nombre] = proxima.replace(tzinfo=None) if proxima else None
+    return proximas
+
+
+class ElectorLider(threading.Thread):
+    """Hilo que intenta obtener el liderazgo y, siendo líder, mantiene el latido"""
+
+    def __init__(self, intervalo):
+        super().__init__(name='giga-scheduler-lider', daemon=True)
+        self.intervalo = intervalo
+        self.detener = threading.Event()
+        self.scheduler = None
+        self.lider_desde = None
+
+    def run(self):
+        while not self.detener.is_set():
+            try:
+                if self.scheduler is None:
+                    self._intentar_liderazgo()
+                else:
+                    self._latido()
+            except Exception as e:
+                logger.warning(f'Scheduler: error en el elector ({e}), se reintenta en {self.intervalo}s')
+                self._abandonar()
+            self.detener.wait(self.intervalo)
+        self._abandonar()
+
+    def detener_y_esperar(self):
+        self.detener.set()
+        self.join(timeout=5)
+
+    def _intentar_liderazgo(self):
+        with connection.cursor() as cursor:
+            cursor.execute(SQL_LOCK_LIDER)
+            es_lider = cursor.fetchone()[0]
+        if not es_lider:
+            # Sin liderazgo no se retiene la conexión (ni un lugar del pool)
+            # hasta el próximo intento
+            connection.close()
+            return
+
+        self.lider_desde = timezone.now()
+        self._registrar_lider()
+
+        # Hilos acotados: cada tarea en curso ocupa una conexión del pool
+        scheduler = BackgroundScheduler(executors={
+            'default': EjecutorAPScheduler(settings.SCHEDULER_MAX_WORKERS),
+        })
+        for nombre, definicion in TAREAS.items():
+            scheduler.add_job(
+                ejecutar_tarea,
+                trigger=definicion['trigger'],
+                args=[nombre],
+                id=definicion['job_id'],
+                replace_existing=True,
+                max_instances=1
+            )
+        scheduler.start()
+        self.scheduler = scheduler
+        logger.info(f'Scheduler: {proceso_actual()} es líder; programadas: {", ".join(TAREAS)}')
+        self._recuperar_perdidas()
+
+    def _latido(self):
+        # Falla si se perdió la conexión (y con ella el lock)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self._registrar_lider()
+
+    def _registrar_lider(self):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO scheduler_lider (id, proceso, lider_desde, ultimo_latido)
+                    VALUES (1, %s, %s, %s)
+                    ON CONFLICT (id) DO UPDATE SET
+                        proceso = EXCLUDED.proceso,
+                        lider_desde = EXCLUDED.lider_desde,
+                        ultimo_latido = EXCLUDED.ultimo_latido
+                """, [proceso_actual(), self.lider_desde, timezone.now()])
+        except Exception as e:
+            logger.warning(f'Scheduler: no se pudo registrar el líder: {e}')
+
+    def _recuperar_perdidas(self):
+        """Ejecuta las tareas que debían correr recientemente y no tienen registro"""
+        ventana = getattr(settings, 'SCHEDULER_CATCHUP_WINDOW', 3600)
+        if not ventana:
+            return
+        for nombre, definicion in TAREAS.items():
+            trigger = definicion['trigger']
+            ahora = datetime.now(trigger.timezone)
+            debida = trigger.get_next_fire_time(None, ahora - timedelta(seconds=ventana))
+            if debida is None or debida > ahora:
+                continue
+            try:
+                registrada = EjecucionTarea.objects.filter(
+                    tarea=nombre, origen='programada', iniciado_en__gte=debida.replace(tzinfo=None)
+                ).exists()
+            except Exception as e:
+                logger.warning(f'Scheduler: no se pudo verificar {nombre}: {e}')
+                continue
+            if not registrada:
+                logger.info(f'Scheduler: {nombre} debía ejecutarse a las {debida:%H:%M}, se ejecuta ahora')
+                self.scheduler.add_job(ejecutar_tarea, args=[nombre], id=f'{nombre}_recuperada',
+                                       replace_existing=True)
+
+    def _abandonar(self):
+        if self.scheduler is not None:
+            try:
+                self.scheduler.shutdown(wait=False)
+            except Exception:
+                logger.exception('Scheduler: error deteniendo APScheduler')
+            self.scheduler = None
+            logger.warning(f'Scheduler: {proceso_actual()} deja de ser líder')
+        # Cerrar la conexión libera el advisory lock
+        connection.close()
+
+
+# ----------------------------------------------------------------------
+# Ejecución de tareas
+# ----------------------------------------------------------------------
+
+def validar_parametros(nombre, parametros):
+    """Parámetros que se pueden sobrescribir al disparar manualmente (los de TAREAS)"""
+    permitidos = TAREAS[nombre]['parametros']
+    invalidos = set(parametros or {}) - set(permitidos)
+    if invalidos:
+        raise ValueError(f'Parámetros no válidos para {nombre}: {", ".join(sorted(invalidos))}')
+    for clave, valor in (parametros or {}).items():
+        if type(valor) is not type(permitidos[clave]):
+            raise ValueError(f'El parámetro {clave} debe ser {type(permitidos[clave]).__name__}')
+    return {**permitidos, **(parametros or {})}
+
+
+def _crear_ejecucion(nombre, origen, agente_id, parametros):
     try:
-        result = cleanup_sessions(days=7, dry_run=False)
-        logger.info(f'cleanup_sessions completado: {result}')
-    except Exception:
-        logger.exception('Error ejecutando cleanup_sessions desde scheduler.')
+        return EjecucionTarea.objects.create(
+            tarea=nombre,
+            origen=origen,
+            disparada_por_id=agente_id,
+            parametros=parametros,
+            iniciado_en=timezone.now(),
+            proceso=proceso_actual(),
+        )
+    except Exception as e:
+        # Sin historial la tarea se ejecuta igual
+        logger.error(f'Scheduler: no se pudo registrar la ejecución de {nombre}: {e}')
+        return None
 
 
-def _run_archive_audits():
-    """Ejecuta archivado de auditorías antiguas."""
+def _correr(nombre, ejecucion, parametros):
+    inicio = time.monotonic()
+    resultado, error, estado = None, None, 'ok'
+
     try:
-        result = archive_old_audits(months=6, dry_run=False)
-        logger.info(f'archive_old_audits completado: {result}')
-    except Exception:
-        logger.exception('Error ejecutando archive_old_audits desde scheduler.')
+        with connection.cursor() as cursor:
+            cursor.execute(SQL_LOCK_TAREA, [nombre])
+            obtenido = cursor.fetchone()[0]
+        if not obtenido:
+            estado, error = 'omitida', 'La tarea ya está en ejecución en otro proceso'
+        else:
+            try:
+                resultado = TAREAS[nombre]['funcion'](**parametros)
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(SQL_UNLOCK_TAREA, [nombre])
+            if isinstance(resultado, dict) and resultado.get('error'):
+                estado, error = 'error', str(resultado['error'])
+    except Exception as e:
+        estado, error = 'error', str(e)
+        logger.exception(f'Error ejecutando {nombre} desde scheduler.')
+
+    duracion = time.monotonic() - inicio
+    registrar_tarea(nombre, duracion, estado)
+    if estado == 'ok':
+        logger.info(f'{nombre} completado: {resultado}')
+    else:
+        logger.warning(f'{nombre} {estado}: {error}')
 
+    if ejecucion is not None:
+        try:
+            ejecucion.finalizado_en = timezone.now()
+            ejecucion.duracion_ms = int(duracion * 1000)
+            ejecucion.estado = estado
+            ejecucion.resultado = resultado if isinstance(resultado, dict) else None
+            ejecucion.error = error
+            ejecucion.save(update_fields=['finalizado_en', 'duracion_ms', 'estado', 'resultado', 'error'])
+        except Exception as e:
+            logger.error(f'Scheduler: no se pudo guardar el resultado de {nombre}: {e}')
+    return estado, resultado
 
-def _run_archive_incidencias():
-    """Ejecuta archivado de incidencias cerradas antiguas."""
+
+def ejecutar_tarea(nombre, origen='programada', agente_id=None, parametros=None):
+    """Ejecuta una tarea en el hilo actual registrando la ejecución"""
+    close_old_connections()
     try:
-        result = archive_old_incidencias(months=12, dry_run=False)
-        logger.info(f'archive_old_incidencias completado: {result}')
-    except Exception:
-        logger.exception('Error ejecutando archive_old_incidencias desde scheduler.')
+        parametros = validar_parametros(nombre, parametros)
+        ejecucion = _crear_ejecucion(nombre, origen, agente_id, parametros)
+        return _correr(nombre, ejecucion, parametros)
+    finally:
+        connection.close()
+
+
+def disparar_tarea(nombre, agente_id, parametros=None):
+    """
+    Ejecuta una tarea manualmente en segundo plano (en este proceso, sea o no líder).
+    Retorna el registro de la ejecución creado antes de iniciar.
+    """
+    parametros = validar_parametros(nombre, parametros)
+    ejecucion = _crear_ejecucion(nombre, 'manual', agente_id, parametros)
+    if ejecucion is None:
+        raise RuntimeError('No se pudo registrar la ejecución')
+
+    def _en_hilo():
+        try:
+            _correr(nombre, ejecucion, parametros)
+        finally:
+            connection.close()
+
+    _ejecutor_manual().submit(_en_hilo)
+    return ejecucion
+
+
+_manual = {'ejecutor': None}
+_manual_lock = threading.Lock()
+
+
+def _ejecutor_manual():
+    """
+    Hilos de las tareas manuales, acotados a SCHEDULER_MAX_WORKERS (cuentan en
+    DB_POOL_HILOS_FONDO); las que exceden esperan su turno.
+    """
+    with _manual_lock:
+        if _manual['ejecutor'] is None:
+            _manual['ejecutor'] = ThreadPoolExecutor(
+                max_workers=settings.SCHEDULER_MAX_WORKERS, thread_name_prefix='giga-tarea'
+            )
+        return _manual['ejecutor']
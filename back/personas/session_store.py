@@ -0,0 +1,164 @@
+"""
+Backend de sesiones con caché y escritura diferida - Sistema GIGA
+
+Las sesiones se leen desde caché (SESSION_CACHE_ALIAS) y solo se escriben en
+django_session cuando cambian sus datos o cuando pasó SESSION_DB_WRITE_INTERVAL
+desde la última escritura. La renovación de la expiración deslizante de cada
+request (SESSION_SAVE_EVERY_REQUEST) se resuelve en caché.
+
+En caché se guarda un sobre con los datos de la sesión y tres marcas de tiempo:
+- expira: vencimiento real por inactividad (SESSION_COOKIE_AGE desde el último acceso)
+- escrito: última escritura en la base de datos
+- validado: última verificación contra la base de datos
+
+En la base el vencimiento se guarda con la ventana de escritura sumada, para que
+una sesión activa nunca figure vencida entre dos escrituras. Con caché local
+(un caché por proceso) las sesiones se revalidan contra la base cada
+SESSION_CACHE_REVALIDATE segundos, de modo que un cierre de sesión hecho en otro
+proceso se propague.
+"""
+
+from datetime import datetime, timedelta
+import time
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache.backends.locmem import LocMemCache
+
+from .actividad import registrar_acceso
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'giga.sesiones'
+
+
+def _ventana_escritura():
+    return getattr(settings, 'SESSION_DB_WRITE_INTERVAL', 300)
+
+
+def _intervalo_revalidacion():
+    return getattr(settings, 'SESSION_CACHE_REVALIDATE', 30)
+
+
+class SessionStore(CachedDBStore):
+    """Sesiones en caché con escrituras a la base coalescidas"""
+
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._sobre = None
+
+    @property
+    def _cache_local(self):
+        return isinstance(self._cache, LocMemCache)
+
+    def _guardar_sobre(self, ahora, escrito, validado):
+        edad = self.get_expiry_age()
+        self._sobre = {
+            'datos': self._session,
+            'expira': ahora + edad,
+            'escrito': escrito,
+            'validado': validado,
+        }
+        try:
+            # El sobre sobrevive a su vencimiento para poder rechazarlo explícitamente
+            self._cache.set(self.cache_key, self._sobre, edad + _ventana_escritura())
+        except Exception:
+            logger.exception('Error guardando sesión en caché')
+
+    def load(self):
+        ahora = time.time()
+        try:
+            sobre = self._cache.get(self.cache_key)
+        except Exception:
+            sobre = None
+
+        if isinstance(sobre, dict) and 'datos' in sobre:
+            if sobre['expira'] <= ahora and not self._cache_local:
+                # Con caché compartido el vencimiento del sobre es exacto
+                self._session_key = None
+                self._sobre = None
+                return {}
+            vigente = sobre['expira'] > ahora and (
+                not self._cache_local
+                or ahora - sobre['validado'] < _intervalo_revalidacion()
+            )
+            if vigente:
+                self._sobre = sobre
+                return sobre['datos']
+
+        s = self._get_session_from_db()
+        if not s:
+            self._sobre = None
+            return {}
+
+        datos = self.decode(s.session_data)
+        escrito = s.expire_date.timestamp() - self.get_expiry_age() - _ventana_escritura()
+        if isinstance(sobre, dict) and sobre.get('datos') == datos and sobre['expira'] > ahora:
+            # Sigue vigente en la base: conservar el vencimiento conocido por este proceso
+            sobre['validado'] = ahora
+            sobre['escrito'] = max(sobre['escrito'], escrito)
+        else:
+            sobre = {
+                'datos': datos,
+                'expira': s.expire_date.timestamp() - _ventana_escritura(),
+                'escrito': escrito,
+                'validado': ahora,
+            }
+        self._sobre = sobre
+        try:
+            self._cache.set(
+                self.cache_key, sobre, max(int(sobre['expira'] - ahora), 0) + _ventana_escritura()
+            )
+        except Exception:
+            logger.exception('Error guardando sesión en caché')
+        return datos
+
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    def create_model_instance(self, data):
+        instancia = super().create_model_instance(data)
+        instancia.expire_date = self.get_expiry_date() + timedelta(seconds=_ventana_escritura())
+        return instancia
+
+    def save(self, must_create=False):
+        ahora = time.time()
+        sobre = self._sobre
+        solo_renovar = (
+            not must_create
+            and not self.modified
+            and self.session_key is not None
+            and sobre is not None
+            and ahora - sobre['escrito'] < _ventana_escritura()
+        )
+
+        if solo_renovar:
+            self._guardar_sobre(ahora, sobre['escrito'], sobre['validado'])
+        else:
+            DBStore.save(self, must_create)
+            self._guardar_sobre(ahora, ahora, ahora)
+
+        if self._session.get('is_authenticated'):
+            registrar_acceso(self.session_key, datetime.fromtimestamp(ahora))
+
+    async def asave(self, must_create=False):
+        await sync_to_async(self.save)(must_create)
+
+    @classmethod
+    def cerrar_sesiones(cls, session_keys):
+        """
+        Elimina sesiones de la base y de la caché.
+        Usar en lugar de borrar filas de django_session directamente.
+        """
+        session_keys = [clave for clave in session_keys if clave]
+        if not session_keys:
+            return 0
+        eliminadas, _ = cls.get_model_class().objects.filter(session_key__in=session_keys).delete()
+        store = cls()
+        store._cache.delete_many([cls.cache_key_prefix + clave for clave in session_keys])
+        return eliminadas
@@ -6,7 +6,7 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from personas.models import Agente, SesionActiva
-from django.contrib.sessions.models import Session
+from personas.session_store import SessionStore
 from django.db import transaction
 import logging
 
@@ -59,8 +59,8 @@ def cerrar_todas_sesiones(request):
         
         # En una transacción: eliminar sesiones Django y filas de SesionActiva
         with transaction.atomic():
-            # Eliminar de django_session
-            Session.objects.filter(session_key__in=session_keys).delete()
+            # Eliminar de django_session y de la caché de sesiones
+            SessionStore.cerrar_sesiones(session_keys)
             # Eliminar registros de SesionActiva para liberar espacio
             SesionActiva.objects.filter(session_key__in=session_keys).delete()
         
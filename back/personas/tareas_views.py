@@ -0,0 +1,170 @@
+"""
+Endpoints de administración de las tareas programadas (scheduler)
+"""
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from rest_framework import status
+from django.db.models import Q
+import logging
+
+from common.permissions import IsAdministrador
+from personas.models import EjecucionTarea, SchedulerLider
+from personas import scheduler
+
+logger = logging.getLogger(__name__)
+
+
+def _serializar_ejecucion(ejecucion):
+    return {
+        'id_ejecucion': ejecucion.id_ejecucion,
+        'tarea': ejecucion.tarea,
+        'origen': ejecucion.origen,
+        'disparada_por': ejecucion.disparada_por_id,
+        'parametros': ejecucion.parametros,
+        'iniciado_en': ejecucion.iniciado_en,
+        'finalizado_en': ejecucion.finalizado_en,
+        'duracion_ms': ejecucion.duracion_ms,
+        'estado': ejecucion.estado,
+        'resultado': ejecucion.resultado,
+        'error': ejecucion.error,
+        'proceso': ejecucion.proceso,
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAdministrador])
+def listar_tareas(request):
+    """
+    Tareas programadas con su próxima ejecución, la última ejecución registrada
+    y el proceso que actúa como líder del scheduler.
+    """
+    try:
+        ultimas = {
+            ejecucion.tarea: ejecucion
+            for ejecucion in EjecucionTarea.objects.order_by('tarea', '-iniciado_en').distinct('tarea')
+        }
+        proximas = scheduler.proximas_ejecuciones()
+        lider = SchedulerLider.objects.filter(id=1).first()
+
+        tareas = []
+        for nombre, definicion in scheduler.TAREAS.items():
+            ultima = ultimas.get(nombre)
+            tareas.append({
+                'nombre': nombre,
+                'descripcion': definicion['descripcion'],
+                'parametros': definicion['parametros'],
+                'proxima_ejecucion': proximas.get(nombre),
+                'ultima_ejecucion': _serializar_ejecucion(ultima) if ultima else None,
+            })
+
+        return Response({
+            'success': True,
+            'data': {
+                'lider': {
+                    'proceso': lider.proceso,
+                    'lider_desde': lider.lider_desde,
+                    'ultimo_latido': lider.ultimo_latido,
+                } if lider else None,
+                'proceso_actual': scheduler.proceso_actual(),
+                'proceso_actual_es_lider': scheduler.es_lider(),
+                'tareas': tareas,
+            }
+        })
+    except Exception as e:
+        logger.error(f'Error listando tareas programadas: {e}')
+        return Response({
+            'success': False,
+            'message': f'Error: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdministrador])
+def historial_tareas(request):
+    """
+    Historial de ejecuciones, más recientes primero.
+    Filtros: ?tarea=, ?estado=, ?origen=, ?limite= (default 50, máximo 500)
+    """
+    try:
+        queryset = EjecucionTarea.objects.all()
+        filtros = Q()
+        for campo in ('tarea', 'estado', 'origen'):
+            valor = request.query_params.get(campo)
+            if valor:
+                filtros &= Q(**{campo: valor})
+
+        try:
+            limite = min(max(int(request.query_params.get('limite', 50)), 1), 500)
+        except ValueError:
+            limite = 50
+
+        ejecuciones = [_serializar_ejecucion(e) for e in queryset.filter(filtros).order_by('-iniciado_en')[:limite]]
+        return Response({
+            'success': True,
+            'data': {
+                'count': len(ejecuciones),
+                'results': ejecuciones
+            }
+        })
+    except Exception as e:
+        logger.error(f'Error obteniendo historial de tareas: {e}')
+        return Response({
+            'success': False,
+            'message': f'Error: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdministrador])
+def detalle_ejecucion(request, ejecucion_id):
+    """Estado de una ejecución (para seguir una tarea disparada manualmente)"""
+    ejecucion = EjecucionTarea.objects.filter(id_ejecucion=ejecucion_id).first()
+    if not ejecucion:
+        return Response({
+            'success': False,
+            'message': 'Ejecución no encontrada'
+        }, status=status.HTTP_404_NOT_FOUND)
+    return Response({'success': True, 'data': _serializar_ejecucion(ejecucion)})
+
+
+@api_view(['POST'])
+@permission_classes([IsAdministrador])
+def ejecutar_tarea(request, nombre):
+    """
+    Dispara una tarea en segundo plano. Body opcional:
+    {"parametros": {"dry_run": true, "months": 3}}
+    Responde 202 con la ejecución creada; su avance se consulta en
+    /tareas/ejecuciones/<id>/.
+    """
+    if nombre not in scheduler.TAREAS:
+        return Response({
+            'success': False,
+            'message': f'Tarea desconocida: {nombre}'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    parametros = request.data.get('parametros') or {}
+    if not isinstance(parametros, dict):
+        return Response({
+            'success': False,
+            'message': 'parametros debe ser un objeto'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        ejecucion = scheduler.disparar_tarea(nombre, request.session.get('user_id'), parametros)
+    except ValueError as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f'Error disparando tarea {nombre}: {e}')
+        return Response({
+            'success': False,
+            'message': f'Error: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return Response({
+        'success': True,
+        'message': f'Tarea {nombre} iniciada',
+        'data': _serializar_ejecucion(ejecucion)
+    }, status=status.HTTP_202_ACCEPTED)
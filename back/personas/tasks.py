@@ -1,16 +1,16 @@
 #!/usr/bin/env python
 """
 Tareas de mantenimiento para el sistema GIGA.
-Incluye limpieza de sesiones y archivado de datos antiguos.
+Incluye limpieza de sesiones, archivado de datos antiguos y purga de notificaciones.
 """
 from django.utils import timezone
-from datetime import timedelta
-from dateutil.relativedelta import relativedelta
+from datetime import date, timedelta
 from personas.models import SesionActiva
-from django.contrib.sessions.models import Session
+from personas.session_store import SessionStore
 from django.db import transaction, connection
 from django.db.models import Q
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -39,8 +39,8 @@ def cleanup_sessions(days=7, dry_run=False):
         return result
 
     with transaction.atomic():
-        # Eliminar en django_session
-        ss_deleted, _ = Session.objects.filter(session_key__in=session_keys).delete()
+        # Eliminar en django_session (y en la caché de sesiones)
+        ss_deleted = SessionStore.cerrar_sesiones(session_keys)
         # Eliminar en sesion_activa
         sa_deleted, _ = qs.delete()
 
@@ -51,118 +51,238 @@ def cleanup_sessions(days=7, dry_run=False):
     return result
 
 
-def archive_old_audits(months=6, dry_run=False):
-    """
-    Archiva registros de auditoría más antiguos de N meses.
-    Mueve los registros a la tabla auditoria_archivo.
-    Retorna dict con conteos.
-    """
+def _archivar(clave, months, dry_run):
+    """Archivado por lotes reanudable (common/archivado.py) con el formato de resultado de las tareas"""
+    from common.archivado import ArchivadoEnCurso, archivar_por_lotes, contar_candidatas
+
     result = {
         'candidatas': 0,
         'archivadas': 0,
         'eliminadas': 0,
         'error': None
     }
-    
+
     try:
-        # Calcular fecha de corte usando relativedelta
-        cutoff_date = timezone.now() - relativedelta(months=months)
-        
-        with connection.cursor() as cursor:
-            # Verificar si la tabla de archivo existe
-            cursor.execute("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_schema = 'public' AND table_name = 'auditoria_archivo'
-                )
-            """)
-            if not cursor.fetchone()[0]:
-                result['error'] = 'Tabla auditoria_archivo no existe'
-                logger.warning(f'archive_old_audits: {result["error"]}')
-                return result
-            
-            # Contar candidatas usando fecha calculada
-            cursor.execute(
-                "SELECT COUNT(*) FROM auditoria WHERE creado_en < %s",
-                [cutoff_date]
-            )
-            result['candidatas'] = cursor.fetchone()[0]
-            
-            logger.info(f'archive_old_audits: {result["candidatas"]} registros candidatos (months={months}, dry_run={dry_run})')
-            
-            if result['candidatas'] == 0 or dry_run:
-                return result
-            
-            # Ejecutar función de archivo (la función usa INTEGER para meses)
-            cursor.execute("SELECT * FROM archivar_auditorias(%s)", [months])
-            row = cursor.fetchone()
-            if row:
-                result['archivadas'] = row[0]
-                result['eliminadas'] = row[1]
-                
-            logger.info(f'archive_old_audits: archivadas={result["archivadas"]}, eliminadas={result["eliminadas"]}')
-            
+        if dry_run:
+            # Solo en dry-run se cuenta de antemano (recorre la tabla)
+            result['candidatas'] = contar_candidatas(clave, months)
+            logger.info(f'archivado {clave}: {result["candidatas"]} candidatas (months={months}, dry_run=True)')
+            return result
+
+        lotes = archivar_por_lotes(clave, months)
+        result.update({
+            'candidatas': lotes['eliminados'],
+            'archivadas': lotes['archivados'],
+            'eliminadas': lotes['eliminados'],
+            'lotes': lotes['lotes'],
+            'reanudado': lotes['reanudado'],
+            'completado': lotes['completado'],
+            'vacuum': lotes['vacuum'],
+        })
+        logger.info(
+            f'archivado {clave}: archivadas={lotes["archivados"]}, eliminadas={lotes["eliminados"]} '
+            f'en {lotes["lotes"]} lotes ({lotes["duracion_ms"]} ms, reanudado={lotes["reanudado"]})'
+        )
+    except ArchivadoEnCurso as e:
+        result['error'] = str(e)
+        logger.warning(f'archivado {clave}: {e}')
+    except Exception as e:
+        result['error'] = str(e)
+        logger.exception(f'Error archivando {clave}: {e}')
+
+    return result
+
+
+def archive_old_audits(months=6, dry_run=False):
+    """
+    Archiva registros de auditoría más antiguos de N meses.
+    Con auditoria particionada desacopla los meses completos (esquema archivo)
+    y mueve por lotes solo lo que quede en auditoria_historico; sin particionar,
+    mueve los registros a la tabla auditoria_archivo en lotes (reanudable).
+    Retorna dict con conteos.
+    """
+    from common.archivado import auditoria_particionada, desacoplar_particiones_auditoria, tabla_existe
+
+    try:
+        particionada = auditoria_particionada()
+    except Exception as e:
+        logger.exception(f'archive_old_audits: no se pudo verificar el particionado: {e}')
+        return {'candidatas': 0, 'archivadas': 0, 'eliminadas': 0, 'error': str(e)}
+
+    if not particionada:
+        return _archivar('auditoria', months, dry_run)
+
+    try:
+        particiones = desacoplar_particiones_auditoria(months, solo_listar=dry_run)
+    except Exception as e:
+        logger.exception(f'archive_old_audits: error desacoplando particiones: {e}')
+        return {'candidatas': 0, 'archivadas': 0, 'eliminadas': 0, 'particiones': [], 'error': str(e)}
+
+    logger.info(
+        f'archive_old_audits: {len(particiones)} particiones desacopladas '
+        f'({", ".join(p["particion"] for p in particiones) or "ninguna"}, dry_run={dry_run})'
+    )
+
+    if tabla_existe('auditoria_historico'):
+        result = _archivar('auditoria_historico', months, dry_run)
+    else:
+        result = {'candidatas': 0, 'archivadas': 0, 'eliminadas': 0, 'error': None}
+    result['particiones'] = particiones
+    return result
+
+
+def ensure_audit_partitions(months_ahead=3):
+    """
+    Crea por adelantado las particiones mensuales de auditoria (mes actual y
+    los N siguientes) para que ninguna inserción caiga en auditoria_default.
+    Retorna dict con las particiones creadas.
+    """
+    from common.archivado import auditoria_particionada, crear_particiones_auditoria
+
+    result = {'creadas': [], 'error': None}
+    try:
+        if not auditoria_particionada():
+            result['error'] = 'auditoria no está particionada (ejecutar 15-auditoria-particionada.sql)'
+            logger.warning(f'ensure_audit_partitions: {result["error"]}')
+            return result
+        result['creadas'] = crear_particiones_auditoria(months_ahead)
+        logger.info(f'ensure_audit_partitions: creadas {result["creadas"] or "ninguna"} (months_ahead={months_ahead})')
     except Exception as e:
         result['error'] = str(e)
-        logger.exception(f'Error en archive_old_audits: {e}')
-    
+        logger.exception(f'Error en ensure_audit_partitions: {e}')
     return result
 
 
 def archive_old_incidencias(months=12, dry_run=False):
     """
     Archiva incidencias cerradas/resueltas más antiguas de N meses.
-    Mueve los registros a la tabla incidencia_archivo.
+    Mueve los registros a la tabla incidencia_archivo en lotes (reanudable).
     Retorna dict con conteos.
     """
+    return _archivar('incidencia', months, dry_run)
+
+
+def purge_old_notifications(read_days=None, unread_days=None, dry_run=False):
+    """
+    Purga por lotes las notificaciones fuera de retención:
+      - leídas más antiguas de read_days (NOTIFICACIONES_RETENCION_LEIDAS_DIAS)
+      - no leídas más antiguas de unread_days (NOTIFICACIONES_RETENCION_NO_LEIDAS_DIAS)
+      - difusiones más antiguas de unread_days, con sus lecturas
+    El avance queda en archivado_progreso (ver v_estadisticas_tablas).
+    Retorna dict con conteos por tabla.
+    """
+    from django.conf import settings
+    from common.archivado import ArchivadoEnCurso, contar_candidatas_purga, purgar_por_lotes
+
+    dias = {
+        'leidas': read_days or getattr(settings, 'NOTIFICACIONES_RETENCION_LEIDAS_DIAS', 90),
+        'no_leidas': unread_days or getattr(settings, 'NOTIFICACIONES_RETENCION_NO_LEIDAS_DIAS', 365),
+    }
+    result = {'candidatas': 0, 'eliminadas': 0, 'tablas': {}, 'error': None}
+
+    for clave in ('notificacion', 'notificacion_difusion'):
+        try:
+            if dry_run:
+                candidatas = contar_candidatas_purga(clave, dias)
+                result['tablas'][clave] = {'candidatas': candidatas}
+                result['candidatas'] += candidatas
+                continue
+            lotes = purgar_por_lotes(clave, dias)
+            result['tablas'][clave] = {
+                'eliminadas': lotes['eliminados'],
+                'lotes': lotes['lotes'],
+                'reanudado': lotes['reanudado'],
+                'completado': lotes['completado'],
+            }
+            result['candidatas'] += lotes['eliminados']
+            result['eliminadas'] += lotes['eliminados']
+            logger.info(
+                f'purga {clave}: eliminadas={lotes["eliminados"]} en {lotes["lotes"]} lotes '
+                f'({lotes["duracion_ms"]} ms, reanudado={lotes["reanudado"]})'
+            )
+        except ArchivadoEnCurso as e:
+            result['error'] = str(e)
+            logger.warning(f'purga {clave}: {e}')
+        except Exception as e:
+            result['error'] = str(e)
+            logger.exception(f'Error purgando {clave}: {e}')
+
+    logger.info(f'purge_old_notifications: {result["eliminadas"]} eliminadas (dias={dias}, dry_run={dry_run})')
+    return result
+
+
+def close_attendance_day(fecha=None, dry_run=False, hora_cierre='23:00'):
+    """
+    Cierre nocturno de asistencias para una fecha (por defecto, ayer):
+      - cierra las jornadas sin salida y calcula horas efectivas (una sola sentencia)
+      - materializa el parte diario con presentes, ausentes y licencias
+      - registra las métricas de la ejecución en cierre_jornada
+    Con dry_run=True todo se ejecuta y se revierte (solo informa conteos).
+    Retorna dict con conteos.
+    """
+    from asistencia.models import CierreJornada
+    from asistencia.resumen import programar_recalculo
+
+    if fecha is None:
+        fecha = date.today() - timedelta(days=1)
+
     result = {
-        'candidatas': 0,
-        'archivadas': 0,
-        'eliminadas': 0,
+        'fecha': str(fecha),
+        'salidas_cerradas': 0,
+        'horas_calculadas': 0,
+        'presentes': 0,
+        'ausentes': 0,
+        'en_licencia': 0,
+        'partes_generados': 0,
+        'duracion_ms': 0,
         'error': None
     }
-    
+
+    iniciado_en = timezone.now()
+    inicio = time.monotonic()
+
     try:
-        # Calcular fecha de corte usando relativedelta
-        cutoff_date = timezone.now() - relativedelta(months=months)
-        
-        with connection.cursor() as cursor:
-            # Verificar si la tabla de archivo existe
-            cursor.execute("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_schema = 'public' AND table_name = 'incidencia_archivo'
-                )
-            """)
-            if not cursor.fetchone()[0]:
-                result['error'] = 'Tabla incidencia_archivo no existe'
-                logger.warning(f'archive_old_incidencias: {result["error"]}')
-                return result
-            
-            # Contar candidatas usando fecha calculada
-            cursor.execute("""
-                SELECT COUNT(*) FROM incidencia 
-                WHERE estado IN ('cerrada', 'resuelta')
-                  AND fecha_resolucion < %s
-            """, [cutoff_date])
-            result['candidatas'] = cursor.fetchone()[0]
-            
-            logger.info(f'archive_old_incidencias: {result["candidatas"]} incidencias candidatas (months={months}, dry_run={dry_run})')
-            
-            if result['candidatas'] == 0 or dry_run:
-                return result
-            
-            # Ejecutar función de archivo (la función usa INTEGER para meses)
-            cursor.execute("SELECT * FROM archivar_incidencias(%s)", [months])
-            row = cursor.fetchone()
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT * FROM cerrar_jornada(%s, %s)", [fecha, hora_cierre])
+                row = cursor.fetchone()
             if row:
-                result['archivadas'] = row[0]
-                result['eliminadas'] = row[1]
-                
-            logger.info(f'archive_old_incidencias: archivadas={result["archivadas"]}, eliminadas={result["eliminadas"]}')
-            
+                (result['salidas_cerradas'], result['horas_calculadas'], result['presentes'],
+                 result['ausentes'], result['en_licencia'], result['partes_generados']) = row
+
+            if dry_run:
+                transaction.set_rollback(True)
+            elif result['horas_calculadas']:
+                programar_recalculo(fecha)
     except Exception as e:
         result['error'] = str(e)
-        logger.exception(f'Error en archive_old_incidencias: {e}')
-    
+        logger.exception(f'Error en close_attendance_day: {e}')
+
+    result['duracion_ms'] = int((time.monotonic() - inicio) * 1000)
+
+    logger.info(
+        f'close_attendance_day: fecha={fecha} salidas={result["salidas_cerradas"]} '
+        f'presentes={result["presentes"]} ausentes={result["ausentes"]} '
+        f'licencias={result["en_licencia"]} ({result["duracion_ms"]} ms, dry_run={dry_run})'
+    )
+
+    if not dry_run:
+        try:
+            CierreJornada.objects.create(
+                fecha=fecha,
+                iniciado_en=iniciado_en,
+                finalizado_en=timezone.now(),
+                duracion_ms=result['duracion_ms'],
+                salidas_cerradas=result['salidas_cerradas'],
+                horas_calculadas=result['horas_calculadas'],
+                presentes=result['presentes'],
+                ausentes=result['ausentes'],
+                en_licencia=result['en_licencia'],
+                partes_generados=result['partes_generados'],
+                estado='error' if result['error'] else 'ok',
+                error=result['error']
+            )
+        except Exception as e:
+            logger.error(f'close_attendance_day: no se pudieron registrar métricas: {e}')
+
     return result
@@ -1,3 +1,87 @@
+from datetime import time
+
+from django.core.cache import caches
 from django.test import TestCase
+from django.urls import reverse
+
+from common.testing import PresupuestoEndpointMixin
+
+from .models import Agente, AgenteRol, Area, Rol
+
+
+def crear_agente(area, rol, dni, password='clave-segura-1'):
+    """Agente activo con un rol, listo para iniciar sesión"""
+    agente = Agente(
+        email=f'{dni}@giga.test', dni=dni, cuil=f'20{dni}9', legajo=f'L{dni}',
+        nombre='Agente', apellido=f'Prueba {dni}', activo=True, id_area=area,
+        horario_entrada=time(8), horario_salida=time(16),
+    )
+    agente.set_password(password)
+    agente.save()
+    AgenteRol.objects.create(id_agente=agente, id_rol=rol)
+    return agente
+
+
+class PresupuestoConsultasPersonasTests(PresupuestoEndpointMixin, TestCase):
+    """Los endpoints de sesión y catálogos respetan SQL_QUERY_BUDGETS"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.area = Area.objects.create(nombre='Área de prueba')
+        Area.objects.create(nombre='Subárea de prueba', id_area_padre=cls.area, nivel=1)
+        cls.rol = Rol.objects.create(nombre='Administrador')
+        Rol.objects.create(nombre='Agente')
+        cls.agente = crear_agente(cls.area, cls.rol, '30111222')
+
+    def iniciar_sesion(self):
+        return self.assertDentroDelPresupuesto(
+            'login', 'post',
+            data={'cuil': self.agente.dni, 'password': 'clave-segura-1'},
+            content_type='application/json',
+        )
+
+    def test_login(self):
+        response = self.iniciar_sesion()
+        self.assertTrue(response.data['success'])
+
+    def test_check_session(self):
+        self.iniciar_sesion()
+        self.assertDentroDelPresupuesto('check_session')
+
+    def test_get_roles(self):
+        self.iniciar_sesion()
+        self.assertDentroDelPresupuesto('get_roles')
+
+    def test_get_areas(self):
+        self.iniciar_sesion()
+        self.assertDentroDelPresupuesto('get_areas')
+
+
+class RespuestaCondicionalTests(TestCase):
+    """ETag de catálogos: igual en todos los workers y nuevo tras cada cambio"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.area = Area.objects.create(nombre='Área de prueba')
+        cls.rol = Rol.objects.create(nombre='Administrador')
+        cls.agente = crear_agente(cls.area, cls.rol, '30111333')
+
+    def setUp(self):
+        self.client.post(
+            reverse('login'), {'cuil': self.agente.dni, 'password': 'clave-segura-1'},
+            content_type='application/json',
+        )
+
+    def test_304_sin_cambios_aunque_otro_worker_no_tenga_cache(self):
+        etag = self.client.get(reverse('get_roles'))['ETag']
+        # Otro proceso: caché local vacía, mismas versiones en la base
+        caches['default'].clear()
+        response = self.client.get(reverse('get_roles'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
 
-# Create your tests here.
+    def test_cambio_genera_nuevo_etag(self):
+        etag = self.client.get(reverse('get_roles'))['ETag']
+        Rol.objects.create(nombre='Jefatura')
+        response = self.client.get(reverse('get_roles'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
@@ -14,6 +14,7 @@ from personas.auth_views import (
 )
 from personas.session_views import cerrar_todas_sesiones
 from personas.session_api import login_history
+from personas import tareas_views
 
 
 # URLs de autenticación
@@ -84,6 +85,14 @@ organigrama_patterns = [
     path('sincronizar/', views.sincronizar_organigrama_manual, name='sincronizar_organigrama_manual'),
 ]
 
+# URLs de tareas programadas (scheduler)
+tareas_patterns = [
+    path('', tareas_views.listar_tareas, name='listar_tareas'),
+    path('ejecuciones/', tareas_views.historial_tareas, name='historial_tareas'),
+    path('ejecuciones/<int:ejecucion_id>/', tareas_views.detalle_ejecucion, name='detalle_ejecucion'),
+    path('<str:nombre>/ejecutar/', tareas_views.ejecutar_tarea, name='ejecutar_tarea'),
+]
+
 # Import temporal para testing
 from .test_views import get_agentes_test
 
@@ -99,6 +108,7 @@ urlpatterns = [
     path('asignaciones/', include(asignaciones_patterns)),
     path('parametros/', include(parametros_patterns)),
     path('organigrama/', include(organigrama_patterns)),
+    path('tareas/', include(tareas_patterns)),
     path('test/', include(test_patterns)),
     # DEBUG TEMPORAL - Remover después de resolver 404
     path('debug/organigrama-test/', views.debug_organigrama_test, name='debug_organigrama_test'),
@@ -17,7 +17,7 @@ from django.http import JsonResponse
 import json
 
 from .models import Agente, Area, Rol, AgenteRol, Agrupacion, Organigrama
-from auditoria.models import Auditoria
+from auditoria.buffer import encolar_auditoria
 from .serializers import (
     AgenteListSerializer,
     AgenteDetailSerializer, 
@@ -33,6 +33,8 @@ from common.permissions import (
     obtener_agente_sesion, obtener_rol_agente, obtener_areas_jerarquia,
     obtener_area_y_subareas
 )
+from common.cache import cache_app
+from common.condicional import respuesta_condicional
 
 
 
@@ -414,6 +416,7 @@ def delete_agente(request, agente_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticatedGIGA])  # RBAC actualizado
+@respuesta_condicional('areas', 'agentes')
 def get_areas(request):
     """
     Obtener todas las áreas del sistema con información jerárquica
@@ -567,19 +570,23 @@ def get_subareas(request, area_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticatedGIGA])  # RBAC actualizado
+@respuesta_condicional('roles')
 def get_roles(request):
     """
     Obtener lista de todos los roles disponibles.
     """
     try:
-        roles = Rol.objects.all().order_by('nombre')
-        serializer = RolSerializer(roles, many=True)
+        roles = cache_app.obtener(
+            'roles', ('listado',),
+            lambda: list(RolSerializer(Rol.objects.all().order_by('nombre'), many=True).data),
+            ttl=3600
+        )
         
         return Response({
             'success': True,
             'data': {
-                'results': serializer.data,
-                'count': len(serializer.data)
+                'results': roles,
+                'count': len(roles)
             }
         })
         
@@ -1777,151 +1784,49 @@ def crear_auditoria(agente_id, accion, tabla, pk_afectada, valor_previo=None, va
     """
     Crear registro de auditoría genérico.
     """
-    try:
-        from django.utils import timezone
-        from django.core.serializers.json import DjangoJSONEncoder
-        import json
-        
-        # Convertir datos a JSON serializable
-        valor_previo_json = None
-        valor_nuevo_json = None
-        
-        if valor_previo:
-            valor_previo_json = json.loads(json.dumps(valor_previo, cls=DjangoJSONEncoder))
-        
-        if valor_nuevo:
-            valor_nuevo_json = json.loads(json.dumps(valor_nuevo, cls=DjangoJSONEncoder))
-        
-        Auditoria.objects.create(
-            pk_afectada=pk_afectada,
-            nombre_tabla=tabla,
-            creado_en=timezone.now(),
-            valor_previo=valor_previo_json,
-            valor_nuevo=valor_nuevo_json,
-            accion=accion,
-            id_agente_id=usuario_logueado_id or agente_id
-        )
-    except Exception as e:
-        print(f"Error al crear auditoría: {str(e)}")
+    encolar_auditoria(
+        tabla, accion, pk_afectada, usuario_logueado_id or agente_id,
+        valor_previo=valor_previo or None, valor_nuevo=valor_nuevo or None
+    )
 
 def crear_auditoria_agente(accion, agente_id, valor_previo=None, valor_nuevo=None, usuario_logueado_id=None):
     """
     Crear registro de auditoría para cambios en agentes.
     """
-    try:
-        from django.utils import timezone
-        from django.core.serializers.json import DjangoJSONEncoder
-        import json
-        
-        # Convertir datos a JSON serializable
-        valor_previo_json = None
-        valor_nuevo_json = None
-        
-        if valor_previo:
-            valor_previo_json = json.loads(json.dumps(valor_previo, cls=DjangoJSONEncoder))
-        
-        if valor_nuevo:
-            valor_nuevo_json = json.loads(json.dumps(valor_nuevo, cls=DjangoJSONEncoder))
-        
-        Auditoria.objects.create(
-            pk_afectada=agente_id,
-            nombre_tabla='agente',
-            creado_en=timezone.now(),
-            valor_previo=valor_previo_json,
-            valor_nuevo=valor_nuevo_json,
-            accion=accion,
-            id_agente_id=usuario_logueado_id  # FK al agente que hizo el cambio
-        )
-    except Exception as e:
-        # No fallar si la auditoría falla, solo registrar
-        print(f"Error al crear auditoría: {str(e)}")
+    encolar_auditoria(
+        'agente', accion, agente_id, usuario_logueado_id,  # FK al agente que hizo el cambio
+        valor_previo=valor_previo or None, valor_nuevo=valor_nuevo or None
+    )
 
 
 def crear_auditoria_rol(accion, agente_id, rol_id, valor_previo=None, valor_nuevo=None, usuario_logueado_id=None):
     """
     Crear registro de auditoría para cambios de roles.
     """
-    try:
-        from django.utils import timezone
-        from django.core.serializers.json import DjangoJSONEncoder
-        import json
-        
-        # Convertir datos a JSON serializable
-        valor_previo_json = None
-        valor_nuevo_json = None
-        
-        if valor_previo:
-            valor_previo_json = json.loads(json.dumps(valor_previo, cls=DjangoJSONEncoder))
-        
-        if valor_nuevo:
-            valor_nuevo_json = json.loads(json.dumps(valor_nuevo, cls=DjangoJSONEncoder))
-        
-        Auditoria.objects.create(
-            pk_afectada=agente_id,
-            nombre_tabla='agente_rol',
-            creado_en=timezone.now(),
-            valor_previo=valor_previo_json,
-            valor_nuevo=valor_nuevo_json,
-            accion=accion,
-            id_agente_id=usuario_logueado_id  # FK al agente que hizo el cambio
-        )
-    except Exception as e:
-        # No fallar si la auditoría falla, solo registrar
-        print(f"Error al crear auditoría de rol: {str(e)}")
+    encolar_auditoria(
+        'agente_rol', accion, agente_id, usuario_logueado_id,  # FK al agente que hizo el cambio
+        valor_previo=valor_previo or None, valor_nuevo=valor_nuevo or None
+    )
 
 
 def crear_auditoria_area(accion, area_id, valor_previo=None, valor_nuevo=None, usuario_logueado_id=None):
     """
     Crear registro de auditoría para cambios en áreas.
     """
-    try:
-        from django.utils import timezone
-        from django.core.serializers.json import DjangoJSONEncoder
-        import json
-        
-        # Convertir datos a JSON serializable
-        valor_previo_json = None
-        valor_nuevo_json = None
-        
-        if valor_previo:
-            valor_previo_json = json.loads(json.dumps(valor_previo, cls=DjangoJSONEncoder))
-        
-        if valor_nuevo:
-            valor_nuevo_json = json.loads(json.dumps(valor_nuevo, cls=DjangoJSONEncoder))
-        
-        Auditoria.objects.create(
-            pk_afectada=area_id,
-            nombre_tabla='area',
-            creado_en=timezone.now(),
-            valor_previo=valor_previo_json,
-            valor_nuevo=valor_nuevo_json,
-            accion=accion,
-            id_agente_id=usuario_logueado_id  # FK al agente que hizo el cambio
-        )
-    except Exception as e:
-        # No fallar si la auditoría falla, solo registrar
-        print(f"Error al crear auditoría de área: {str(e)}")
+    encolar_auditoria(
+        'area', accion, area_id, usuario_logueado_id,  # FK al agente que hizo el cambio
+        valor_previo=valor_previo or None, valor_nuevo=valor_nuevo or None
+    )
 
 
 def crear_auditoria_organigrama(accion, organigrama_id, valor_previo=None, valor_nuevo=None, agente_id=None):
     """
     Crear registro de auditoría para cambios en organigrama.
     """
-    try:
-        from django.utils import timezone
-        
-        Auditoria.objects.create(
-            pk_afectada=organigrama_id,
-            nombre_tabla='organigrama',
-            creado_en=timezone.now(),
-            valor_previo=valor_previo,
-            valor_nuevo=valor_nuevo,
-            accion=accion,
-            id_agente_id=agente_id  # FK al agente que hizo el cambio
-        )
-    except Exception as e:
-        # No fallar si la auditoría falla, solo registrar
-        print(f"Error al crear auditoría: {str(e)}")
+    encolar_auditoria(
+        'organigrama', accion, organigrama_id, agente_id,  # FK al agente que hizo el cambio
+        valor_previo=valor_previo, valor_nuevo=valor_nuevo
+    )
 
 
 def sincronizar_organigrama_areas(usuario_logueado_id=None):
@@ -2027,6 +1932,7 @@ def sincronizar_organigrama_areas(usuario_logueado_id=None):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticatedGIGA])  # RBAC actualizado
+@respuesta_condicional('organigrama')
 def get_organigrama(request):
     """
     Obtener la estructura del organigrama activa.
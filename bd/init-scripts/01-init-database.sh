@@ -65,6 +65,36 @@ run_sql "$SCRIPT_DIR/08-create-notificaciones.sql" \
 run_sql "$SCRIPT_DIR/09-alter-table-cronogramas.sql" \
     "Agregados campos cronograma"
 
+run_sql "$SCRIPT_DIR/10-resumen-asistencia.sql" \
+    "Resumen diario de asistencia"
+
+run_sql "$SCRIPT_DIR/11-marcacion-kiosco.sql" \
+    "Marcaciones por lote desde kioscos"
+
+run_sql "$SCRIPT_DIR/12-cierre-jornada.sql" \
+    "Cierre nocturno de jornada"
+
+run_sql "$SCRIPT_DIR/13-scheduler-tareas.sql" \
+    "Historial de tareas programadas"
+
+run_sql "$SCRIPT_DIR/14-archivado-por-lotes.sql" \
+    "Archivado por lotes reanudable"
+
+run_sql "$SCRIPT_DIR/15-auditoria-particionada.sql" \
+    "Auditoría particionada por mes"
+
+run_sql "$SCRIPT_DIR/16-notificaciones-difusion.sql" \
+    "Notificaciones de difusión"
+
+run_sql "$SCRIPT_DIR/17-notificaciones-retencion.sql" \
+    "Retención de notificaciones"
+
+run_sql "$SCRIPT_DIR/18-version-datos.sql" \
+    "Versiones de datos de referencia"
+
+run_sql "$SCRIPT_DIR/19-auditoria-asistencia-aplicacion.sql" \
+    "Auditoría de asistencia sin duplicados"
+
 # ========================================================================
 # Finalización
 # ========================================================================
@@ -0,0 +1,115 @@
+-- ========================================================================
+-- SCRIPT: Resumen diario de asistencia
+-- Fecha: Diciembre 2025
+-- Descripción: Cálculo del resumen diario de asistencias en una sola consulta
+--              y tabla de contadores por (fecha, área) mantenida en forma
+--              incremental por la marcación y la aprobación de licencias
+-- ========================================================================
+
+-- =====================================================
+-- 1. TABLA DE CONTADORES POR FECHA Y ÁREA
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS resumen_asistencia_diaria (
+    fecha DATE NOT NULL,
+    id_area BIGINT NOT NULL,
+    total_agentes INTEGER NOT NULL DEFAULT 0,
+    presentes INTEGER NOT NULL DEFAULT 0,
+    sin_salida INTEGER NOT NULL DEFAULT 0,
+    salidas_automaticas INTEGER NOT NULL DEFAULT 0,
+    en_licencia INTEGER NOT NULL DEFAULT 0,
+    -- Agentes que marcaron entrada y además tienen licencia aprobada ese día
+    -- (necesario para no restar dos veces al calcular ausentes)
+    presentes_con_licencia INTEGER NOT NULL DEFAULT 0,
+    actualizado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (fecha, id_area),
+    FOREIGN KEY (id_area) REFERENCES area(id_area) ON DELETE CASCADE
+);
+
+COMMENT ON TABLE resumen_asistencia_diaria IS 'Contadores diarios de asistencia por área para el tablero de supervisores';
+
+-- =====================================================
+-- 2. CÁLCULO DEL RESUMEN EN UNA SOLA CONSULTA
+-- =====================================================
+
+-- Resumen por área de los agentes activos para una fecha.
+-- Une agentes, asistencia y licencias aprobadas con agregados condicionales.
+-- p_areas limita los agentes antes de agregar (NULL: todas las áreas).
+-- La versión anterior solo recibía la fecha; se elimina para que la llamada
+-- con un argumento no sea ambigua.
+DROP FUNCTION IF EXISTS calcular_resumen_asistencia(DATE);
+
+CREATE OR REPLACE FUNCTION calcular_resumen_asistencia(p_fecha DATE, p_areas BIGINT[] DEFAULT NULL)
+RETURNS TABLE(
+    id_area BIGINT,
+    total_agentes INTEGER,
+    presentes INTEGER,
+    sin_salida INTEGER,
+    salidas_automaticas INTEGER,
+    en_licencia INTEGER,
+    presentes_con_licencia INTEGER
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        ag.id_area,
+        COUNT(*)::INTEGER,
+        COUNT(*) FILTER (WHERE asi.hora_entrada IS NOT NULL)::INTEGER,
+        COUNT(*) FILTER (WHERE asi.hora_entrada IS NOT NULL AND asi.hora_salida IS NULL)::INTEGER,
+        COUNT(*) FILTER (WHERE asi.marcacion_salida_automatica)::INTEGER,
+        COUNT(*) FILTER (WHERE lic.id_agente IS NOT NULL)::INTEGER,
+        COUNT(*) FILTER (WHERE asi.hora_entrada IS NOT NULL AND lic.id_agente IS NOT NULL)::INTEGER
+    FROM agente ag
+    LEFT JOIN asistencia asi
+        ON asi.id_agente = ag.id_agente AND asi.fecha = p_fecha
+    LEFT JOIN (
+        SELECT DISTINCT l.id_agente
+        FROM licencia l
+        WHERE l.estado = 'aprobada'
+          AND p_fecha BETWEEN l.fecha_desde AND l.fecha_hasta
+    ) lic ON lic.id_agente = ag.id_agente
+    WHERE ag.activo = true
+      AND ag.id_area IS NOT NULL
+      AND (p_areas IS NULL OR ag.id_area = ANY(p_areas))
+    GROUP BY ag.id_area;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+COMMENT ON FUNCTION calcular_resumen_asistencia IS 'Resumen diario de asistencia por área calculado en una única consulta';
+
+-- =====================================================
+-- 3. RECÁLCULO DE CONTADORES
+-- =====================================================
+
+-- Recalcula (y crea si no existen) los contadores de una fecha a partir
+-- de los datos reales. Si se indica un área, solo recalcula esa área.
+CREATE OR REPLACE FUNCTION recalcular_resumen_asistencia(p_fecha DATE, p_id_area BIGINT DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    filas INTEGER;
+BEGIN
+    INSERT INTO resumen_asistencia_diaria (
+        fecha, id_area, total_agentes, presentes, sin_salida,
+        salidas_automaticas, en_licencia, presentes_con_licencia, actualizado_en
+    )
+    SELECT p_fecha, r.id_area, r.total_agentes, r.presentes, r.sin_salida,
+           r.salidas_automaticas, r.en_licencia, r.presentes_con_licencia, CURRENT_TIMESTAMP
+    FROM calcular_resumen_asistencia(
+        p_fecha,
+        CASE WHEN p_id_area IS NULL THEN NULL ELSE ARRAY[p_id_area] END
+    ) r
+    ON CONFLICT (fecha, id_area) DO UPDATE SET
+        total_agentes = EXCLUDED.total_agentes,
+        presentes = EXCLUDED.presentes,
+        sin_salida = EXCLUDED.sin_salida,
+        salidas_automaticas = EXCLUDED.salidas_automaticas,
+        en_licencia = EXCLUDED.en_licencia,
+        presentes_con_licencia = EXCLUDED.presentes_con_licencia,
+        actualizado_en = CURRENT_TIMESTAMP;
+
+    GET DIAGNOSTICS filas = ROW_COUNT;
+    RETURN filas;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION recalcular_resumen_asistencia IS 'Sincroniza los contadores diarios de asistencia con los datos reales';
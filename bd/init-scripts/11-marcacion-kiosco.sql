@@ -0,0 +1,30 @@
+-- ========================================================================
+-- SCRIPT: Marcaciones por lote desde kioscos
+-- Fecha: Diciembre 2025
+-- Descripción: Registro de marcaciones recibidas desde kioscos y terminales
+--              sin conexión. El id generado por el cliente permite reenviar
+--              un lote completo sin duplicar marcaciones (idempotencia)
+-- ========================================================================
+
+CREATE TABLE IF NOT EXISTS marcacion_kiosco (
+    id_cliente VARCHAR(64) PRIMARY KEY,
+    dni VARCHAR(20) NOT NULL,
+    tipo VARCHAR(10) NOT NULL,
+    marcado_en TIMESTAMP NOT NULL,
+    estado VARCHAR(20) NOT NULL DEFAULT 'procesando',
+    motivo VARCHAR(100),
+    id_agente BIGINT,
+    id_asistencia BIGINT,
+    id_agente_sesion BIGINT,
+    terminal VARCHAR(100),
+    recibido_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (id_agente) REFERENCES agente(id_agente) ON DELETE SET NULL,
+    FOREIGN KEY (id_asistencia) REFERENCES asistencia(id_asistencia) ON DELETE SET NULL,
+    FOREIGN KEY (id_agente_sesion) REFERENCES agente(id_agente) ON DELETE SET NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_marcacion_kiosco_recibido ON marcacion_kiosco(recibido_en DESC);
+CREATE INDEX IF NOT EXISTS idx_marcacion_kiosco_agente ON marcacion_kiosco(id_agente, marcado_en DESC);
+
+COMMENT ON TABLE marcacion_kiosco IS 'Marcaciones recibidas por lote desde kioscos (deduplicadas por id de cliente)';
+COMMENT ON COLUMN marcacion_kiosco.estado IS 'aplicada, sin_cambios o rechazada';
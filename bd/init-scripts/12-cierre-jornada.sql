@@ -0,0 +1,188 @@
+-- ========================================================================
+-- SCRIPT: Cierre nocturno de jornada
+-- Fecha: Diciembre 2025
+-- Descripción: Cierre de asistencias abiertas con cálculo de horas efectivas,
+--              materialización del parte diario (presentes, ausentes y
+--              licencias) y registro de métricas de cada ejecución
+-- ========================================================================
+
+-- =====================================================
+-- 1. PARTE DIARIO MATERIALIZADO
+-- =====================================================
+
+ALTER TABLE parte_diario
+    ADD COLUMN IF NOT EXISTS id_area BIGINT,
+    ADD COLUMN IF NOT EXISTS estado VARCHAR(20),
+    ADD COLUMN IF NOT EXISTS id_asistencia BIGINT,
+    ADD COLUMN IF NOT EXISTS id_licencia BIGINT,
+    ADD COLUMN IF NOT EXISTS horas_efectivas DECIMAL(4,2);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'fk_parte_diario_asistencia'
+    ) THEN
+        ALTER TABLE parte_diario
+            ADD CONSTRAINT fk_parte_diario_asistencia
+            FOREIGN KEY (id_asistencia) REFERENCES asistencia(id_asistencia) ON DELETE SET NULL;
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'fk_parte_diario_licencia'
+    ) THEN
+        ALTER TABLE parte_diario
+            ADD CONSTRAINT fk_parte_diario_licencia
+            FOREIGN KEY (id_licencia) REFERENCES licencia(id_licencia) ON DELETE SET NULL;
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_parte_diario_fecha_area ON parte_diario(fecha_parte, id_area);
+
+COMMENT ON COLUMN parte_diario.estado IS 'presente, ausente o licencia (calculado por el cierre de jornada)';
+
+-- =====================================================
+-- 2. MÉTRICAS DE EJECUCIÓN
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS cierre_jornada (
+    id_cierre BIGSERIAL PRIMARY KEY,
+    fecha DATE NOT NULL,
+    iniciado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finalizado_en TIMESTAMP,
+    duracion_ms INTEGER,
+    salidas_cerradas INTEGER DEFAULT 0,
+    horas_calculadas INTEGER DEFAULT 0,
+    presentes INTEGER DEFAULT 0,
+    ausentes INTEGER DEFAULT 0,
+    en_licencia INTEGER DEFAULT 0,
+    partes_generados INTEGER DEFAULT 0,
+    estado VARCHAR(20) NOT NULL DEFAULT 'ok',
+    error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_cierre_jornada_fecha ON cierre_jornada(fecha DESC);
+
+COMMENT ON TABLE cierre_jornada IS 'Historial y métricas de las ejecuciones del cierre nocturno de asistencias';
+
+-- =====================================================
+-- 3. FUNCIÓN DE CIERRE
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION cerrar_jornada(
+    p_fecha DATE,
+    p_hora_cierre TIME DEFAULT '23:00:00'
+)
+RETURNS TABLE(
+    salidas_cerradas INTEGER,
+    horas_calculadas INTEGER,
+    presentes INTEGER,
+    ausentes INTEGER,
+    en_licencia INTEGER,
+    partes_generados INTEGER
+) AS $$
+DECLARE
+    v_laborable BOOLEAN;
+    v_salidas INTEGER := 0;
+    v_horas INTEGER := 0;
+    v_partes INTEGER := 0;
+BEGIN
+    v_laborable := EXTRACT(ISODOW FROM p_fecha) < 6 AND NOT es_fecha_feriado(p_fecha);
+
+    -- 1) Cerrar jornadas abiertas y calcular horas efectivas en una sola sentencia
+    --    (también completa horas de jornadas cerradas que no las tenían calculadas)
+    WITH objetivo AS (
+        SELECT a.id_asistencia, a.hora_salida IS NULL AS abierta
+        FROM asistencia a
+        WHERE a.fecha = p_fecha
+          AND a.hora_entrada IS NOT NULL
+          AND (a.hora_salida IS NULL OR a.horas_efectivas IS NULL)
+        FOR UPDATE
+    ), actualizadas AS (
+        UPDATE asistencia a
+        SET
+            hora_salida = COALESCE(a.hora_salida, GREATEST(p_hora_cierre, a.hora_entrada)),
+            marcacion_salida_automatica = a.marcacion_salida_automatica OR o.abierta,
+            observaciones = CASE
+                WHEN o.abierta THEN COALESCE(a.observaciones || ' | ', '')
+                    || 'Salida marcada automáticamente por el sistema a las ' || to_char(p_hora_cierre, 'HH24:MI')
+                ELSE a.observaciones
+            END,
+            horas_efectivas = GREATEST(ROUND((EXTRACT(EPOCH FROM (
+                COALESCE(a.hora_salida, GREATEST(p_hora_cierre, a.hora_entrada)) - a.hora_entrada
+            )) / 3600.0)::numeric, 2), 0),
+            actualizado_en = CURRENT_TIMESTAMP
+        FROM objetivo o
+        WHERE a.id_asistencia = o.id_asistencia
+        RETURNING o.abierta
+    )
+    SELECT COUNT(*) FILTER (WHERE abierta), COUNT(*)
+    INTO v_salidas, v_horas
+    FROM actualizadas;
+
+    -- 2) Materializar el parte diario: presentes, licencias y ausentes
+    --    (en días no laborables solo se registran quienes marcaron)
+    INSERT INTO parte_diario (
+        fecha_parte, id_agente, id_area, estado, id_asistencia, id_licencia,
+        horas_efectivas, creado_en, actualizado_en
+    )
+    SELECT
+        p_fecha,
+        ag.id_agente,
+        ag.id_area,
+        CASE
+            WHEN asi.hora_entrada IS NOT NULL THEN 'presente'
+            WHEN lic.id_licencia IS NOT NULL THEN 'licencia'
+            ELSE 'ausente'
+        END,
+        asi.id_asistencia,
+        lic.id_licencia,
+        asi.horas_efectivas,
+        CURRENT_TIMESTAMP,
+        CURRENT_TIMESTAMP
+    FROM agente ag
+    LEFT JOIN asistencia asi
+        ON asi.id_agente = ag.id_agente AND asi.fecha = p_fecha
+    LEFT JOIN LATERAL (
+        SELECT l.id_licencia
+        FROM licencia l
+        WHERE l.id_agente = ag.id_agente
+          AND l.estado = 'aprobada'
+          AND p_fecha BETWEEN l.fecha_desde AND l.fecha_hasta
+        ORDER BY l.id_licencia
+        LIMIT 1
+    ) lic ON true
+    WHERE ag.activo = true
+      AND (v_laborable OR asi.hora_entrada IS NOT NULL)
+    ON CONFLICT (id_agente, fecha_parte) DO UPDATE SET
+        id_area = EXCLUDED.id_area,
+        estado = EXCLUDED.estado,
+        id_asistencia = EXCLUDED.id_asistencia,
+        id_licencia = EXCLUDED.id_licencia,
+        horas_efectivas = EXCLUDED.horas_efectivas,
+        actualizado_en = CURRENT_TIMESTAMP;
+
+    GET DIAGNOSTICS v_partes = ROW_COUNT;
+
+    RETURN QUERY
+    SELECT
+        v_salidas,
+        v_horas,
+        COUNT(*) FILTER (WHERE pd.estado = 'presente')::INTEGER,
+        COUNT(*) FILTER (WHERE pd.estado = 'ausente')::INTEGER,
+        COUNT(*) FILTER (WHERE pd.estado = 'licencia')::INTEGER,
+        v_partes
+    FROM parte_diario pd
+    WHERE pd.fecha_parte = p_fecha;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION cerrar_jornada IS 'Cierra la jornada: salidas automáticas, horas efectivas y parte diario materializado';
+
+-- La función anterior queda como atajo del cierre para el día previo
+CREATE OR REPLACE FUNCTION marcar_salidas_automaticas()
+RETURNS void AS $$
+BEGIN
+    PERFORM cerrar_jornada((CURRENT_DATE - INTERVAL '1 day')::DATE);
+    RAISE NOTICE 'Jornada cerrada para el día %', CURRENT_DATE - INTERVAL '1 day';
+END;
+$$ LANGUAGE plpgsql;
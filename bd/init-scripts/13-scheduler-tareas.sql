@@ -0,0 +1,66 @@
+-- ========================================================================
+-- SCRIPT: Historial de tareas programadas y líder del scheduler
+-- Fecha: Diciembre 2025
+-- Descripción: Registro de cada ejecución de las tareas de mantenimiento
+--              (duración, conteos y errores) y del proceso que actúa como
+--              líder del scheduler (elegido con un advisory lock)
+-- ========================================================================
+
+-- =====================================================
+-- 1. HISTORIAL DE EJECUCIONES
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS ejecucion_tarea (
+    id_ejecucion BIGSERIAL PRIMARY KEY,
+    tarea VARCHAR(100) NOT NULL,
+    origen VARCHAR(20) NOT NULL DEFAULT 'programada',
+    disparada_por BIGINT REFERENCES agente(id_agente) ON DELETE SET NULL,
+    parametros JSONB,
+    iniciado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finalizado_en TIMESTAMP,
+    duracion_ms INTEGER,
+    estado VARCHAR(20) NOT NULL DEFAULT 'en_curso',
+    resultado JSONB,
+    error TEXT,
+    proceso VARCHAR(255)
+);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'chk_ejecucion_tarea_estado'
+    ) THEN
+        ALTER TABLE ejecucion_tarea
+            ADD CONSTRAINT chk_ejecucion_tarea_estado
+            CHECK (estado IN ('en_curso', 'ok', 'error', 'omitida'));
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'chk_ejecucion_tarea_origen'
+    ) THEN
+        ALTER TABLE ejecucion_tarea
+            ADD CONSTRAINT chk_ejecucion_tarea_origen
+            CHECK (origen IN ('programada', 'manual'));
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_ejecucion_tarea_tarea_inicio
+    ON ejecucion_tarea(tarea, iniciado_en DESC);
+
+COMMENT ON TABLE ejecucion_tarea IS 'Historial de ejecuciones de tareas programadas y manuales del scheduler';
+COMMENT ON COLUMN ejecucion_tarea.resultado IS 'Conteos retornados por la tarea (filas afectadas, candidatas, etc.)';
+COMMENT ON COLUMN ejecucion_tarea.proceso IS 'host:pid del proceso que ejecutó la tarea';
+
+-- =====================================================
+-- 2. LÍDER DEL SCHEDULER
+-- =====================================================
+
+-- Una sola fila: el proceso que tiene el advisory lock la actualiza en cada latido
+CREATE TABLE IF NOT EXISTS scheduler_lider (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    proceso VARCHAR(255) NOT NULL,
+    lider_desde TIMESTAMP NOT NULL,
+    ultimo_latido TIMESTAMP NOT NULL
+);
+
+COMMENT ON TABLE scheduler_lider IS 'Proceso que ejecuta actualmente las tareas programadas (informativo; la exclusión la garantiza pg_advisory_lock)';
@@ -0,0 +1,57 @@
+-- ========================================================================
+-- SCRIPT: Archivado por lotes reanudable
+-- Fecha: Diciembre 2025
+-- Descripción: Puntos de control del archivado de auditorías e incidencias
+--              por lotes de clave primaria (common/archivado.py). Reemplaza
+--              el uso de archivar_auditorias/archivar_incidencias, que mueven
+--              todo en una sola sentencia y una sola transacción
+-- ========================================================================
+
+-- =====================================================
+-- 1. PUNTOS DE CONTROL
+-- =====================================================
+
+-- Una fila por tabla archivada: la ejecución en curso (o la última terminada)
+CREATE TABLE IF NOT EXISTS archivado_progreso (
+    clave VARCHAR(50) PRIMARY KEY,
+    fecha_corte TIMESTAMP NOT NULL,
+    ultimo_id BIGINT NOT NULL DEFAULT 0,
+    archivados BIGINT NOT NULL DEFAULT 0,
+    eliminados BIGINT NOT NULL DEFAULT 0,
+    lotes INTEGER NOT NULL DEFAULT 0,
+    estado VARCHAR(20) NOT NULL DEFAULT 'en_curso',
+    iniciado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    actualizado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finalizado_en TIMESTAMP,
+    error TEXT
+);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'chk_archivado_progreso_estado'
+    ) THEN
+        ALTER TABLE archivado_progreso
+            ADD CONSTRAINT chk_archivado_progreso_estado
+            CHECK (estado IN ('en_curso', 'completado', 'error'));
+    END IF;
+END $$;
+
+COMMENT ON TABLE archivado_progreso IS 'Punto de control del archivado por lotes: una ejecución interrumpida se reanuda desde ultimo_id con la misma fecha_corte';
+COMMENT ON COLUMN archivado_progreso.ultimo_id IS 'Mayor clave primaria ya movida al archivo (los lotes avanzan en orden de PK)';
+
+-- =====================================================
+-- 2. ÍNDICES PARA LA SELECCIÓN DE LOTES
+-- =====================================================
+
+-- Incidencias archivables: solo cerradas/resueltas, por fecha de resolución
+CREATE INDEX IF NOT EXISTS idx_incidencia_archivable
+    ON incidencia(fecha_resolucion, id)
+    WHERE estado IN ('cerrada', 'resuelta');
+
+-- =====================================================
+-- 3. FUNCIONES ANTERIORES
+-- =====================================================
+
+COMMENT ON FUNCTION archivar_auditorias IS 'OBSOLETA: mueve todo en una transacción. Usar el archivado por lotes (manage.py archivar_auditorias)';
+COMMENT ON FUNCTION archivar_incidencias IS 'OBSOLETA: mueve todo en una transacción. Usar el archivado por lotes (manage.py archivar_incidencias)';
@@ -0,0 +1,206 @@
+-- ========================================================================
+-- SCRIPT: Auditoría particionada por mes
+-- Fecha: Diciembre 2025
+-- Descripción: Convierte auditoria en una tabla particionada por rango
+--              mensual de creado_en. Las particiones futuras se crean por
+--              adelantado (crear_particiones_auditoria, tarea diaria) y el
+--              archivado desacopla particiones completas en lugar de copiar
+--              y borrar fila por fila (desacoplar_particiones_auditoria).
+--              Las consultas con rango sobre creado_en solo leen los meses
+--              involucrados (partition pruning).
+-- ========================================================================
+
+-- =====================================================
+-- 1. CONVERSIÓN DE LA TABLA EXISTENTE (sin copiar filas)
+-- =====================================================
+-- La tabla actual pasa a ser la partición auditoria_historico, con rango
+-- desde MINVALUE hasta el mes siguiente al del registro más reciente. Sus
+-- filas se archivan por lotes (common/archivado.py) hasta que toda la
+-- partición queda fuera del período de retención y se desacopla.
+
+DO $$
+DECLARE
+    v_limite DATE := (date_trunc('month', CURRENT_DATE) + INTERVAL '1 month')::date;
+    v_indice RECORD;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_class
+        WHERE oid = to_regclass('public.auditoria') AND relkind = 'r'
+    ) THEN
+        LOCK TABLE auditoria IN ACCESS EXCLUSIVE MODE;
+
+        -- La clave de partición no admite NULL
+        UPDATE auditoria SET creado_en = '2000-01-01' WHERE creado_en IS NULL;
+        ALTER TABLE auditoria ALTER COLUMN creado_en SET NOT NULL;
+
+        SELECT GREATEST(v_limite, (date_trunc('month', MAX(creado_en)) + INTERVAL '1 month')::date)
+        INTO v_limite
+        FROM auditoria;
+
+        ALTER TABLE auditoria RENAME TO auditoria_historico;
+        ALTER TABLE auditoria_historico RENAME CONSTRAINT auditoria_pkey TO auditoria_historico_pkey;
+        ALTER TABLE auditoria_historico ALTER COLUMN id_auditoria DROP DEFAULT;
+
+        FOR v_indice IN
+            SELECT indexname FROM pg_indexes
+            WHERE schemaname = 'public' AND tablename = 'auditoria_historico'
+              AND indexname LIKE 'idx\_auditoria\_%'
+        LOOP
+            EXECUTE format(
+                'ALTER INDEX %I RENAME TO %I',
+                v_indice.indexname,
+                replace(v_indice.indexname, 'idx_auditoria_', 'idx_auditoria_historico_')
+            );
+        END LOOP;
+
+        CREATE TABLE auditoria (
+            id_auditoria BIGINT NOT NULL DEFAULT nextval('auditoria_id_auditoria_seq'::regclass),
+            pk_afectada BIGINT,
+            nombre_tabla VARCHAR(100) NOT NULL,
+            creado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            valor_previo JSONB,
+            valor_nuevo JSONB,
+            accion VARCHAR(50) NOT NULL,
+            id_agente BIGINT,
+            PRIMARY KEY (id_auditoria, creado_en),
+            FOREIGN KEY (id_agente) REFERENCES agente(id_agente) ON DELETE SET NULL
+        ) PARTITION BY RANGE (creado_en);
+
+        ALTER SEQUENCE auditoria_id_auditoria_seq OWNED BY auditoria.id_auditoria;
+
+        EXECUTE format(
+            'ALTER TABLE auditoria ATTACH PARTITION auditoria_historico FOR VALUES FROM (MINVALUE) TO (%L)',
+            v_limite
+        );
+
+        RAISE NOTICE 'auditoria convertida a tabla particionada (auditoria_historico hasta %)', v_limite;
+    ELSIF to_regclass('public.auditoria') IS NULL THEN
+        CREATE TABLE auditoria (
+            id_auditoria BIGSERIAL,
+            pk_afectada BIGINT,
+            nombre_tabla VARCHAR(100) NOT NULL,
+            creado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            valor_previo JSONB,
+            valor_nuevo JSONB,
+            accion VARCHAR(50) NOT NULL,
+            id_agente BIGINT,
+            PRIMARY KEY (id_auditoria, creado_en),
+            FOREIGN KEY (id_agente) REFERENCES agente(id_agente) ON DELETE SET NULL
+        ) PARTITION BY RANGE (creado_en);
+    END IF;
+END $$;
+
+-- Índices en la tabla padre: se propagan a cada partición (en la partición
+-- histórica se reutilizan los índices existentes equivalentes)
+CREATE INDEX IF NOT EXISTS idx_auditoria_tabla ON auditoria(nombre_tabla);
+CREATE INDEX IF NOT EXISTS idx_auditoria_accion ON auditoria(accion);
+CREATE INDEX IF NOT EXISTS idx_auditoria_fecha ON auditoria(creado_en DESC);
+CREATE INDEX IF NOT EXISTS idx_auditoria_agente ON auditoria(id_agente);
+CREATE INDEX IF NOT EXISTS idx_auditoria_tabla_fecha ON auditoria(nombre_tabla, creado_en DESC);
+CREATE INDEX IF NOT EXISTS idx_auditoria_agente_fecha ON auditoria(id_agente, creado_en DESC);
+
+-- Partición por defecto: recibe filas fuera de las particiones creadas
+-- (por ejemplo, si la tarea diaria dejó de correr). Debe permanecer vacía.
+CREATE TABLE IF NOT EXISTS auditoria_default PARTITION OF auditoria DEFAULT;
+
+-- Particiones desacopladas (archivadas): siguen consultables como archivo.auditoria_yAAAAmMM
+CREATE SCHEMA IF NOT EXISTS archivo;
+
+-- =====================================================
+-- 2. CREACIÓN DE PARTICIONES FUTURAS
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION crear_particiones_auditoria(meses_adelante INTEGER DEFAULT 3)
+RETURNS SETOF TEXT AS $$
+DECLARE
+    v_desde DATE;
+    v_hasta DATE;
+    v_nombre TEXT;
+BEGIN
+    FOR i IN 0..meses_adelante LOOP
+        v_desde := (date_trunc('month', CURRENT_DATE) + make_interval(months => i))::date;
+        v_hasta := (v_desde + INTERVAL '1 month')::date;
+        v_nombre := 'auditoria_' || to_char(v_desde, '"y"YYYY"m"MM');
+
+        CONTINUE WHEN to_regclass('public.' || v_nombre) IS NOT NULL;
+
+        BEGIN
+            -- Se crea aparte y se adjunta: ATTACH no bloquea las inserciones en auditoria
+            EXECUTE format(
+                'CREATE TABLE %I (LIKE auditoria INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', v_nombre
+            );
+            -- Hasta el ATTACH (fin de la transacción) no entran filas nuevas a la
+            -- partición por defecto: una fila del mes insertada después de mover
+            -- las existentes haría fallar el ATTACH con check_violation. Las
+            -- inserciones de otros meses no pasan por auditoria_default.
+            LOCK TABLE auditoria_default IN SHARE ROW EXCLUSIVE MODE;
+            -- Filas del mes que hayan caído en la partición por defecto
+            EXECUTE format(
+                'WITH movidas AS (
+                     DELETE FROM auditoria_default WHERE creado_en >= %L AND creado_en < %L RETURNING *
+                 )
+                 INSERT INTO %I SELECT * FROM movidas',
+                v_desde, v_hasta, v_nombre
+            );
+            EXECUTE format(
+                'ALTER TABLE auditoria ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                v_nombre, v_desde, v_hasta
+            );
+            RETURN NEXT v_nombre;
+        EXCEPTION WHEN invalid_object_definition THEN
+            -- El mes ya está cubierto por otra partición (p. ej. auditoria_historico)
+            NULL;
+        END;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION crear_particiones_auditoria IS 'Crea las particiones mensuales de auditoria desde el mes actual hasta N meses adelante (idempotente). Retorna las creadas';
+
+-- =====================================================
+-- 3. ARCHIVADO POR DESACOPLE DE PARTICIONES
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION desacoplar_particiones_auditoria(
+    meses_antiguedad INTEGER DEFAULT 6,
+    solo_listar BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE(particion TEXT, hasta TIMESTAMP, filas_estimadas BIGINT) AS $$
+DECLARE
+    v_corte TIMESTAMP := CURRENT_TIMESTAMP - make_interval(months => meses_antiguedad);
+    v_particion RECORD;
+BEGIN
+    FOR v_particion IN
+        SELECT c.relname,
+               substring(pg_get_expr(c.relpartbound, c.oid) FROM 'TO \(''([^'']+)''\)')::timestamp AS limite,
+               GREATEST(c.reltuples, 0)::bigint AS filas
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'public.auditoria'::regclass
+        ORDER BY 2
+    LOOP
+        -- La partición por defecto no tiene límite superior
+        CONTINUE WHEN v_particion.limite IS NULL OR v_particion.limite > v_corte;
+
+        IF NOT solo_listar THEN
+            EXECUTE format('ALTER TABLE auditoria DETACH PARTITION %I', v_particion.relname);
+            EXECUTE format('ALTER TABLE %I SET SCHEMA archivo', v_particion.relname);
+        END IF;
+
+        particion := v_particion.relname;
+        hasta := v_particion.limite;
+        filas_estimadas := v_particion.filas;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION desacoplar_particiones_auditoria IS 'Desacopla las particiones de auditoria cuyo rango completo es anterior a N meses y las mueve al esquema archivo (sin copiar filas)';
+
+-- =====================================================
+-- 4. PARTICIONES INICIALES
+-- =====================================================
+
+SELECT crear_particiones_auditoria(3);
+
+COMMENT ON TABLE auditoria IS 'Auditoría particionada por mes (creado_en). Filtrar por rango de creado_en para leer solo las particiones necesarias';
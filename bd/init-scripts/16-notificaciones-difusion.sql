@@ -0,0 +1,68 @@
+-- ========================================================================
+-- SCRIPT: Notificaciones de difusión
+-- Fecha: Diciembre 2025
+-- Descripción: Las notificaciones dirigidas a todos los agentes, a un área o
+--              a un rol (feriados, organigrama, cronogramas pendientes) se
+--              guardan una sola vez en notificacion_difusion. La lectura de
+--              cada agente se registra recién cuando la marca como leída
+--              (notificacion_difusion_lectura), en lugar de crear una fila de
+--              notificacion por agente activo.
+-- ========================================================================
+
+-- =====================================================
+-- 1. DIFUSIONES
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS notificacion_difusion (
+    id BIGSERIAL PRIMARY KEY,
+    titulo VARCHAR(255) NOT NULL,
+    mensaje TEXT NOT NULL,
+    tipo VARCHAR(50) DEFAULT 'GENERICO' NOT NULL,
+    link VARCHAR(255),
+    audiencia VARCHAR(10) DEFAULT 'todos' NOT NULL,
+    id_area BIGINT REFERENCES area(id_area) ON DELETE CASCADE,
+    id_rol BIGINT REFERENCES rol(id_rol) ON DELETE CASCADE,
+    fecha_creacion TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'chk_notificacion_difusion_audiencia'
+    ) THEN
+        ALTER TABLE notificacion_difusion
+            ADD CONSTRAINT chk_notificacion_difusion_audiencia CHECK (
+                (audiencia = 'todos' AND id_area IS NULL AND id_rol IS NULL)
+                OR (audiencia = 'area' AND id_area IS NOT NULL AND id_rol IS NULL)
+                OR (audiencia = 'rol' AND id_rol IS NOT NULL AND id_area IS NULL)
+            );
+    END IF;
+END $$;
+
+-- Bandeja: difusiones recientes de cada audiencia
+CREATE INDEX IF NOT EXISTS idx_notificacion_difusion_todos
+    ON notificacion_difusion(fecha_creacion DESC) WHERE audiencia = 'todos';
+CREATE INDEX IF NOT EXISTS idx_notificacion_difusion_area
+    ON notificacion_difusion(id_area, fecha_creacion DESC) WHERE audiencia = 'area';
+CREATE INDEX IF NOT EXISTS idx_notificacion_difusion_rol
+    ON notificacion_difusion(id_rol, fecha_creacion DESC) WHERE audiencia = 'rol';
+
+COMMENT ON TABLE notificacion_difusion IS 'Notificaciones para una audiencia (todos, un área o un rol), guardadas una sola vez';
+COMMENT ON COLUMN notificacion_difusion.audiencia IS 'todos | area (id_area) | rol (id_rol)';
+
+-- =====================================================
+-- 2. LECTURAS POR AGENTE
+-- =====================================================
+
+-- Una fila solo cuando el agente lee la difusión: sin fila = no leída
+CREATE TABLE IF NOT EXISTS notificacion_difusion_lectura (
+    id_difusion BIGINT NOT NULL REFERENCES notificacion_difusion(id) ON DELETE CASCADE,
+    id_agente BIGINT NOT NULL REFERENCES agente(id_agente) ON DELETE CASCADE,
+    leida_en TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    PRIMARY KEY (id_difusion, id_agente)
+);
+
+CREATE INDEX IF NOT EXISTS idx_notificacion_difusion_lectura_agente
+    ON notificacion_difusion_lectura(id_agente);
+
+COMMENT ON TABLE notificacion_difusion_lectura IS 'Acuse de lectura de una difusión por agente (se crea al marcarla como leída)';
@@ -0,0 +1,58 @@
+-- ========================================================================
+-- SCRIPT: Retención de notificaciones
+-- Fecha: Diciembre 2025
+-- Descripción: Índices parciales para la bandeja y la purga diaria de
+--              notificaciones (personas.tasks.purge_old_notifications), y
+--              avance de la purga/archivado en v_estadisticas_tablas
+-- ========================================================================
+
+-- =====================================================
+-- 1. ÍNDICES PARCIALES
+-- =====================================================
+
+-- Bandeja y contador de no leídas: solo las no leídas de cada agente, ya
+-- ordenadas por fecha. No crece con las leídas acumuladas.
+CREATE INDEX IF NOT EXISTS idx_notificacion_no_leidas
+    ON notificacion(id_agente, fecha_creacion DESC)
+    WHERE leida = false;
+
+-- (id_agente, leida) queda cubierto por el índice parcial; para el borrado en
+-- cascada desde agente alcanza con un índice simple por agente
+DROP INDEX IF EXISTS idx_notificacion_agente_leida;
+CREATE INDEX IF NOT EXISTS idx_notificacion_agente
+    ON notificacion(id_agente);
+
+-- Purga: límite superior de cada ejecución por fecha de creación
+CREATE INDEX IF NOT EXISTS idx_notificacion_difusion_fecha
+    ON notificacion_difusion(fecha_creacion);
+
+-- =====================================================
+-- 2. ESTADÍSTICAS Y AVANCE DE PURGA/ARCHIVADO
+-- =====================================================
+
+-- Las columnas nuevas van al final (CREATE OR REPLACE VIEW no permite reordenar).
+-- retencion_*: última ejecución registrada en archivado_progreso para la tabla.
+CREATE OR REPLACE VIEW v_estadisticas_tablas AS
+SELECT
+    s.schemaname,
+    s.relname as tabla,
+    s.n_live_tup as filas_vivas,
+    s.n_dead_tup as filas_muertas,
+    pg_size_pretty(pg_total_relation_size(s.relid)) as tamano_total,
+    s.last_vacuum,
+    s.last_autovacuum,
+    s.last_analyze,
+    p.estado as retencion_estado,
+    p.eliminados as retencion_filas_eliminadas,
+    p.lotes as retencion_lotes,
+    p.iniciado_en as retencion_iniciada_en,
+    p.actualizado_en as retencion_actualizada_en,
+    p.finalizado_en as retencion_finalizada_en
+FROM pg_stat_user_tables s
+LEFT JOIN archivado_progreso p ON p.clave = s.relname
+WHERE s.relname IN ('auditoria', 'auditoria_historico', 'auditoria_archivo', 'incidencia', 'incidencia_archivo',
+                    'sesion_activa', 'django_session', 'asistencia', 'guardia', 'licencia',
+                    'notificacion', 'notificacion_difusion', 'notificacion_difusion_lectura')
+ORDER BY pg_total_relation_size(s.relid) DESC;
+
+COMMENT ON VIEW v_estadisticas_tablas IS 'Vista de estadísticas de tablas principales para monitoreo de espacio, con el avance de la última purga o archivado por lotes';
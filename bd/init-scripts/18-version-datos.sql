@@ -0,0 +1,24 @@
+-- ========================================================================
+-- SCRIPT: Versiones de datos de referencia
+-- Fecha: Diciembre 2025
+-- Descripción: Versión y momento del último cambio de cada grupo de datos
+--              de referencia (roles, áreas, feriados, ...). Los signals de
+--              common/signals.py la incrementan en la misma transacción que
+--              la escritura; common/condicional.py arma con ella los ETag y
+--              Last-Modified, iguales en todos los workers
+-- ========================================================================
+
+CREATE TABLE IF NOT EXISTS version_datos (
+    espacio VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    -- Epoch en segundos
+    modificado BIGINT NOT NULL
+);
+
+-- Sin fila el espacio responde solo con ETag (versión 0) hasta el primer cambio
+INSERT INTO version_datos (espacio, version, modificado)
+SELECT espacio, 0, EXTRACT(EPOCH FROM CURRENT_TIMESTAMP)::BIGINT
+FROM unnest(ARRAY['roles', 'areas', 'agentes', 'organigrama', 'feriados', 'tipos_licencia']) AS espacio
+ON CONFLICT (espacio) DO NOTHING;
+
+COMMENT ON TABLE version_datos IS 'Versión de cada grupo de datos de referencia, validador de las respuestas condicionales (ETag / Last-Modified)';
@@ -0,0 +1,20 @@
+-- ========================================================================
+-- SCRIPT: Auditoría de asistencia sin duplicados
+-- Fecha: Diciembre 2025
+-- Descripción: La marcación rápida (asistencia/marcacion.py) y el lote de
+--              kioscos (asistencia/kiosco.py) encolan su propia fila de
+--              auditoría. Con trigger_audit_asistencia cada marcación costaba
+--              dos INSERT en auditoria. Esos caminos activan
+--              giga.auditoria_aplicacion en su transacción (SET LOCAL vía
+--              set_config) y el trigger solo audita los cambios hechos por
+--              fuera de ellos (ORM, correcciones, SQL manual)
+-- ========================================================================
+
+DROP TRIGGER IF EXISTS trigger_audit_asistencia ON asistencia;
+CREATE TRIGGER trigger_audit_asistencia
+    AFTER INSERT OR UPDATE ON asistencia
+    FOR EACH ROW
+    WHEN (current_setting('giga.auditoria_aplicacion', true) IS DISTINCT FROM 'on')
+    EXECUTE FUNCTION audit_asistencia_changes();
+
+COMMENT ON TRIGGER trigger_audit_asistencia ON asistencia IS 'Audita cambios de asistencia salvo los de caminos que encolan su propia auditoría (giga.auditoria_aplicacion)';
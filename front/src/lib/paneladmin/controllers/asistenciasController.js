@@ -142,22 +142,20 @@ class AsistenciasController {
 				}
 
 
-				const [responseAsistencias, responseAusentes] = await Promise.all([
-					asistenciaService.getAsistenciasAdmin(paramsAsistencias),
-					asistenciaService.getAsistenciasAdmin(paramsAusentes)
+				// El listado viene paginado por cursor: se recorren todas las páginas
+				const [dataAsistencias, dataAusentes] = await Promise.all([
+					asistenciaService.getTodasAsistenciasAdmin(paramsAsistencias),
+					asistenciaService.getTodasAsistenciasAdmin(paramsAusentes)
 				]);
 
-				const dataAsistencias = responseAsistencias.data;
-				const dataAusentes = responseAusentes.data;
-
 				// Filtrar ausentes que YA tienen asistencia (evitar duplicados visuales)
 				// Esto protege contra latencia del backend o condiciones de carrera
-				const dniConAsistencia = new Set((dataAsistencias.data || []).map(a => a.agente_dni));
-				const ausentesFiltrados = (dataAusentes.data || []).filter(a => !dniConAsistencia.has(a.agente_dni));
+				const dniConAsistencia = new Set(dataAsistencias.map(a => a.agente_dni));
+				const ausentesFiltrados = dataAusentes.filter(a => !dniConAsistencia.has(a.agente_dni));
 
 				// Combinar arrays (asistencias reales primero)
 				asistenciasData = [
-					...(dataAsistencias.data || []),
+					...dataAsistencias,
 					...ausentesFiltrados
 				];
 
@@ -180,8 +178,7 @@ class AsistenciasController {
 					}
 				}
 
-				const response = await asistenciaService.getAsistenciasAdmin(params);
-				asistenciasData = response.data?.data || [];
+				asistenciasData = await asistenciaService.getTodasAsistenciasAdmin(params);
 			}
 
 			this.asistencias.set(asistenciasData);
@@ -123,6 +123,19 @@ export const asistenciaService = {
     const queryString = new URLSearchParams(params).toString();
     return createApiClient(token).get(`/asistencia/admin/listar/?${queryString}`);
   },
+  // Recorre todas las páginas del listado (paginación por cursor) y devuelve las filas juntas
+  getTodasAsistenciasAdmin: async (params = {}, token = null) => {
+    const filas = [];
+    let cursor = null;
+    do {
+      const pagina = cursor ? { ...params, cursor } : params;
+      const queryString = new URLSearchParams(pagina).toString();
+      const response = await createApiClient(token).get(`/asistencia/admin/listar/?${queryString}`);
+      filas.push(...(response.data?.data || []));
+      cursor = response.data?.next_cursor || null;
+    } while (cursor);
+    return filas;
+  },
   getResumenAdmin: (params = {}, token = null) => {
     const queryString = new URLSearchParams(params).toString();
     return createApiClient(token).get(`/asistencia/admin/resumen/?${queryString}`);
@@ -162,6 +175,11 @@ export const guardiasService = {
       fecha_desde: fechaDesde,
       fecha_hasta: fechaHasta
     }),
+  getMatrizDisponibilidad: (fechaDesde, fechaHasta, areaId = null, token = null) => {
+    const params = new URLSearchParams({ fecha_desde: fechaDesde, fecha_hasta: fechaHasta });
+    if (areaId) params.append('area_id', areaId);
+    return createApiClient(token).get(`/guardias/guardias/matriz_disponibilidad/?${params}`);
+  },
 
   // Aprobaciones jerárquicas
   getPendientesAprobacion: (agenteId, token = null) => createApiClient(token).get(`/guardias/cronogramas/pendientes/?agente_id=${agenteId}`),
@@ -212,6 +230,7 @@ export const guardiasService = {
   updateReglaPlus: (id, data, token = null) => createApiClient(token).put(`/guardias/reglas-plus/${id}/`, data),
   deleteReglaPlus: (id, token = null) => createApiClient(token).delete(`/guardias/reglas-plus/${id}/`),
   simularReglaPlus: (id, data, token = null) => createApiClient(token).post(`/guardias/reglas-plus/${id}/simular/`, data),
+  simularPeriodoPlus: (data, token = null) => createApiClient(token).post('/guardias/reglas-plus/simular_periodo/', data),
 
   // Parámetros de Área
   getParametrosArea: (params = '', token = null) => createApiClient(token).get(`/guardias/parametros-area/?${params}`),
@@ -377,5 +396,12 @@ export const auditoriaService = {
 export const notificacionesService = {
   getNotificaciones: (token = null) => createApiClient(token).get('/notificaciones/'),
   marcarLeida: (id, token = null) => createApiClient(token).post(`/notificaciones/${id}/marcar_leida/`),
+  marcarDifusionLeida: (id, token = null) => createApiClient(token).post(`/notificaciones/${id}/marcar_difusion_leida/`),
   marcarTodasLeidas: (token = null) => createApiClient(token).post('/notificaciones/marcar_todas_leidas/'),
+  // Stream SSE (eventos estado, nueva, leida, todas_leidas). En producción lo
+  // sirve un proceso aparte: VITE_NOTIFICACIONES_STREAM_URL apunta a él
+  abrirStream: () => new EventSource(
+    import.meta.env.VITE_NOTIFICACIONES_STREAM_URL || `${API_BASE_URL}/notificaciones/stream/`,
+    { withCredentials: true }
+  ),
 };